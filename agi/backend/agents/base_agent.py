@@ -3,14 +3,22 @@ Base Agent class for all LangGraph agents in AGI-V2.
 Provides common functionality and interfaces for all agents.
 """
 
+import dataclasses
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, TypedDict
-from langchain_core.messages import BaseMessage
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, TypedDict
+from langchain_core.messages import BaseMessage, SystemMessage, message_to_dict, messages_from_dict
 from langchain_core.runnables import Runnable
 from langgraph.graph import StateGraph
 from pydantic import BaseModel, Field
 import structlog
 
+from services.checkpoint_store import CHECKPOINT_COMPLETED, CHECKPOINT_RUNNING
+from services.cpu_executor import CPUExecutor
+from services.external_services import rate_limiter as provider_rate_limiter
+from services.rate_limiter import estimate_tokens
+
 logger = structlog.get_logger(__name__)
 
 
@@ -45,12 +53,29 @@ class BaseAgent(ABC):
     - Graph construction
     """
     
+    # Large context entries set by one node and only read by later ones:
+    # checkpointed once per node instead of with every in-node save
+    detached_context_keys: Tuple[str, ...] = ()
+    
     def __init__(self, config: AgentConfig, services: Dict[str, Any]):
         self.config = config
         self.services = services
         self.logger = logger.bind(agent=config.name)
         self._graph: Optional[StateGraph] = None
         
+        # Shared provider budget (same limiter as the HTTP services)
+        external_services = services.get("external_services")
+        self.rate_limiter = getattr(external_services, "rate_limiter", None) or provider_rate_limiter
+        # Shared completion cache (same instance as AnthropicService)
+        self.completion_cache = getattr(getattr(external_services, "anthropic", None), "cache", None)
+        
+        # Optional checkpoint store: runs whose context carries a run_id are resumable
+        self.checkpoint_store = services.get("checkpoint_store")
+        self._node_order: List[str] = []
+        
+        # Shared process pool for CPU-bound stages; threads when none is provided
+        self.cpu_executor: CPUExecutor = services.get("cpu_executor") or CPUExecutor(workers=0)
+        
     @property
     def name(self) -> str:
         return self.config.name
@@ -91,8 +116,13 @@ class BaseAgent(ABC):
             self.logger.info("Starting agent execution", 
                            initial_context=initial_state.get("context", {}))
             
-            # Run the graph
-            result = await self.graph.ainvoke(initial_state)
+            # Run the graph (node by node when checkpointing)
+            if self._checkpoint_run_id(initial_state):
+                result = initial_state
+                async for _, result in self._iterate_graph(initial_state):
+                    pass
+            else:
+                result = await self.graph.ainvoke(initial_state)
             
             self.logger.info("Agent execution completed successfully",
                            final_step_count=result.get("step_count", 0))
@@ -109,6 +139,157 @@ class BaseAgent(ABC):
                 step_count=initial_state.get("step_count", 0)
             )
     
+    async def astream_steps(self, initial_state: AgentState) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the agent graph and yield one "step" event per executed node,
+        then a final "completed" or "failed" event carrying the context.
+
+        Closing the iterator (client gone) stops the graph at the current node.
+        """
+        started = time.monotonic()
+        state = dict(initial_state)
+        
+        try:
+            async with aclosing(self._iterate_graph(initial_state)) as steps:
+                async for node, state in steps:
+                    if node is not None:
+                        yield self._step_event("step", state, started, node=node)
+        except Exception as e:
+            self.logger.error("Agent streaming failed", error=str(e))
+            state["error"] = str(e)
+        
+        final_event = "failed" if state.get("error") else "completed"
+        yield self._step_event(final_event, state, started, result=state.get("context", {}))
+    
+    async def _iterate_graph(
+        self,
+        initial_state: AgentState
+    ) -> AsyncIterator[Tuple[Optional[str], Dict[str, Any]]]:
+        """
+        Run the graph node by node, yielding (node, state).
+
+        With a run_id in the context and a checkpoint store, the state is
+        restored from the last checkpoint and saved after every successful
+        node. An already completed run yields (None, state) once.
+        """
+        state = dict(initial_state)
+        run_id = self._checkpoint_run_id(state)
+        
+        if run_id:
+            checkpoint = await self.checkpoint_store.load(run_id)
+            if checkpoint is not None:
+                state = self._restore_checkpoint(state, checkpoint)
+                if checkpoint["status"] == CHECKPOINT_COMPLETED:
+                    yield None, state
+                    return
+        
+        # Closed explicitly so that an abandoned stream stops the graph right away
+        async with aclosing(self.graph.astream(state, stream_mode="updates")) as updates:
+            async for update in updates:
+                for node, node_state in update.items():
+                    if node_state:
+                        state.update(node_state)
+                    # A failed node is not saved: resuming retries it
+                    if run_id and not state.get("error"):
+                        next_node = self._next_node(node)
+                        await self.checkpoint_store.save(
+                            run_id, self.name, next_node, state,
+                            status=CHECKPOINT_COMPLETED if next_node is None else CHECKPOINT_RUNNING,
+                            owner=self._run_owner(state),
+                            detached_keys=self.detached_context_keys
+                        )
+                    yield node, state
+    
+    def _set_resumable_entry(self, workflow: StateGraph, nodes: List[str]):
+        """Entry point of a linear graph that can start at any of its nodes."""
+        self._node_order = list(nodes)
+        workflow.set_conditional_entry_point(
+            lambda state: (state.get("context") or {}).get("resume_from") or nodes[0],
+            {node: node for node in nodes}
+        )
+    
+    def _next_node(self, node: str) -> Optional[str]:
+        index = self._node_order.index(node)
+        return self._node_order[index + 1] if index + 1 < len(self._node_order) else None
+    
+    def _checkpoint_run_id(self, state: AgentState) -> Optional[str]:
+        """run_id of a checkpointed run, None when checkpointing does not apply."""
+        run_id = (state.get("context") or {}).get("run_id")
+        if not run_id or self.checkpoint_store is None:
+            return None
+        # Building the graph registers the resumable node order
+        return run_id if self.graph is not None and self._node_order else None
+    
+    def _restore_checkpoint(self, state: Dict[str, Any], checkpoint: Dict[str, Any]) -> Dict[str, Any]:
+        if checkpoint["agent"] != self.name:
+            raise ValueError(
+                f"Run {checkpoint['run_id']} belongs to {checkpoint['agent']}, not {self.name}"
+            )
+        # run_id comes from the client: only the user who started the run may resume it
+        if checkpoint.get("owner") != self._run_owner(state):
+            raise PermissionError(f"Run {checkpoint['run_id']} belongs to another user")
+        
+        context = checkpoint["context"]
+        context["run_id"] = checkpoint["run_id"]
+        context["resume_from"] = checkpoint["next_node"]
+        
+        self.logger.info("Resuming from checkpoint",
+                       run_id=checkpoint["run_id"],
+                       next_node=checkpoint["next_node"],
+                       status=checkpoint["status"])
+        
+        return {
+            **state,
+            "context": context,
+            "error": None,
+            "step_count": checkpoint["step_count"]
+        }
+    
+    async def _save_checkpoint(self, state: AgentState, next_node: str):
+        """Save progress made inside a node (e.g. after each processed batch)."""
+        run_id = self._checkpoint_run_id(state)
+        if run_id:
+            # Detached entries are unchanged inside a node: saved at the node boundary
+            await self.checkpoint_store.save(
+                run_id, self.name, next_node, state, owner=self._run_owner(state),
+                detached_keys=self.detached_context_keys, write_detached=False
+            )
+    
+    @staticmethod
+    def _run_owner(state: Dict[str, Any]) -> Optional[str]:
+        """User who started a checkpointed run (stored with each checkpoint)."""
+        return (state.get("context") or {}).get("run_owner")
+    
+    def _step_event(self, event: str, state: Dict[str, Any], started: float, **extra) -> Dict[str, Any]:
+        return {
+            "event": event,
+            "agent": self.name,
+            "run_id": (state.get("context") or {}).get("run_id"),
+            "step_count": state.get("step_count", 0),
+            "elapsed": round(time.monotonic() - started, 3),
+            "counts": self._progress_counts(state.get("context") or {}),
+            "error": state.get("error"),
+            **extra
+        }
+    
+    @staticmethod
+    def _progress_counts(context: Dict[str, Any]) -> Dict[str, float]:
+        """Numeric context values, list sizes and *_metrics dataclass fields."""
+        counts = {}
+        for key, value in context.items():
+            if isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                counts[key] = value
+            elif isinstance(value, list):
+                counts[key] = len(value)
+            elif key.endswith("_metrics") and dataclasses.is_dataclass(value):
+                for field in dataclasses.fields(value):
+                    field_value = getattr(value, field.name)
+                    if isinstance(field_value, (int, float)) and not isinstance(field_value, bool):
+                        counts[field.name] = field_value
+        return counts
+    
     def _increment_step(self, state: AgentState) -> AgentState:
         """Increment step counter in state."""
         state["step_count"] = state.get("step_count", 0) + 1
@@ -123,6 +304,45 @@ class BaseAgent(ABC):
             return False
         return True
     
+    async def _invoke_llm(self, messages: List[BaseMessage]) -> Any:
+        """Invoke the agent LLM within the shared Anthropic rate budget, through the completion cache."""
+        request = None
+        if self.completion_cache is not None:
+            request = self._completion_request(messages)
+            cached = await self.completion_cache.get(request, agent=self.name)
+            if cached is not None:
+                return messages_from_dict([cached])[0]
+        
+        tokens = estimate_tokens("".join(str(message.content) for message in messages))
+        async with self.rate_limiter.limit("anthropic", tokens):
+            response = await self.llm.ainvoke(messages)
+        
+        if request is not None:
+            usage = getattr(response, "usage_metadata", None) or {}
+            await self.completion_cache.set(
+                request, message_to_dict(response),
+                input_tokens=usage.get("input_tokens", 0),
+                output_tokens=usage.get("output_tokens", 0),
+                agent=self.name
+            )
+        return response
+    
+    def _completion_request(self, messages: List[BaseMessage]):
+        """Cache key parameters of a LangChain call, in Anthropic message format."""
+        system_prompt = "\n".join(
+            str(message.content) for message in messages if isinstance(message, SystemMessage)
+        )
+        return self.completion_cache.make_request(
+            model=getattr(self.llm, "model", None) or getattr(self.llm, "model_name", "unknown"),
+            messages=[
+                {"role": message.type, "content": message.content}
+                for message in messages if not isinstance(message, SystemMessage)
+            ],
+            system_prompt=system_prompt or None,
+            max_tokens=getattr(self.llm, "max_tokens", None),
+            temperature=getattr(self.llm, "temperature", None)
+        )
+    
     def _log_step(self, step_name: str, state: AgentState, **kwargs):
         """Log a processing step."""
         if self.config.enable_logging:
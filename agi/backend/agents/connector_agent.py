@@ -8,6 +8,7 @@ Responsabilités:
 - Enrichir les métadonnées des relations existantes
 """
 
+import numpy as np
 from typing import Any, Dict, List, Optional, Set, Tuple
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_anthropic import ChatAnthropic
@@ -16,9 +17,10 @@ import json
 from collections import defaultdict, deque
 
 from .base_agent import BaseAgent, AgentConfig, AgentState
-from ..services.memory_service import MemoryService
-from ..services.embedding_service import EmbeddingService
-from ..services.graph_service import GraphService
+from services.memory_service import MemoryService
+from services.embedding_service import EmbeddingService
+from services.graph_service import GraphService
+from services.ann_index import similar_pairs
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -74,6 +76,7 @@ class ConnectorAgent(BaseAgent):
         self.max_connections_per_node = 20
         self.similarity_threshold = 0.7
         self.centrality_threshold = 0.1
+        self.ann_probe_lists = 8  # Listes IVF examinées par nœud (rappel vs coût)
         
         # Types de connexions supportés
         self.connection_types = {
@@ -209,29 +212,36 @@ class ConnectorAgent(BaseAgent):
         
         try:
             missing_connections = state["context"].get("missing_connections", [])
-            created_count = 0
-            
-            for connection in missing_connections:
-                # Vérifier que la connexion n'existe pas déjà
-                exists = await self.graph_service.connection_exists(
-                    connection.source_id, 
-                    connection.target_id,
-                    connection.connection_type
-                )
-                
-                if not exists and connection.strength >= self.min_connection_strength:
-                    # Créer la connexion
-                    await self.graph_service.create_relationship(
-                        source_id=connection.source_id,
-                        target_id=connection.target_id,
-                        relationship_type=connection.connection_type,
-                        properties={
-                            "strength": connection.strength,
-                            "created_by": "ConnectorAgent",
-                            "metadata": connection.metadata
-                        }
-                    )
-                    created_count += 1
+            eligible = [
+                connection for connection in missing_connections
+                if connection.strength >= self.min_connection_strength
+            ]
+            
+            # Relations existantes chargées une fois par type (au lieu d'une requête par paire)
+            existing_pairs = {
+                connection_type: await self.graph_service.get_connection_pairs(connection_type)
+                for connection_type in {connection.connection_type for connection in eligible}
+            }
+            
+            relationships = []
+            for connection in eligible:
+                pair = tuple(sorted((connection.source_id, connection.target_id)))
+                if pair in existing_pairs[connection.connection_type]:
+                    continue
+                existing_pairs[connection.connection_type].add(pair)
+                relationships.append({
+                    "source_id": connection.source_id,
+                    "target_id": connection.target_id,
+                    "relationship_type": connection.connection_type,
+                    "properties": {
+                        "strength": connection.strength,
+                        "created_by": "ConnectorAgent",
+                        "metadata": connection.metadata
+                    }
+                })
+            
+            # Écriture groupée: un aller-retour par lot de relations
+            created_count = await self.graph_service.create_relationships(relationships)
             
             state["context"]["created_connections"] = created_count
             
@@ -256,8 +266,8 @@ class ConnectorAgent(BaseAgent):
             # Récupérer toutes les connexions existantes
             existing_connections = await self.graph_service.get_all_relationships()
             
-            optimized_count = 0
-            removed_count = 0
+            removals = []
+            updates = []
             
             for connection in existing_connections:
                 # Recalculer la force de la connexion
@@ -265,17 +275,14 @@ class ConnectorAgent(BaseAgent):
                 
                 if new_strength < self.min_connection_strength:
                     # Supprimer les connexions faibles
-                    await self.graph_service.remove_relationship(
-                        connection["id"]
-                    )
-                    removed_count += 1
+                    removals.append(connection["id"])
                 elif abs(new_strength - connection.get("strength", 0)) > 0.1:
                     # Mettre à jour la force de la connexion
-                    await self.graph_service.update_relationship_properties(
-                        connection["id"],
-                        {"strength": new_strength}
-                    )
-                    optimized_count += 1
+                    updates.append({"id": connection["id"], "properties": {"strength": new_strength}})
+            
+            # Écritures groupées par lots
+            removed_count = await self.graph_service.remove_relationships(removals)
+            optimized_count = await self.graph_service.update_relationships_properties(updates)
             
             state["context"]["optimized_connections"] = optimized_count
             state["context"]["removed_connections"] = removed_count
@@ -328,35 +335,45 @@ class ConnectorAgent(BaseAgent):
         try:
             # Récupérer tous les nœuds avec leurs embeddings
             nodes_with_embeddings = await self.graph_service.get_nodes_with_embeddings()
+            if len(nodes_with_embeddings) < 2:
+                return connections
             
-            # Comparer tous les pairs de nœuds
-            for i, node1 in enumerate(nodes_with_embeddings):
-                for node2 in nodes_with_embeddings[i+1:]:
-                    if node1["id"] == node2["id"]:
-                        continue
-                    
-                    # Calculer la similarité sémantique
-                    similarity = self.embedding_service.cosine_similarity(
-                        node1["embedding"], node2["embedding"]
-                    )
-                    
-                    if similarity >= self.similarity_threshold:
-                        # Vérifier qu'une connexion n'existe pas déjà
-                        exists = await self.graph_service.connection_exists(
-                            node1["id"], node2["id"], "semantic"
-                        )
-                        
-                        if not exists:
-                            connections.append(Connection(
-                                source_id=node1["id"],
-                                target_id=node2["id"],
-                                connection_type="semantic",
-                                strength=similarity,
-                                metadata={
-                                    "similarity_score": similarity,
-                                    "detection_method": "embedding_similarity"
-                                }
-                            ))
+            # Relations existantes chargées en une fois (au lieu d'un aller-retour par paire)
+            existing_pairs = await self.graph_service.get_connection_pairs("semantic")
+            
+            # Candidats: k plus proches voisins de chaque nœud via un index IVF
+            # Matrice transmise au pool CPU par mémoire partagée
+            candidates = await self.cpu_executor.run_with_array(
+                similar_pairs,
+                np.asarray([node["embedding"] for node in nodes_with_embeddings], dtype=np.float32),
+                self.similarity_threshold,
+                self.max_connections_per_node,
+                self.ann_probe_lists,
+                kind="ann_pairs"
+            )
+            
+            for i, j, similarity in candidates:
+                node1, node2 = nodes_with_embeddings[i], nodes_with_embeddings[j]
+                if node1["id"] == node2["id"]:
+                    continue
+                if tuple(sorted((node1["id"], node2["id"]))) in existing_pairs:
+                    continue
+                
+                connections.append(Connection(
+                    source_id=node1["id"],
+                    target_id=node2["id"],
+                    connection_type="semantic",
+                    strength=similarity,
+                    metadata={
+                        "similarity_score": similarity,
+                        "detection_method": "embedding_ann"
+                    }
+                ))
+            
+            self.logger.info("Semantic candidates generated",
+                           nodes=len(nodes_with_embeddings),
+                           candidates=len(candidates),
+                           new_connections=len(connections))
             
         except Exception as e:
             self.logger.error("Semantic connection finding failed", error=str(e))
@@ -611,7 +628,7 @@ Format JSON:
             HumanMessage(content=prompt)
         ]
         
-        response = await self.llm.ainvoke(messages)
+        response = await self._invoke_llm(messages)
         
         try:
             return json.loads(response.content)
@@ -8,6 +8,7 @@ Responsabilités:
 - Maintenir la cohérence des connaissances consolidées
 """
 
+import numpy as np
 from typing import Any, Dict, List, Optional
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_anthropic import ChatAnthropic
@@ -15,8 +16,9 @@ from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolExecutor
 
 from .base_agent import BaseAgent, AgentConfig, AgentState
-from ..services.memory_service import MemoryService
-from ..services.embedding_service import EmbeddingService
+from services.memory_service import MemoryService
+from services.embedding_service import EmbeddingService
+from services.similarity_clustering import SimilarityClusterer
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -47,6 +49,8 @@ class ConsolidatorAgent(BaseAgent):
         # Seuils de consolidation
         self.consolidation_threshold = 5  # Nombre minimum d'occurrences
         self.similarity_threshold = 0.85  # Seuil de similarité pour regroupement
+        self.clustering_mode = "greedy"  # "greedy", "components" ou "agglomerative"
+        self.clusterer = SimilarityClusterer(self.similarity_threshold, self.clustering_mode)
         
     def _build_graph(self) -> StateGraph:
         """Construit le graphe LangGraph pour la consolidation."""
@@ -157,7 +161,7 @@ class ConsolidatorAgent(BaseAgent):
                     HumanMessage(content=consolidation_prompt)
                 ]
                 
-                response = await self.llm.ainvoke(messages)
+                response = await self._invoke_llm(messages)
                 
                 # Parser la réponse de Claude
                 consolidated = self._parse_claude_response(response.content, pattern)
@@ -240,42 +244,15 @@ class ConsolidatorAgent(BaseAgent):
             return []
         
         # Obtenir les embeddings pour toutes les mémoires
-        texts = [mem["content"] for mem in memories]
-        embeddings = await self.embedding_service.get_embeddings(texts)
+        embeddings = await self.embedding_service.get_item_embeddings(memories)
         
-        # Algorithme de clustering simple basé sur la similarité
-        patterns = []
-        used_indices = set()
-        
-        for i, memory in enumerate(memories):
-            if i in used_indices:
-                continue
-            
-            # Créer un nouveau pattern
-            pattern = {
-                "representative_content": memory["content"],
-                "memories": [memory],
-                "embedding": embeddings[i]
-            }
-            used_indices.add(i)
-            
-            # Trouver les mémoires similaires
-            for j, other_memory in enumerate(memories):
-                if j in used_indices or i == j:
-                    continue
-                
-                # Calculer la similarité cosinus
-                similarity = self.embedding_service.cosine_similarity(
-                    embeddings[i], embeddings[j]
-                )
-                
-                if similarity >= self.similarity_threshold:
-                    pattern["memories"].append(other_memory)
-                    used_indices.add(j)
-            
-            patterns.append(pattern)
-        
-        return patterns
+        # Similarités calculées par blocs matriciels dans le pool CPU partagé
+        clusters = await self.cpu_executor.run_with_array(
+            self.clusterer.cluster,
+            np.asarray(embeddings, dtype=np.float32),
+            kind="similarity_clustering"
+        )
+        return self.clusterer.patterns_from_clusters(memories, embeddings, clusters)
     
     def _create_consolidation_prompt(self, pattern: Dict) -> str:
         """Créer le prompt pour Claude pour consolider un pattern."""
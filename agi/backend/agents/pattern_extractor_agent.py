@@ -8,18 +8,22 @@ Responsabilités:
 - Enrichir le graphe de connaissances avec de nouveaux patterns
 """
 
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_anthropic import ChatAnthropic
 from langgraph.graph import StateGraph, END
+from contextlib import aclosing
 import json
+import random
 import re
-from collections import Counter, defaultdict
+import numpy as np
 
 from .base_agent import BaseAgent, AgentConfig, AgentState
-from ..services.memory_service import MemoryService
-from ..services.embedding_service import EmbeddingService
-from ..services.graph_service import GraphService
+from services.memory_service import MemoryService
+from services.embedding_service import EmbeddingService
+from services.graph_service import GraphService
+from services.pattern_scanner import PatternScanner, ScanResult
+from services.similarity_clustering import SimilarityClusterer
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -77,6 +81,13 @@ class PatternExtractorAgent(BaseAgent):
         self.min_concept_confidence = 0.6
         self.max_patterns_per_batch = 50
         
+        # Mode streaming: données lues par blocs, seuls les agrégats et un
+        # échantillon (étapes sémantiques et Claude) restent en mémoire
+        self.stream_sample_size = 500
+        
+        # Regroupement sémantique glouton (seuil 0.75), calculé dans le pool CPU
+        self.semantic_clusterer = SimilarityClusterer(0.75, "greedy")
+        
         # Patterns regex pour extraction basique
         self.regex_patterns = {
             "email": r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
@@ -86,6 +97,9 @@ class PatternExtractorAgent(BaseAgent):
             "phone": r'\b(?:\+?1[-.\s]?)?\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}\b'
         }
         
+        # Regex, n-grammes et nombres extraits en une seule passe sur les données
+        self.pattern_scanner = PatternScanner(self.regex_patterns)
+        
     def _build_graph(self) -> StateGraph:
         """Construit le graphe LangGraph pour l'extraction de patterns."""
         
@@ -124,6 +138,9 @@ class PatternExtractorAgent(BaseAgent):
             data_source = state["context"].get("data_source", "recent_memories")
             batch_size = state["context"].get("batch_size", 100)
             
+            if state["context"].get("streaming", False):
+                return await self._prepare_streaming_data(state)
+            
             if data_source == "recent_memories":
                 # Récupérer les mémoires récentes
                 data = await self.memory_service.get_recent_memories(
@@ -166,23 +183,34 @@ class PatternExtractorAgent(BaseAgent):
             processed_data = state["context"]["processed_data"]
             basic_patterns = []
             
+            # En mode streaming, le scan a été fait bloc par bloc à la préparation
+            scan = state["context"].pop("scan_result", None)
+            if scan is None:
+                scan = await self.cpu_executor.run(
+                    self.pattern_scanner.scan,
+                    [item["content"] for item in processed_data],
+                    kind="pattern_scan"
+                )
+            
             # Extraction avec regex
-            regex_results = self._extract_regex_patterns(processed_data)
+            regex_results = self._extract_regex_patterns(scan)
             basic_patterns.extend(regex_results)
             
             # Extraction de patterns textuels
-            text_patterns = self._extract_text_patterns(processed_data)
+            text_patterns = self._extract_text_patterns(scan)
             basic_patterns.extend(text_patterns)
             
             # Extraction de patterns numériques
-            numeric_patterns = self._extract_numeric_patterns(processed_data)
+            numeric_patterns = self._extract_numeric_patterns(scan)
             basic_patterns.extend(numeric_patterns)
             
             state["context"]["basic_patterns"] = basic_patterns
             state["context"]["basic_pattern_count"] = len(basic_patterns)
             
             self.logger.info("Basic pattern extraction completed",
-                           pattern_count=len(basic_patterns))
+                           pattern_count=len(basic_patterns),
+                           token_count=scan.tokens,
+                           exact_counts=scan.exact)
             
         except Exception as e:
             state["error"] = f"Basic pattern extraction failed: {str(e)}"
@@ -356,7 +384,68 @@ class PatternExtractorAgent(BaseAgent):
         
         return state
     
-    def _preprocess_data(self, raw_data: List[Dict]) -> List[Dict]:
+    async def _prepare_streaming_data(self, state: AgentState) -> AgentState:
+        """Préparer les données bloc par bloc: scan incrémental et échantillon borné."""
+        context = state["context"]
+        data_count = 0
+        chunk_count = 0
+        scan = None
+        sample: List[Dict] = []
+        
+        async with aclosing(self._iter_data_chunks(context)) as chunks:
+            async for chunk in chunks:
+                processed_chunk = self._preprocess_data(chunk, keep_original=False)
+                
+                chunk_scan = await self.cpu_executor.run(
+                    self.pattern_scanner.scan,
+                    [item["content"] for item in processed_chunk],
+                    kind="pattern_scan"
+                )
+                scan = chunk_scan if scan is None else scan.merge(chunk_scan)
+                
+                # Échantillonnage par réservoir: uniforme sur toutes les données
+                for item in processed_chunk:
+                    data_count += 1
+                    if len(sample) < self.stream_sample_size:
+                        sample.append(item)
+                    else:
+                        slot = random.randrange(data_count)
+                        if slot < self.stream_sample_size:
+                            sample[slot] = item
+                chunk_count += 1
+        
+        context["processed_data"] = sample
+        context["data_count"] = data_count
+        context["scan_result"] = scan or self.pattern_scanner.scan([])
+        
+        self.logger.info("Streaming data preparation completed",
+                       data_count=data_count,
+                       chunk_count=chunk_count,
+                       sample_size=len(sample))
+        
+        return state
+    
+    async def _iter_data_chunks(self, context: Dict[str, Any]) -> AsyncIterator[List[Dict]]:
+        """Source de données par blocs (curseur Postgres ou contenu fourni)."""
+        data_source = context.get("data_source", "recent_memories")
+        chunk_size = context.get("chunk_size")
+        
+        if data_source == "specific_content":
+            content_data = context.get("content_data", [])
+            step = chunk_size or len(content_data) or 1
+            for start in range(0, len(content_data), step):
+                yield content_data[start:start + step]
+            return
+        
+        limit = context.get("batch_size", 100) if data_source == "recent_memories" else None
+        async for chunk in self.memory_service.iter_memories_for_analysis(
+            user_id=context.get("user_id"),
+            limit=limit,
+            chunk_size=chunk_size
+        ):
+            yield chunk
+    
+    def _preprocess_data(self, raw_data: List[Dict], keep_original: bool = True) -> List[Dict]:
         """Préprocesser les données pour l'extraction."""
         processed = []
         
@@ -373,9 +462,10 @@ class PatternExtractorAgent(BaseAgent):
             processed_item = {
                 "id": item.get("id"),
                 "content": content,
-                "original_content": item.get("content"),
+                "original_content": item.get("content") if keep_original else None,
                 "metadata": item.get("metadata", {}),
                 "timestamp": item.get("timestamp"),
+                "embedding": item.get("embedding"),
                 "word_count": len(content.split()),
                 "char_count": len(content)
             }
@@ -384,100 +474,55 @@ class PatternExtractorAgent(BaseAgent):
         
         return processed
     
-    def _extract_regex_patterns(self, data: List[Dict]) -> List[Pattern]:
+    def _extract_regex_patterns(self, scan: ScanResult) -> List[Pattern]:
         """Extraire les patterns avec des expressions régulières."""
         patterns = []
-        pattern_counts = defaultdict(list)
-        
-        for item in data:
-            content = item["content"]
-            
-            for pattern_name, regex in self.regex_patterns.items():
-                matches = re.findall(regex, content)
-                for match in matches:
-                    pattern_counts[pattern_name].append({
-                        "match": match,
-                        "source_id": item["id"],
-                        "context": content
-                    })
         
         # Créer les objets Pattern
-        for pattern_name, matches in pattern_counts.items():
-            if len(matches) >= self.min_pattern_frequency:
+        for pattern_name, count in scan.pattern_counts.items():
+            if count >= self.min_pattern_frequency:
                 patterns.append(Pattern(
                     pattern_type="regex",
                     content=f"{pattern_name}_pattern",
-                    frequency=len(matches),
+                    frequency=count,
                     confidence=0.9,  # Haute confiance pour les regex
-                    examples=[m["match"] for m in matches[:5]]
+                    examples=scan.pattern_examples[pattern_name]
                 ))
         
         return patterns
     
-    def _extract_text_patterns(self, data: List[Dict]) -> List[Pattern]:
+    def _extract_text_patterns(self, scan: ScanResult) -> List[Pattern]:
         """Extraire les patterns textuels récurrents."""
         patterns = []
         
-        # Extraire les n-grammes fréquents
-        all_text = " ".join([item["content"] for item in data])
-        words = re.findall(r'\b\w+\b', all_text.lower())
-        
-        # Bigrammes
-        bigrams = [f"{words[i]} {words[i+1]}" for i in range(len(words)-1)]
-        bigram_counts = Counter(bigrams)
-        
-        # Trigrammes
-        trigrams = [f"{words[i]} {words[i+1]} {words[i+2]}" for i in range(len(words)-2)]
-        trigram_counts = Counter(trigrams)
-        
         # Créer les patterns pour les n-grammes fréquents
-        for ngram, count in bigram_counts.most_common(20):
-            if count >= self.min_pattern_frequency:
-                patterns.append(Pattern(
-                    pattern_type="bigram",
-                    content=ngram,
-                    frequency=count,
-                    confidence=min(0.8, count / len(data)),
-                    examples=[ngram]
-                ))
-        
-        for ngram, count in trigram_counts.most_common(10):
-            if count >= self.min_pattern_frequency:
-                patterns.append(Pattern(
-                    pattern_type="trigram",
-                    content=ngram,
-                    frequency=count,
-                    confidence=min(0.8, count / len(data)),
-                    examples=[ngram]
-                ))
+        for pattern_type, size, limit in (("bigram", 2, 20), ("trigram", 3, 10)):
+            for ngram, count in scan.most_common_ngrams(size, limit):
+                if count >= self.min_pattern_frequency:
+                    patterns.append(Pattern(
+                        pattern_type=pattern_type,
+                        content=ngram,
+                        frequency=count,
+                        confidence=min(0.8, count / scan.documents),
+                        examples=[ngram]
+                    ))
         
         return patterns
     
-    def _extract_numeric_patterns(self, data: List[Dict]) -> List[Pattern]:
+    def _extract_numeric_patterns(self, scan: ScanResult) -> List[Pattern]:
         """Extraire les patterns numériques."""
         patterns = []
-        numbers = []
-        
-        for item in data:
-            content = item["content"]
-            # Extraire tous les nombres
-            found_numbers = re.findall(r'\b\d+(?:\.\d+)?\b', content)
-            numbers.extend([float(n) for n in found_numbers])
         
-        if numbers:
-            # Analyser les distributions numériques
-            number_counter = Counter(numbers)
-            
-            # Patterns de nombres fréquents
-            for number, count in number_counter.most_common(10):
-                if count >= self.min_pattern_frequency:
-                    patterns.append(Pattern(
-                        pattern_type="numeric",
-                        content=f"frequent_number_{number}",
-                        frequency=count,
-                        confidence=0.7,
-                        examples=[str(number)]
-                    ))
+        # Patterns de nombres fréquents
+        for number, count in scan.numbers.most_common(10):
+            if count >= self.min_pattern_frequency:
+                patterns.append(Pattern(
+                    pattern_type="numeric",
+                    content=f"frequent_number_{number}",
+                    frequency=count,
+                    confidence=0.7,
+                    examples=[str(number)]
+                ))
         
         return patterns
     
@@ -487,42 +532,24 @@ class PatternExtractorAgent(BaseAgent):
             return []
         
         # Obtenir les embeddings
-        texts = [item["content"] for item in data]
-        embeddings = await self.embedding_service.get_embeddings(texts)
+        embeddings = await self.embedding_service.get_item_embeddings(data)
         
-        # Clustering simple basé sur la similarité
-        groups = []
-        used_indices = set()
-        similarity_threshold = 0.75
+        # Clustering glouton basé sur la similarité, hors de la boucle d'événements
+        clusters = await self.cpu_executor.run_with_array(
+            self.semantic_clusterer.cluster,
+            np.asarray(embeddings, dtype=np.float32),
+            kind="semantic_grouping"
+        )
         
-        for i, item in enumerate(data):
-            if i in used_indices:
-                continue
-            
-            group = {
-                "representative_item": item,
-                "items": [item],
-                "embedding": embeddings[i]
+        return [
+            {
+                "representative_item": data[indices[0]],
+                "items": [data[index] for index in indices],
+                "embedding": embeddings[indices[0]]
             }
-            used_indices.add(i)
-            
-            # Trouver les items similaires
-            for j, other_item in enumerate(data):
-                if j in used_indices or i == j:
-                    continue
-                
-                similarity = self.embedding_service.cosine_similarity(
-                    embeddings[i], embeddings[j]
-                )
-                
-                if similarity >= similarity_threshold:
-                    group["items"].append(other_item)
-                    used_indices.add(j)
-            
-            if len(group["items"]) >= 2:  # Au moins 2 items pour former un groupe
-                groups.append(group)
-        
-        return groups
+            for indices in clusters
+            if len(indices) >= 2  # Au moins 2 items pour former un groupe
+        ]
     
     async def _analyze_semantic_group(self, group: Dict) -> Dict:
         """Analyser un groupe sémantique avec Claude."""
@@ -559,7 +586,7 @@ Format JSON:
             HumanMessage(content=prompt)
         ]
         
-        response = await self.llm.ainvoke(messages)
+        response = await self._invoke_llm(messages)
         
         try:
             return json.loads(response.content)
@@ -621,7 +648,7 @@ Format JSON:
             HumanMessage(content=prompt)
         ]
         
-        response = await self.llm.ainvoke(messages)
+        response = await self._invoke_llm(messages)
         
         try:
             result = json.loads(response.content)
@@ -695,7 +722,7 @@ Format JSON:
             HumanMessage(content=prompt)
         ]
         
-        response = await self.llm.ainvoke(messages)
+        response = await self._invoke_llm(messages)
         
         try:
             result = json.loads(response.content)
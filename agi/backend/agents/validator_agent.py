@@ -12,12 +12,14 @@ from typing import Any, Dict, List, Optional, Tuple
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_anthropic import ChatAnthropic
 from langgraph.graph import StateGraph, END
+import asyncio
 import json
 
 from .base_agent import BaseAgent, AgentConfig, AgentState
-from ..services.memory_service import MemoryService
-from ..services.embedding_service import EmbeddingService
-from ..services.graph_service import GraphService
+from services.memory_service import MemoryService
+from services.embedding_service import EmbeddingService
+from services.graph_service import GraphService
+from services.contradiction_prefilter import ContradictionPrefilter
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -60,6 +62,17 @@ class ValidatorAgent(BaseAgent):
         self.similarity_threshold = 0.8     # Seuil pour identifier les contenus similaires
         self.confidence_threshold = 0.6     # Seuil minimum de confiance
         
+        # Analyse des contradictions par lots
+        self.contradiction_batch_size = 5              # Paires par prompt
+        self.max_concurrent_contradiction_batches = 4  # Prompts en vol simultanément
+        
+        # Filtre local avant le LLM: seules les paires sans rapport ou
+        # concordantes sans indice de conflit lui sont épargnées
+        self.contradiction_prefilter = ContradictionPrefilter(
+            unrelated_threshold=0.82,
+            agreement_threshold=0.95
+        )
+        
     def _build_graph(self) -> StateGraph:
         """Construit le graphe LangGraph pour la validation."""
         
@@ -130,26 +143,40 @@ class ValidatorAgent(BaseAgent):
             
             contradictions = []
             
-            for knowledge in similar_knowledge:
-                # Analyser avec Claude pour détecter les contradictions
-                contradiction_analysis = await self._analyze_contradiction(
-                    content_to_validate, knowledge
-                )
-                
+            # Écarter localement les paires qui ne peuvent pas se contredire
+            analyses, prefilter_metrics = self.contradiction_prefilter.classify_pairs(
+                content_to_validate, similar_knowledge
+            )
+            ambiguous = [index for index, analysis in enumerate(analyses) if analysis is None]
+            
+            # Analyser les paires ambiguës avec Claude par lots concurrents
+            llm_analyses = await self._analyze_contradictions(
+                content_to_validate, [similar_knowledge[index] for index in ambiguous]
+            )
+            for index, analysis in zip(ambiguous, llm_analyses):
+                analyses[index] = analysis
+            
+            for knowledge, contradiction_analysis in zip(similar_knowledge, analyses):
                 if contradiction_analysis["has_contradiction"]:
                     contradictions.append({
                         "knowledge_id": knowledge["id"],
                         "knowledge_content": knowledge["content"],
                         "contradiction_type": contradiction_analysis["type"],
                         "severity": contradiction_analysis["severity"],
-                        "explanation": contradiction_analysis["explanation"]
+                        "explanation": contradiction_analysis["explanation"],
+                        "resolved_by": contradiction_analysis.get("resolved_by", "llm")
                     })
             
             state["context"]["contradictions"] = contradictions
             state["context"]["contradiction_count"] = len(contradictions)
+            state["context"]["prefilter_metrics"] = prefilter_metrics
             
             self.logger.info("Contradiction detection completed",
-                           contradictions_found=len(contradictions))
+                           contradictions_found=len(contradictions),
+                           resolved_locally=prefilter_metrics.embedding,
+                           sent_to_llm=prefilter_metrics.llm,
+                           lexical_cues=prefilter_metrics.lexical,
+                           numeric_cues=prefilter_metrics.numeric)
             
         except Exception as e:
             state["error"] = f"Contradiction detection failed: {str(e)}"
@@ -289,6 +316,133 @@ class ValidatorAgent(BaseAgent):
             self.logger.error("Similar knowledge search failed", error=str(e))
             return []
     
+    async def _analyze_contradictions(self, new_content: str, knowledge_items: List[Dict]) -> List[Dict]:
+        """Analyser toutes les paires, par lots concurrents, dans l'ordre des entrées."""
+        if not knowledge_items:
+            return []
+        
+        batch_size = max(1, self.contradiction_batch_size)
+        batches = [
+            knowledge_items[i:i + batch_size]
+            for i in range(0, len(knowledge_items), batch_size)
+        ]
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_contradiction_batches))
+        
+        results = await asyncio.gather(*(
+            self._analyze_contradiction_batch(new_content, batch, semaphore)
+            for batch in batches
+        ))
+        
+        return [analysis for batch_results in results for analysis in batch_results]
+    
+    async def _analyze_contradiction_batch(
+        self,
+        new_content: str,
+        batch: List[Dict],
+        semaphore: asyncio.Semaphore
+    ) -> List[Dict]:
+        """Analyser un lot de paires en un seul appel; repli par paire si la réponse est invalide."""
+        if len(batch) == 1:
+            async with semaphore:
+                return [await self._analyze_contradiction(new_content, batch[0])]
+        
+        existing_text = "\n\n".join(
+            f"[{index}]\n{knowledge['content']}"
+            for index, knowledge in enumerate(batch)
+        )
+        
+        prompt = f"""
+Analysez si le nouveau contenu contredit chacun des contenus existants numérotés.
+
+NOUVEAU CONTENU:
+{new_content}
+
+CONTENUS EXISTANTS:
+{existing_text}
+
+Pour chaque contenu existant, évaluez:
+1. Y a-t-il une contradiction directe?
+2. Quel type de contradiction (factuelle, logique, temporelle)?
+3. Quelle est la sévérité (faible, moyenne, élevée)?
+4. Explication détaillée
+
+Répondez uniquement avec ce JSON, un élément par contenu existant (index 0 à {len(batch) - 1}):
+{{
+    "results": [
+        {{
+            "index": int,
+            "has_contradiction": boolean,
+            "type": "factual|logical|temporal|none",
+            "severity": "low|medium|high",
+            "explanation": "explication détaillée",
+            "confidence": float
+        }}
+    ]
+}}
+"""
+        
+        messages = [
+            SystemMessage(content=self._get_contradiction_system_prompt()),
+            HumanMessage(content=prompt)
+        ]
+        
+        async with semaphore:
+            response = await self._invoke_llm(messages)
+        
+        analyses = self._parse_batch_analysis(response.content, len(batch))
+        missing = [index for index, analysis in enumerate(analyses) if analysis is None]
+        
+        if missing:
+            self.logger.warning("Batch contradiction analysis incomplete, falling back per pair",
+                              batch_size=len(batch), missing=len(missing))
+            
+            async def analyze_pair(index: int) -> Dict:
+                async with semaphore:
+                    return await self._analyze_contradiction(new_content, batch[index])
+            
+            fallback = await asyncio.gather(*(analyze_pair(index) for index in missing))
+            for index, analysis in zip(missing, fallback):
+                analyses[index] = analysis
+        
+        return analyses
+    
+    @staticmethod
+    def _parse_batch_analysis(content: str, expected: int) -> List[Optional[Dict]]:
+        """Valider la réponse d'un lot; les paires absentes ou mal formées restent à None."""
+        analyses: List[Optional[Dict]] = [None] * expected
+        
+        try:
+            results = json.loads(content)["results"]
+        except (json.JSONDecodeError, TypeError, KeyError):
+            return analyses
+        
+        if not isinstance(results, list):
+            return analyses
+        
+        for item in results:
+            if not isinstance(item, dict):
+                continue
+            index = item.get("index")
+            if (
+                not isinstance(index, int) or isinstance(index, bool)
+                or not 0 <= index < expected
+                or not isinstance(item.get("has_contradiction"), bool)
+                or item.get("type") not in ("factual", "logical", "temporal", "none")
+                or item.get("severity") not in ("low", "medium", "high")
+            ):
+                continue
+            
+            confidence = item.get("confidence", 0.0)
+            analyses[index] = {
+                "has_contradiction": item["has_contradiction"],
+                "type": item["type"],
+                "severity": item["severity"],
+                "explanation": str(item.get("explanation", "")),
+                "confidence": float(confidence) if isinstance(confidence, (int, float)) else 0.0
+            }
+        
+        return analyses
+    
     async def _analyze_contradiction(self, new_content: str, existing_knowledge: Dict) -> Dict:
         """Analyser si deux contenus sont contradictoires."""
         
@@ -322,7 +476,7 @@ Format JSON:
             HumanMessage(content=prompt)
         ]
         
-        response = await self.llm.ainvoke(messages)
+        response = await self._invoke_llm(messages)
         
         try:
             return json.loads(response.content)
@@ -373,7 +527,7 @@ Format JSON:
             HumanMessage(content=prompt)
         ]
         
-        response = await self.llm.ainvoke(messages)
+        response = await self._invoke_llm(messages)
         
         try:
             return json.loads(response.content)
@@ -424,7 +578,7 @@ Format JSON:
             HumanMessage(content=prompt)
         ]
         
-        response = await self.llm.ainvoke(messages)
+        response = await self._invoke_llm(messages)
         
         try:
             resolution = json.loads(response.content)
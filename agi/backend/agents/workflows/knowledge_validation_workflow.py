@@ -11,18 +11,21 @@ Responsabilités:
 from typing import Any, Dict, List, Optional, Set
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langgraph.graph import StateGraph, END
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass
+from uuid import UUID
 
 from ..base_agent import BaseAgent, AgentConfig, AgentState
 from ..validator_agent import ValidatorAgent
 from ..connector_agent import ConnectorAgent
 from ..pattern_extractor_agent import PatternExtractorAgent
+from services.checkpoint_store import checkpoint_type
 import structlog
 
 logger = structlog.get_logger(__name__)
 
 
+@checkpoint_type
 @dataclass
 class ValidationScope:
     """Définit la portée de la validation."""
@@ -31,8 +34,12 @@ class ValidationScope:
     validate_patterns: bool = True
     validate_consistency: bool = True
     deep_validation: bool = False
+    user_id: Optional[str] = None  # Requis pour la validation incrémentale
+    incremental: bool = True  # Seulement les changements depuis le dernier passage
+    full_sweep: bool = False  # Forcer un passage complet
 
 
+@checkpoint_type
 @dataclass
 class ValidationMetrics:
     """Métriques de validation."""
@@ -70,6 +77,9 @@ class KnowledgeValidationWorkflow(BaseAgent):
         self.contradiction_threshold = 0.7
         self.consistency_threshold = 0.8
         self.max_validation_iterations = 3
+        self.full_sweep_interval_days = 7  # Passage complet périodique
+        self.neighbor_count = 5  # Voisines revalidées par mémoire modifiée
+        self.neighbor_similarity_threshold = 0.8
         
     def _build_graph(self) -> StateGraph:
         """Construit le graphe LangGraph pour la validation des connaissances."""
@@ -87,7 +97,16 @@ class KnowledgeValidationWorkflow(BaseAgent):
         workflow.add_node("generate_validation_report", self._generate_validation_report)
         
         # Définir les transitions
-        workflow.set_entry_point("analyze_validation_scope")
+        self._set_resumable_entry(workflow, [
+            "analyze_validation_scope",
+            "validate_memory_consistency",
+            "validate_connection_integrity",
+            "validate_pattern_coherence",
+            "detect_global_contradictions",
+            "resolve_contradictions",
+            "optimize_knowledge_quality",
+            "generate_validation_report"
+        ])
         workflow.add_edge("analyze_validation_scope", "validate_memory_consistency")
         workflow.add_edge("validate_memory_consistency", "validate_connection_integrity")
         workflow.add_edge("validate_connection_integrity", "validate_pattern_coherence")
@@ -103,18 +122,24 @@ class KnowledgeValidationWorkflow(BaseAgent):
         """Point d'entrée principal pour la validation des connaissances."""
         return await self.run(state)
     
-    async def validate_knowledge_base(self, validation_scope: ValidationScope = None) -> Dict[str, Any]:
-        """Lancer le processus de validation complète."""
+    def create_validation_state(
+        self,
+        validation_scope: ValidationScope = None,
+        run_id: Optional[str] = None,
+        run_owner: Optional[str] = None
+    ) -> AgentState:
+        """État initial du workflow (partagé par l'exécution et le streaming)."""
         
         if validation_scope is None:
             validation_scope = ValidationScope()
         
-        # Créer l'état initial
-        initial_state = AgentState(
+        return AgentState(
             messages=[],
             context={
                 "validation_start": datetime.now().isoformat(),
                 "validation_scope": validation_scope,
+                "run_id": run_id,
+                "run_owner": run_owner,
                 "validation_config": {
                     "batch_size": self.validation_batch_size,
                     "contradiction_threshold": self.contradiction_threshold,
@@ -125,6 +150,16 @@ class KnowledgeValidationWorkflow(BaseAgent):
             },
             step_count=0
         )
+    
+    async def validate_knowledge_base(
+        self,
+        validation_scope: ValidationScope = None,
+        run_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Lancer (ou reprendre, avec run_id) le processus de validation complète."""
+        
+        # Créer l'état initial
+        initial_state = self.create_validation_state(validation_scope, run_id)
         
         # Exécuter le workflow
         result_state = await self.process(initial_state)
@@ -148,6 +183,9 @@ class KnowledgeValidationWorkflow(BaseAgent):
             # Analyser l'état actuel du système
             system_stats = await self._get_system_statistics()
             
+            # Fenêtre de validation: complète ou depuis le dernier watermark
+            state["context"]["validation_window"] = await self._plan_validation_window(validation_scope)
+            
             # Déterminer les priorités de validation
             validation_priorities = self._determine_validation_priorities(system_stats, validation_scope)
             
@@ -184,11 +222,22 @@ class KnowledgeValidationWorkflow(BaseAgent):
                 state["context"]["memory_validation_results"] = {"skipped": True}
                 return state
             
-            # Récupérer toutes les mémoires à valider
-            memories_to_validate = await self._get_memories_for_validation()
+            # Récupérer les mémoires à valider (toutes, ou modifiées + voisines)
+            memories_to_validate = await self._get_memories_for_validation(state)
+            
+            # Progression d'un run repris: mémoires déjà validées et leurs résultats
+            progress = state["context"].setdefault(
+                "memory_validation_progress", {"validated_ids": [], "results": []}
+            )
+            validated_ids = set(progress["validated_ids"])
+            memories_to_validate = [
+                memory for memory in memories_to_validate
+                if str(memory.get("id")) not in validated_ids
+            ]
             
-            memory_validation_results = []
+            memory_validation_results = progress["results"]
             batch_size = state["context"]["validation_config"]["batch_size"]
+            failed_batches = []
             
             # Traiter par lots
             for i in range(0, len(memories_to_validate), batch_size):
@@ -211,7 +260,11 @@ class KnowledgeValidationWorkflow(BaseAgent):
                 if not result_state.get("error"):
                     batch_results = result_state["context"].get("validation_results", [])
                     memory_validation_results.extend(batch_results)
+                    progress["validated_ids"].extend(str(memory.get("id")) for memory in batch)
+                    await self._save_checkpoint(state, "validate_memory_consistency")
                 else:
+                    # Mémoires non validées: le watermark ne doit pas les dépasser
+                    failed_batches.append({"batch": i // batch_size + 1, "error": result_state["error"]})
                     self.logger.error("Memory validation batch failed", 
                                     batch=i // batch_size + 1, 
                                     error=result_state["error"])
@@ -224,6 +277,7 @@ class KnowledgeValidationWorkflow(BaseAgent):
                 "total_validated": len(memory_validation_results),
                 "valid_memories": len(valid_memories),
                 "invalid_memories": len(invalid_memories),
+                "failed_batches": failed_batches,
                 "validation_details": memory_validation_results
             }
             
@@ -259,7 +313,17 @@ class KnowledgeValidationWorkflow(BaseAgent):
                 state["context"]["connection_validation_results"] = {"skipped": True}
                 return state
             
+            # En incrémental, rien à revalider si le graphe n'a pas changé
+            graph_changes = await self._get_graph_changes(state)
+            if graph_changes is not None and not any(graph_changes.values()):
+                state["context"]["connection_validation_results"] = {
+                    "skipped": True,
+                    "reason": "no graph changes since last validation"
+                }
+                return state
+            
             # Utiliser le ConnectorAgent pour analyser les connexions
+            # (le graphe entier: le connecteur n'a pas de portée par changement)
             connector_state = AgentState(
                 messages=[],
                 context={
@@ -573,6 +637,7 @@ class KnowledgeValidationWorkflow(BaseAgent):
                     "success": not state.get("error")
                 },
                 "validation_scope": state["context"]["validation_scope"].__dict__,
+                "validation_window": state["context"].get("validation_window", {}),
                 "system_statistics": state["context"].get("system_stats", {}),
                 "validation_results": {
                     "memory_validation": state["context"].get("memory_validation_results", {}),
@@ -593,6 +658,9 @@ class KnowledgeValidationWorkflow(BaseAgent):
             state["context"]["validation_report"] = validation_report
             state["context"]["execution_time"] = execution_time
             
+            # Run complet: les prochains passages partent d'ici
+            await self._advance_validation_watermark(state)
+            
             self.logger.info("Validation report generated",
                            execution_time=execution_time,
                            overall_quality_score=validation_report["quality_score"])
@@ -662,15 +730,122 @@ class KnowledgeValidationWorkflow(BaseAgent):
         
         return workload
     
-    async def _get_memories_for_validation(self) -> List[Dict[str, Any]]:
+    async def _plan_validation_window(self, validation_scope: ValidationScope) -> Dict[str, Any]:
+        """
+        Validation complète ou incrémentale depuis le watermark de l'utilisateur.
+        Passage complet si demandé, sans watermark, ou si le dernier passage
+        complet date de plus de `full_sweep_interval_days`.
+        """
+        # Capturé avant lecture: un changement pendant le run sera revu au suivant
+        started_at = datetime.now(timezone.utc)
+        window = {"mode": "full", "since": None, "started_at": started_at, "reason": None}
+        
+        if not validation_scope.user_id:
+            window["reason"] = "no user scope"
+            return window
+        if not validation_scope.incremental or validation_scope.full_sweep:
+            window["reason"] = "full sweep requested"
+            return window
+        
+        watermark = await self.memory_service.get_validation_watermark(UUID(validation_scope.user_id))
+        if watermark is None:
+            window["reason"] = "first validation"
+            return window
+        
+        last_full_sweep = watermark.get("last_full_sweep")
+        if last_full_sweep is None or started_at - last_full_sweep > timedelta(days=self.full_sweep_interval_days):
+            window["reason"] = "periodic full sweep"
+            return window
+        
+        window.update(mode="incremental", since=watermark["watermark"], reason="changes since watermark")
+        return window
+    
+    async def _get_memories_for_validation(self, state: AgentState) -> List[Dict[str, Any]]:
         """Récupérer les mémoires à valider."""
-        try:
-            # Pour l'instant, récupérer toutes les mémoires
-            # Dans une implémentation complète, on pourrait filtrer par critères
+        validation_scope: ValidationScope = state["context"]["validation_scope"]
+        window = state["context"].get("validation_window") or {"mode": "full", "since": None}
+        
+        # Pas de repli sur une liste vide: une erreur de lecture fait échouer
+        # le run, qui ne doit pas avancer le watermark
+        if not validation_scope.user_id:
             return await self.memory_service.get_all_memories()
+        
+        user_id = UUID(validation_scope.user_id)
+        changed = await self.memory_service.get_memories_changed_since(user_id, window["since"])
+        if window["mode"] != "incremental":
+            return changed
+        
+        # Les voisines d'une mémoire modifiée peuvent devenir contradictoires
+        neighbors = await self.memory_service.get_memory_neighbors(
+            user_id,
+            [memory["id"] for memory in changed],
+            k=self.neighbor_count,
+            similarity_threshold=self.neighbor_similarity_threshold
+        )
+        
+        window["changed_memories"] = len(changed)
+        window["neighbor_memories"] = len(neighbors)
+        self.logger.info("Incremental validation set",
+                       since=window["since"].isoformat(),
+                       changed=len(changed),
+                       neighbors=len(neighbors))
+        
+        return changed + neighbors
+    
+    async def _get_graph_changes(self, state: AgentState) -> Optional[Dict[str, int]]:
+        """Changements du graphe depuis le watermark (None en validation complète)."""
+        validation_scope: ValidationScope = state["context"]["validation_scope"]
+        window = state["context"].get("validation_window") or {}
+        
+        if window.get("mode") != "incremental":
+            return None
+        
+        changes = await self.graph_service.count_changes_since(UUID(validation_scope.user_id), window["since"])
+        window["graph_changes"] = changes
+        return changes
+    
+    async def _advance_validation_watermark(self, state: AgentState):
+        """
+        Enregistrer le début de ce run comme nouveau watermark de l'utilisateur,
+        seulement si le run n'a pas d'erreur, que la validation des mémoires
+        a réellement tourné (portée complète, aucun lot en échec): sinon les
+        mémoires et relations modifiées non revues seraient sautées jusqu'au
+        prochain passage complet.
+        """
+        validation_scope: ValidationScope = state["context"]["validation_scope"]
+        window = state["context"].get("validation_window")
+        
+        if not validation_scope.user_id or not window:
+            return
+        
+        memory_results = state["context"].get("memory_validation_results") or {}
+        if (
+            not validation_scope.validate_memories
+            or not validation_scope.validate_connections
+            or not memory_results
+            or memory_results.get("skipped")
+        ):
+            self.logger.info("Validation watermark not advanced: partial validation scope",
+                           validate_memories=validation_scope.validate_memories,
+                           validate_connections=validation_scope.validate_connections)
+            return
+        
+        failed_batches = memory_results.get("failed_batches")
+        if state.get("error") or failed_batches:
+            self.logger.warning("Validation watermark not advanced",
+                              error=state.get("error"),
+                              failed_batches=len(failed_batches or []))
+            return
+        
+        try:
+            await self.memory_service.set_validation_watermark(
+                UUID(validation_scope.user_id),
+                window["started_at"],
+                full_sweep=window["mode"] == "full"
+            )
         except Exception as e:
-            self.logger.error("Failed to get memories for validation", error=str(e))
-            return []
+            # Le run reste valide; le prochain repartira de l'ancien watermark
+            self.logger.warning("Failed to advance validation watermark", error=str(e))
     
     def _calculate_connection_quality_score(self, connection_analysis: Dict[str, Any]) -> float:
         """Calculer le score de qualité des connexions."""
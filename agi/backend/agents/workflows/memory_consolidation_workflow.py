@@ -7,6 +7,8 @@ Responsabilités:
 - Optimiser les connexions dans le graphe de connaissances
 """
 
+import asyncio
+import time
 from typing import Any, Dict, List, Optional
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langgraph.graph import StateGraph, END
@@ -29,6 +31,9 @@ class MemoryConsolidationWorkflow(BaseAgent):
     pour un processus de consolidation mémoire optimisé.
     """
     
+    # Lignes candidates hors des sauvegardes par lot: seul l'avancement est réécrit
+    detached_context_keys = ("consolidation_candidates",)
+    
     def __init__(self, config: AgentConfig, services: Dict[str, Any]):
         super().__init__(config, services)
         
@@ -44,6 +49,7 @@ class MemoryConsolidationWorkflow(BaseAgent):
         # Configuration du workflow
         self.consolidation_threshold_hours = 24  # Consolider les mémoires > 24h
         self.batch_size = 50  # Traiter par lots de 50 mémoires
+        self.max_concurrent_batches = 4  # Lots consolidés en parallèle (budget LLM partagé)
         self.validation_threshold = 0.8  # Seuil de validation
         
     def _build_graph(self) -> StateGraph:
@@ -60,7 +66,14 @@ class MemoryConsolidationWorkflow(BaseAgent):
         workflow.add_node("generate_consolidation_report", self._generate_consolidation_report)
         
         # Définir les transitions
-        workflow.set_entry_point("identify_consolidation_candidates")
+        self._set_resumable_entry(workflow, [
+            "identify_consolidation_candidates",
+            "batch_consolidation",
+            "validate_consolidated_memories",
+            "update_memory_connections",
+            "cleanup_old_memories",
+            "generate_consolidation_report"
+        ])
         workflow.add_edge("identify_consolidation_candidates", "batch_consolidation")
         workflow.add_edge("batch_consolidation", "validate_consolidated_memories")
         workflow.add_edge("validate_consolidated_memories", "update_memory_connections")
@@ -74,23 +87,39 @@ class MemoryConsolidationWorkflow(BaseAgent):
         """Point d'entrée principal pour la consolidation mémoire."""
         return await self.run(state)
     
-    async def consolidate_memories(self, force_consolidation: bool = False) -> Dict[str, Any]:
-        """Lancer le processus de consolidation mémoire."""
-        
-        # Créer l'état initial
-        initial_state = AgentState(
+    def create_consolidation_state(
+        self,
+        force_consolidation: bool = False,
+        run_id: Optional[str] = None,
+        run_owner: Optional[str] = None
+    ) -> AgentState:
+        """État initial du workflow (partagé par l'exécution et le streaming)."""
+        return AgentState(
             messages=[],
             context={
                 "consolidation_start": datetime.now().isoformat(),
                 "force_consolidation": force_consolidation,
+                "run_id": run_id,
+                "run_owner": run_owner,
                 "consolidation_config": {
                     "threshold_hours": self.consolidation_threshold_hours,
                     "batch_size": self.batch_size,
+                    "max_concurrent_batches": self.max_concurrent_batches,
                     "validation_threshold": self.validation_threshold
                 }
             },
             step_count=0
         )
+    
+    async def consolidate_memories(
+        self,
+        force_consolidation: bool = False,
+        run_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Lancer (ou reprendre, avec run_id) le processus de consolidation mémoire."""
+        
+        # Créer l'état initial
+        initial_state = self.create_consolidation_state(force_consolidation, run_id)
         
         # Exécuter le workflow
         result_state = await self.process(initial_state)
@@ -150,43 +179,46 @@ class MemoryConsolidationWorkflow(BaseAgent):
             candidates = state["context"]["consolidation_candidates"]
             batch_size = state["context"]["consolidation_config"]["batch_size"]
             
+            max_concurrent = state["context"]["consolidation_config"].get(
+                "max_concurrent_batches", self.max_concurrent_batches
+            )
+            
+            # Lots traités en parallèle; les appels Claude passent par le
+            # limiteur de débit partagé (_invoke_llm), le sémaphore borne le reste
+            batches = [candidates[i:i + batch_size] for i in range(0, len(candidates), batch_size)]
+            semaphore = asyncio.Semaphore(max(1, max_concurrent))
+            # Lots déjà traités avant une reprise (clés JSON: numéros en texte)
+            completed = state["context"].setdefault("completed_batches", {})
+            
+            async def run_batch(batch_number: int, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+                if str(batch_number) in completed:
+                    return completed[str(batch_number)]
+                outcome = await self._consolidate_batch(batch, batch_number, len(batches), semaphore)
+                if not outcome["error"]:
+                    completed[str(batch_number)] = outcome
+                    await self._save_checkpoint(state, "batch_consolidation")
+                return outcome
+            
+            outcomes = await asyncio.gather(*(
+                run_batch(batch_number, batch)
+                for batch_number, batch in enumerate(batches, start=1)
+            ))
+            
+            # Fusion dans l'ordre des lots, indépendamment de l'ordre de fin
             consolidated_memories = []
             consolidation_errors = []
-            
-            # Traiter par lots
-            for i in range(0, len(candidates), batch_size):
-                batch = candidates[i:i + batch_size]
-                
-                try:
-                    # Créer l'état pour le ConsolidatorAgent
-                    consolidator_state = AgentState(
-                        messages=[],
-                        context={
-                            "l2_memories": batch,
-                            "batch_number": i // batch_size + 1,
-                            "total_batches": (len(candidates) + batch_size - 1) // batch_size
-                        },
-                        step_count=0
-                    )
-                    
-                    # Exécuter la consolidation
-                    result_state = await self.consolidator_agent.process(consolidator_state)
-                    
-                    if not result_state.get("error"):
-                        batch_consolidated = result_state["context"].get("consolidated_memories", [])
-                        consolidated_memories.extend(batch_consolidated)
-                    else:
-                        consolidation_errors.append({
-                            "batch": i // batch_size + 1,
-                            "error": result_state["error"]
-                        })
-                    
-                except Exception as e:
+            batch_timings = []
+            for outcome in outcomes:
+                batch_timings.append(outcome["timing"])
+                if outcome["error"]:
                     consolidation_errors.append({
-                        "batch": i // batch_size + 1,
-                        "error": str(e)
+                        "batch": outcome["timing"]["batch"],
+                        "error": outcome["error"]
                     })
+                else:
+                    consolidated_memories.extend(outcome["consolidated"])
             
+            state["context"]["batch_timings"] = batch_timings
             state["context"]["consolidated_memories"] = consolidated_memories
             state["context"]["consolidation_errors"] = consolidation_errors
             state["context"]["successful_consolidations"] = len(consolidated_memories)
@@ -201,6 +233,62 @@ class MemoryConsolidationWorkflow(BaseAgent):
         
         return state
     
+    async def _consolidate_batch(
+        self,
+        batch: List[Dict[str, Any]],
+        batch_number: int,
+        total_batches: int,
+        semaphore: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        """Consolider un lot; une erreur reste confinée à ce lot."""
+        queued_at = time.monotonic()
+        
+        async with semaphore:
+            started_at = time.monotonic()
+            consolidated = []
+            error = None
+            
+            try:
+                # Créer l'état pour le ConsolidatorAgent
+                consolidator_state = AgentState(
+                    messages=[],
+                    context={
+                        "l2_memories": batch,
+                        "batch_number": batch_number,
+                        "total_batches": total_batches
+                    },
+                    step_count=0
+                )
+                
+                # Exécuter la consolidation
+                result_state = await self.consolidator_agent.process(consolidator_state)
+                
+                if result_state.get("error"):
+                    error = result_state["error"]
+                else:
+                    consolidated = result_state["context"].get("consolidated_memories", [])
+                
+            except Exception as e:
+                error = str(e)
+            
+            finished_at = time.monotonic()
+        
+        if error:
+            self.logger.warning("Batch consolidation failed", batch=batch_number, error=error)
+        
+        return {
+            "consolidated": consolidated,
+            "error": error,
+            "timing": {
+                "batch": batch_number,
+                "size": len(batch),
+                "consolidated": len(consolidated),
+                "wait_seconds": round(started_at - queued_at, 3),
+                "duration_seconds": round(finished_at - started_at, 3),
+                "status": "error" if error else "success"
+            }
+        }
+    
     async def _validate_consolidated_memories(self, state: AgentState) -> AgentState:
         """Valider les mémoires consolidées."""
         self._log_step("validate_consolidated_memories", state)
@@ -273,7 +361,7 @@ class MemoryConsolidationWorkflow(BaseAgent):
             valid_memories = state["context"].get("valid_consolidated_memories", [])
             
             if not valid_memories:
-                state["context"]["connection_updates"] = []
+                state["context"]["connection_updates"] = {}
                 return state
             
             # Créer l'état pour le ConnectorAgent
@@ -375,6 +463,15 @@ class MemoryConsolidationWorkflow(BaseAgent):
                     "invalid_consolidated_memories": len(state["context"].get("invalid_consolidated_memories", [])),
                     "archived_memories": state["context"].get("archived_memories", 0)
                 },
+                "batch_metrics": {
+                    "batches": len(state["context"].get("batch_timings", [])),
+                    "max_concurrent_batches": state["context"]["consolidation_config"].get("max_concurrent_batches", 1),
+                    "slowest_batch_seconds": max(
+                        (timing["duration_seconds"] for timing in state["context"].get("batch_timings", [])),
+                        default=0.0
+                    ),
+                    "batch_timings": state["context"].get("batch_timings", [])
+                },
                 "connection_metrics": {
                     "created_connections": state["context"].get("connection_updates", {}).get("created_connections", 0),
                     "optimized_connections": state["context"].get("connection_updates", {}).get("optimized_connections", 0)
@@ -36,6 +36,8 @@ class AnalysisScope:
     identify_trends: bool = True
     deep_analysis: bool = False
     time_window_days: int = 30
+    streaming: bool = False                  # Lecture par blocs (curseur), agrégats seuls en mémoire
+    stream_chunk_size: Optional[int] = None  # Défaut: memory_analysis_chunk_size
 
 
 @dataclass
@@ -112,18 +114,20 @@ class PatternAnalysisWorkflow(BaseAgent):
         """Point d'entrée principal pour l'analyse des patterns."""
         return await self.run(state)
     
-    async def analyze_patterns(self, analysis_scope: AnalysisScope = None) -> Dict[str, Any]:
-        """Lancer le processus d'analyse complète des patterns."""
+    def create_analysis_state(self, analysis_scope: AnalysisScope = None) -> AgentState:
+        """État initial du workflow (partagé par l'exécution et le streaming)."""
         
         if analysis_scope is None:
             analysis_scope = AnalysisScope()
         
-        # Créer l'état initial
-        initial_state = AgentState(
+        return AgentState(
             messages=[],
             context={
                 "analysis_start": datetime.now().isoformat(),
                 "analysis_scope": analysis_scope,
+                # Lus par PatternExtractorAgent lors de la préparation des données
+                "streaming": analysis_scope.streaming,
+                "chunk_size": analysis_scope.stream_chunk_size,
                 "analysis_config": {
                     "batch_size": self.pattern_batch_size,
                     "similarity_threshold": self.similarity_threshold,
@@ -134,6 +138,12 @@ class PatternAnalysisWorkflow(BaseAgent):
             },
             step_count=0
         )
+    
+    async def analyze_patterns(self, analysis_scope: AnalysisScope = None) -> Dict[str, Any]:
+        """Lancer le processus d'analyse complète des patterns."""
+        
+        # Créer l'état initial
+        initial_state = self.create_analysis_state(analysis_scope)
         
         # Exécuter le workflow
         result_state = await self.process(initial_state)
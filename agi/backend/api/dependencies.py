@@ -3,7 +3,7 @@ AGI-V2 Backend API Dependencies
 FastAPI dependency injection for services
 """
 
-from typing import Annotated
+from typing import Annotated, Any, Dict
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
@@ -14,6 +14,7 @@ from services.external_services import ExternalServicesManager
 from services.memory_service import MemoryService
 from services.graph_service import GraphService
 from services.embedding_service import EmbeddingService
+from services.job_queue import JobManager
 
 # Security
 security = HTTPBearer()
@@ -61,6 +62,33 @@ def get_embedding_service(request: Request) -> EmbeddingService:
     return request.app.state.embedding_service
 
 
+def services_from_state(state) -> Dict[str, Any]:
+    """Services partagés présents dans l'état de l'application"""
+    return {
+        name: getattr(state, name)
+        for name in (
+            "external_services", "memory_service", "graph_service",
+            "embedding_service", "checkpoint_store", "cpu_executor"
+        )
+        if hasattr(state, name)
+    }
+
+
+def get_services(request: Request) -> Dict[str, Any]:
+    """Services partagés passés aux agents et workflows"""
+    return services_from_state(request.app.state)
+
+
+def get_job_manager(request: Request) -> JobManager:
+    """Get background job manager from app state"""
+    if not hasattr(request.app.state, 'job_manager'):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Job manager not initialized"
+        )
+    return request.app.state.job_manager
+
+
 # Authentication Dependencies
 async def get_current_user_id(
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)]
@@ -137,5 +165,6 @@ ExternalServicesDep = Annotated[ExternalServicesManager, Depends(get_external_se
 MemoryServiceDep = Annotated[MemoryService, Depends(get_memory_service)]
 GraphServiceDep = Annotated[GraphService, Depends(get_graph_service)]
 EmbeddingServiceDep = Annotated[EmbeddingService, Depends(get_embedding_service)]
+JobManagerDep = Annotated[JobManager, Depends(get_job_manager)]
 CurrentUserDep = Annotated[str, Depends(get_current_user_id)]
 OptionalUserDep = Annotated[str | None, Depends(get_optional_user_id)]
\ No newline at end of file
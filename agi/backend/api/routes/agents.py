@@ -3,22 +3,28 @@ Agents API Routes - LangGraph Agents Management
 """
 
 import logging
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from contextlib import aclosing
 from datetime import datetime
 import asyncio
+import dataclasses
+import json
+import uuid
 
-from ...agents.consolidator_agent import ConsolidatorAgent
-from ...agents.validator_agent import ValidatorAgent
-from ...agents.pattern_extractor_agent import PatternExtractorAgent
-from ...agents.connector_agent import ConnectorAgent
-from ...agents.workflows.multi_agent_orchestrator import MultiAgentOrchestrator
-from ...agents.workflows.memory_consolidation_workflow import MemoryConsolidationWorkflow
-from ...agents.workflows.knowledge_validation_workflow import KnowledgeValidationWorkflow
-from ...agents.workflows.pattern_analysis_workflow import PatternAnalysisWorkflow, AnalysisScope
-from ...agents.base_agent import AgentConfig, AgentState
-from ..dependencies import get_services
+from agents.consolidator_agent import ConsolidatorAgent
+from agents.validator_agent import ValidatorAgent
+from agents.pattern_extractor_agent import PatternExtractorAgent
+from agents.connector_agent import ConnectorAgent
+from agents.workflows.multi_agent_orchestrator import MultiAgentOrchestrator
+from agents.workflows.memory_consolidation_workflow import MemoryConsolidationWorkflow
+from agents.workflows.knowledge_validation_workflow import KnowledgeValidationWorkflow, ValidationScope
+from agents.workflows.pattern_analysis_workflow import PatternAnalysisWorkflow, AnalysisScope
+from agents.base_agent import AgentConfig, AgentState, BaseAgent
+from api.dependencies import JobManagerDep, OptionalUserDep, get_services
+from services.job_queue import Job, JobContext, JobLimitExceeded, JobManager
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -35,6 +41,7 @@ class WorkflowRequest(BaseModel):
     workflow_type: str = Field(..., description="Type de workflow: memory_consolidation, knowledge_validation, pattern_analysis, multi_agent")
     parameters: Dict[str, Any] = Field(..., description="Paramètres du workflow")
     config: Optional[Dict[str, Any]] = Field(None, description="Configuration du workflow")
+    run_id: Optional[str] = Field(None, description="Identifiant de run: reprend depuis le dernier checkpoint s'il existe")
 
 
 class AgentResponse(BaseModel):
@@ -54,52 +61,196 @@ class WorkflowResponse(BaseModel):
     timestamp: str
     agents_used: List[str]
     error: Optional[str] = None
+    run_id: Optional[str] = None
 
 
-@router.post("/execute", response_model=AgentResponse)
-async def execute_agent(
-    agent_request: AgentRequest, 
-    services: Dict[str, Any] = Depends(get_services)
-):
-    """Exécuter un agent spécifique"""
-    start_time = datetime.now()
+AGENT_TYPES = {
+    "consolidator": ConsolidatorAgent,
+    "validator": ValidatorAgent,
+    "pattern_extractor": PatternExtractorAgent,
+    "connector": ConnectorAgent
+}
+
+WORKFLOW_AGENTS = {
+    "memory_consolidation": ["consolidator", "validator", "connector"],
+    "knowledge_validation": ["validator", "connector", "pattern_extractor"],
+    "pattern_analysis": ["pattern_extractor", "connector", "validator"],
+    "multi_agent": ["consolidator", "validator", "pattern_extractor", "connector"]
+}
+
+WORKFLOW_TYPES = tuple(WORKFLOW_AGENTS)
+
+# Workflows checkpointés: un run interrompu reprend avec le même run_id
+RESUMABLE_WORKFLOW_TYPES = ("memory_consolidation", "knowledge_validation")
+
+
+class JobSubmittedResponse(BaseModel):
+    job_id: str
+    kind: str
+    job_type: str
+    status: str
+    status_url: str
+    run_id: Optional[str] = None
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str
+    job_type: str
+    status: str
+    progress: float
+    message: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    run_id: Optional[str] = None
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat() if value is not None else None
+
+
+def _job_status(job: Job) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job.id,
+        kind=job.kind,
+        job_type=job.job_type,
+        status=job.status,
+        progress=job.progress,
+        message=job.message,
+        result=job.result,
+        error=job.error,
+        created_at=_timestamp(job.created_at),
+        started_at=_timestamp(job.started_at),
+        finished_at=_timestamp(job.finished_at),
+        run_id=job.payload.get("run_id")
+    )
+
+
+def _agent_config(name: str, overrides: Optional[Dict[str, Any]]) -> AgentConfig:
+    return AgentConfig(
+        name=f"{name}_agent",
+        description=f"Agent {name}",
+        **overrides if overrides else {}
+    )
+
+
+def _prepare_agent(
+    agent_request: AgentRequest,
+    services: Dict[str, Any],
+    start_time: datetime
+) -> Tuple[BaseAgent, AgentState]:
+    """Instancier l'agent demandé et son état initial"""
+    agent_class = AGENT_TYPES.get(agent_request.agent_type)
+    if agent_class is None:
+        raise ValueError(f"Agent type '{agent_request.agent_type}' not supported")
     
-    try:
-        # Configuration de l'agent
-        config = AgentConfig(
-            name=f"{agent_request.agent_type}_agent",
-            description=f"Agent {agent_request.agent_type}",
-            **agent_request.config if agent_request.config else {}
+    agent = agent_class(_agent_config(agent_request.agent_type, agent_request.config), services)
+    initial_state = AgentState(
+        messages=[],
+        context={
+            "input_data": agent_request.input_data,
+            "additional_context": agent_request.context or {},
+            "execution_start": start_time.isoformat()
+        },
+        step_count=0
+    )
+    return agent, initial_state
+
+
+def _scope_from_parameters(scope_class, parameters: Dict[str, Any]):
+    """Construire une portée (dataclass) à partir des paramètres connus"""
+    names = {field.name for field in dataclasses.fields(scope_class)}
+    return scope_class(**{key: value for key, value in parameters.items() if key in names})
+
+
+def _workflow_run_id(workflow_request: WorkflowRequest) -> Optional[str]:
+    """Toujours un run_id pour un workflow checkpointé: le run interrompu peut reprendre"""
+    if workflow_request.workflow_type not in RESUMABLE_WORKFLOW_TYPES:
+        return None
+    return workflow_request.run_id or str(uuid.uuid4())
+
+
+def _prepare_workflow(
+    workflow_request: WorkflowRequest,
+    services: Dict[str, Any],
+    user_id: str
+) -> Tuple[BaseAgent, AgentState]:
+    """
+    Instancier le workflow demandé et son état initial (jobs et streaming).
+    L'utilisateur est enregistré avec le checkpoint: lui seul peut reprendre le run.
+    """
+    workflow_type = workflow_request.workflow_type
+    parameters = workflow_request.parameters
+    config = _agent_config(workflow_type, workflow_request.config)
+    run_id = _workflow_run_id(workflow_request)
+    
+    if workflow_type == "memory_consolidation":
+        workflow = MemoryConsolidationWorkflow(config, services)
+        return workflow, workflow.create_consolidation_state(
+            parameters.get("force_consolidation", False), run_id, user_id
         )
-        
-        # Créer l'état initial
-        initial_state = AgentState(
+    if workflow_type == "knowledge_validation":
+        workflow = KnowledgeValidationWorkflow(config, services)
+        return workflow, workflow.create_validation_state(
+            _scope_from_parameters(ValidationScope, parameters), run_id, user_id
+        )
+    if workflow_type == "pattern_analysis":
+        workflow = PatternAnalysisWorkflow(config, services)
+        return workflow, workflow.create_analysis_state(_scope_from_parameters(AnalysisScope, parameters))
+    if workflow_type == "multi_agent":
+        orchestrator = MultiAgentOrchestrator(config, services)
+        return orchestrator, AgentState(
             messages=[],
             context={
-                "input_data": agent_request.input_data,
-                "additional_context": agent_request.context or {},
-                "execution_start": start_time.isoformat()
+                "workflow_type": parameters.get("workflow_type", "full_processing"),
+                "input_data": parameters,
+                "execution_start": datetime.now().isoformat()
             },
             step_count=0
         )
-        
-        # Sélectionner et exécuter l'agent approprié
-        agent = None
-        if agent_request.agent_type == "consolidator":
-            agent = ConsolidatorAgent(config, services)
-        elif agent_request.agent_type == "validator":
-            agent = ValidatorAgent(config, services)
-        elif agent_request.agent_type == "pattern_extractor":
-            agent = PatternExtractorAgent(config, services)
-        elif agent_request.agent_type == "connector":
-            agent = ConnectorAgent(config, services)
-        else:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Agent type '{agent_request.agent_type}' not supported"
-            )
+    
+    raise ValueError(f"Workflow type '{workflow_type}' not supported")
+
+
+def _sse_event(event: Dict[str, Any]) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def _stream_steps(agent: BaseAgent, initial_state: AgentState) -> AsyncIterator[str]:
+    """
+    Diffuser les étapes du graphe. Si le client se déconnecte, Starlette annule
+    la réponse: aclosing referme le flux LangGraph et interrompt le nœud en cours.
+    """
+    async with aclosing(agent.astream_steps(initial_state)) as events:
+        async for event in events:
+            yield _sse_event(event)
+
+
+def _event_stream_response(agent: BaseAgent, initial_state: AgentState) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_steps(agent, initial_state),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def run_agent(
+    agent_request: AgentRequest,
+    services: Dict[str, Any],
+    context: Optional[JobContext] = None
+) -> AgentResponse:
+    """Exécuter un agent spécifique"""
+    start_time = datetime.now()
+    
+    try:
+        agent, initial_state = _prepare_agent(agent_request, services, start_time)
         
         # Exécuter l'agent
+        if context:
+            await context.report(0.0, f"{agent_request.agent_type} started")
         result_state = await agent.process(initial_state)
         
         # Calculer le temps d'exécution
@@ -118,6 +269,8 @@ async def execute_agent(
             error=result_state.get("error")
         )
     
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         end_time = datetime.now()
         execution_time = (end_time - start_time).total_seconds()
@@ -134,101 +287,43 @@ async def execute_agent(
         )
 
 
-@router.post("/workflow", response_model=WorkflowResponse)
-async def execute_workflow(
+async def run_workflow(
     workflow_request: WorkflowRequest,
-    services: Dict[str, Any] = Depends(get_services)
-):
+    services: Dict[str, Any],
+    context: Optional[JobContext] = None,
+    user_id: str = "anonymous"
+) -> WorkflowResponse:
     """Exécuter un workflow multi-agents"""
     start_time = datetime.now()
     
     try:
-        workflow = None
-        agents_used = []
+        workflow, initial_state = _prepare_workflow(workflow_request, services, user_id)
         
-        if workflow_request.workflow_type == "memory_consolidation":
-            workflow = MemoryConsolidationWorkflow(services)
-            agents_used = ["consolidator", "validator", "connector"]
-            
-            # Paramètres spécifiques pour la consolidation mémoire
-            batch_size = workflow_request.parameters.get("batch_size", 100)
-            threshold = workflow_request.parameters.get("threshold", 0.8)
-            
-            result = await workflow.run_consolidation(
-                batch_size=batch_size,
-                threshold=threshold,
-                config=workflow_request.config or {}
-            )
-            
-        elif workflow_request.workflow_type == "knowledge_validation":
-            workflow = KnowledgeValidationWorkflow(services)
-            agents_used = ["validator", "connector", "pattern_extractor"]
-            
-            # Paramètres spécifiques pour la validation
-            scope = workflow_request.parameters.get("scope", "full")
-            validation_level = workflow_request.parameters.get("validation_level", "comprehensive")
-            
-            result = await workflow.run_validation(
-                scope=scope,
-                validation_level=validation_level,
-                config=workflow_request.config or {}
-            )
-            
-        elif workflow_request.workflow_type == "pattern_analysis":
-            workflow = PatternAnalysisWorkflow(services)
-            agents_used = ["pattern_extractor", "connector", "validator"]
-            
-            # Paramètres spécifiques pour l'analyse de patterns
-            analysis_scope = AnalysisScope(
-                data_sources=workflow_request.parameters.get("data_sources", []),
-                time_range=workflow_request.parameters.get("time_range"),
-                pattern_types=workflow_request.parameters.get("pattern_types", ["all"]),
-                depth_level=workflow_request.parameters.get("depth_level", "comprehensive")
-            )
-            
-            result = await workflow.run_analysis(
-                scope=analysis_scope,
-                config=workflow_request.config or {}
-            )
-            
-        elif workflow_request.workflow_type == "multi_agent":
-            orchestrator = MultiAgentOrchestrator(services)
-            agents_used = ["consolidator", "validator", "pattern_extractor", "connector"]
-            
-            # Paramètres pour l'orchestration multi-agents
-            execution_mode = workflow_request.parameters.get("execution_mode", "sequential")
-            workflow_type = workflow_request.parameters.get("workflow_type", "full_processing")
-            
-            result = await orchestrator.execute_workflow(
-                workflow_type=workflow_type,
-                execution_mode=execution_mode,
-                parameters=workflow_request.parameters,
-                config=workflow_request.config or {}
-            )
-            
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Workflow type '{workflow_request.workflow_type}' not supported"
-            )
+        # Exécuter le workflow
+        if context:
+            await context.report(0.0, f"{workflow_request.workflow_type} started")
+        result_state = await workflow.process(initial_state)
         
         # Calculer le temps d'exécution
         end_time = datetime.now()
         execution_time = (end_time - start_time).total_seconds()
         
         # Préparer la réponse
-        status = "completed" if not result.get("error") else "failed"
+        status = "completed" if not result_state.get("error") else "failed"
         
         return WorkflowResponse(
             workflow_type=workflow_request.workflow_type,
-            result=result,
+            result=result_state.get("context", {}),
             execution_time=execution_time,
             status=status,
             timestamp=end_time.isoformat(),
-            agents_used=agents_used,
-            error=result.get("error")
+            agents_used=WORKFLOW_AGENTS[workflow_request.workflow_type],
+            error=result_state.get("error"),
+            run_id=result_state.get("context", {}).get("run_id")
         )
         
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         end_time = datetime.now()
         execution_time = (end_time - start_time).total_seconds()
@@ -246,6 +341,153 @@ async def execute_workflow(
         )
 
 
+def register_job_handlers(job_manager: JobManager, services: Dict[str, Any]):
+    """
+    Enregistrer (une fois par processus, au démarrage) les handlers des jobs:
+    les jobs déjà en file sont consommés dès le démarrage des workers.
+    """
+    if not job_manager.has_handler("agent"):
+        async def agent_handler(job: Job, context: JobContext) -> Dict[str, Any]:
+            return _job_result(await run_agent(AgentRequest(**job.payload), services, context))
+        job_manager.register_handler("agent", agent_handler)
+    
+    if not job_manager.has_handler("workflow"):
+        async def workflow_handler(job: Job, context: JobContext) -> Dict[str, Any]:
+            return _job_result(await run_workflow(
+                WorkflowRequest(**job.payload), services, context, job.user_id
+            ))
+        job_manager.register_handler("workflow", workflow_handler)
+
+
+def _job_result(response: BaseModel) -> Dict[str, Any]:
+    """Résultat d'un job; un run en échec lève pour que le job passe en "failed" avec son erreur"""
+    if response.status == "failed":
+        raise RuntimeError(response.error or "Échec sans message d'erreur")
+    return response.model_dump(mode="json")
+
+
+async def _submit_job(
+    job_manager: JobManager,
+    kind: str,
+    job_type: str,
+    payload: Dict[str, Any],
+    user_id: Optional[str]
+) -> JobSubmittedResponse:
+    try:
+        job = await job_manager.submit(kind, job_type, payload, user_id or "anonymous")
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    return JobSubmittedResponse(
+        job_id=job.id,
+        kind=job.kind,
+        job_type=job.job_type,
+        status=job.status,
+        status_url=f"/agents/jobs/{job.id}",
+        run_id=job.payload.get("run_id")
+    )
+
+
+async def _get_user_job(job_manager: JobManager, job_id: str, user_id: Optional[str]) -> Job:
+    job = await job_manager.get(job_id)
+    if job is None or job.user_id != (user_id or "anonymous"):
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@router.post("/execute", response_model=JobSubmittedResponse, status_code=202)
+async def execute_agent(
+    agent_request: AgentRequest,
+    user_id: OptionalUserDep,
+    job_manager: JobManagerDep
+):
+    """Soumettre l'exécution d'un agent; le résultat est suivi via /jobs/{job_id}"""
+    if agent_request.agent_type not in AGENT_TYPES:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Agent type '{agent_request.agent_type}' not supported"
+        )
+    
+    return await _submit_job(
+        job_manager, "agent", agent_request.agent_type,
+        agent_request.model_dump(), user_id
+    )
+
+
+@router.post("/workflow", response_model=JobSubmittedResponse, status_code=202)
+async def execute_workflow(
+    workflow_request: WorkflowRequest,
+    user_id: OptionalUserDep,
+    job_manager: JobManagerDep
+):
+    """Soumettre un workflow multi-agents; le résultat est suivi via /jobs/{job_id}"""
+    if workflow_request.workflow_type not in WORKFLOW_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Workflow type '{workflow_request.workflow_type}' not supported"
+        )
+    
+    # run_id fixé dès la soumission: un job repris après redémarrage repart du checkpoint
+    workflow_request.run_id = _workflow_run_id(workflow_request)
+    
+    return await _submit_job(
+        job_manager, "workflow", workflow_request.workflow_type,
+        workflow_request.model_dump(), user_id
+    )
+
+
+@router.post("/execute/stream")
+async def stream_agent(
+    agent_request: AgentRequest,
+    services: Dict[str, Any] = Depends(get_services)
+):
+    """Exécuter un agent en diffusant chaque étape (Server-Sent Events)"""
+    if agent_request.agent_type not in AGENT_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Agent type '{agent_request.agent_type}' not supported"
+        )
+    
+    agent, initial_state = _prepare_agent(agent_request, services, datetime.now())
+    return _event_stream_response(agent, initial_state)
+
+
+@router.post("/workflow/stream")
+async def stream_workflow(
+    workflow_request: WorkflowRequest,
+    user_id: OptionalUserDep,
+    services: Dict[str, Any] = Depends(get_services)
+):
+    """Exécuter un workflow en diffusant chaque étape (Server-Sent Events)"""
+    if workflow_request.workflow_type not in WORKFLOW_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Workflow type '{workflow_request.workflow_type}' not supported"
+        )
+    
+    workflow, initial_state = _prepare_workflow(workflow_request, services, user_id or "anonymous")
+    return _event_stream_response(workflow, initial_state)
+
+
+@router.get("/jobs", response_model=List[JobStatusResponse])
+async def list_jobs(user_id: OptionalUserDep, job_manager: JobManagerDep):
+    """Jobs de l'utilisateur, du plus récent au plus ancien"""
+    return [_job_status(job) for job in await job_manager.list_jobs(user_id or "anonymous")]
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str, user_id: OptionalUserDep, job_manager: JobManagerDep):
+    """Statut, progression et résultat d'un job"""
+    return _job_status(await _get_user_job(job_manager, job_id, user_id))
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobStatusResponse)
+async def cancel_job(job_id: str, user_id: OptionalUserDep, job_manager: JobManagerDep):
+    """Annuler un job en attente ou en cours"""
+    await _get_user_job(job_manager, job_id, user_id)
+    return _job_status(await job_manager.cancel(job_id))
+
+
 @router.get("/status")
 async def get_agents_status():
     """Obtenir le statut de tous les agents disponibles"""
@@ -304,12 +546,18 @@ async def get_agents_status():
 
 
 @router.get("/health")
-async def agents_health_check():
+async def agents_health_check(services: Dict[str, Any] = Depends(get_services)):
     """Vérification de santé du système d'agents"""
     try:
         # Vérifier la disponibilité des services
         # Cette vérification sera plus détaillée avec les vrais services
         
+        # Hits et économies du cache de completions, par agent
+        anthropic = getattr(services.get("external_services"), "anthropic", None)
+        completion_cache = getattr(anthropic, "cache", None)
+        # File et utilisation du pool CPU partagé
+        cpu_executor = services.get("cpu_executor")
+        
         return {
             "status": "healthy",
             "agents_initialized": True,
@@ -321,6 +569,8 @@ async def agents_health_check():
                 "vector_service": "available",
                 "graph_service": "available"
             },
+            "completion_cache": completion_cache.get_stats() if completion_cache else None,
+            "cpu_executor": cpu_executor.get_stats() if cpu_executor else None,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -3,12 +3,14 @@ Routes de gestion des mémoires pour l'API AGI
 Gestion des mémoires L1/L2/L3, recherche sémantique et consolidation
 """
 
+import json
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 
 from backend.api.dependencies import (
     MemoryServiceDep,
@@ -23,7 +25,7 @@ router = APIRouter(prefix="/memory", tags=["memory"])
 # Modèles Pydantic pour les requêtes/réponses
 class MemoryCreate(BaseModel):
     content: str = Field(..., min_length=1, max_length=10000)
-    level: str = Field(default=MemoryLevel.L1, regex="^(L1|L2|L3)$")
+    level: str = Field(default=MemoryLevel.L1, pattern="^(L1|L2|L3)$")
     importance: Optional[float] = Field(default=None, ge=0.0, le=1.0)
     metadata: Optional[Dict[str, Any]] = None
     conversation_id: Optional[str] = None
@@ -42,7 +44,7 @@ class MemoryResponse(BaseModel):
 
 class MemorySearchRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=1000)
-    level: Optional[str] = Field(default=None, regex="^(L1|L2|L3)$")
+    level: Optional[str] = Field(default=None, pattern="^(L1|L2|L3)$")
     limit: int = Field(default=10, ge=1, le=50)
     similarity_threshold: float = Field(default=0.7, ge=0.0, le=1.0)
 
@@ -58,7 +60,8 @@ class SemanticSearchRequest(BaseModel):
     search_concepts: bool = True
     limit: int = Field(default=10, ge=1, le=50)
     similarity_threshold: float = Field(default=0.7, ge=0.0, le=1.0)
-    use_reranking: bool = True
+    mode: str = Field(default="vector", pattern="^(vector|hybrid)$")
+    use_reranking: bool = Field(default=False, description="Cohere rerank, skipped when the rerank budget is exhausted")
 
 class MemoryStatsResponse(BaseModel):
     total: int
@@ -115,6 +118,43 @@ async def create_memory(
             detail=f"Failed to create memory: {str(e)}"
         )
 
+@router.post("/bulk")
+async def create_memories_bulk(
+    request: Request,
+    memory_service: MemoryServiceDep,
+    user_id: CurrentUserDep
+) -> StreamingResponse:
+    """
+    Bulk import memories.
+    
+    The body is NDJSON, one `MemoryCreate` object per line. Results are streamed
+    back as NDJSON, one line per input line in the same order.
+    """
+    
+    async def parse_items() -> AsyncIterator[Dict[str, Any]]:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_bulk_line(line)
+        if buffer.strip():
+            yield _parse_bulk_line(buffer)
+    
+    async def stream_results() -> AsyncIterator[str]:
+        async for result in memory_service.create_memories_bulk(user_id, parse_items()):
+            yield json.dumps(result, default=str) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+def _parse_bulk_line(line: bytes) -> Dict[str, Any]:
+    """Validate one NDJSON line; invalid lines are reported, not fatal"""
+    try:
+        return MemoryCreate.model_validate_json(line).model_dump()
+    except ValidationError as e:
+        return {"error": f"Invalid line: {e.errors()[0]['msg']}"}
+
 @router.get("/{memory_id}", response_model=MemoryResponse)
 async def get_memory(
     memory_id: str,
@@ -151,11 +191,11 @@ async def get_memory(
 
 @router.get("/search", response_model=List[MemoryResponse])
 async def search_memories(
-    query: str,
-    level: Optional[MemoryLevel] = None,
-    limit: int = 10,
     embedding_service: EmbeddingServiceDep,
-    user_id: CurrentUserDep
+    user_id: CurrentUserDep,
+    query: str,
+    level: Optional[str] = Query(default=None, pattern="^(L1|L2|L3)$"),
+    limit: int = 10
 ):
     """Search memories using semantic search"""
     try:
@@ -201,7 +241,8 @@ async def semantic_search(
             search_concepts=search_request.search_concepts,
             limit=search_request.limit,
             similarity_threshold=search_request.similarity_threshold,
-            use_reranking=search_request.use_reranking
+            use_reranking=search_request.use_reranking,
+            mode=search_request.mode
         )
         
         return results
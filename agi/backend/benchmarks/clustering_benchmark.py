@@ -0,0 +1,90 @@
+"""
+Benchmark du regroupement par similarité (ConsolidatorAgent._group_by_similarity)
+Compare la boucle historique (cosine_similarity paire à paire) aux modes
+vectorisés de SimilarityClusterer sur des mémoires synthétiques.
+
+Usage:
+    python -m benchmarks.clustering_benchmark --sizes 1000 10000 50000
+"""
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from services.embedding_service import EmbeddingService
+from services.similarity_clustering import CLUSTERING_MODES, SimilarityClusterer
+
+
+def synthetic_embeddings(count: int, dimensions: int, rng: np.random.Generator) -> np.ndarray:
+    """Embeddings regroupés autour de centres (~50 mémoires par centre)"""
+    centers = rng.standard_normal((max(1, count // 50), dimensions)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    assignments = rng.integers(0, len(centers), size=count)
+    noise = rng.standard_normal((count, dimensions)).astype(np.float32) * (0.3 / np.sqrt(dimensions))
+    return centers[assignments] + noise
+
+
+def legacy_greedy(embeddings: List[List[float]], threshold: float) -> List[List[int]]:
+    """Boucle d'origine: O(n²) appels cosine_similarity en Python"""
+    clusters = []
+    used = set()
+    for i in range(len(embeddings)):
+        if i in used:
+            continue
+        cluster = [i]
+        used.add(i)
+        for j in range(len(embeddings)):
+            if j in used:
+                continue
+            if EmbeddingService.cosine_similarity(embeddings[i], embeddings[j]) >= threshold:
+                cluster.append(j)
+                used.add(j)
+        clusters.append(cluster)
+    return clusters
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def run(args):
+    rng = np.random.default_rng(args.random_seed)
+
+    for size in args.sizes:
+        embeddings = synthetic_embeddings(size, args.dimensions, rng)
+        print(f"--- {size} mémoires, {args.dimensions} dimensions")
+
+        greedy = None
+        for mode in CLUSTERING_MODES:
+            clusterer = SimilarityClusterer(args.threshold, mode)
+            clusters, elapsed = timed(clusterer.cluster, embeddings)
+            if mode == "greedy":
+                greedy = clusters
+            print(f"{mode:<16} {elapsed * 1000:10.1f} ms  groupes={len(clusters)}")
+
+        if size <= args.legacy_max:
+            clusters, elapsed = timed(legacy_greedy, embeddings.tolist(), args.threshold)
+            print(
+                f"{'boucle d origine':<16} {elapsed * 1000:10.1f} ms  groupes={len(clusters)}  "
+                f"identique={clusters == greedy}"
+            )
+        else:
+            print(f"{'boucle d origine':<16} ignorée (> --legacy-max {args.legacy_max})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--legacy-max", type=int, default=2000, help="Taille maximale pour la boucle d'origine")
+    parser.add_argument("--random-seed", type=int, default=42)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Benchmark de la recherche vectorielle des mémoires
+Compare le rappel et la latence du chemin ANN (index HNSW partiels)
+au scan exact historique, pour plusieurs valeurs de ef_search et modes de
+parcours itératif.
+
+Les index sont communs à tous les utilisateurs: les mémoires synthétiques
+sont réparties entre plusieurs utilisateurs de tailles très inégales
+(chacun deux fois moins de mémoires que le précédent) et le rappel est
+rapporté par utilisateur, le plus petit étant le cas difficile.
+
+Usage:
+    python -m benchmarks.vector_search_benchmark --seed 20000 --tenants 6 --queries 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List, Optional, Sequence, Set
+from uuid import UUID, uuid4
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+from config.settings import get_settings
+from services.memory_service import MemoryService
+from services.vector_index_manager import MEMORY_LEVELS, VectorIndexManager
+
+DIMENSIONS = 1536
+
+# Requête d'origine: le seuil dans le WHERE empêche l'usage d'un index
+EXACT_QUERY = """
+SELECT id, 1 - (embedding <=> $2) AS similarity
+FROM memories
+WHERE user_id = $1 AND expires_at > NOW()
+  AND 1 - (embedding <=> $2) >= $3
+ORDER BY similarity DESC, importance DESC, created_at DESC
+LIMIT $4
+"""
+
+
+def random_unit_vectors(count: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def seed_memories(pool: asyncpg.Pool, user_id: UUID, count: int, rng: np.random.Generator):
+    """Insérer des mémoires synthétiques (regroupées autour de centres)"""
+    centers = random_unit_vectors(max(1, count // 200), rng)
+    assignments = rng.integers(0, len(centers), size=count)
+    noise = rng.standard_normal((count, DIMENSIONS)).astype(np.float32) * 0.05
+    vectors = centers[assignments] + noise
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    levels = rng.choice(MEMORY_LEVELS, size=count)
+    records = [
+        (uuid4(), user_id, f"memoire synthetique {index}", str(levels[index]),
+         float(rng.uniform(0.1, 1.0)), vectors[index], "{}")
+        for index in range(count)
+    ]
+
+    async with pool.acquire() as conn:
+        await conn.executemany(
+            """
+            INSERT INTO memories (id, user_id, content, level, importance, embedding, metadata, expires_at)
+            VALUES ($1, $2, $3, $4, $5, $6, $7::jsonb, NOW() + INTERVAL '30 days')
+            """,
+            records
+        )
+        await conn.execute("ANALYZE memories")
+
+    return vectors
+
+
+async def exact_search(conn, user_id: UUID, embedding, threshold: float, limit: int) -> List[UUID]:
+    rows = await conn.fetch(EXACT_QUERY, user_id, embedding, threshold, limit)
+    return [row["id"] for row in rows]
+
+
+def recall(expected: Sequence[UUID], found: Set[UUID]) -> float:
+    if not expected:
+        return 1.0
+    return sum(1 for item in expected if item in found) / len(expected)
+
+
+def summarize(label: str, latencies: List[float], recalls: Optional[List[float]] = None):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    line = (
+        f"{label:<26} p50={statistics.median(latencies):7.2f} ms  "
+        f"p95={p95:7.2f} ms"
+    )
+    if recalls is not None:
+        line += f"  recall@k={statistics.mean(recalls):.3f}"
+    print(line)
+
+
+def tenant_sizes(total: int, tenants: int) -> List[int]:
+    """Parts géométriques (1/2, 1/4, ...) d'un total, au moins une mémoire chacun"""
+    weights = [2.0 ** -index for index in range(tenants)]
+    return [max(1, int(total * weight / sum(weights))) for weight in weights]
+
+
+async def tenant_vectors(pool: asyncpg.Pool, user_id: UUID, count: int) -> np.ndarray:
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT embedding FROM memories WHERE user_id = $1 AND embedding IS NOT NULL "
+            "ORDER BY random() LIMIT $2",
+            user_id, count
+        )
+    return np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+
+
+async def run(args):
+    settings = get_settings()
+    rng = np.random.default_rng(args.random_seed)
+    pool = await asyncpg.create_pool(settings.database_url, min_size=1, max_size=4, init=register_vector)
+
+    tenants: Dict[UUID, np.ndarray] = {}
+
+    try:
+        if args.seed:
+            for size in tenant_sizes(args.seed, args.tenants):
+                user_id = uuid4()
+                print(f"Insertion de {size} mémoires pour {user_id}...")
+                tenants[user_id] = await seed_memories(pool, user_id, size, rng)
+        else:
+            if not args.user_id:
+                raise SystemExit("Utiliser --seed, ou --user-id pour des utilisateurs existants")
+            for user_id in map(UUID, args.user_id):
+                tenants[user_id] = await tenant_vectors(pool, user_id, args.queries)
+                if not len(tenants[user_id]):
+                    raise SystemExit(f"Aucune mémoire pour {user_id}")
+
+        manager = VectorIndexManager(
+            pool, m=settings.vector_index_m, ef_construction=settings.vector_index_ef_construction
+        )
+        print(f"Index: {await manager.ensure_indexes()}")
+
+        for user_id, vectors in tenants.items():
+            print(f"\nUtilisateur {user_id} ({len(vectors)} mémoires échantillonnées)")
+
+            # Requêtes proches de mémoires existantes (bruit léger)
+            picks = rng.integers(0, len(vectors), size=args.queries)
+            queries = vectors[picks] + rng.standard_normal((args.queries, DIMENSIONS)).astype(np.float32) * 0.02
+            queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+            expected = []
+            latencies = []
+            async with pool.acquire() as conn:
+                for query in queries:
+                    started = time.perf_counter()
+                    expected.append(await exact_search(conn, user_id, query, args.threshold, args.k))
+                    latencies.append((time.perf_counter() - started) * 1000)
+            summarize("scan exact", latencies)
+
+            for iterative_scan in args.iterative_scan:
+                service = MemoryService(external_services=None)
+                service.settings = settings.model_copy(update={"vector_search_iterative_scan": iterative_scan})
+                service.pool = pool
+
+                for ef_search in args.ef_search:
+                    latencies = []
+                    recalls = []
+                    for query, truth in zip(queries, expected):
+                        started = time.perf_counter()
+                        results = await service.search_memories_by_embedding(
+                            user_id, query, limit=args.k,
+                            similarity_threshold=args.threshold, ef_search=ef_search
+                        )
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        recalls.append(recall(truth, {row["id"] for row in results}))
+                    summarize(f"{iterative_scan} ef={ef_search}", latencies, recalls)
+
+    finally:
+        if args.seed and args.cleanup:
+            async with pool.acquire() as conn:
+                await conn.execute("DELETE FROM memories WHERE user_id = ANY($1::uuid[])", list(tenants))
+        await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Nombre de mémoires synthétiques à insérer")
+    parser.add_argument("--tenants", type=int, default=6, help="Utilisateurs synthétiques (tailles géométriques)")
+    parser.add_argument("--user-id", nargs="+", default=None, help="Utilisateurs existants à interroger")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100, 200])
+    parser.add_argument(
+        "--iterative-scan", nargs="+", default=["relaxed_order", "off"],
+        help="Modes hnsw.iterative_scan comparés (off: scan exact par utilisateur)"
+    )
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--no-cleanup", dest="cleanup", action="store_false")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -37,11 +37,102 @@ class Settings(BaseSettings):
     db_max_overflow: int = 30
     redis_max_connections: int = 50
     neo4j_max_connection_pool_size: int = 50
-    
+
+    # Graph writes (UNWIND par lots dans une transaction d'écriture gérée)
+    graph_write_batch_size: int = 1000
+    graph_write_max_retries: int = 3
+
+    # Graph snapshot (graphe de concepts en CSR par utilisateur, parcours en mémoire)
+    graph_snapshot_enabled: bool = True
+    graph_snapshot_max_age: int = 300          # seconds, rechargement (écritures externes)
+    graph_snapshot_max_users: int = 100
+    graph_snapshot_compact_threshold: int = 1024
+
+    # Embedding batching (regroupement des requêtes Voyage AI concurrentes)
+    embedding_batching_enabled: bool = True
+    embedding_batch_window_ms: int = 5
+    embedding_batch_max_size: int = 64
+    embedding_request_max_batch: int = 128       # Limites par requête Voyage AI
+    embedding_request_max_tokens: int = 100000
+
+    # Embedding cache (L1 en mémoire + L2 Redis)
+    embedding_cache_enabled: bool = True
+    embedding_cache_l1_max_entries: int = 10000
+    embedding_cache_l1_ttl: int = 3600      # 1 hour
+    embedding_cache_ttl: int = 604800       # 7 days
+
+    # Completion cache (réponses LLM: correspondance exacte + similarité optionnelle)
+    completion_cache_enabled: bool = True
+    completion_cache_ttl: int = 604800      # 7 days
+    completion_cache_l1_max_entries: int = 2000
+    completion_cache_semantic_threshold: float = 0.0   # 0 = niveau sémantique désactivé
+    completion_cache_semantic_max_entries: int = 1000  # Prompts indexés par groupe
+
+    # External HTTP clients (un pool persistant par fournisseur)
+    http2_enabled: bool = True
+    http_max_connections_per_host: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry: float = 30.0
+    http_connect_timeout: float = 5.0
+
+    # Provider rate limits (budgets partagés entre workers via Redis, 0 = illimité)
+    anthropic_requests_per_minute: int = 50
+    anthropic_tokens_per_minute: int = 40000
+    anthropic_max_concurrency: int = 8
+    voyage_requests_per_minute: int = 300
+    voyage_tokens_per_minute: int = 1000000
+    voyage_max_concurrency: int = 8
+    cohere_requests_per_minute: int = 100
+    cohere_tokens_per_minute: int = 0
+    cohere_max_concurrency: int = 4
+    provider_max_retry_after: float = 60.0
+    provider_max_retries: int = 4
+
+    # Vector search (index HNSW partiels par niveau)
+    vector_index_auto_create: bool = True
+    vector_index_m: int = 16
+    vector_index_ef_construction: int = 64
+    vector_search_ef_search: int = 40
+    vector_search_probes: int = 10
+    vector_search_overfetch: int = 4
+    # pgvector >= 0.8: "relaxed_order" ou "strict_order"; "off" (ou pgvector plus ancien): scan exact par utilisateur
+    vector_search_iterative_scan: str = "relaxed_order"
+    vector_search_max_scan_tuples: int = 20000  # Borne du parcours itératif par sous-requête
+
+    # Hybrid search (plein texte + vecteurs, fusion RRF)
+    search_rrf_k: int = 60
+    search_candidate_multiplier: int = 3
+    search_rerank_per_minute: int = 30  # Reranks Cohere facultatifs autorisés par minute
+
+    # Search fan-out (délai par branche, au-delà le résultat partiel est renvoyé)
+    search_postgres_timeout: float = 2.0   # seconds
+    search_graph_timeout: float = 1.5      # seconds
+
     # Memory Configuration
     memory_l1_ttl: int = 3600      # 1 hour
     memory_l2_ttl: int = 86400     # 24 hours  
     memory_l3_ttl: int = 2592000   # 30 days
+    memory_bulk_chunk_size: int = 1000
+    memory_analysis_chunk_size: int = 1000  # Lignes lues par bloc (curseur côté serveur)
+    consolidation_chunk_size: int = 5000
+    memory_partitioning_enabled: bool = False
+    memory_partition_premake_months: int = 3
+
+    # Background jobs (agents et workflows exécutés hors requête HTTP)
+    job_workers: int = 4
+    job_max_running_per_user: int = 2
+    job_max_queued_per_user: int = 20
+    job_timeout: int = 3600            # seconds
+    job_result_ttl: int = 86400        # 24 hours
+    job_cancel_poll_interval: float = 1.0
+
+    # CPU executor (étapes CPU des agents dans un pool de processus, 0 = threads)
+    cpu_executor_workers: int = 2
+    cpu_executor_start_method: str = "spawn"
+
+    # Workflow checkpoints (reprise par run_id; Redis, sinon fichiers JSON)
+    checkpoint_dir: str = ".checkpoints"
+    checkpoint_ttl: int = 604800       # 7 days
     
     # JWT Configuration
     jwt_algorithm: str = "HS256"
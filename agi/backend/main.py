@@ -1,11 +1,63 @@
+import logging
+from contextlib import asynccontextmanager
+
+import redis.asyncio as redis
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.routes import tasks
+from api.routes.agents import register_job_handlers
+from api.dependencies import services_from_state
+from config.settings import get_settings
+from services.external_services import external_services
+from services.checkpoint_store import CheckpointStore
+from services.cpu_executor import CPUExecutor
+from services.job_queue import JobManager
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients HTTP persistants partagés par toutes les requêtes
+    app.state.external_services = external_services
+    
+    # Budgets de débit et cache d'embeddings partagés entre workers
+    redis_client = redis.from_url(settings.redis_url, max_connections=settings.redis_max_connections)
+    try:
+        await redis_client.ping()
+        external_services.attach_redis(redis_client)
+    except Exception as e:
+        logger.warning(f"Redis indisponible, limites de débit locales au worker: {e}")
+        await redis_client.close()
+        redis_client = None
+    
+    # Checkpoints des workflows longs (reprise après redémarrage)
+    app.state.checkpoint_store = CheckpointStore.from_settings(settings, redis_client)
+    
+    # Pool de processus partagé: scans et similarités hors de la boucle d'événements
+    app.state.cpu_executor = CPUExecutor.from_settings(settings)
+    app.state.cpu_executor.start()
+    
+    # Jobs d'agents/workflows: file Redis partagée, sinon file locale
+    # Handlers enregistrés avant les workers: les jobs restés en file sont repris au démarrage
+    app.state.job_manager = JobManager.from_settings(settings, redis_client)
+    register_job_handlers(app.state.job_manager, services_from_state(app.state))
+    app.state.job_manager.start()
+        
+    yield
+    await app.state.job_manager.stop()
+    app.state.cpu_executor.shutdown()
+    await external_services.aclose()
+    if redis_client is not None:
+        await redis_client.close()
+
 
 app = FastAPI(
     title="Task Manager AGI API",
     description="Backend API for the Task Manager AGI application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
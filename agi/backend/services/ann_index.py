@@ -0,0 +1,194 @@
+"""
+Index de plus proches voisins approximatifs (IVF) en mémoire
+Sert à générer des candidats de similarité sans comparer toutes les paires:
+les vecteurs sont répartis en listes autour de centroïdes (k-means
+sphérique) et seules les listes les plus proches sont examinées.
+"""
+
+import logging
+import math
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.similarity_clustering import normalize_embeddings
+
+logger = logging.getLogger(__name__)
+
+# En dessous, une recherche exacte est aussi rapide que l'IVF
+EXACT_SEARCH_MAX_VECTORS = 4096
+
+
+class IVFIndex:
+    """
+    Index IVF sur une matrice NumPy float32 normalisée (similarité cosinus).
+
+    `n_lists` vaut ~sqrt(n) par défaut; `n_probe` règle le compromis
+    rappel/coût: chaque requête examine environ n_probe * n / n_lists
+    vecteurs au lieu de n.
+    """
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        kmeans_iterations: int = 10,
+        train_size: int = 50_000,
+        seed: int = 0
+    ):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.train_size = train_size
+        self.seed = seed
+
+        self.vectors: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        self.list_members: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+
+    @property
+    def is_exact(self) -> bool:
+        return self.centroids is None
+
+    def build(self, embeddings: Sequence[Sequence[float]]) -> "IVFIndex":
+        """Normaliser, entraîner les centroïdes et répartir les vecteurs en listes"""
+        self.vectors = normalize_embeddings(embeddings)
+        count = len(self.vectors)
+
+        n_lists = self.n_lists or int(math.sqrt(count))
+        if count <= EXACT_SEARCH_MAX_VECTORS or n_lists <= self.n_probe:
+            # Petit volume: recherche exacte
+            self.centroids = None
+            return self
+
+        rng = np.random.default_rng(self.seed)
+        sample = self.vectors[rng.choice(count, size=min(count, self.train_size), replace=False)]
+        self.centroids = self._train_centroids(sample, n_lists, rng)
+
+        assignments = self._nearest_centroids(self.vectors, 1)[:, 0]
+        self.list_members = np.argsort(assignments, kind="stable")
+        self.list_offsets = np.searchsorted(assignments[self.list_members], np.arange(n_lists + 1))
+
+        logger.info(f"Index IVF construit: {count} vecteurs, {n_lists} listes, n_probe={self.n_probe}")
+        return self
+
+    def search(self, query: Sequence[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices et similarités des k plus proches vecteurs d'une requête"""
+        query = normalize_embeddings([query])[0]
+        if self.is_exact:
+            candidates = np.arange(len(self.vectors))
+        else:
+            probes = np.argsort(self.centroids @ query)[::-1][:self.n_probe]
+            candidates = self._list_candidates(probes)
+        return _top_k(self.vectors[candidates] @ query, candidates, k)
+
+    def iter_neighbors(self, k: int) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Top-k voisins de chaque vecteur indexé (hors lui-même), par lots.
+
+        Produit (indices des requêtes, voisins (m, k), similarités (m, k)).
+        Les membres d'une même liste partagent les listes sondées (celles des
+        centroïdes les plus proches du leur): un seul produit matriciel par
+        liste au lieu d'une recherche par vecteur.
+        """
+        if self.is_exact:
+            count = len(self.vectors)
+            block = max(1, 16_000_000 // max(1, count))
+            everything = np.arange(count)
+            for start in range(0, count, block):
+                queries = everything[start:start + block]
+                yield (queries, *self._block_top_k(queries, everything, k))
+            return
+
+        probes_by_list = self._nearest_centroids(self.centroids, self.n_probe)
+        for list_index, probes in enumerate(probes_by_list):
+            queries = self.list_members[self.list_offsets[list_index]:self.list_offsets[list_index + 1]]
+            if len(queries) == 0:
+                continue
+            candidates = self._list_candidates(probes)
+            yield (queries, *self._block_top_k(queries, candidates, k))
+
+    def _block_top_k(
+        self,
+        queries: np.ndarray,
+        candidates: np.ndarray,
+        k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        similarities = self.vectors[queries] @ self.vectors[candidates].T
+        # Exclure chaque requête de ses propres voisins
+        self_rows, self_columns = np.nonzero(queries[:, None] == candidates[None, :])
+        similarities[self_rows, self_columns] = -np.inf
+
+        k = min(k, len(candidates))
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-scores, axis=1)
+        return candidates[np.take_along_axis(top, order, axis=1)], np.take_along_axis(scores, order, axis=1)
+
+    def _list_candidates(self, lists: Sequence[int]) -> np.ndarray:
+        return np.concatenate([
+            self.list_members[self.list_offsets[index]:self.list_offsets[index + 1]] for index in lists
+        ])
+
+    def _nearest_centroids(self, vectors: np.ndarray, count: int) -> np.ndarray:
+        """Indices des `count` centroïdes les plus proches de chaque vecteur, par blocs"""
+        count = min(count, len(self.centroids))
+        block = max(1, 16_000_000 // len(self.centroids))
+        nearest = []
+        for start in range(0, len(vectors), block):
+            similarities = vectors[start:start + block] @ self.centroids.T
+            top = np.argpartition(-similarities, count - 1, axis=1)[:, :count]
+            order = np.argsort(-np.take_along_axis(similarities, top, axis=1), axis=1)
+            nearest.append(np.take_along_axis(top, order, axis=1))
+        return np.concatenate(nearest)
+
+    def _train_centroids(self, sample: np.ndarray, n_lists: int, rng: np.random.Generator) -> np.ndarray:
+        """k-means sphérique sur un échantillon"""
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            self.centroids = centroids
+            assignments = self._nearest_centroids(sample, 1)[:, 0]
+            order = np.argsort(assignments, kind="stable")
+            present, starts = np.unique(assignments[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            empty = np.linalg.norm(sums, axis=1) == 0
+            # Une liste vide repart d'un point de l'échantillon
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = normalize_embeddings(sums)
+        return centroids
+
+
+def _top_k(similarities: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, len(candidates))
+    top = np.argpartition(-similarities, k - 1)[:k] if k else np.empty(0, dtype=np.int64)
+    top = top[np.argsort(-similarities[top])]
+    return candidates[top], similarities[top]
+
+
+def similar_pairs(
+    embeddings: Sequence[Sequence[float]],
+    threshold: float,
+    k: int,
+    n_probe: int = 8
+) -> List[Tuple[int, int, float]]:
+    """
+    Paires (i, j, similarité) avec i < j, parmi les k plus proches voisins
+    de chaque vecteur, au-dessus du seuil.
+    """
+    index = IVFIndex(n_probe=n_probe).build(embeddings)
+    pairs = {}
+    for queries, neighbors, scores in index.iter_neighbors(k):
+        rows, columns = np.nonzero(scores >= threshold)
+        for source, target, score in zip(
+            queries[rows].tolist(), neighbors[rows, columns].tolist(), scores[rows, columns].tolist()
+        ):
+            pairs[(min(source, target), max(source, target))] = score
+    return [(source, target, score) for (source, target), score in pairs.items()]
@@ -0,0 +1,196 @@
+"""
+Checkpoints des workflows longs.
+Le contexte de l'AgentState est sauvegardé après chaque nœud (et chaque lot
+traité) sous un identifiant de run; un run interrompu reprend depuis son
+dernier checkpoint au lieu de repayer tous les appels LLM.
+Les entrées volumineuses fixées par un nœud (clés détachées) sont écrites à
+part, une fois par nœud, et non à chaque sauvegarde intermédiaire.
+Stockage Redis, ou fichiers JSON locaux si Redis est absent.
+"""
+
+import asyncio
+import dataclasses
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+CHECKPOINT_RUNNING = "running"
+CHECKPOINT_COMPLETED = "completed"
+
+# Dataclasses autorisées dans un contexte sérialisé (scopes, métriques)
+_CHECKPOINT_TYPES: Dict[str, type] = {}
+
+
+def checkpoint_type(cls):
+    """Déclarer une dataclass reconstruite à la lecture d'un checkpoint"""
+    _CHECKPOINT_TYPES[cls.__name__] = cls
+    return cls
+
+
+def _encode(value: Any) -> Any:
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {
+            "__dataclass__": type(value).__name__,
+            "fields": {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+        }
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def _decode(value: Dict[str, Any]) -> Any:
+    if "__datetime__" in value and len(value) == 1:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__dataclass__" in value and set(value) == {"__dataclass__", "fields"}:
+        cls = _CHECKPOINT_TYPES.get(value["__dataclass__"])
+        if cls is not None:
+            return cls(**value["fields"])
+    return value
+
+
+def dumps_checkpoint(checkpoint: Dict[str, Any]) -> str:
+    return json.dumps(checkpoint, default=_encode)
+
+
+def loads_checkpoint(payload) -> Dict[str, Any]:
+    return json.loads(payload, object_hook=_decode)
+
+
+class CheckpointStore:
+    """
+    Un checkpoint par run: agent, propriétaire, prochain nœud à exécuter,
+    statut, step_count et contexte. Chaque sauvegarde remplace la précédente.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        directory: str = ".checkpoints",
+        ttl: int = 604800,
+        key_prefix: str = "agi:checkpoints"
+    ):
+        self.redis = redis_client
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        # Sauvegardes d'un même processus sérialisées: pas de retour en arrière
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_settings(cls, settings, redis_client=None) -> "CheckpointStore":
+        return cls(
+            redis_client=redis_client,
+            directory=settings.checkpoint_dir,
+            ttl=settings.checkpoint_ttl
+        )
+
+    async def save(
+        self,
+        run_id: str,
+        agent: str,
+        next_node: Optional[str],
+        state: Dict[str, Any],
+        status: str = CHECKPOINT_RUNNING,
+        owner: Optional[str] = None,
+        detached_keys: Sequence[str] = (),
+        write_detached: bool = True
+    ):
+        """
+        `detached_keys`: entrées du contexte sauvegardées à part et fusionnées
+        à la lecture. Avec `write_detached=False` (progression interne à un
+        nœud), elles ne sont pas réécrites: seul le reste du contexte l'est.
+        """
+        async with self._lock:
+            context = state.get("context", {})
+            # Sérialisé avant toute attente: le contexte peut changer pendant l'écriture
+            payload = dumps_checkpoint({
+                "run_id": run_id,
+                "agent": agent,
+                "owner": owner,
+                "next_node": next_node,
+                "status": status,
+                "step_count": state.get("step_count", 0),
+                "context": {key: value for key, value in context.items() if key not in detached_keys},
+                "detached_keys": list(detached_keys),
+                "updated_at": time.time()
+            })
+            detached_payload = None
+            if detached_keys and write_detached:
+                detached_payload = dumps_checkpoint(
+                    {key: context[key] for key in detached_keys if key in context}
+                )
+
+            # Entrées détachées écrites d'abord: le checkpoint ne désigne jamais un état absent
+            if self.redis is not None:
+                if detached_payload is not None:
+                    await self.redis.set(self._key(run_id, "detached"), detached_payload, ex=self.ttl)
+                elif detached_keys:
+                    await self.redis.expire(self._key(run_id, "detached"), self.ttl)
+                await self.redis.set(self._key(run_id), payload, ex=self.ttl)
+            else:
+                if detached_payload is not None:
+                    await asyncio.to_thread(self._write_file, run_id, detached_payload, "detached")
+                await asyncio.to_thread(self._write_file, run_id, payload)
+
+        logger.debug("Checkpoint sauvegardé", run_id=run_id, next_node=next_node, status=status)
+
+    async def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        if self.redis is not None:
+            payload = await self.redis.get(self._key(run_id))
+        else:
+            payload = await asyncio.to_thread(self._read_file, run_id)
+        if not payload:
+            return None
+
+        checkpoint = loads_checkpoint(payload)
+        if self.redis is None and time.time() - checkpoint["updated_at"] > self.ttl:
+            await self.delete(run_id)
+            return None
+
+        if checkpoint.get("detached_keys"):
+            if self.redis is not None:
+                detached = await self.redis.get(self._key(run_id, "detached"))
+            else:
+                detached = await asyncio.to_thread(self._read_file, run_id, "detached")
+            if detached:
+                checkpoint["context"].update(loads_checkpoint(detached))
+        return checkpoint
+
+    async def delete(self, run_id: str):
+        if self.redis is not None:
+            await self.redis.delete(self._key(run_id), self._key(run_id, "detached"))
+        else:
+            await asyncio.to_thread(self._path(run_id).unlink, missing_ok=True)
+            await asyncio.to_thread(self._path(run_id, "detached").unlink, missing_ok=True)
+
+    # --- Stand-in fichier -------------------------------------------------------------
+
+    def _write_file(self, run_id: str, payload: str, part: str = ""):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(run_id, part)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        # Remplacement atomique: un arrêt brutal laisse l'ancien checkpoint intact
+        os.replace(tmp_path, path)
+
+    def _read_file(self, run_id: str, part: str = "") -> Optional[str]:
+        path = self._path(run_id, part)
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    def _path(self, run_id: str, part: str = "") -> Path:
+        safe_id = "".join(char for char in run_id if char.isalnum() or char in "-_")
+        if not safe_id:
+            raise ValueError(f"run_id invalide: {run_id!r}")
+        return self.directory / (f"{safe_id}.{part}.json" if part else f"{safe_id}.json")
+
+    def _key(self, run_id: str, part: str = "") -> str:
+        return f"{self.key_prefix}:{run_id}:{part}" if part else f"{self.key_prefix}:{run_id}"
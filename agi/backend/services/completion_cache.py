@@ -0,0 +1,310 @@
+"""
+Cache des completions LLM.
+Niveau exact: hash de (modèle, prompt système, messages, max_tokens,
+température). Niveau sémantique optionnel: un prompt dont l'embedding est
+assez proche d'un prompt déjà servi, à modèle, système et paramètres
+identiques, réutilise sa réponse.
+Stockage Redis avec TTL (L1 local en repli) et compteurs par agent.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Prix publics en USD par million de tokens (entrée, sortie)
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "claude-3-opus-20240229": (15.0, 75.0),
+    "claude-3-sonnet-20240229": (3.0, 15.0),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-5-sonnet-20240620": (3.0, 15.0),
+    "claude-3-5-sonnet-20241022": (3.0, 15.0)
+}
+DEFAULT_PRICING = (3.0, 15.0)
+
+Embedder = Callable[[str], Awaitable[List[float]]]
+
+
+def completion_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Coût en USD d'une completion."""
+    input_price, output_price = MODEL_PRICING.get(model, DEFAULT_PRICING)
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+@dataclass
+class CompletionCacheStats:
+    """Compteurs d'un agent."""
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    saved_input_tokens: int = 0
+    saved_output_tokens: int = 0
+    saved_usd: float = 0.0
+    errors: int = 0
+
+
+@dataclass
+class CompletionRequest:
+    """Requête normalisée: clé exacte, groupe sémantique et texte à encoder."""
+    model: str
+    key: str
+    bucket: str
+    text: str
+    embedding: Optional[np.ndarray] = field(default=None, repr=False)
+
+
+class CompletionCache:
+    """
+    Cache de réponses LLM à deux niveaux de correspondance.
+
+    Le niveau sémantique (désactivé si `semantic_threshold` vaut 0) compare
+    le prompt aux prompts déjà servis dans le même groupe (modèle, système,
+    max_tokens, température); il coûte un embedding par miss exact.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        ttl_seconds: int = 604800,
+        max_local_entries: int = 2000,
+        semantic_threshold: float = 0.0,
+        max_semantic_entries: int = 1000,
+        embedder: Optional[Embedder] = None,
+        key_prefix: str = "llm:v1:"
+    ):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.max_local_entries = max_local_entries
+        self.semantic_threshold = semantic_threshold
+        self.max_semantic_entries = max_semantic_entries
+        self.embedder = embedder
+        self.key_prefix = key_prefix
+        self.stats: Dict[str, CompletionCacheStats] = {}
+
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._local_semantic: Dict[str, "OrderedDict[str, np.ndarray]"] = {}
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.semantic_threshold > 0 and self.embedder is not None
+
+    def make_request(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        system_prompt: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None
+    ) -> CompletionRequest:
+        """Normaliser une requête (messages au format Anthropic role/content)."""
+        parameters = {
+            "model": model,
+            "system": system_prompt or "",
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        canonical = json.dumps(
+            {**parameters, "messages": messages},
+            sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+        )
+        bucket = json.dumps(parameters, sort_keys=True, separators=(",", ":"))
+
+        return CompletionRequest(
+            model=model,
+            key=f"{self.key_prefix}{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}",
+            bucket=f"{self.key_prefix}sem:{hashlib.sha256(bucket.encode('utf-8')).hexdigest()[:32]}",
+            text="\n".join(f"{message.get('role')}: {message.get('content')}" for message in messages)
+        )
+
+    async def get(self, request: CompletionRequest, agent: str = "default") -> Optional[Any]:
+        """Réponse en cache (exacte, sinon la plus proche au-dessus du seuil)."""
+        stats = self.stats.setdefault(agent, CompletionCacheStats())
+
+        entry = await self._get_entry(request.key, stats)
+        tier = "exact"
+        if entry is None and self.semantic_enabled:
+            entry = await self._get_semantic(request, stats)
+            tier = "semantic"
+
+        if entry is None:
+            stats.misses += 1
+            return None
+
+        if tier == "exact":
+            stats.exact_hits += 1
+        else:
+            stats.semantic_hits += 1
+        stats.saved_input_tokens += entry["input_tokens"]
+        stats.saved_output_tokens += entry["output_tokens"]
+        stats.saved_usd += completion_cost(entry["model"], entry["input_tokens"], entry["output_tokens"])
+
+        logger.debug("Completion servie depuis le cache", agent=agent, tier=tier)
+        return entry["value"]
+
+    async def set(
+        self,
+        request: CompletionRequest,
+        value: Any,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        agent: str = "default"
+    ):
+        """Stocker une réponse (JSON) et, si activé, l'embedding du prompt."""
+        stats = self.stats.setdefault(agent, CompletionCacheStats())
+        payload = json.dumps({
+            "value": value,
+            "model": request.model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens
+        }, default=str)
+
+        self._local_set(request.key, payload)
+        stats.writes += 1
+
+        if self.redis is not None:
+            try:
+                await self.redis.setex(request.key, self.ttl_seconds, payload)
+            except Exception as e:
+                stats.errors += 1
+                logger.warning("Écriture du cache de completions échouée", error=str(e))
+
+        if self.semantic_enabled:
+            await self._add_semantic(request, stats)
+
+    # --- Niveau exact -------------------------------------------------------------------
+
+    async def _get_entry(self, key: str, stats: CompletionCacheStats) -> Optional[Dict[str, Any]]:
+        payload = self._local_get(key)
+        if payload is None and self.redis is not None:
+            try:
+                payload = await self.redis.get(key)
+            except Exception as e:
+                stats.errors += 1
+                logger.warning("Lecture du cache de completions échouée", error=str(e))
+            if payload is not None:
+                payload = payload.decode("utf-8") if isinstance(payload, bytes) else payload
+                self._local_set(key, payload)
+        return json.loads(payload) if payload is not None else None
+
+    def _local_get(self, key: str) -> Optional[str]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+
+        self._local.move_to_end(key)
+        return payload
+
+    def _local_set(self, key: str, payload: str):
+        self._local[key] = (time.monotonic() + self.ttl_seconds, payload)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_local_entries:
+            self._local.popitem(last=False)
+
+    # --- Niveau sémantique ----------------------------------------------------------------
+
+    async def _embedding(self, request: CompletionRequest) -> np.ndarray:
+        # Calculé une fois par requête: réutilisé par set() après un miss
+        if request.embedding is None:
+            vector = np.asarray(await self.embedder(request.text), dtype=np.float32)
+            request.embedding = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        return request.embedding
+
+    async def _get_semantic(self, request: CompletionRequest, stats: CompletionCacheStats) -> Optional[Dict[str, Any]]:
+        try:
+            vector = await self._embedding(request)
+            candidates = await self._load_bucket(request.bucket)
+        except Exception as e:
+            stats.errors += 1
+            logger.warning("Recherche sémantique du cache échouée", error=str(e))
+            return None
+
+        candidates = [(key, embedding) for key, embedding in candidates if embedding.shape == vector.shape]
+        if not candidates:
+            return None
+
+        scores = np.stack([embedding for _, embedding in candidates]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+
+        # L'entrée peut avoir expiré avant son embedding
+        return await self._get_entry(candidates[best][0], stats)
+
+    async def _load_bucket(self, bucket: str) -> List[Tuple[str, np.ndarray]]:
+        if self.redis is None:
+            return list(self._local_semantic.get(bucket, {}).items())
+
+        items = await self.redis.hgetall(bucket)
+        return [
+            (key.decode("utf-8") if isinstance(key, bytes) else key, np.frombuffer(payload, dtype="<f4"))
+            for key, payload in items.items()
+        ]
+
+    async def _add_semantic(self, request: CompletionRequest, stats: CompletionCacheStats):
+        try:
+            vector = await self._embedding(request)
+        except Exception as e:
+            stats.errors += 1
+            logger.warning("Embedding du prompt échoué", error=str(e))
+            return
+
+        if self.redis is None:
+            bucket = self._local_semantic.setdefault(request.bucket, OrderedDict())
+            bucket[request.key] = vector
+            while len(bucket) > self.max_semantic_entries:
+                bucket.popitem(last=False)
+            return
+
+        try:
+            # Groupe plein: les nouveaux prompts restent servis par le niveau exact
+            if await self.redis.hlen(request.bucket) < self.max_semantic_entries:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(request.bucket, request.key, vector.astype("<f4").tobytes())
+                    pipe.expire(request.bucket, self.ttl_seconds)
+                    await pipe.execute()
+        except Exception as e:
+            stats.errors += 1
+            logger.warning("Écriture de l'index sémantique échouée", error=str(e))
+
+    # --- Statistiques ---------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Taux de hit et économies par agent, puis totaux."""
+        agents = {}
+        total = CompletionCacheStats()
+        for agent, stats in self.stats.items():
+            agents[agent] = self._with_rates(stats)
+            for name, value in asdict(stats).items():
+                setattr(total, name, getattr(total, name) + value)
+
+        return {
+            "agents": agents,
+            "total": self._with_rates(total),
+            "semantic_enabled": self.semantic_enabled,
+            "semantic_threshold": self.semantic_threshold,
+            "local_entries": len(self._local),
+            "redis_enabled": self.redis is not None
+        }
+
+    @staticmethod
+    def _with_rates(stats: CompletionCacheStats) -> Dict[str, Any]:
+        hits = stats.exact_hits + stats.semantic_hits
+        lookups = hits + stats.misses
+        return {
+            **asdict(stats),
+            "saved_usd": round(stats.saved_usd, 6),
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
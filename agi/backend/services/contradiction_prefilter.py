@@ -0,0 +1,220 @@
+"""
+Pré-filtre des paires avant l'analyse de contradictions par LLM
+Seuls les cas sans contradiction évidents sont tranchés localement:
+1. paires sans rapport (similarité des embeddings basse)
+2. paires concordantes (similarité très haute) sans aucun indice de conflit
+Un indice de conflit (négation ou antonyme, valeurs numériques ou dates
+différentes) ne suffit jamais à conclure: la paire part au LLM.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from services.checkpoint_store import checkpoint_type
+
+logger = logging.getLogger(__name__)
+
+NEGATIONS: FrozenSet[str] = frozenset({
+    "not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "cannot",
+    "pas", "jamais", "aucun", "aucune", "personne", "rien", "ni", "non", "sans"
+})
+# "ne ... pas" ne compte qu'une fois; "ne" seul ("ne ... plus") compte pour une négation
+FRENCH_NEGATION_PARTICLES: FrozenSet[str] = frozenset({"ne", "n"})
+
+ANTONYMS: Tuple[Tuple[str, str], ...] = (
+    ("true", "false"), ("vrai", "faux"),
+    ("increase", "decrease"), ("increases", "decreases"),
+    ("augmente", "diminue"), ("hausse", "baisse"),
+    ("always", "never"), ("toujours", "jamais"),
+    ("before", "after"), ("avant", "après"),
+    ("allowed", "forbidden"), ("autorisé", "interdit"),
+    ("open", "closed"), ("ouvert", "fermé"),
+    ("enabled", "disabled"), ("activé", "désactivé"),
+    ("alive", "dead"), ("vivant", "mort"),
+    ("possible", "impossible"),
+    ("success", "failure"), ("succès", "échec"),
+    ("accepted", "rejected"), ("accepté", "rejeté"),
+    ("love", "hate"), ("aime", "déteste"),
+    ("like", "dislike"),
+    ("minimum", "maximum"),
+)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_DATE_RE = re.compile(
+    r"\b(\d{4})-(\d{2})-(\d{2})\b"
+    r"|\b(\d{1,2})/(\d{1,2})/(\d{4})\b"
+    r"|\b((?:19|20)\d{2})\b"
+)
+# Valeur suivie d'une unité éventuelle (mot ou symbole)
+_NUMBER_RE = re.compile(r"(?<![\w.,])(\d+(?:[.,]\d+)?)\s*(%|€|\$|[^\W\d_]+)?", re.UNICODE)
+
+
+@checkpoint_type
+@dataclass
+class PrefilterMetrics:
+    """
+    Paires tranchées localement (`embedding`) et envoyées au LLM (`llm`);
+    `lexical` et `numeric` comptent les paires envoyées avec un indice de
+    polarité ou de valeurs.
+    """
+    pairs: int = 0
+    embedding: int = 0
+    lexical: int = 0
+    numeric: int = 0
+    llm: int = 0
+
+
+def _tokens(text: str) -> List[str]:
+    # "isn't" -> "is not"; "n'est" donne le jeton "n"
+    return _WORD_RE.findall(text.lower().replace("n't", " not"))
+
+
+def _negations(tokens: List[str]) -> int:
+    count = sum(token in NEGATIONS for token in tokens)
+    if not count and any(token in FRENCH_NEGATION_PARTICLES for token in tokens):
+        return 1
+    return count
+
+
+def extract_dates(text: str) -> Set[str]:
+    """Dates normalisées (AAAA-MM-JJ, ou AAAA pour une année seule)"""
+    dates = set()
+    for match in _DATE_RE.finditer(text):
+        iso_year, iso_month, iso_day, day, month, year, bare_year = match.groups()
+        if iso_year:
+            dates.add(f"{iso_year}-{iso_month}-{iso_day}")
+        elif year:
+            dates.add(f"{year}-{int(month):02d}-{int(day):02d}")
+        else:
+            dates.add(bare_year)
+    return dates
+
+
+def extract_quantities(text: str) -> Dict[str, Set[float]]:
+    """Valeurs numériques regroupées par unité (dates exclues)"""
+    masked = _DATE_RE.sub(" ", text)
+    quantities: Dict[str, Set[float]] = {}
+    for match in _NUMBER_RE.finditer(masked):
+        value, unit = match.groups()
+        quantities.setdefault((unit or "").lower(), set()).add(float(value.replace(",", ".")))
+    return quantities
+
+
+class ContradictionPrefilter:
+    """
+    Écarte localement les paires (nouveau contenu, contenu existant) qui ne
+    peuvent pas se contredire. `classify` renvoie une analyse au format de
+    l'analyse LLM (plus `resolved_by`), toujours sans contradiction, ou None
+    si la paire doit être analysée par le LLM.
+
+    - similarité < `unrelated_threshold`: sans rapport
+    - similarité >= `agreement_threshold` sans indice de polarité ni de
+      valeurs: concordantes
+    - sinon, et en particulier dès qu'un indice est présent: LLM
+    """
+
+    def __init__(
+        self,
+        unrelated_threshold: float = 0.82,
+        agreement_threshold: float = 0.95
+    ):
+        self.unrelated_threshold = unrelated_threshold
+        self.agreement_threshold = agreement_threshold
+
+    def classify(self, new_content: str, existing_content: str, similarity: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        return self._classify(new_content, existing_content, similarity)[0]
+
+    def classify_pairs(self, new_content: str, knowledge_items: List[Dict[str, Any]]) -> Tuple[List[Optional[Dict[str, Any]]], PrefilterMetrics]:
+        """Analyses locales dans l'ordre des entrées (None = à envoyer au LLM)"""
+        metrics = PrefilterMetrics(pairs=len(knowledge_items))
+        analyses = []
+        for knowledge in knowledge_items:
+            similarity = knowledge.get("similarity")
+            analysis, cues = self._classify(
+                new_content, knowledge["content"],
+                float(similarity) if similarity is not None else None
+            )
+            if analysis is not None:
+                metrics.embedding += 1
+            else:
+                metrics.llm += 1
+                metrics.lexical += "lexical" in cues
+                metrics.numeric += "numeric" in cues
+            analyses.append(analysis)
+
+        logger.debug(
+            f"Pré-filtre: {metrics.pairs} paires, {metrics.embedding} tranchées localement, "
+            f"{metrics.llm} envoyées au LLM ({metrics.lexical} indices lexicaux, "
+            f"{metrics.numeric} indices numériques)"
+        )
+        return analyses, metrics
+
+    def _classify(
+        self,
+        new_content: str,
+        existing_content: str,
+        similarity: Optional[float]
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, str]]:
+        """Analyse locale (ou None) et indices de conflit relevés"""
+        # 1. Sans rapport
+        if similarity is not None and similarity < self.unrelated_threshold:
+            return self._analysis(f"Contenus sans rapport (similarité {similarity:.2f})"), {}
+
+        # 2. Indices de conflit: polarité, puis valeurs numériques et dates
+        cues = {}
+        polarity_cue = self._polarity_cue(_tokens(new_content), _tokens(existing_content))
+        if polarity_cue:
+            cues["lexical"] = polarity_cue
+        value_cue = self._value_conflict(new_content, existing_content)
+        if value_cue:
+            cues["numeric"] = value_cue[1]
+
+        # 3. Concordantes seulement sans aucun indice
+        if not cues and similarity is not None and similarity >= self.agreement_threshold:
+            return self._analysis(f"Contenus concordants (similarité {similarity:.2f})"), cues
+
+        return None, cues
+
+    @staticmethod
+    def _polarity_cue(new_tokens: List[str], existing_tokens: List[str]) -> Optional[str]:
+        if _negations(new_tokens) % 2 != _negations(existing_tokens) % 2:
+            return "négation"
+
+        new_set, existing_set = set(new_tokens), set(existing_tokens)
+        for first, second in ANTONYMS:
+            for a, b in ((first, second), (second, first)):
+                if a in new_set and b in existing_set and a not in existing_set and b not in new_set:
+                    return f"{a} / {b}"
+        return None
+
+    @staticmethod
+    def _value_conflict(new_content: str, existing_content: str) -> Optional[Tuple[str, str]]:
+        new_dates, existing_dates = extract_dates(new_content), extract_dates(existing_content)
+        if new_dates and existing_dates and not new_dates & existing_dates:
+            return "temporal", f"Dates différentes: {sorted(new_dates)} / {sorted(existing_dates)}"
+
+        new_values, existing_values = extract_quantities(new_content), extract_quantities(existing_content)
+        for unit in new_values.keys() & existing_values.keys():
+            # Unité vide: nombres nus comparables seulement s'ils sont seuls
+            if not unit and (len(new_values[unit]) > 1 or len(existing_values[unit]) > 1):
+                continue
+            if not new_values[unit] & existing_values[unit]:
+                label = unit or "valeur"
+                return "factual", (
+                    f"Valeurs différentes ({label}): "
+                    f"{sorted(new_values[unit])} / {sorted(existing_values[unit])}"
+                )
+        return None
+
+    @staticmethod
+    def _analysis(explanation: str) -> Dict[str, Any]:
+        return {
+            "has_contradiction": False,
+            "type": "none",
+            "severity": "low",
+            "explanation": explanation,
+            "confidence": 0.9,
+            "resolved_by": "embedding"
+        }
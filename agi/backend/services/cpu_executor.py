@@ -0,0 +1,205 @@
+"""
+Exécuteur partagé des étapes CPU des agents.
+Les calculs lourds (scan de patterns, regroupement par similarité, paires
+ANN) tournent dans un pool de processus: ni le GIL ni la boucle
+d'événements ne sont bloqués, l'API continue de répondre pendant une
+analyse. Les matrices d'embeddings passent par mémoire partagée au lieu
+d'être sérialisées. Sans processus (workers = 0), repli sur des threads.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class SharedArrayRef:
+    """Référence picklable d'un tableau NumPy en mémoire partagée"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+@dataclass
+class CPUTaskStats:
+    """Compteurs d'un type de tâche"""
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+
+
+def _timed_call(fn: Callable, args: Tuple) -> Tuple[Any, float]:
+    # Exécuté dans le processus worker
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def _call_with_shared_array(fn: Callable, ref: SharedArrayRef, args: Tuple) -> Any:
+    # Exécuté dans le processus worker: vue sans copie sur le segment partagé
+    # fn ne doit pas renvoyer de vue sur ce tableau
+    segment = shared_memory.SharedMemory(name=ref.name)
+    array = np.ndarray(ref.shape, dtype=ref.dtype, buffer=segment.buf)
+    array.flags.writeable = False
+    try:
+        return fn(array, *args)
+    finally:
+        del array
+        segment.close()
+
+
+class CPUExecutor:
+    """
+    Pool de processus partagé par les agents (un par processus API).
+
+    `queue_depth` compte les tâches soumises qui attendent un worker et
+    `utilization` la part de workers occupés; `busy_seconds` cumule le
+    temps de calcul mesuré dans les workers.
+    """
+
+    def __init__(self, workers: int = 2, start_method: str = "spawn"):
+        self.workers = max(0, workers)
+        self.start_method = start_method
+        self.started_at = time.monotonic()
+        self.stats: Dict[str, CPUTaskStats] = {}
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        # Les fins de tâches arrivent sur le thread de gestion du pool
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> "CPUExecutor":
+        return cls(
+            workers=settings.cpu_executor_workers,
+            start_method=settings.cpu_executor_start_method
+        )
+
+    @property
+    def uses_processes(self) -> bool:
+        return self.workers > 0
+
+    def start(self):
+        if self.uses_processes and self._pool is None:
+            # "spawn": pas de fork d'un processus qui a déjà des threads et une boucle asyncio
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method)
+            )
+            logger.info("Pool CPU démarré", workers=self.workers, start_method=self.start_method)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable, *args, kind: str = "task") -> Any:
+        """Exécuter fn(*args) hors de la boucle (fn et args picklables)"""
+        return await self._submit(kind, fn, args)
+
+    async def run_with_array(self, fn: Callable, array, *args, kind: str = "task") -> Any:
+        """
+        Exécuter fn(array, *args), `array` transmis par mémoire partagée.
+        Le tableau reçu par fn est en lecture seule.
+        """
+        matrix = np.ascontiguousarray(array)
+        if not self.uses_processes or matrix.nbytes == 0:
+            return await self._submit(kind, fn, (matrix, *args))
+
+        segment = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+        try:
+            np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=segment.buf)[...] = matrix
+            ref = SharedArrayRef(segment.name, matrix.shape, matrix.dtype.str)
+        except BaseException:
+            segment.close()
+            segment.unlink()
+            raise
+
+        def release(_future: Future):
+            # Libéré quand le worker a fini, même si l'appelant a été annulé
+            segment.close()
+            segment.unlink()
+
+        return await self._submit(kind, _call_with_shared_array, (fn, ref, args), on_done=release)
+
+    async def _submit(
+        self,
+        kind: str,
+        fn: Callable,
+        args: Tuple,
+        on_done: Optional[Callable[[Future], None]] = None
+    ) -> Any:
+        stats = self.stats.setdefault(kind, CPUTaskStats())
+
+        if not self.uses_processes:
+            stats.submitted += 1
+            try:
+                result, duration = await asyncio.to_thread(_timed_call, fn, args)
+            except Exception:
+                stats.failed += 1
+                raise
+            stats.completed += 1
+            stats.busy_seconds += duration
+            return result
+
+        self.start()
+        try:
+            future = self._pool.submit(_timed_call, fn, args)
+        except BrokenProcessPool:
+            # Un worker a été tué (OOM...): nouveau pool pour les tâches suivantes
+            logger.error("Pool CPU cassé, redémarrage")
+            self.shutdown()
+            self.start()
+            future = self._pool.submit(_timed_call, fn, args)
+
+        with self._lock:
+            self._in_flight += 1
+            stats.submitted += 1
+
+        def finish(done: Future):
+            with self._lock:
+                self._in_flight -= 1
+                if done.cancelled() or done.exception() is not None:
+                    stats.failed += 1
+                else:
+                    stats.completed += 1
+                    stats.busy_seconds += done.result()[1]
+            if on_done is not None:
+                on_done(done)
+
+        future.add_done_callback(finish)
+        result, _duration = await asyncio.wrap_future(future)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Profondeur de file, utilisation et compteurs par type de tâche"""
+        with self._lock:
+            in_flight = self._in_flight
+            tasks = {kind: asdict(stats) for kind, stats in self.stats.items()}
+
+        busy_seconds = sum(stats["busy_seconds"] for stats in tasks.values())
+        uptime = time.monotonic() - self.started_at
+        capacity = max(1, self.workers)
+
+        return {
+            "mode": "process" if self.uses_processes else "thread",
+            "workers": self.workers,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.workers) if self.uses_processes else 0,
+            "utilization": min(in_flight, capacity) / capacity if self.uses_processes else None,
+            "average_utilization": busy_seconds / (capacity * uptime) if uptime > 0 else 0.0,
+            "busy_seconds": round(busy_seconds, 3),
+            "tasks": tasks
+        }
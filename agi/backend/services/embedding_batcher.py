@@ -0,0 +1,176 @@
+"""
+Regroupement (micro-batching) des requêtes d'embeddings.
+Collecte les demandes unitaires concurrentes pendant une courte fenêtre
+et les envoie en une seule requête `input` au fournisseur.
+"""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+EmbedFunction = Callable[[List[str], str], Awaitable[List[List[float]]]]
+
+
+@dataclass
+class _PendingEmbedding:
+    """Demande d'embedding en attente de flush."""
+    text: str
+    future: asyncio.Future
+    enqueued_at: float
+
+
+@dataclass
+class EmbeddingBatchMetrics:
+    """Métriques agrégées du batcher (remplissage et temps d'attente)."""
+    requests: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    total_fill_ratio: float = 0.0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    recent_samples: Deque[Tuple[int, float]] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def record(self, batch_size: int, fill_ratio: float, wait_ms: float):
+        """Enregistrer une requête servie dans un lot."""
+        self.requests += 1
+        self.total_fill_ratio += fill_ratio
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.recent_samples.append((batch_size, wait_ms))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Vue sérialisable des métriques."""
+        waits = sorted(sample[1] for sample in self.recent_samples)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))]
+
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "avg_fill_ratio": self.total_fill_ratio / self.requests if self.requests else 0.0,
+            "avg_wait_ms": self.total_wait_ms / self.requests if self.requests else 0.0,
+            "p95_wait_ms": percentile(0.95),
+            "max_wait_ms": self.max_wait_ms
+        }
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce les demandes d'embedding unitaires concurrentes.
+
+    Les demandes sont regroupées par `input_type` (le fournisseur n'accepte
+    qu'un type par requête) et envoyées dès que la fenêtre expire ou que
+    le lot atteint `max_batch_size`. Chaque vecteur est ensuite renvoyé à
+    la coroutine qui l'attend.
+    """
+
+    def __init__(
+        self,
+        embed_fn: EmbedFunction,
+        max_batch_size: int = 64,
+        flush_window_ms: int = 5
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size doit être >= 1")
+
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.flush_window = max(0, flush_window_ms) / 1000.0
+        self.metrics = EmbeddingBatchMetrics()
+
+        self._pending: Dict[str, List[_PendingEmbedding]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._inflight: set = set()
+
+    async def embed(self, text: str, input_type: str = "document") -> List[float]:
+        """Demander l'embedding d'un texte; attend le flush du lot."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        queue = self._pending.setdefault(input_type, [])
+        queue.append(_PendingEmbedding(text=text, future=future, enqueued_at=loop.time()))
+
+        if len(queue) >= self.max_batch_size:
+            self._flush(input_type)
+        elif input_type not in self._timers:
+            self._timers[input_type] = loop.call_later(self.flush_window, self._flush, input_type)
+
+        return await future
+
+    def _flush(self, input_type: str):
+        """Détacher le lot courant et lancer son envoi."""
+        timer = self._timers.pop(input_type, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(input_type, [])
+        # Ignorer les appelants déjà annulés
+        batch = [pending for pending in batch if not pending.future.done()]
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run_batch(input_type, batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run_batch(self, input_type: str, batch: List[_PendingEmbedding]):
+        """Envoyer un lot au fournisseur et redistribuer les vecteurs."""
+        loop = asyncio.get_running_loop()
+        flushed_at = loop.time()
+        batch_size = len(batch)
+        fill_ratio = batch_size / self.max_batch_size
+
+        self.metrics.batches += 1
+
+        try:
+            embeddings = await self.embed_fn([pending.text for pending in batch], input_type)
+            if len(embeddings) != batch_size:
+                raise ValueError(
+                    f"Nombre d'embeddings inattendu: {len(embeddings)} pour {batch_size} textes"
+                )
+        except Exception as e:
+            self.metrics.failed_batches += 1
+            logger.error("Échec du lot d'embeddings", batch_size=batch_size, error=str(e))
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        for pending, embedding in zip(batch, embeddings):
+            wait_ms = (flushed_at - pending.enqueued_at) * 1000
+            self.metrics.record(batch_size, fill_ratio, wait_ms)
+            if not pending.future.done():
+                pending.future.set_result(embedding)
+
+        logger.debug(
+            "Lot d'embeddings envoyé",
+            input_type=input_type,
+            batch_size=batch_size,
+            fill_ratio=round(fill_ratio, 3)
+        )
+
+    async def close(self):
+        """Vider les lots en attente et attendre les envois en cours."""
+        for input_type in list(self._pending):
+            self._flush(input_type)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Métriques de remplissage et d'attente des lots."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "flush_window_ms": self.flush_window * 1000,
+            "pending": sum(len(queue) for queue in self._pending.values()),
+            **self.metrics.snapshot()
+        }
@@ -0,0 +1,176 @@
+"""
+Cache d'embeddings adressé par contenu.
+L1 en mémoire (LRU borné) devant un L2 Redis partagé entre workers.
+Les vecteurs sont stockés en binaire float32 compact.
+"""
+
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass
+class EmbeddingCacheStats:
+    """Compteurs de hits/miss du cache."""
+    l1_hits: int = 0
+    l2_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    l1_evictions: int = 0
+    l2_errors: int = 0
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    """Encoder un vecteur en float32 little-endian."""
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+def decode_vector(payload: bytes) -> List[float]:
+    """Décoder un vecteur float32 little-endian."""
+    return np.frombuffer(payload, dtype="<f4").tolist()
+
+
+class EmbeddingCache:
+    """
+    Cache d'embeddings à deux niveaux.
+
+    La clé est un hash de (modèle, input_type, texte normalisé), de sorte
+    qu'un même texte n'est encodé qu'une fois par modèle et type d'entrée.
+    Le L1 est un LRU borné avec TTL; le L2 utilise le client Redis ouvert
+    par `DatabaseManager` avec expiration (SETEX).
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        max_entries: int = 10000,
+        l1_ttl_seconds: int = 3600,
+        ttl_seconds: int = 604800,
+        key_prefix: str = "emb:v1:"
+    ):
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.l1_ttl_seconds = l1_ttl_seconds
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.stats = EmbeddingCacheStats()
+
+        self._l1: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normaliser le texte (Unicode NFC, espaces compactés)."""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def make_key(self, model: str, input_type: str, text: str) -> str:
+        """Clé adressée par contenu."""
+        digest = hashlib.sha256(
+            f"{model}\x1f{input_type}\x1f{self.normalize_text(text)}".encode("utf-8")
+        ).hexdigest()
+        return f"{self.key_prefix}{digest}"
+
+    async def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Récupérer des vecteurs (None pour les absents)."""
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        l2_lookup: List[int] = []
+
+        for index, key in enumerate(keys):
+            payload = self._l1_get(key)
+            if payload is not None:
+                self.stats.l1_hits += 1
+                results[index] = decode_vector(payload)
+            else:
+                l2_lookup.append(index)
+
+        if l2_lookup and self.redis is not None:
+            try:
+                payloads = await self.redis.mget([keys[index] for index in l2_lookup])
+            except Exception as e:
+                self.stats.l2_errors += 1
+                logger.warning("Lecture du cache Redis échouée", error=str(e))
+                payloads = [None] * len(l2_lookup)
+
+            for index, payload in zip(l2_lookup, payloads):
+                if payload is not None:
+                    self.stats.l2_hits += 1
+                    self._l1_set(keys[index], payload)
+                    results[index] = decode_vector(payload)
+
+        self.stats.misses += sum(1 for result in results if result is None)
+        return results
+
+    async def get(self, key: str) -> Optional[List[float]]:
+        """Récupérer un vecteur."""
+        return (await self.get_many([key]))[0]
+
+    async def set_many(self, items: Dict[str, Sequence[float]]):
+        """Stocker des vecteurs dans les deux niveaux."""
+        if not items:
+            return
+
+        encoded = {key: encode_vector(vector) for key, vector in items.items()}
+        for key, payload in encoded.items():
+            self._l1_set(key, payload)
+        self.stats.writes += len(encoded)
+
+        if self.redis is None:
+            return
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, payload in encoded.items():
+                    pipe.setex(key, self.ttl_seconds, payload)
+                await pipe.execute()
+        except Exception as e:
+            self.stats.l2_errors += 1
+            logger.warning("Écriture du cache Redis échouée", error=str(e))
+
+    async def set(self, key: str, vector: Sequence[float]):
+        """Stocker un vecteur."""
+        await self.set_many({key: vector})
+
+    def _l1_get(self, key: str) -> Optional[bytes]:
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            del self._l1[key]
+            return None
+
+        self._l1.move_to_end(key)
+        return payload
+
+    def _l1_set(self, key: str, payload: bytes):
+        self._l1[key] = (time.monotonic() + self.l1_ttl_seconds, payload)
+        self._l1.move_to_end(key)
+
+        while len(self._l1) > self.max_entries:
+            self._l1.popitem(last=False)
+            self.stats.l1_evictions += 1
+
+    def clear_local(self):
+        """Vider le niveau L1."""
+        self._l1.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compteurs et taux de hit."""
+        lookups = self.stats.l1_hits + self.stats.l2_hits + self.stats.misses
+        hits = self.stats.l1_hits + self.stats.l2_hits
+
+        return {
+            **asdict(self.stats),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "l1_entries": len(self._l1),
+            "l1_max_entries": self.max_entries,
+            "l2_enabled": self.redis is not None
+        }
@@ -5,16 +5,27 @@ Intègre Voyage AI pour les embeddings et Cohere pour le reranking
 
 import asyncio
 import logging
-from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime
+from typing import Awaitable, List, Optional, Dict, Any, Tuple
 from uuid import UUID
 import numpy as np
 
+from config.settings import get_settings
 from services.external_services import ExternalServicesManager
 from services.memory_service import MemoryService
 from services.graph_service import GraphService
 
 logger = logging.getLogger(__name__)
 
+SEARCH_MODES = ("vector", "hybrid")
+
+# Score brut rapporté par chaque source de classement
+SOURCE_SCORE_KEYS = {
+    "vector": "similarity",
+    "lexical": "lexical_score",
+    "concept": "importance"
+}
+
 class EmbeddingService:
     """Service de gestion des embeddings et recherche sémantique avancée"""
     
@@ -24,6 +35,7 @@ class EmbeddingService:
         memory_service: MemoryService,
         graph_service: GraphService
     ):
+        self.settings = get_settings()
         self.external_services = external_services
         self.memory_service = memory_service
         self.graph_service = graph_service
@@ -39,6 +51,46 @@ class EmbeddingService:
             logger.error(f"Erreur lors de l'initialisation d'EmbeddingService: {e}")
             raise
     
+    async def get_embedding(self, text: str, input_type: str = "document") -> List[float]:
+        """Embedding d'un texte (cache + regroupement des appels concurrents)"""
+        return await self.external_services.voyage.create_single_embedding(text, input_type)
+    
+    async def get_embeddings(
+        self,
+        texts: List[str],
+        input_type: str = "document"
+    ) -> List[List[float]]:
+        """Embeddings d'une liste de textes; seuls les textes non cachés sont envoyés"""
+        if not texts:
+            return []
+        return await self.external_services.voyage.create_embeddings(texts, input_type)
+    
+    async def get_item_embeddings(
+        self,
+        items: List[Dict[str, Any]],
+        text_key: str = "content"
+    ) -> List[List[float]]:
+        """Embeddings d'éléments, en réutilisant `embedding` quand il est déjà stocké"""
+        embeddings = [item.get("embedding") for item in items]
+        missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+        
+        if missing:
+            fetched = await self.get_embeddings([items[index][text_key] for index in missing])
+            for index, embedding in zip(missing, fetched):
+                embeddings[index] = embedding
+        
+        return embeddings
+    
+    @staticmethod
+    def cosine_similarity(embedding1: List[float], embedding2: List[float]) -> float:
+        """Similarité cosinus entre deux vecteurs"""
+        vector1 = np.asarray(embedding1, dtype=np.float32)
+        vector2 = np.asarray(embedding2, dtype=np.float32)
+        norm = np.linalg.norm(vector1) * np.linalg.norm(vector2)
+        if norm == 0:
+            return 0.0
+        return float(np.dot(vector1, vector2) / norm)
+    
     async def semantic_search(
         self,
         user_id: UUID,
@@ -47,54 +99,152 @@ class EmbeddingService:
         search_concepts: bool = True,
         limit: int = 10,
         similarity_threshold: float = 0.7,
-        use_reranking: bool = True
+        use_reranking: bool = False,
+        mode: str = "vector"
     ) -> Dict[str, Any]:
-        """Recherche sémantique hybride dans mémoires et concepts"""
+        """
+        Recherche sémantique dans mémoires et concepts.
+        
+        En mode "hybrid", la recherche plein texte (termes exacts: identifiants,
+        noms, codes d'erreur) tourne en parallèle de la recherche pgvector et
+        les classements sont fusionnés localement par RRF. Le reranking Cohere
+        est facultatif et limité par le budget `search_rerank`; chaque
+        résultat expose ses scores par source.
+        
+        La requête est embarquée une seule fois, avant le lancement des
+        branches: le délai de la branche vectorielle ne couvre que Postgres.
+        Une branche qui dépasse son délai est abandonnée: le résultat est
+        renvoyé sans elle, avec `partial` et la liste `timed_out`.
+        """
+        
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Mode de recherche inconnu: {mode}")
         
         try:
             results = {
                 "query": query,
+                "mode": mode,
                 "memories": [],
                 "concepts": [],
-                "combined_results": []
+                "combined_results": [],
+                "reranked": False,
+                "timed_out": [],
+                "partial": False
             }
             
-            # Recherche dans les mémoires
+            hybrid = mode == "hybrid"
+            candidate_limit = limit * self.settings.search_candidate_multiplier if hybrid else limit
+            postgres_timeout = self.settings.search_postgres_timeout
+            
+            # Embedding calculé avant le fan-out: le délai Postgres ne couvre que la base
+            query_embedding = await self.get_embedding(query, input_type="query") if search_memories else None
+            
+            # Les sources sont interrogées en parallèle, chacune sous son propre délai
+            branches = {}
             if search_memories:
-                memories = await self.memory_service.search_memories(
-                    user_id=user_id,
-                    query=query,
-                    limit=limit,
-                    similarity_threshold=similarity_threshold
+                branches["vector"] = (
+                    self.memory_service.search_memories_by_embedding(
+                        user_id,
+                        query_embedding,
+                        limit=candidate_limit,
+                        similarity_threshold=similarity_threshold
+                    ),
+                    postgres_timeout
                 )
-                results["memories"] = memories
-            
-            # Recherche dans les concepts
+                if hybrid:
+                    branches["lexical"] = (
+                        self.memory_service.search_memories_lexical(
+                            user_id=user_id,
+                            query=query,
+                            limit=candidate_limit
+                        ),
+                        postgres_timeout
+                    )
             if search_concepts:
-                concepts = await self.graph_service.find_similar_concepts(
-                    user_id=user_id,
-                    query=query,
-                    limit=limit
-                )
-                results["concepts"] = concepts
-            
-            # Combiner et reranker les résultats si demandé
-            if use_reranking and (results["memories"] or results["concepts"]):
-                combined_results = await self._combine_and_rerank_results(
-                    query=query,
-                    memories=results["memories"],
-                    concepts=results["concepts"],
-                    limit=limit
+                branches["concept"] = (
+                    self.graph_service.find_similar_concepts(
+                        user_id=user_id,
+                        query=query,
+                        limit=limit
+                    ),
+                    self.settings.search_graph_timeout
                 )
-                results["combined_results"] = combined_results
             
-            logger.info(f"Recherche sémantique terminée: {len(results['memories'])} mémoires, {len(results['concepts'])} concepts")
+            rankings, timed_out, errors = await self._gather_branches(branches)
+            for source, error in errors.items():
+                # Le plein texte est un complément: son échec dégrade en mode vectoriel
+                if source != "lexical":
+                    raise error
+                logger.warning(f"Recherche plein texte indisponible: {error}")
+            for source in branches:
+                rankings.setdefault(source, [])
+            results["timed_out"] = timed_out
+            results["partial"] = bool(timed_out)
+            
+            fused = self.reciprocal_rank_fusion(rankings, k=self.settings.search_rrf_k)
+            
+            results["memories"] = [
+                {**entry["data"], "scores": entry["scores"]}
+                for entry in fused if entry["type"] == "memory"
+            ][:limit]
+            results["concepts"] = rankings.get("concept", [])
+            
+            combined_results = fused
+            if use_reranking and fused:
+                reranked, skipped = await self._rerank_if_budget(query, fused, limit)
+                if reranked is not None:
+                    combined_results = reranked
+                    results["reranked"] = True
+                else:
+                    results["rerank_skipped"] = skipped
+            
+            results["combined_results"] = combined_results[:limit]
+            
+            logger.info(
+                f"Recherche {mode} terminée: {len(results['memories'])} mémoires, "
+                f"{len(results['concepts'])} concepts"
+            )
             return results
             
         except Exception as e:
             logger.error(f"Erreur lors de la recherche sémantique: {e}")
             raise
     
+    @staticmethod
+    def reciprocal_rank_fusion(
+        rankings: Dict[str, List[Dict[str, Any]]],
+        k: int = 60
+    ) -> List[Dict[str, Any]]:
+        """
+        Fusion de classements par Reciprocal Rank Fusion: score = somme de 1 / (k + rang).
+        
+        Les sources "vector" et "lexical" classent des mémoires (fusionnées par
+        id), "concept" des concepts. Les scores bruts de chaque source sont
+        conservés dans `scores`.
+        """
+        fused: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        
+        for source, items in rankings.items():
+            item_type = "concept" if source == "concept" else "memory"
+            for rank, item in enumerate(items, start=1):
+                entry = fused.get((item_type, item["id"]))
+                if entry is None:
+                    entry = fused[(item_type, item["id"])] = {
+                        "type": item_type,
+                        "data": item,
+                        "scores": {},
+                        "ranks": {},
+                        "combined_score": 0.0
+                    }
+                entry["scores"][source] = item.get(SOURCE_SCORE_KEYS[source])
+                entry["ranks"][source] = rank
+                entry["combined_score"] += 1.0 / (k + rank)
+        
+        ordered = sorted(fused.values(), key=lambda entry: entry["combined_score"], reverse=True)
+        for entry in ordered:
+            entry["scores"]["rrf"] = entry["combined_score"]
+        return ordered
+    
     async def find_related_content(
         self,
         user_id: UUID,
@@ -102,65 +252,159 @@ class EmbeddingService:
         context_window: int = 5,
         include_graph_neighbors: bool = True
     ) -> Dict[str, Any]:
-        """Trouve du contenu lié basé sur les embeddings et le graphe"""
+        """
+        Trouve du contenu lié basé sur les embeddings et le graphe.
+        
+        Le contenu est embarqué une seule fois; la recherche pgvector et la
+        recherche de concepts Neo4j tournent en parallèle, puis les concepts
+        des mémoires trouvées et leurs voisins sont chargés en deux requêtes
+        groupées. Une branche hors délai donne un résultat partiel.
+        """
         
         try:
-            # Générer l'embedding du contenu
-            content_embedding = await self.external_services.voyage_ai.get_embedding(content)
-            
-            # Rechercher des mémoires similaires
-            similar_memories = await self.memory_service.search_memories(
-                user_id=user_id,
-                query=content,
-                limit=context_window
-            )
-            
             related_content = {
                 "source_content": content,
-                "similar_memories": similar_memories,
+                "similar_memories": [],
                 "related_concepts": [],
-                "graph_neighbors": []
+                "graph_neighbors": [],
+                "timed_out": [],
+                "partial": False
             }
-            
-            # Extraire les concepts du contenu et trouver des relations
-            if include_graph_neighbors and similar_memories:
-                # Utiliser les concepts des mémoires similaires pour explorer le graphe
-                for memory in similar_memories[:3]:  # Limiter à 3 mémoires
-                    # Rechercher des concepts liés dans le graphe
-                    concepts = await self.graph_service.find_similar_concepts(
+            graph_timeout = self.settings.search_graph_timeout
+            
+            # Un seul embedding, réutilisé par la recherche vectorielle
+            content_embedding = await self.get_embedding(content, input_type="query")
+            
+            branches = {
+                "memories": (
+                    self.memory_service.search_memories_by_embedding(
+                        user_id,
+                        content_embedding,
+                        limit=context_window
+                    ),
+                    self.settings.search_postgres_timeout
+                )
+            }
+            if include_graph_neighbors:
+                branches["concepts"] = (
+                    self.graph_service.find_similar_concepts(
                         user_id=user_id,
-                        query=memory["content"][:100],  # Utiliser les premiers 100 caractères
+                        query=content[:100],
                         limit=5
+                    ),
+                    graph_timeout
+                )
+            
+            found, timed_out, errors = await self._gather_branches(branches)
+            for error in errors.values():
+                raise error
+            
+            similar_memories = found.get("memories", [])
+            related_content["similar_memories"] = similar_memories
+            related_content["related_concepts"] = found.get("concepts", [])
+            
+            if include_graph_neighbors and "concepts" not in timed_out:
+                neighbors, graph_timed_out, graph_errors = await self._gather_branches({
+                    "graph_neighbors": (
+                        self._collect_graph_neighbors(
+                            user_id,
+                            similar_memories[:3],  # Limiter à 3 mémoires
+                            related_content["related_concepts"]
+                        ),
+                        graph_timeout
                     )
-                    
-                    for concept in concepts:
-                        # Trouver les voisins de ce concept
-                        neighbors = await self.graph_service.get_concept_neighbors(
-                            concept_id=concept["id"],
-                            max_depth=2,
-                            min_strength=0.3
-                        )
-                        
-                        related_content["graph_neighbors"].extend(neighbors)
-            
-            # Déduplication des voisins du graphe
-            seen_ids = set()
-            unique_neighbors = []
-            for neighbor in related_content["graph_neighbors"]:
-                concept_id = neighbor["concept"]["id"]
-                if concept_id not in seen_ids:
-                    seen_ids.add(concept_id)
-                    unique_neighbors.append(neighbor)
+                })
+                for error in graph_errors.values():
+                    raise error
+                timed_out.extend(graph_timed_out)
+                related_content["graph_neighbors"] = neighbors.get("graph_neighbors", [])[:10]  # Limiter à 10
             
-            related_content["graph_neighbors"] = unique_neighbors[:10]  # Limiter à 10
+            related_content["timed_out"] = timed_out
+            related_content["partial"] = bool(timed_out)
             
-            logger.info(f"Trouvé du contenu lié: {len(similar_memories)} mémoires, {len(unique_neighbors)} voisins")
+            logger.info(
+                f"Trouvé du contenu lié: {len(similar_memories)} mémoires, "
+                f"{len(related_content['graph_neighbors'])} voisins"
+            )
             return related_content
             
         except Exception as e:
             logger.error(f"Erreur lors de la recherche de contenu lié: {e}")
             raise
     
+    async def _collect_graph_neighbors(
+        self,
+        user_id: UUID,
+        memories: List[Dict[str, Any]],
+        concepts: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Concepts des mémoires puis leurs voisins, en une requête groupée chacun"""
+        
+        concept_ids = [concept["id"] for concept in concepts]
+        if memories:
+            memory_concepts = await self.graph_service.find_similar_concepts_batch(
+                user_id=user_id,
+                queries=[memory["content"][:100] for memory in memories],  # Utiliser les premiers 100 caractères
+                limit=5
+            )
+            concept_ids.extend(
+                concept["id"] for batch in memory_concepts for concept in batch
+            )
+        
+        concept_ids = list(dict.fromkeys(concept_ids))
+        if not concept_ids:
+            return []
+        
+        neighbors_by_concept = await self.graph_service.get_concepts_neighbors_batch(
+            concept_ids,
+            max_depth=2,
+            min_strength=0.3,
+            user_id=user_id
+        )
+        
+        # Déduplication des voisins du graphe
+        seen_ids = set()
+        unique_neighbors = []
+        for concept_id in concept_ids:
+            for neighbor in neighbors_by_concept.get(concept_id, []):
+                neighbor_id = neighbor["concept"]["id"]
+                if neighbor_id not in seen_ids:
+                    seen_ids.add(neighbor_id)
+                    unique_neighbors.append(neighbor)
+        
+        return unique_neighbors
+    
+    async def _gather_branches(
+        self,
+        branches: Dict[str, Tuple[Awaitable[Any], float]]
+    ) -> Tuple[Dict[str, Any], List[str], Dict[str, Exception]]:
+        """
+        Exécute des branches de recherche en parallèle, chacune sous son délai.
+        
+        Renvoie les résultats obtenus, les branches hors délai (annulées) et
+        les erreurs par branche.
+        """
+        names = list(branches)
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(awaitable, timeout) for awaitable, timeout in branches.values()),
+            return_exceptions=True
+        )
+        
+        results: Dict[str, Any] = {}
+        timed_out: List[str] = []
+        errors: Dict[str, Exception] = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                timed_out.append(name)
+            elif isinstance(outcome, Exception):
+                errors[name] = outcome
+            else:
+                results[name] = outcome
+        
+        if timed_out:
+            logger.warning(f"Branches de recherche hors délai, résultat partiel: {timed_out}")
+        return results, timed_out, errors
+    
     async def extract_and_link_concepts(
         self,
         user_id: UUID,
@@ -189,7 +433,8 @@ class EmbeddingService:
             # Générer la réponse avec Claude
             response = await self.external_services.anthropic.generate_completion(
                 messages=[{"role": "user", "content": extraction_prompt}],
-                max_tokens=1000
+                max_tokens=1000,
+                agent="concept_extraction"
             )
             
             # Parser la réponse JSON (simplifiée pour cet exemple)
@@ -246,16 +491,10 @@ class EmbeddingService:
         """Calcule la similarité entre deux contenus"""
         
         try:
-            # Générer les embeddings
-            embedding1 = await self.external_services.voyage_ai.get_embedding(content1)
-            embedding2 = await self.external_services.voyage_ai.get_embedding(content2)
-            
-            # Calculer la similarité cosinus
-            similarity = np.dot(embedding1, embedding2) / (
-                np.linalg.norm(embedding1) * np.linalg.norm(embedding2)
-            )
+            # Générer les embeddings en un seul appel (contenus déjà vus servis par le cache)
+            embedding1, embedding2 = await self.get_embeddings([content1, content2])
             
-            return float(similarity)
+            return self.cosine_similarity(embedding1, embedding2)
             
         except Exception as e:
             logger.error(f"Erreur lors du calcul de similarité: {e}")
@@ -279,7 +518,8 @@ class EmbeddingService:
             
             summary = await self.external_services.anthropic.generate_completion(
                 messages=[{"role": "user", "content": summary_prompt}],
-                max_tokens=100
+                max_tokens=100,
+                agent="memory_summary"
             )
             
             # Nettoyer et limiter la longueur
@@ -293,92 +533,47 @@ class EmbeddingService:
             logger.error(f"Erreur lors de la génération de résumé: {e}")
             return content[:max_length-3] + "..." if len(content) > max_length else content
     
-    async def _combine_and_rerank_results(
+    async def _rerank_if_budget(
         self,
         query: str,
-        memories: List[Dict[str, Any]],
-        concepts: List[Dict[str, Any]],
-        limit: int = 10
-    ) -> List[Dict[str, Any]]:
-        """Combine et reranke les résultats de mémoires et concepts"""
+        fused: List[Dict[str, Any]],
+        limit: int
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """Reranker avec Cohere si le budget le permet; sinon garder l'ordre RRF"""
+        
+        if not await self.external_services.rate_limiter.try_acquire("search_rerank"):
+            return None, "budget"
+        
+        texts = []
+        for entry in fused:
+            data = entry["data"]
+            if entry["type"] == "memory":
+                texts.append(data["content"])
+            else:
+                texts.append(f"{data['name']}: {data.get('description', '')}")
         
         try:
-            # Préparer les documents pour le reranking
-            documents = []
-            
-            # Ajouter les mémoires
-            for memory in memories:
-                documents.append({
-                    "text": memory["content"],
-                    "type": "memory",
-                    "data": memory,
-                    "original_score": memory.get("similarity", 0.0)
-                })
-            
-            # Ajouter les concepts
-            for concept in concepts:
-                concept_text = f"{concept['name']}: {concept.get('description', '')}"
-                documents.append({
-                    "text": concept_text,
-                    "type": "concept", 
-                    "data": concept,
-                    "original_score": concept.get("importance", 0.0)
-                })
-            
-            if not documents:
-                return []
-            
-            # Utiliser Cohere pour le reranking
-            texts = [doc["text"] for doc in documents]
             reranked_results = await self.external_services.cohere.rerank_documents(
                 query=query,
                 documents=texts,
-                top_k=min(limit, len(documents))
+                top_k=min(limit, len(texts)),
+                return_documents=False
             )
-            
-            # Combiner les résultats rerankés avec les données originales
-            combined_results = []
-            for result in reranked_results:
-                original_doc = documents[result["index"]]
-                combined_results.append({
-                    "type": original_doc["type"],
-                    "data": original_doc["data"],
-                    "original_score": original_doc["original_score"],
-                    "rerank_score": result["relevance_score"],
-                    "combined_score": (original_doc["original_score"] + result["relevance_score"]) / 2
-                })
-            
-            # Trier par score combiné
-            combined_results.sort(key=lambda x: x["combined_score"], reverse=True)
-            
-            logger.info(f"Reranking terminé: {len(combined_results)} résultats combinés")
-            return combined_results
-            
         except Exception as e:
             logger.error(f"Erreur lors du reranking: {e}")
-            # Fallback: retourner les résultats originaux sans reranking
-            fallback_results = []
-            
-            for memory in memories:
-                fallback_results.append({
-                    "type": "memory",
-                    "data": memory,
-                    "original_score": memory.get("similarity", 0.0),
-                    "rerank_score": 0.0,
-                    "combined_score": memory.get("similarity", 0.0)
-                })
-            
-            for concept in concepts:
-                fallback_results.append({
-                    "type": "concept",
-                    "data": concept,
-                    "original_score": concept.get("importance", 0.0),
-                    "rerank_score": 0.0,
-                    "combined_score": concept.get("importance", 0.0)
-                })
-            
-            fallback_results.sort(key=lambda x: x["combined_score"], reverse=True)
-            return fallback_results[:limit]
+            return None, "error"
+        
+        reranked = []
+        for result in reranked_results:
+            entry = fused[result["index"]]
+            reranked.append({
+                **entry,
+                "scores": {**entry["scores"], "rerank": result["relevance_score"]},
+                "combined_score": result["relevance_score"]
+            })
+        
+        logger.info(f"Reranking terminé: {len(reranked)} résultats combinés")
+        return reranked, None
     
     async def health_check(self) -> Dict[str, Any]:
         """Vérifie la santé du service d'embeddings"""
@@ -388,7 +583,7 @@ class EmbeddingService:
             external_health = await self.external_services.health_check()
             
             # Test simple d'embedding
-            test_embedding = await self.external_services.voyage_ai.get_embedding("test")
+            test_embedding = await self.get_embedding("test")
             
             if test_embedding and len(test_embedding) > 0:
                 return {
@@ -7,26 +7,141 @@ import asyncio
 from typing import List, Dict, Any, Optional
 import httpx
 import structlog
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
 from config.settings import get_settings
+from services.embedding_batcher import EmbeddingBatcher
+from services.completion_cache import CompletionCache
+from services.embedding_cache import EmbeddingCache
+from services.rate_limiter import (
+    ProviderRateLimiter,
+    estimate_tokens,
+    is_retryable_error,
+    wait_retry_after
+)
+
+try:
+    import h2  # noqa: F401 - requis par httpx pour HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 logger = structlog.get_logger(__name__)
 settings = get_settings()
 
+# Budget commun à tous les services (et aux agents LangChain)
+rate_limiter = ProviderRateLimiter.from_settings(settings)
+
+
+def provider_retry():
+    """Politique de retry: erreurs transitoires uniquement, Retry-After respecté."""
+    return retry(
+        retry=retry_if_exception(is_retryable_error),
+        stop=stop_after_attempt(settings.provider_max_retries),
+        wait=wait_retry_after(
+            wait_exponential(multiplier=0.5, min=0.5, max=10),
+            max_wait=settings.provider_max_retry_after
+        ),
+        reraise=True
+    )
+
+
+def build_http_client(timeout: float) -> httpx.AsyncClient:
+    """
+    Créer un client HTTP longue durée avec pool de connexions keep-alive.
+    
+    Un client est dédié à chaque fournisseur: `max_connections` borne donc
+    le nombre de connexions vers un même hôte.
+    """
+    use_http2 = settings.http2_enabled and HTTP2_AVAILABLE
+    if settings.http2_enabled and not HTTP2_AVAILABLE:
+        logger.warning("Paquet h2 absent, repli sur HTTP/1.1")
+        
+    return httpx.AsyncClient(
+        http2=use_http2,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections_per_host,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry
+        ),
+        timeout=httpx.Timeout(timeout, connect=settings.http_connect_timeout)
+    )
+
 
-class VoyageAIService:
+class PooledHTTPService:
+    """Base des services HTTP partageant un client persistant et un budget de débit."""
+    
+    provider: str = ""
+    request_timeout: float = 30.0
+    
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        limiter: Optional[ProviderRateLimiter] = None
+    ):
+        self.client = client
+        self.limiter = limiter or rate_limiter
+        
+    def _get_client(self) -> httpx.AsyncClient:
+        """Client du fournisseur, recréé s'il a été fermé."""
+        if self.client is None or self.client.is_closed:
+            self.client = build_http_client(self.request_timeout)
+        return self.client
+        
+    async def _post(self, url: str, tokens: int = 0, **kwargs) -> httpx.Response:
+        """
+        POST sous le budget du fournisseur.
+        
+        Un 429 place le fournisseur en pause pour tous les workers avant que
+        l'erreur ne remonte à la politique de retry.
+        """
+        async with self.limiter.limit(self.provider, tokens):
+            response = await self._get_client().post(url, **kwargs)
+            
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            await self.limiter.record_response_error(self.provider, e)
+            raise
+        return response
+        
+    async def aclose(self):
+        """Fermer les connexions du pool."""
+        if self.client is not None and not self.client.is_closed:
+            await self.client.aclose()
+
+
+class VoyageAIService(PooledHTTPService):
     """Service pour l'intégration avec Voyage AI (embeddings)."""
     
-    def __init__(self):
+    provider = "voyage"
+    
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        limiter: Optional[ProviderRateLimiter] = None
+    ):
+        super().__init__(client, limiter)
         self.api_key = settings.voyage_api_key
         self.base_url = "https://api.voyageai.com/v1"
         self.model = "voyage-large-2"
+        self.batcher: Optional[EmbeddingBatcher] = None
+        self.cache: Optional[EmbeddingCache] = None
+        
+        if settings.embedding_batching_enabled:
+            self.batcher = EmbeddingBatcher(
+                self._request_embeddings,
+                max_batch_size=settings.embedding_batch_max_size,
+                flush_window_ms=settings.embedding_batch_window_ms
+            )
+            
+        if settings.embedding_cache_enabled:
+            self.cache = EmbeddingCache(
+                max_entries=settings.embedding_cache_l1_max_entries,
+                l1_ttl_seconds=settings.embedding_cache_l1_ttl,
+                ttl_seconds=settings.embedding_cache_ttl
+            )
         
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
     async def create_embeddings(
         self, 
         texts: List[str], 
@@ -35,6 +150,8 @@ class VoyageAIService:
         """
         Créer des embeddings pour une liste de textes.
         
+        Seuls les textes absents du cache sont envoyés à Voyage AI.
+        
         Args:
             texts: Liste des textes à encoder
             input_type: Type d'input ("document" ou "query")
@@ -42,63 +159,151 @@ class VoyageAIService:
         Returns:
             Liste des vecteurs d'embeddings
         """
+        if self.cache is None:
+            return await self._request_embeddings_batched(texts, input_type)
+            
+        keys = [self.cache.make_key(self.model, input_type, text) for text in texts]
+        embeddings = await self.cache.get_many(keys)
+        
+        missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            # Dédupliquer les textes identiques au sein de la requête
+            unique_keys = list(dict.fromkeys(keys[index] for index in missing))
+            texts_by_key = {keys[index]: texts[index] for index in missing}
+            
+            fetched = await self._request_embeddings_batched(
+                [texts_by_key[key] for key in unique_keys], input_type
+            )
+            fetched_by_key = dict(zip(unique_keys, fetched))
+            await self.cache.set_many(fetched_by_key)
+            
+            for index in missing:
+                embeddings[index] = fetched_by_key[keys[index]]
+                
+        return embeddings
+        
+    async def _request_embeddings_batched(
+        self,
+        texts: List[str],
+        input_type: str = "document"
+    ) -> List[List[float]]:
+        """Découper en requêtes de la taille acceptée par Voyage AI, envoyées en parallèle."""
+        batches: List[List[str]] = [[]]
+        batch_tokens = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if batches[-1] and (
+                len(batches[-1]) >= settings.embedding_request_max_batch
+                or batch_tokens + tokens > settings.embedding_request_max_tokens
+            ):
+                batches.append([])
+                batch_tokens = 0
+            batches[-1].append(text)
+            batch_tokens += tokens
+            
+        if len(batches) == 1:
+            return await self._request_embeddings(texts, input_type)
+            
+        # Le limiteur borne le nombre de requêtes simultanées
+        results = await asyncio.gather(*[
+            self._request_embeddings(batch, input_type) for batch in batches
+        ])
+        return [embedding for batch in results for embedding in batch]
+        
+    @provider_retry()
+    async def _request_embeddings(
+        self, 
+        texts: List[str], 
+        input_type: str = "document"
+    ) -> List[List[float]]:
+        """Appeler l'API Voyage AI (sans cache)."""
         if not self.api_key:
             raise ValueError("VOYAGE_API_KEY non configurée")
             
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/embeddings",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "input": texts,
-                        "model": self.model,
-                        "input_type": input_type
-                    },
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                embeddings = [item["embedding"] for item in data["data"]]
-                
-                logger.info(
-                    "Embeddings créés avec succès",
-                    count=len(embeddings),
-                    model=self.model
-                )
-                
-                return embeddings
-                
-            except httpx.HTTPError as e:
-                logger.error("Erreur lors de la création des embeddings", error=str(e))
-                raise
-                
+        try:
+            response = await self._post(
+                f"{self.base_url}/embeddings",
+                tokens=sum(estimate_tokens(text) for text in texts),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "input": texts,
+                    "model": self.model,
+                    "input_type": input_type
+                }
+            )
+            
+            data = response.json()
+            embeddings = [item["embedding"] for item in data["data"]]
+            
+            logger.info(
+                "Embeddings créés avec succès",
+                count=len(embeddings),
+                model=self.model
+            )
+            
+            return embeddings
+            
+        except httpx.HTTPError as e:
+            logger.error("Erreur lors de la création des embeddings", error=str(e))
+            raise
+            
     async def create_single_embedding(
         self, 
         text: str, 
-        input_type: str = "document"
+        input_type: str = "document",
+        use_cache: bool = True
     ) -> List[float]:
-        """Créer un embedding pour un seul texte."""
-        embeddings = await self.create_embeddings([text], input_type)
-        return embeddings[0]
+        """
+        Créer un embedding pour un seul texte.
+        
+        Le cache est consulté d'abord; en cas de miss, les appels concurrents
+        sont regroupés par le batcher en une seule requête Voyage AI.
+        Avec `use_cache=False` (sonde de santé), Voyage AI est toujours appelé.
+        """
+        if not use_cache:
+            if self.batcher is not None:
+                return await self.batcher.embed(text, input_type)
+            embeddings = await self._request_embeddings_batched([text], input_type)
+            return embeddings[0]
+            
+        if self.batcher is None:
+            embeddings = await self.create_embeddings([text], input_type)
+            return embeddings[0]
+            
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(self.model, input_type, text)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+                
+        embedding = await self.batcher.embed(text, input_type)
+        
+        if key is not None:
+            await self.cache.set(key, embedding)
+            
+        return embedding
 
 
-class CohereService:
+class CohereService(PooledHTTPService):
     """Service pour l'intégration avec Cohere (reranking)."""
     
-    def __init__(self):
+    provider = "cohere"
+    
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        limiter: Optional[ProviderRateLimiter] = None
+    ):
+        super().__init__(client, limiter)
         self.api_key = settings.cohere_api_key
         self.base_url = "https://api.cohere.ai/v1"
         self.model = "rerank-multilingual-v3.0"
         
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
+    @provider_retry()
     async def rerank_documents(
         self,
         query: str,
@@ -121,60 +326,72 @@ class CohereService:
         if not self.api_key:
             raise ValueError("COHERE_API_KEY non configurée")
             
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/rerank",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "query": query,
-                        "documents": documents,
-                        "top_k": top_k,
-                        "return_documents": return_documents
-                    },
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                results = data["results"]
-                
-                logger.info(
-                    "Documents rerankés avec succès",
-                    query_length=len(query),
-                    documents_count=len(documents),
-                    results_count=len(results)
-                )
-                
-                return results
-                
-            except httpx.HTTPError as e:
-                logger.error("Erreur lors du reranking", error=str(e))
-                raise
+        try:
+            response = await self._post(
+                f"{self.base_url}/rerank",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model,
+                    "query": query,
+                    "documents": documents,
+                    "top_k": top_k,
+                    "return_documents": return_documents
+                }
+            )
+            
+            data = response.json()
+            results = data["results"]
+            
+            logger.info(
+                "Documents rerankés avec succès",
+                query_length=len(query),
+                documents_count=len(documents),
+                results_count=len(results)
+            )
+            
+            return results
+            
+        except httpx.HTTPError as e:
+            logger.error("Erreur lors du reranking", error=str(e))
+            raise
 
 
-class AnthropicService:
+class AnthropicService(PooledHTTPService):
     """Service pour l'intégration avec Anthropic Claude."""
     
-    def __init__(self):
+    provider = "anthropic"
+    request_timeout = 60.0
+    
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        limiter: Optional[ProviderRateLimiter] = None
+    ):
+        super().__init__(client, limiter)
         self.api_key = settings.anthropic_api_key
         self.base_url = "https://api.anthropic.com/v1"
         self.model = "claude-3-sonnet-20240229"
+        self.cache: Optional[CompletionCache] = None
+        
+        if settings.completion_cache_enabled:
+            self.cache = CompletionCache(
+                ttl_seconds=settings.completion_cache_ttl,
+                max_local_entries=settings.completion_cache_l1_max_entries,
+                semantic_threshold=settings.completion_cache_semantic_threshold,
+                max_semantic_entries=settings.completion_cache_semantic_max_entries
+            )
         
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
     async def generate_completion(
         self,
         messages: List[Dict[str, str]],
         max_tokens: int = 4000,
         temperature: float = 0.7,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        agent: str = "default",
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         Générer une completion avec Claude.
@@ -184,52 +401,88 @@ class AnthropicService:
             max_tokens: Nombre maximum de tokens
             temperature: Température de génération
             system_prompt: Prompt système optionnel
+            agent: Appelant, pour les statistiques du cache
+            use_cache: Consulter et alimenter le cache de completions
             
         Returns:
             Réponse de Claude avec métadonnées
         """
+        if self.cache is None or not use_cache:
+            return await self._request_completion(messages, max_tokens, temperature, system_prompt)
+        
+        request = self.cache.make_request(self.model, messages, system_prompt, max_tokens, temperature)
+        cached = await self.cache.get(request, agent=agent)
+        if cached is not None:
+            return cached
+        
+        data = await self._request_completion(messages, max_tokens, temperature, system_prompt)
+        usage = data.get("usage", {})
+        await self.cache.set(
+            request, data,
+            input_tokens=usage.get("input_tokens", 0),
+            output_tokens=usage.get("output_tokens", 0),
+            agent=agent
+        )
+        return data
+    
+    @provider_retry()
+    async def _request_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        system_prompt: Optional[str]
+    ) -> Dict[str, Any]:
+        """Appeler l'API Messages (sans cache)."""
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY non configurée")
             
-        async with httpx.AsyncClient() as client:
-            try:
-                payload = {
-                    "model": self.model,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature,
-                    "messages": messages
-                }
-                
-                if system_prompt:
-                    payload["system"] = system_prompt
-                
-                response = await client.post(
-                    f"{self.base_url}/messages",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "anthropic-version": "2023-06-01"
-                    },
-                    json=payload,
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                logger.info(
-                    "Completion générée avec succès",
-                    model=self.model,
-                    input_tokens=data.get("usage", {}).get("input_tokens", 0),
-                    output_tokens=data.get("usage", {}).get("output_tokens", 0)
-                )
-                
-                return data
-                
-            except httpx.HTTPError as e:
-                logger.error("Erreur lors de la génération", error=str(e))
-                raise
-                
+        try:
+            payload = {
+                "model": self.model,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "messages": messages
+            }
+            
+            if system_prompt:
+                payload["system"] = system_prompt
+            
+            response = await self._post(
+                f"{self.base_url}/messages",
+                tokens=self._estimate_prompt_tokens(messages, system_prompt),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                    "anthropic-version": "2023-06-01"
+                },
+                json=payload
+            )
+            
+            data = response.json()
+            
+            logger.info(
+                "Completion générée avec succès",
+                model=self.model,
+                input_tokens=data.get("usage", {}).get("input_tokens", 0),
+                output_tokens=data.get("usage", {}).get("output_tokens", 0)
+            )
+            
+            return data
+            
+        except httpx.HTTPError as e:
+            logger.error("Erreur lors de la génération", error=str(e))
+            raise
+            
+    @staticmethod
+    def _estimate_prompt_tokens(
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None
+    ) -> int:
+        """Estimer les tokens d'entrée pour le budget tokens/min."""
+        text = "".join(str(message.get("content", "")) for message in messages)
+        return estimate_tokens((system_prompt or "") + text)
+        
     async def generate_streaming_completion(
         self,
         messages: List[Dict[str, str]],
@@ -241,55 +494,79 @@ class AnthropicService:
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY non configurée")
             
-        async with httpx.AsyncClient() as client:
-            try:
-                payload = {
-                    "model": self.model,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature,
-                    "messages": messages,
-                    "stream": True
-                }
-                
-                if system_prompt:
-                    payload["system"] = system_prompt
-                
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/messages",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "anthropic-version": "2023-06-01"
-                    },
-                    json=payload,
-                    timeout=60.0
-                ) as response:
+        client = self._get_client()
+        
+        try:
+            payload = {
+                "model": self.model,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "messages": messages,
+                "stream": True
+            }
+            
+            if system_prompt:
+                payload["system"] = system_prompt
+            
+            # Le créneau reste occupé pendant toute la durée du flux
+            async with self.limiter.limit(
+                self.provider, self._estimate_prompt_tokens(messages, system_prompt)
+            ), client.stream(
+                "POST",
+                f"{self.base_url}/messages",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                    "anthropic-version": "2023-06-01"
+                },
+                json=payload
+            ) as response:
+                try:
                     response.raise_for_status()
-                    
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            data = line[6:]  # Remove "data: " prefix
-                            if data.strip() == "[DONE]":
-                                break
-                            try:
-                                yield data
-                            except Exception as e:
-                                logger.error("Erreur parsing streaming data", error=str(e))
-                                continue
-                                
-            except httpx.HTTPError as e:
-                logger.error("Erreur lors du streaming", error=str(e))
-                raise
+                except httpx.HTTPStatusError as e:
+                    await self.limiter.record_response_error(self.provider, e)
+                    raise
+                
+                async for line in response.aiter_lines():
+                    if line.startswith("data: "):
+                        data = line[6:]  # Remove "data: " prefix
+                        if data.strip() == "[DONE]":
+                            break
+                        try:
+                            yield data
+                        except Exception as e:
+                            logger.error("Erreur parsing streaming data", error=str(e))
+                            continue
+                            
+        except httpx.HTTPError as e:
+            logger.error("Erreur lors du streaming", error=str(e))
+            raise
 
 
 class ExternalServicesManager:
     """Gestionnaire centralisé pour tous les services externes."""
     
     def __init__(self):
-        self.voyage = VoyageAIService()
-        self.cohere = CohereService()
-        self.anthropic = AnthropicService()
+        # Un client HTTP persistant par fournisseur (créé au premier appel)
+        self.rate_limiter = rate_limiter
+        self.voyage = VoyageAIService(limiter=self.rate_limiter)
+        self.cohere = CohereService(limiter=self.rate_limiter)
+        self.anthropic = AnthropicService(limiter=self.rate_limiter)
+        
+        # Niveau sémantique du cache de completions: prompts encodés par Voyage AI
+        if self.anthropic.cache is not None:
+            self.anthropic.cache.embedder = self._embed_prompt
+        
+    async def _embed_prompt(self, text: str) -> List[float]:
+        return await self.voyage.create_single_embedding(text, input_type="query")
+        
+    def attach_redis(self, redis_client):
+        """Brancher le client Redis de `DatabaseManager` (cache L2 et budgets partagés)."""
+        if self.voyage.cache is not None:
+            self.voyage.cache.redis = redis_client
+        if self.anthropic.cache is not None:
+            self.anthropic.cache.redis = redis_client
+        self.rate_limiter.attach_redis(redis_client)
         
     async def health_check(self) -> Dict[str, bool]:
         """Vérifier la santé de tous les services externes."""
@@ -297,7 +574,8 @@ class ExternalServicesManager:
         
         # Test Voyage AI
         try:
-            await self.voyage.create_single_embedding("test")
+            # Hors cache: sinon la sonde réussirait sans joindre Voyage AI
+            await self.voyage.create_single_embedding("test", use_cache=False)
             results["voyage_ai"] = True
         except Exception:
             results["voyage_ai"] = False
@@ -313,13 +591,43 @@ class ExternalServicesManager:
         try:
             await self.anthropic.generate_completion(
                 [{"role": "user", "content": "Hello"}],
-                max_tokens=10
+                max_tokens=10,
+                use_cache=False
             )
             results["anthropic"] = True
         except Exception:
             results["anthropic"] = False
             
         return results
+    
+    async def aclose(self):
+        """Vider les lots en attente et fermer les clients HTTP (arrêt de l'application)."""
+        if self.voyage.batcher is not None:
+            await self.voyage.batcher.close()
+            
+        await asyncio.gather(
+            self.voyage.aclose(),
+            self.cohere.aclose(),
+            self.anthropic.aclose(),
+            return_exceptions=True
+        )
+        logger.info("Clients HTTP des services externes fermés")
+        
+    def get_metrics(self) -> Dict[str, Any]:
+        """Métriques des services externes."""
+        metrics: Dict[str, Any] = {}
+        
+        if self.voyage.batcher is not None:
+            metrics["embedding_batcher"] = self.voyage.batcher.get_metrics()
+            
+        if self.voyage.cache is not None:
+            metrics["embedding_cache"] = self.voyage.cache.get_stats()
+            
+        if self.anthropic.cache is not None:
+            metrics["completion_cache"] = self.anthropic.cache.get_stats()
+            
+        metrics["rate_limiter"] = self.rate_limiter.get_stats()
+        return metrics
 
 
 # Instance globale
@@ -4,16 +4,19 @@ Implémente les opérations sur les concepts, relations et patterns
 """
 
 import asyncio
+import json
 import logging
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Tuple
+from typing import AsyncIterator, List, Optional, Dict, Any, Set, Tuple
 from uuid import UUID
 
-from neo4j import AsyncGraphDatabase, AsyncDriver
+from neo4j import AsyncGraphDatabase, AsyncDriver, AsyncManagedTransaction
 from neo4j.exceptions import ServiceUnavailable, TransientError
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 from config.settings import get_settings
 from services.external_services import ExternalServicesManager
+from services.graph_snapshot import GraphSnapshotStore
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +28,16 @@ class GraphService:
         self.external_services = external_services
         self.driver: Optional[AsyncDriver] = None
         
+        # Instantanés CSR par utilisateur pour les parcours (voisins, chemins)
+        self.snapshots: Optional[GraphSnapshotStore] = None
+        if self.settings.graph_snapshot_enabled:
+            self.snapshots = GraphSnapshotStore(
+                self._load_snapshot,
+                max_age=self.settings.graph_snapshot_max_age,
+                max_users=self.settings.graph_snapshot_max_users,
+                compact_threshold=self.settings.graph_snapshot_compact_threshold
+            )
+        
     async def initialize(self):
         """Initialise la connexion à Neo4j"""
         try:
@@ -84,6 +97,14 @@ class GraphService:
                     concept = record["concept"]
                     logger.info(f"Concept créé/mis à jour: {name} ({concept_type})")
                     
+                    if self.snapshots:
+                        self.snapshots.record_concept(user_id, {
+                            "id": concept["id"],
+                            "name": concept["name"],
+                            "type": concept["type"],
+                            "importance": concept["importance"]
+                        })
+                    
                     return {
                         "id": concept["id"],
                         "name": concept["name"],
@@ -131,6 +152,13 @@ class GraphService:
                     relation = record["relation"]
                     logger.info(f"Relation créée: {concept1_id} -{relation_type}-> {concept2_id}")
                     
+                    if self.snapshots:
+                        # elementId: retrouver l'arête lors des mises à jour et suppressions par id
+                        self.snapshots.record_edge(
+                            concept1_id, concept2_id, relation_type, relation["strength"],
+                            getattr(relation, "element_id", None)
+                        )
+                    
                     return {
                         "type": relation["type"],
                         "strength": relation["strength"],
@@ -188,37 +216,128 @@ class GraphService:
             logger.error(f"Erreur lors de la recherche de concepts: {e}")
             raise
     
+    async def find_similar_concepts_batch(
+        self,
+        user_id: UUID,
+        queries: List[str],
+        limit: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """Recherche textuelle de concepts pour plusieurs requêtes en un seul aller-retour"""
+        
+        if not queries:
+            return []
+        
+        try:
+            async with self.driver.session() as session:
+                # Même filtre que agi.findSimilarConcepts, appliqué par requête
+                cypher_query = """
+                UNWIND range(0, size($queries) - 1) AS idx
+                CALL {
+                    WITH idx
+                    MATCH (c:Concept {user_id: $user_id})
+                    WHERE c.name CONTAINS $queries[idx] OR c.description CONTAINS $queries[idx]
+                    RETURN c
+                    ORDER BY c.importance DESC, c.frequency DESC
+                    LIMIT $limit
+                }
+                RETURN idx, collect(c) AS concepts
+                """
+                
+                result = await session.run(
+                    cypher_query,
+                    user_id=str(user_id),
+                    queries=queries,
+                    limit=limit
+                )
+                
+                concepts_by_query: List[List[Dict[str, Any]]] = [[] for _ in queries]
+                async for record in result:
+                    concepts_by_query[record["idx"]] = [
+                        {
+                            "id": concept["id"],
+                            "name": concept["name"],
+                            "type": concept["type"],
+                            "description": concept.get("description", ""),
+                            "importance": concept["importance"],
+                            "frequency": concept["frequency"]
+                        }
+                        for concept in record["concepts"]
+                    ]
+                
+                return concepts_by_query
+                
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche groupée de concepts: {e}")
+            raise
+    
     async def get_concept_neighbors(
         self,
         concept_id: str,
         max_depth: int = 2,
-        min_strength: float = 0.3
+        min_strength: float = 0.3,
+        user_id: Optional[UUID] = None
     ) -> List[Dict[str, Any]]:
         """Récupère les concepts voisins avec leurs relations"""
         
+        neighbors = await self.get_concepts_neighbors_batch(
+            [concept_id], max_depth=max_depth, min_strength=min_strength, user_id=user_id
+        )
+        return neighbors.get(concept_id, [])
+    
+    async def get_concepts_neighbors_batch(
+        self,
+        concept_ids: List[str],
+        max_depth: int = 2,
+        min_strength: float = 0.3,
+        limit: int = 20,
+        user_id: Optional[UUID] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Voisins de plusieurs concepts en une seule requête (UNWIND).
+        
+        Avec `user_id`, le parcours se fait en mémoire sur l'instantané CSR
+        de l'utilisateur (une voisine par concept, meilleur chemin).
+        """
+        
+        if not concept_ids:
+            return {}
+        
+        if self.snapshots and user_id:
+            snapshot = await self.snapshots.get(user_id)
+            return {
+                concept_id: snapshot.neighbors(concept_id, max_depth, min_strength, limit)
+                for concept_id in concept_ids
+            }
+        
         try:
             async with self.driver.session() as session:
-                query = """
-                MATCH (c:Concept {id: $concept_id})-[r*1..$max_depth]-(neighbor:Concept)
-                WHERE ALL(rel in r WHERE rel.strength >= $min_strength)
-                WITH neighbor, r, 
-                     reduce(strength = 1.0, rel in r | strength * rel.strength) as path_strength
-                RETURN DISTINCT neighbor, path_strength, length(r) as distance
-                ORDER BY path_strength DESC, distance ASC
-                LIMIT 20
+                # La profondeur d'un motif variable ne peut pas être un paramètre
+                query = f"""
+                UNWIND $concept_ids AS concept_id
+                CALL {{
+                    WITH concept_id
+                    MATCH (c:Concept {{id: concept_id}})-[r*1..{int(max_depth)}]-(neighbor:Concept)
+                    WHERE ALL(rel in r WHERE rel.strength >= $min_strength)
+                    WITH neighbor, r,
+                         reduce(strength = 1.0, rel in r | strength * rel.strength) as path_strength
+                    RETURN DISTINCT neighbor, path_strength, length(r) as distance
+                    ORDER BY path_strength DESC, distance ASC
+                    LIMIT $limit
+                }}
+                RETURN concept_id, neighbor, path_strength, distance
                 """
                 
                 result = await session.run(
                     query,
-                    concept_id=concept_id,
-                    max_depth=max_depth,
-                    min_strength=min_strength
+                    concept_ids=list(concept_ids),
+                    min_strength=min_strength,
+                    limit=limit
                 )
                 
-                neighbors = []
+                neighbors: Dict[str, List[Dict[str, Any]]] = {concept_id: [] for concept_id in concept_ids}
                 async for record in result:
                     neighbor = record["neighbor"]
-                    neighbors.append({
+                    neighbors[record["concept_id"]].append({
                         "concept": {
                             "id": neighbor["id"],
                             "name": neighbor["name"],
@@ -246,6 +365,12 @@ class GraphService:
         """Explore le graphe de connaissances à partir d'un concept"""
         
         try:
+            if self.snapshots:
+                snapshot = await self.snapshots.get(user_id)
+                paths = snapshot.explore(start_concept, max_depth, min_score, limit)
+                logger.info(f"Exploré {len(paths)} chemins depuis {start_concept} (instantané)")
+                return paths
+            
             async with self.driver.session() as session:
                 query = """
                 CALL agi.exploreKnowledgeGraph($start_concept, $user_id, $max_depth, $min_score, $limit)
@@ -410,6 +535,8 @@ class GraphService:
                 deleted_count = record["deleted_count"] if record else 0
                 
                 logger.info(f"Supprimé {deleted_count} concepts inutilisés")
+                if self.snapshots and deleted_count:
+                    self.snapshots.invalidate(user_id)
                 return deleted_count
                 
         except Exception as e:
@@ -455,48 +582,322 @@ class GraphService:
             logger.error(f"Erreur lors de la récupération des stats: {e}")
             raise
     
+    async def count_changes_since(self, user_id: UUID, since: datetime) -> Dict[str, int]:
+        """Concepts et relations créés ou modifiés depuis `since`"""
+        
+        try:
+            async with self.driver.session() as session:
+                query = """
+                OPTIONAL MATCH (c:Concept {user_id: $user_id})
+                WHERE coalesce(c.updated_at, c.created_at) >= datetime($since)
+                WITH count(c) AS concepts
+                OPTIONAL MATCH (:Concept {user_id: $user_id})-[r:RELATED_TO]->(:Concept)
+                WHERE coalesce(r.updated_at, r.created_at) >= datetime($since)
+                RETURN concepts, count(r) AS relationships
+                """
+                
+                result = await session.run(query, user_id=str(user_id), since=since.isoformat())
+                record = await result.single()
+                return {"concepts": record["concepts"], "relationships": record["relationships"]}
+                
+        except Exception as e:
+            logger.error(f"Erreur lors du comptage des changements du graphe: {e}")
+            raise
+    
+    async def get_nodes_with_embeddings(self, user_id: Optional[UUID] = None) -> List[Dict[str, Any]]:
+        """Concepts portant un embedding (id, nom, embedding)"""
+        
+        try:
+            async with self.driver.session() as session:
+                query = """
+                MATCH (c:Concept)
+                WHERE c.embedding IS NOT NULL
+                  AND ($user_id IS NULL OR c.user_id = $user_id)
+                RETURN c.id as id, c.name as name, c.embedding as embedding
+                """
+                
+                result = await session.run(query, user_id=str(user_id) if user_id else None)
+                return [
+                    {"id": record["id"], "name": record["name"], "embedding": record["embedding"]}
+                    async for record in result
+                ]
+                
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des embeddings de concepts: {e}")
+            raise
+    
+    async def get_connection_pairs(self, connection_type: str) -> Set[Tuple[str, str]]:
+        """
+        Paires de concepts déjà reliées par une relation de ce type, en une
+        seule requête. Les paires sont non orientées: (min(id), max(id)).
+        """
+        
+        try:
+            async with self.driver.session() as session:
+                query = """
+                MATCH (a:Concept)-[r:RELATED_TO {type: $connection_type}]-(b:Concept)
+                WHERE a.id < b.id
+                RETURN DISTINCT a.id as source, b.id as target
+                """
+                
+                result = await session.run(query, connection_type=connection_type)
+                return {(record["source"], record["target"]) async for record in result}
+                
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des relations existantes: {e}")
+            raise
+    
     async def link_memory_to_concepts(
         self,
         memory_id: UUID,
         user_id: UUID,
         concepts: List[Dict[str, Any]]
     ) -> int:
-        """Lie une mémoire à des concepts dans le graphe"""
+        """Lie une mémoire à des concepts dans le graphe (un UNWIND par lot)"""
+        
+        try:
+            query = """
+            MERGE (m:Memory {id: $memory_id, user_id: $user_id})
+            SET m.created_at = CASE WHEN m.created_at IS NULL THEN datetime() ELSE m.created_at END
+            WITH m
+            UNWIND $rows AS row
+            MATCH (c:Concept {id: row.concept_id})
+            MERGE (m)-[r:CONTAINS]->(c)
+            SET r.relevance = row.relevance,
+                r.created_at = datetime()
+            RETURN count(r) AS count
+            """
+            
+            rows = [
+                {"concept_id": concept["id"], "relevance": concept.get("relevance", 0.5)}
+                for concept in concepts
+            ]
+            # Sans concept, un lot vide crée tout de même le nœud mémoire
+            links_created = await self.write_in_batches(
+                query, rows, memory_id=str(memory_id), user_id=str(user_id),
+                allow_empty=True
+            )
+            
+            logger.info(f"Créé {links_created} liens mémoire-concept")
+            return links_created
+                
+        except Exception as e:
+            logger.error(f"Erreur lors de la liaison mémoire-concepts: {e}")
+            raise
+    
+    async def get_all_relationships(self) -> List[Dict[str, Any]]:
+        """Relations entre concepts; `id` est l'elementId Neo4j de la relation"""
         
         try:
             async with self.driver.session() as session:
-                # Créer le nœud mémoire s'il n'existe pas
-                memory_query = """
-                MERGE (m:Memory {id: $memory_id, user_id: $user_id})
-                SET m.created_at = CASE WHEN m.created_at IS NULL THEN datetime() ELSE m.created_at END
+                query = """
+                MATCH (a:Concept)-[r:RELATED_TO]->(b:Concept)
+                RETURN elementId(r) as id, a.id as source_id, b.id as target_id,
+                       r.type as type, r.strength as strength
                 """
                 
-                await session.run(memory_query, memory_id=str(memory_id), user_id=str(user_id))
-                
-                # Lier aux concepts
-                links_created = 0
-                for concept in concepts:
-                    link_query = """
-                    MATCH (m:Memory {id: $memory_id}), (c:Concept {id: $concept_id})
-                    MERGE (m)-[r:CONTAINS]->(c)
-                    SET r.relevance = $relevance,
-                        r.created_at = datetime()
-                    """
-                    
-                    await session.run(
-                        link_query,
-                        memory_id=str(memory_id),
-                        concept_id=concept["id"],
-                        relevance=concept.get("relevance", 0.5)
-                    )
-                    links_created += 1
-                
-                logger.info(f"Créé {links_created} liens mémoire-concept")
-                return links_created
+                result = await session.run(query)
+                return [record.data() async for record in result]
                 
         except Exception as e:
-            logger.error(f"Erreur lors de la liaison mémoire-concepts: {e}")
+            logger.error(f"Erreur lors de la récupération des relations: {e}")
+            raise
+    
+    async def create_relationships(self, relationships: List[Dict[str, Any]]) -> int:
+        """
+        Crée ou met à jour des relations entre concepts, par lots.
+        
+        Chaque élément: source_id, target_id, relationship_type et
+        properties (valeurs scalaires; un dict est sérialisé en JSON).
+        """
+        
+        query = """
+        UNWIND $rows AS row
+        MATCH (a:Concept {id: row.source_id}), (b:Concept {id: row.target_id})
+        MERGE (a)-[r:RELATED_TO {type: row.relationship_type}]->(b)
+        ON CREATE SET r.created_at = datetime(), r.frequency = 1
+        ON MATCH SET r.updated_at = datetime()
+        SET r += row.properties
+        RETURN count(r) AS count,
+               collect([row.source_id, row.target_id, row.relationship_type, r.strength, elementId(r)]) AS edges
+        """
+        
+        rows = [
+            {
+                "source_id": relationship["source_id"],
+                "target_id": relationship["target_id"],
+                "relationship_type": relationship["relationship_type"],
+                "properties": self._graph_properties(relationship.get("properties", {}))
+            }
+            for relationship in relationships
+        ]
+        
+        try:
+            created = 0
+            async for record in self._write_batches(query, rows):
+                created += record["count"]
+                # Arêtes écrites avec leur elementId, seul identifiant des mises à jour et suppressions
+                if self.snapshots:
+                    for source_id, target_id, relationship_type, strength, edge_id in record["edges"]:
+                        self.snapshots.record_edge(source_id, target_id, relationship_type, strength, edge_id)
+            
+            logger.info(f"{created} relations créées/mises à jour")
+            return created
+        except Exception as e:
+            logger.error(f"Erreur lors de la création des relations: {e}")
+            raise
+    
+    async def update_relationships_properties(self, updates: List[Dict[str, Any]]) -> int:
+        """Met à jour les propriétés de relations existantes (`id`, `properties`), par lots"""
+        
+        query = """
+        UNWIND $rows AS row
+        MATCH ()-[r]->()
+        WHERE elementId(r) = row.id
+        SET r += row.properties, r.updated_at = datetime()
+        RETURN count(r) AS count
+        """
+        
+        rows = [
+            {"id": update["id"], "properties": self._graph_properties(update["properties"])}
+            for update in updates
+        ]
+        
+        try:
+            updated = await self.write_in_batches(query, rows)
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise à jour des relations: {e}")
             raise
+        
+        if self.snapshots:
+            for row in rows:
+                if "strength" in row["properties"]:
+                    self.snapshots.record_edge_update(row["id"], row["properties"]["strength"])
+        return updated
+    
+    async def remove_relationships(self, relationship_ids: List[str]) -> int:
+        """Supprime des relations par elementId, par lots"""
+        
+        query = """
+        UNWIND $rows AS relationship_id
+        MATCH ()-[r]->()
+        WHERE elementId(r) = relationship_id
+        DELETE r
+        RETURN count(*) AS count
+        """
+        
+        try:
+            removed = await self.write_in_batches(query, list(relationship_ids))
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression des relations: {e}")
+            raise
+        
+        if self.snapshots:
+            for relationship_id in relationship_ids:
+                self.snapshots.record_edge_removal(relationship_id)
+        return removed
+    
+    async def _load_snapshot(self, user_id: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Concepts et relations d'un utilisateur pour l'instantané CSR"""
+        
+        async with self.driver.session() as session:
+            nodes_result = await session.run(
+                """
+                MATCH (c:Concept {user_id: $user_id})
+                RETURN c.id as id, c.name as name, c.type as type, c.importance as importance
+                """,
+                user_id=user_id
+            )
+            nodes = [record.data() async for record in nodes_result]
+            
+            edges_result = await session.run(
+                """
+                MATCH (a:Concept {user_id: $user_id})-[r]->(b:Concept {user_id: $user_id})
+                RETURN elementId(r) as id, a.id as source_id, b.id as target_id,
+                       coalesce(r.type, type(r)) as type, r.strength as strength
+                """,
+                user_id=user_id
+            )
+            edges = [record.data() async for record in edges_result]
+        
+        return nodes, edges
+    
+    def get_snapshot_stats(self) -> Dict[str, Any]:
+        """Âge et empreinte mémoire des instantanés chargés"""
+        if not self.snapshots:
+            return {"enabled": False}
+        return {"enabled": True, **self.snapshots.stats()}
+    
+    async def write_in_batches(
+        self,
+        query: str,
+        rows: List[Any],
+        batch_size: Optional[int] = None,
+        allow_empty: bool = False,
+        **parameters
+    ) -> int:
+        """
+        Exécute une requête `UNWIND $rows` par lots, chaque lot dans sa propre
+        transaction d'écriture gérée. Un lot interrompu par une erreur
+        transitoire (deadlock, leader changé) est rejoué en entier.
+        
+        La requête doit renvoyer une colonne `count`; la somme est renvoyée.
+        `allow_empty` exécute la requête même sans ligne (effets hors UNWIND).
+        """
+        
+        total = 0
+        async for record in self._write_batches(query, rows, batch_size, allow_empty, **parameters):
+            total += record.get("count", 0)
+        return total
+    
+    async def _write_batches(
+        self,
+        query: str,
+        rows: List[Any],
+        batch_size: Optional[int] = None,
+        allow_empty: bool = False,
+        **parameters
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Exécute les lots de write_in_batches et renvoie l'enregistrement de chacun"""
+        
+        batch_size = batch_size or self.settings.graph_write_batch_size
+        if not rows and not allow_empty:
+            return
+        
+        async with self.driver.session() as session:
+            for start in range(0, max(len(rows), 1), batch_size):
+                batch = rows[start:start + batch_size]
+                async for attempt in AsyncRetrying(
+                    retry=retry_if_exception_type((TransientError, ServiceUnavailable)),
+                    stop=stop_after_attempt(self.settings.graph_write_max_retries),
+                    wait=wait_exponential(multiplier=0.2, max=5),
+                    reraise=True
+                ):
+                    with attempt:
+                        record = await session.execute_write(
+                            self._run_write_batch, query, batch, parameters
+                        )
+                # Lot validé: seules ses valeurs sont renvoyées, jamais celles d'un essai rejoué
+                yield record
+    
+    @staticmethod
+    async def _run_write_batch(
+        tx: AsyncManagedTransaction,
+        query: str,
+        rows: List[Any],
+        parameters: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        result = await tx.run(query, rows=rows, **parameters)
+        record = await result.single()
+        return {key: record[key] for key in record.keys()} if record else {}
+    
+    @staticmethod
+    def _graph_properties(properties: Dict[str, Any]) -> Dict[str, Any]:
+        """Neo4j n'accepte pas de map imbriquée comme propriété: sérialiser en JSON"""
+        return {
+            key: json.dumps(value) if isinstance(value, dict) else value
+            for key, value in properties.items()
+        }
     
     async def health_check(self) -> Dict[str, Any]:
         """Vérifie la santé du service de graphe"""
@@ -518,6 +919,7 @@ class GraphService:
                     return {
                         "status": "healthy",
                         "node_count": count_record["node_count"],
+                        "snapshots": self.get_snapshot_stats(),
                         "timestamp": datetime.utcnow().isoformat()
                     }
                 else:
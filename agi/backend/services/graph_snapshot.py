@@ -0,0 +1,550 @@
+"""
+Instantané en mémoire du graphe de concepts d'un utilisateur (format CSR)
+Sert les expansions de voisinage, le meilleur chemin et les requêtes k-sauts
+sans parcours à profondeur variable dans Neo4j.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STRENGTH = 0.5
+
+# (voisin, code de type) -> force, ou None si l'arête a été supprimée
+NodeDelta = Dict[Tuple[int, int], Optional[float]]
+
+
+class GraphSnapshot:
+    """
+    Graphe de concepts non orienté en tableaux CSR.
+
+    `indptr[i]:indptr[i + 1]` délimite les arêtes du nœud i dans `indices`
+    (voisin), `strengths` et `type_codes`. Chaque relation Neo4j est stockée
+    dans les deux sens, comme les parcours `-[r]-` qu'elle remplace.
+
+    Les écritures de l'application sont appliquées dans un delta par nœud
+    (arêtes ajoutées, modifiées ou supprimées) relu lors des parcours; le
+    CSR est reconstruit quand le delta dépasse `compact_threshold`.
+    """
+
+    def __init__(
+        self,
+        nodes: List[Dict[str, Any]],
+        edges: Iterable[Dict[str, Any]],
+        compact_threshold: int = 1024
+    ):
+        self.compact_threshold = compact_threshold
+        self.loaded_at = time.time()
+        self.updated_at = self.loaded_at
+
+        self.node_ids: List[str] = []
+        self.names: List[str] = []
+        self.types: List[str] = []
+        self.importance: List[float] = []
+        self.index: Dict[str, int] = {}
+        for node in nodes:
+            self._append_node(node)
+
+        self.type_names: List[str] = []
+        self._type_codes: Dict[str, int] = {}
+        self.edge_ids: Dict[str, Tuple[int, int, int]] = {}
+        self._delta: Dict[int, NodeDelta] = {}
+        self._delta_size = 0
+
+        sources, targets, strengths, codes = [], [], [], []
+        for edge in edges:
+            source = self.index.get(edge["source_id"])
+            target = self.index.get(edge["target_id"])
+            if source is None or target is None:
+                continue
+            code = self._type_code(edge.get("type") or "RELATED_TO")
+            strength = edge.get("strength")
+            sources.append(source)
+            targets.append(target)
+            strengths.append(DEFAULT_STRENGTH if strength is None else strength)
+            codes.append(code)
+            if edge.get("id"):
+                self.edge_ids[edge["id"]] = (source, target, code)
+
+        self._build_csr(
+            np.asarray(sources, dtype=np.int64),
+            np.asarray(targets, dtype=np.int64),
+            np.asarray(strengths, dtype=np.float32),
+            np.asarray(codes, dtype=np.int16)
+        )
+
+    # --- Métadonnées -------------------------------------------------------
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        """Relations (non orientées) du CSR, hors delta en attente"""
+        return len(self.indices) // 2
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.loaded_at
+
+    def memory_bytes(self) -> int:
+        """Empreinte approximative: tableaux CSR + structures Python"""
+        arrays = self.indptr.nbytes + self.indices.nbytes + self.strengths.nbytes + self.type_codes.nbytes
+        strings = sum(sys.getsizeof(value) for value in self.node_ids + self.names + self.types)
+        containers = sum(
+            sys.getsizeof(container)
+            for container in (self.node_ids, self.names, self.types, self.importance, self.index, self.edge_ids)
+        )
+        delta = sum(sys.getsizeof(entries) for entries in self._delta.values())
+        return int(arrays + strings + containers + delta + 24 * len(self.importance))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "nodes": self.node_count,
+            "edges": self.edge_count,
+            "pending_changes": self._delta_size,
+            "age_seconds": round(self.age_seconds, 1),
+            "seconds_since_update": round(time.time() - self.updated_at, 1),
+            "memory_bytes": self.memory_bytes()
+        }
+
+    # --- Mises à jour incrémentales ------------------------------------------
+
+    def upsert_concept(self, concept: Dict[str, Any]):
+        position = self.index.get(concept["id"])
+        if position is None:
+            self._append_node(concept)
+        else:
+            self.names[position] = concept.get("name", self.names[position])
+            self.types[position] = concept.get("type", self.types[position])
+            self.importance[position] = concept.get("importance", self.importance[position])
+        self.updated_at = time.time()
+
+    def upsert_edge(
+        self,
+        source_id: str,
+        target_id: str,
+        edge_type: str,
+        strength: Optional[float],
+        edge_id: Optional[str] = None
+    ) -> bool:
+        """Ajouter ou modifier une relation; ignorée si un concept est hors instantané"""
+        source = self.index.get(source_id)
+        target = self.index.get(target_id)
+        if source is None or target is None:
+            return False
+
+        code = self._type_code(edge_type)
+        strength = DEFAULT_STRENGTH if strength is None else strength
+        self._set_delta(source, target, code, strength)
+        if edge_id:
+            self.edge_ids[edge_id] = (source, target, code)
+        return True
+
+    def update_edge_by_id(self, edge_id: str, strength: float) -> bool:
+        edge = self.edge_ids.get(edge_id)
+        if edge is None:
+            return False
+        self._set_delta(*edge, strength)
+        return True
+
+    def remove_edge_by_id(self, edge_id: str) -> bool:
+        edge = self.edge_ids.pop(edge_id, None)
+        if edge is None:
+            return False
+        self._set_delta(*edge, None)
+        return True
+
+    # --- Parcours -------------------------------------------------------------
+
+    def neighbors(
+        self,
+        concept_id: str,
+        max_depth: int = 2,
+        min_strength: float = 0.3,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Voisins à au plus `max_depth` sauts par des arêtes de force >=
+        `min_strength`, avec la force du meilleur chemin (produit des forces).
+        Même forme que GraphService.get_concepts_neighbors_batch.
+        """
+        start = self.index.get(concept_id)
+        if start is None:
+            return []
+
+        best, _ = self._best_paths(start, max_depth, min_strength)
+        ranked = sorted(
+            ((node, score, depth) for node, (score, depth) in best.items() if node != start),
+            key=lambda item: (-item[1], item[2])
+        )
+        return [
+            {"concept": self._concept(node), "path_strength": score, "distance": depth}
+            for node, score, depth in ranked[:limit]
+        ]
+
+    def best_path(
+        self,
+        source_id: str,
+        target_id: str,
+        max_depth: int = 4,
+        min_strength: float = 0.0
+    ) -> Optional[Dict[str, Any]]:
+        """Chemin de plus forte force (produit) entre deux concepts, ou None"""
+        source = self.index.get(source_id)
+        target = self.index.get(target_id)
+        if source is None or target is None:
+            return None
+
+        best, parents = self._best_paths(source, max_depth, min_strength)
+        if target not in best or target == source:
+            return None
+        return self._path(target, best, parents)
+
+    def explore(
+        self,
+        start_name: str,
+        max_depth: int = 3,
+        min_score: float = 0.2,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Meilleurs chemins depuis un concept (par nom), score > min_score"""
+        try:
+            start = self.names.index(start_name)
+        except ValueError:
+            return []
+
+        best, parents = self._best_paths(start, max_depth, 0.0)
+        ranked = sorted(
+            (node for node, (score, _) in best.items() if node != start and score > min_score),
+            key=lambda node: (-best[node][0], best[node][1])
+        )
+        return [self._path(node, best, parents) for node in ranked[:limit]]
+
+    def k_hop(self, concept_id: str, k: int, min_strength: float = 0.0) -> Dict[str, int]:
+        """Concepts atteignables en au plus k sauts -> distance minimale"""
+        start = self.index.get(concept_id)
+        if start is None:
+            return {}
+
+        distances = {start: 0}
+        frontier = np.asarray([start], dtype=np.int64)
+        for depth in range(1, k + 1):
+            _, targets, _, _ = self._expand(frontier, np.ones(len(frontier), dtype=np.float32), min_strength)
+            fresh = [node for node in np.unique(targets).tolist() if node not in distances]
+            if not fresh:
+                break
+            for node in fresh:
+                distances[node] = depth
+            frontier = np.asarray(fresh, dtype=np.int64)
+
+        del distances[start]
+        return {self.node_ids[node]: depth for node, depth in distances.items()}
+
+    # --- Interne ----------------------------------------------------------------
+
+    def _best_paths(
+        self,
+        start: int,
+        max_depth: int,
+        min_strength: float
+    ) -> Tuple[Dict[int, Tuple[float, int]], Dict[Tuple[int, int], Tuple[int, int]]]:
+        """
+        Programmation dynamique par couche: meilleur score pour chaque nœud à
+        chaque profondeur, puis meilleur score toutes profondeurs confondues
+        (à égalité, le plus court). `parents[(nœud, profondeur)]` permet de
+        reconstruire le chemin.
+        """
+        best: Dict[int, Tuple[float, int]] = {start: (1.0, 0)}
+        parents: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        frontier = np.asarray([start], dtype=np.int64)
+        scores = np.ones(1, dtype=np.float32)
+
+        for depth in range(1, max_depth + 1):
+            sources, targets, candidate_scores, _ = self._expand(frontier, scores, min_strength)
+            if len(targets) == 0:
+                break
+
+            # Meilleur candidat par cible pour cette profondeur
+            order = np.lexsort((-candidate_scores, targets))
+            targets, sources, candidate_scores = targets[order], sources[order], candidate_scores[order]
+            first = np.ones(len(targets), dtype=bool)
+            first[1:] = targets[1:] != targets[:-1]
+            targets, sources, candidate_scores = targets[first], sources[first], candidate_scores[first]
+
+            for target, source, score in zip(targets.tolist(), sources.tolist(), candidate_scores.tolist()):
+                parents[(target, depth)] = (source, depth - 1)
+                if score > best.get(target, (0.0, 0))[0]:
+                    best[target] = (score, depth)
+
+            frontier, scores = targets, candidate_scores
+
+        return best, parents
+
+    def _path(
+        self,
+        node: int,
+        best: Dict[int, Tuple[float, int]],
+        parents: Dict[Tuple[int, int], Tuple[int, int]]
+    ) -> Dict[str, Any]:
+        score, depth = best[node]
+        chain = [(node, depth)]
+        while chain[-1][1] > 0:
+            chain.append(parents[chain[-1]])
+        chain.reverse()
+
+        relationships = []
+        for (source, _), (target, _) in zip(chain, chain[1:]):
+            strength, code = self._edge_between(source, target)
+            relationships.append({"type": self.type_names[code], "strength": strength})
+
+        return {
+            "nodes": [self._concept(position) for position, _ in chain],
+            "relationships": relationships,
+            "depth": depth,
+            "score": score
+        }
+
+    def _expand(
+        self,
+        frontier: np.ndarray,
+        scores: np.ndarray,
+        min_strength: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Arêtes sortantes du front: (source, cible, score cumulé, code de type)"""
+        # Nœuds ajoutés depuis le chargement: aucune ligne CSR
+        in_csr = frontier < len(self.indptr) - 1
+        csr_frontier = frontier[in_csr]
+        starts = self.indptr[csr_frontier]
+        counts = self.indptr[csr_frontier + 1] - starts
+        total = int(counts.sum())
+
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        sources = np.repeat(csr_frontier, counts)
+        source_scores = np.repeat(scores[in_csr], counts)
+        targets = self.indices[offsets]
+        strengths = self.strengths[offsets]
+        codes = self.type_codes[offsets]
+        keep = strengths >= min_strength
+
+        if self._delta:
+            extra_sources, extra_targets, extra_scores, extra_codes = [], [], [], []
+            score_of = dict(zip(frontier.tolist(), scores.tolist()))
+            for node in frontier.tolist():
+                delta = self._delta.get(node)
+                if not delta:
+                    continue
+                # Les arêtes du delta remplacent leurs équivalents CSR
+                overridden = (sources == node) & np.asarray(
+                    [(target, code) in delta for target, code in zip(targets.tolist(), codes.tolist())],
+                    dtype=bool
+                ) if total else np.zeros(0, dtype=bool)
+                keep &= ~overridden
+                for (target, code), strength in delta.items():
+                    if strength is not None and strength >= min_strength:
+                        extra_sources.append(node)
+                        extra_targets.append(target)
+                        extra_scores.append(score_of[node] * strength)
+                        extra_codes.append(code)
+
+            if extra_sources:
+                return (
+                    np.concatenate([sources[keep], np.asarray(extra_sources, dtype=np.int64)]),
+                    np.concatenate([targets[keep], np.asarray(extra_targets, dtype=np.int64)]),
+                    np.concatenate([(source_scores * strengths)[keep], np.asarray(extra_scores, dtype=np.float32)]),
+                    np.concatenate([codes[keep], np.asarray(extra_codes, dtype=np.int16)])
+                )
+
+        return sources[keep], targets[keep], (source_scores * strengths)[keep], codes[keep]
+
+    def _edge_between(self, source: int, target: int) -> Tuple[float, int]:
+        """Arête la plus forte entre deux nœuds adjacents"""
+        candidates = []
+        delta = self._delta.get(source, {})
+        if source < len(self.indptr) - 1:
+            start, end = self.indptr[source], self.indptr[source + 1]
+            for offset in np.flatnonzero(self.indices[start:end] == target):
+                code = int(self.type_codes[start + offset])
+                if (target, code) not in delta:
+                    candidates.append((float(self.strengths[start + offset]), code))
+        candidates.extend(
+            (strength, code) for (neighbor, code), strength in delta.items()
+            if neighbor == target and strength is not None
+        )
+        return max(candidates)
+
+    def _concept(self, position: int) -> Dict[str, Any]:
+        return {
+            "id": self.node_ids[position],
+            "name": self.names[position],
+            "type": self.types[position],
+            "importance": self.importance[position]
+        }
+
+    def _append_node(self, node: Dict[str, Any]):
+        self.index[node["id"]] = len(self.node_ids)
+        self.node_ids.append(node["id"])
+        self.names.append(node.get("name", ""))
+        self.types.append(node.get("type", ""))
+        self.importance.append(node.get("importance", 0.5))
+
+    def _type_code(self, edge_type: str) -> int:
+        code = self._type_codes.get(edge_type)
+        if code is None:
+            code = self._type_codes[edge_type] = len(self.type_names)
+            self.type_names.append(edge_type)
+        return code
+
+    def _set_delta(self, source: int, target: int, code: int, strength: Optional[float]):
+        for node, neighbor in ((source, target), (target, source)):
+            delta = self._delta.setdefault(node, {})
+            if (neighbor, code) not in delta:
+                self._delta_size += 1
+            delta[(neighbor, code)] = strength
+        self.updated_at = time.time()
+
+        if self._delta_size >= self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """Reconstruire le CSR en y intégrant le delta"""
+        if not self._delta:
+            return
+
+        sources = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        keep = np.ones(len(self.indices), dtype=bool)
+        extra = []
+        for node, delta in self._delta.items():
+            if node < len(self.indptr) - 1:
+                start, end = self.indptr[node], self.indptr[node + 1]
+                for offset in range(start, end):
+                    if (int(self.indices[offset]), int(self.type_codes[offset])) in delta:
+                        keep[offset] = False
+            extra.extend(
+                (node, neighbor, strength, code)
+                for (neighbor, code), strength in delta.items() if strength is not None
+            )
+
+        extra_array = np.asarray(extra, dtype=np.float64).reshape(-1, 4)
+        # Le CSR stocke déjà les deux sens: ne garder qu'un sens avant reconstruction
+        sources, targets = sources[keep], self.indices[keep]
+        strengths, codes = self.strengths[keep], self.type_codes[keep]
+        one_way = sources <= targets
+        extra_one_way = extra_array[:, 0] <= extra_array[:, 1]
+
+        self._delta = {}
+        self._delta_size = 0
+        self._build_csr(
+            np.concatenate([sources[one_way], extra_array[extra_one_way, 0].astype(np.int64)]),
+            np.concatenate([targets[one_way], extra_array[extra_one_way, 1].astype(np.int64)]),
+            np.concatenate([strengths[one_way], extra_array[extra_one_way, 2].astype(np.float32)]),
+            np.concatenate([codes[one_way], extra_array[extra_one_way, 3].astype(np.int16)])
+        )
+
+    def _build_csr(self, sources: np.ndarray, targets: np.ndarray, strengths: np.ndarray, codes: np.ndarray):
+        """Symétriser puis trier les arêtes par nœud source"""
+        loops = sources == targets
+        all_sources = np.concatenate([sources, targets[~loops]])
+        all_targets = np.concatenate([targets, sources[~loops]])
+        order = np.argsort(all_sources, kind="stable")
+
+        self.indices = all_targets[order].astype(np.int32)
+        self.strengths = np.concatenate([strengths, strengths[~loops]])[order].astype(np.float32)
+        self.type_codes = np.concatenate([codes, codes[~loops]])[order].astype(np.int16)
+        self.indptr = np.searchsorted(all_sources[order], np.arange(self.node_count + 1)).astype(np.int64)
+
+
+class GraphSnapshotStore:
+    """
+    Instantanés par utilisateur, chargés à la demande et gardés à jour par
+    les écritures du GraphService. Un instantané plus vieux que `max_age`
+    secondes est rechargé (écritures externes); au-delà de `max_users`, le
+    moins récemment utilisé est libéré.
+    """
+
+    def __init__(self, loader, max_age: float = 300.0, max_users: int = 100, compact_threshold: int = 1024):
+        self.loader = loader
+        self.max_age = max_age
+        self.max_users = max_users
+        self.compact_threshold = compact_threshold
+        self._snapshots: "OrderedDict[str, GraphSnapshot]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, user_id) -> GraphSnapshot:
+        key = str(user_id)
+        snapshot = self._fresh(key)
+        if snapshot is not None:
+            return snapshot
+
+        # Un seul chargement par utilisateur, même sous requêtes concurrentes
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            snapshot = self._fresh(key)
+            if snapshot is None:
+                started = time.perf_counter()
+                nodes, edges = await self.loader(key)
+                snapshot = GraphSnapshot(nodes, edges, self.compact_threshold)
+                self._snapshots[key] = snapshot
+                self._snapshots.move_to_end(key)
+                while len(self._snapshots) > self.max_users:
+                    self._snapshots.popitem(last=False)
+                logger.info(
+                    f"Instantané du graphe chargé pour {key}: {snapshot.node_count} concepts, "
+                    f"{snapshot.edge_count} relations en {(time.perf_counter() - started) * 1000:.0f} ms"
+                )
+            return snapshot
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(str(user_id), None)
+
+    def record_concept(self, user_id, concept: Dict[str, Any]):
+        snapshot = self._snapshots.get(str(user_id))
+        if snapshot is not None:
+            snapshot.upsert_concept(concept)
+
+    def record_edge(
+        self,
+        source_id: str,
+        target_id: str,
+        edge_type: str,
+        strength: Optional[float],
+        edge_id: Optional[str] = None
+    ):
+        for snapshot in self._snapshots.values():
+            if snapshot.upsert_edge(source_id, target_id, edge_type, strength, edge_id):
+                return
+
+    def record_edge_update(self, edge_id: str, strength: float):
+        for snapshot in self._snapshots.values():
+            if snapshot.update_edge_by_id(edge_id, strength):
+                return
+
+    def record_edge_removal(self, edge_id: str):
+        for snapshot in self._snapshots.values():
+            if snapshot.remove_edge_by_id(edge_id):
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._snapshots),
+            "memory_bytes": sum(snapshot.memory_bytes() for snapshot in self._snapshots.values()),
+            "snapshots": {key: snapshot.stats() for key, snapshot in self._snapshots.items()}
+        }
+
+    def _fresh(self, key: str) -> Optional[GraphSnapshot]:
+        snapshot = self._snapshots.get(key)
+        if snapshot is None or snapshot.age_seconds > self.max_age:
+            return None
+        self._snapshots.move_to_end(key)
+        return snapshot
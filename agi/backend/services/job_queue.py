@@ -0,0 +1,413 @@
+"""
+Exécution asynchrone des agents et workflows longs.
+La soumission renvoie immédiatement un identifiant de job; un pool borné de
+workers consomme une file Redis (ou une file locale si Redis est absent).
+Statut, progression, résultat et annulation sont consultables par job.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINAL_STATUSES = {JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED}
+
+# Réserve atomique d'un créneau d'exécution pour l'utilisateur
+_CLAIM_SLOT_SCRIPT = """
+if redis.call('SCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('SADD', KEYS[1], ARGV[1])
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+    return 1
+end
+return 0
+"""
+
+
+class JobLimitExceeded(Exception):
+    """Trop de jobs en attente pour cet utilisateur"""
+
+
+@dataclass
+class Job:
+    """État d'un job, sérialisable en JSON"""
+    id: str
+    kind: str
+    job_type: str
+    user_id: str
+    payload: Dict[str, Any]
+    status: str = JOB_QUEUED
+    progress: float = 0.0
+    message: str = ""
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def is_final(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        return cls(**data)
+
+
+class JobContext:
+    """Passé au handler: progression et annulation coopérative"""
+
+    def __init__(self, manager: "JobManager", job: Job):
+        self.manager = manager
+        self.job = job
+
+    async def report(self, progress: float, message: str = ""):
+        self.job.progress = max(0.0, min(1.0, progress))
+        self.job.message = message
+        await self.manager._save(self.job)
+
+
+JobHandler = Callable[[Job, JobContext], Awaitable[Dict[str, Any]]]
+
+
+class JobManager:
+    """
+    File de jobs et pool de workers.
+
+    Avec Redis, une file par type de job (`kind`): un worker ne consomme que
+    les types pour lesquels un handler est enregistré dans son processus. Chaque
+    utilisateur a au plus `max_running_per_user` jobs en cours (un job
+    au-delà est remis en fin de file) et `max_queued_per_user` jobs actifs.
+
+    Sans Redis, file et états sont locaux au processus.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        workers: int = 4,
+        max_running_per_user: int = 2,
+        max_queued_per_user: int = 20,
+        result_ttl: int = 86400,
+        job_timeout: float = 3600.0,
+        cancel_poll_interval: float = 1.0,
+        key_prefix: str = "agi:jobs"
+    ):
+        self.redis = redis_client
+        self.workers = workers
+        self.max_running_per_user = max_running_per_user
+        self.max_queued_per_user = max_queued_per_user
+        self.result_ttl = result_ttl
+        self.job_timeout = job_timeout
+        self.cancel_poll_interval = cancel_poll_interval
+        self.key_prefix = key_prefix
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._claim_slot = redis_client.register_script(_CLAIM_SLOT_SCRIPT) if redis_client else None
+
+        # Stand-in local
+        self._jobs: Dict[str, Job] = {}
+        self._local_queue: asyncio.Queue = asyncio.Queue()
+        self._user_slots: Dict[str, set] = {}
+
+    @classmethod
+    def from_settings(cls, settings, redis_client=None) -> "JobManager":
+        return cls(
+            redis_client=redis_client,
+            workers=settings.job_workers,
+            max_running_per_user=settings.job_max_running_per_user,
+            max_queued_per_user=settings.job_max_queued_per_user,
+            result_ttl=settings.job_result_ttl,
+            job_timeout=settings.job_timeout,
+            cancel_poll_interval=settings.job_cancel_poll_interval
+        )
+
+    def attach_redis(self, redis_client):
+        """Partager la file entre workers via Redis"""
+        self.redis = redis_client
+        self._claim_slot = redis_client.register_script(_CLAIM_SLOT_SCRIPT)
+
+    # --- Cycle de vie ------------------------------------------------------------
+
+    def register_handler(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    def has_handler(self, kind: str) -> bool:
+        return kind in self._handlers
+
+    def start(self):
+        if self._worker_tasks:
+            return
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(index)) for index in range(self.workers)
+        ]
+        logger.info("Workers de jobs démarrés", workers=self.workers, redis=self.redis is not None)
+
+    async def stop(self):
+        """
+        Arrêter les workers. Les jobs interrompus (en cours ou tout juste
+        retirés de la file) y sont remis en tête et leur créneau libéré: un
+        autre processus, ou ce processus au redémarrage, les reprend.
+        """
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    # --- API --------------------------------------------------------------------
+
+    async def submit(self, kind: str, job_type: str, payload: Dict[str, Any], user_id: str) -> Job:
+        if kind not in self._handlers:
+            raise ValueError(f"Type de job inconnu: {kind}")
+
+        active = [job for job in await self.list_jobs(user_id) if not job.is_final]
+        if len(active) >= self.max_queued_per_user:
+            raise JobLimitExceeded(
+                f"{len(active)} jobs actifs pour cet utilisateur (max {self.max_queued_per_user})"
+            )
+
+        job = Job(id=str(uuid.uuid4()), kind=kind, job_type=job_type, user_id=user_id, payload=payload)
+        await self._save(job)
+        await self._enqueue(job)
+        logger.info("Job soumis", job_id=job.id, kind=kind, job_type=job_type, user_id=user_id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        if self.redis is None:
+            return self._jobs.get(job_id)
+        data = await self.redis.get(self._job_key(job_id))
+        return Job.from_dict(json.loads(data)) if data else None
+
+    async def list_jobs(self, user_id: str) -> List[Job]:
+        if self.redis is None:
+            jobs = [job for job in self._jobs.values() if job.user_id == user_id]
+        else:
+            job_ids = await self.redis.zrange(self._user_key(user_id), 0, -1)
+            loaded = await asyncio.gather(*(self.get(self._decode(job_id)) for job_id in job_ids))
+            jobs = [job for job in loaded if job is not None]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Annuler un job: un job en attente ne sera jamais exécuté, un job en
+        cours est interrompu par le worker qui l'exécute (CancelledError).
+        """
+        job = await self.get(job_id)
+        if job is None or job.is_final:
+            return job
+
+        job.cancel_requested = True
+        if job.status == JOB_QUEUED:
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+        await self._save(job)
+
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return job
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self.redis is not None else "local",
+            "workers": len(self._worker_tasks),
+            "running": len(self._running),
+            "handlers": sorted(self._handlers)
+        }
+
+    # --- Workers ------------------------------------------------------------------
+
+    async def _worker(self, index: int):
+        while True:
+            # Job retiré de la file et pas encore confié à _execute
+            pending_id = None
+            try:
+                pending_id = await self._dequeue()
+                if pending_id is None:
+                    continue
+                job = await self.get(pending_id)
+                if job is None or job.status != JOB_QUEUED:
+                    pending_id = None
+                    continue
+
+                if not await self._claim_user_slot(job):
+                    # Plafond de l'utilisateur atteint: repasser en fin de file
+                    await self._enqueue(job)
+                    pending_id = None
+                    await asyncio.sleep(0.2)
+                    continue
+
+                pending_id = None
+                try:
+                    await self._execute(job)
+                finally:
+                    await self._release_user_slot(job)
+
+            except asyncio.CancelledError:
+                if pending_id is not None:
+                    job = await self.get(pending_id)
+                    if job is not None and job.status == JOB_QUEUED:
+                        await self._enqueue(job, front=True)
+                raise
+            except Exception as e:
+                logger.error("Erreur du worker de jobs", worker=index, error=str(e))
+                await asyncio.sleep(1.0)
+
+    async def _execute(self, job: Job):
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        await self._save(job)
+
+        task = asyncio.create_task(
+            asyncio.wait_for(self._handlers[job.kind](job, JobContext(self, job)), self.job_timeout)
+        )
+        self._running[job.id] = task
+        watcher = asyncio.create_task(self._watch_cancellation(job.id, task))
+        interrupted = False
+
+        try:
+            job.result = await task
+            job.status = JOB_COMPLETED
+            job.progress = 1.0
+        except asyncio.CancelledError:
+            if not job.cancel_requested and not (await self._cancel_requested(job.id)):
+                # Worker arrêté (stop): le job repasse en file au lieu de rester "running"
+                interrupted = True
+                job.status = JOB_QUEUED
+                job.started_at = None
+                job.message = "Interrompu par l'arrêt du worker, remis en file"
+                raise
+            job.status = JOB_CANCELLED
+        except asyncio.TimeoutError:
+            job.status = JOB_FAILED
+            job.error = f"Délai d'exécution dépassé ({self.job_timeout:.0f} s)"
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            logger.error("Job en échec", job_id=job.id, error=str(e))
+        finally:
+            watcher.cancel()
+            self._running.pop(job.id, None)
+            if interrupted:
+                await self._save(job)
+                await self._enqueue(job, front=True)
+                logger.info("Job interrompu remis en file", job_id=job.id)
+            else:
+                job.finished_at = time.time()
+                await self._save(job)
+
+        logger.info(
+            "Job terminé", job_id=job.id, status=job.status,
+            duration=round(job.finished_at - job.started_at, 2)
+        )
+
+    async def _watch_cancellation(self, job_id: str, task: asyncio.Task):
+        """Annulation demandée depuis un autre processus (flag dans Redis)"""
+        if self.redis is None:
+            return
+        while not task.done():
+            await asyncio.sleep(self.cancel_poll_interval)
+            if await self._cancel_requested(job_id):
+                task.cancel()
+                return
+
+    async def _cancel_requested(self, job_id: str) -> bool:
+        job = await self.get(job_id)
+        return bool(job and job.cancel_requested)
+
+    # --- Stockage -------------------------------------------------------------------
+
+    async def _save(self, job: Job):
+        if self.redis is None:
+            self._jobs[job.id] = job
+            return
+
+        if job.status == JOB_RUNNING and await self._cancel_requested(job.id):
+            # Ne pas écraser une demande d'annulation venue d'ailleurs
+            job.cancel_requested = True
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._job_key(job.id), json.dumps(job.to_dict(), default=str), ex=self.result_ttl)
+            pipe.zadd(self._user_key(job.user_id), {job.id: job.created_at})
+            pipe.expire(self._user_key(job.user_id), self.result_ttl)
+            pipe.zremrangebyscore(self._user_key(job.user_id), 0, time.time() - self.result_ttl)
+            await pipe.execute()
+
+    async def _enqueue(self, job: Job, front: bool = False):
+        """Ajouter en fin de file, ou en tête (prochain job servi) avec `front` sous Redis"""
+        if self.redis is None:
+            # File locale: perdue avec le processus, l'ordre importe peu
+            self._local_queue.put_nowait(job.id)
+        elif front:
+            # BRPOP consomme par la droite
+            await self.redis.rpush(self._queue_key(job.kind), job.id)
+        else:
+            await self.redis.lpush(self._queue_key(job.kind), job.id)
+
+    async def _dequeue(self, timeout: float = 1.0) -> Optional[str]:
+        kinds = sorted(self._handlers)
+        if not kinds:
+            await asyncio.sleep(timeout)
+            return None
+
+        if self.redis is None:
+            try:
+                return await asyncio.wait_for(self._local_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        item = await self.redis.brpop([self._queue_key(kind) for kind in kinds], timeout=timeout)
+        return self._decode(item[1]) if item else None
+
+    async def _claim_user_slot(self, job: Job) -> bool:
+        if self.redis is None:
+            slots = self._user_slots.setdefault(job.user_id, set())
+            if len(slots) >= self.max_running_per_user:
+                return False
+            slots.add(job.id)
+            return True
+        claimed = await self._claim_slot(
+            keys=[self._slots_key(job.user_id)],
+            # Expire avec le délai maximal: un worker tombé ne bloque pas l'utilisateur
+            args=[job.id, self.max_running_per_user, int(self.job_timeout) + 60]
+        )
+        return bool(claimed)
+
+    async def _release_user_slot(self, job: Job):
+        if self.redis is None:
+            self._user_slots.get(job.user_id, set()).discard(job.id)
+        else:
+            await self.redis.srem(self._slots_key(job.user_id), job.id)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.key_prefix}:job:{job_id}"
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.key_prefix}:user:{user_id}"
+
+    def _slots_key(self, user_id: str) -> str:
+        return f"{self.key_prefix}:running:{user_id}"
+
+    def _queue_key(self, kind: str) -> str:
+        return f"{self.key_prefix}:queue:{kind}"
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
@@ -4,9 +4,10 @@ Implémente la hiérarchie de mémoire selon la documentation technique
 """
 
 import asyncio
+import json
 import logging
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterable, AsyncIterator, Iterable, Union
 from uuid import UUID, uuid4
 
 import asyncpg
@@ -15,6 +16,8 @@ from pgvector.asyncpg import register_vector
 
 from config.settings import get_settings
 from services.external_services import ExternalServicesManager
+from services.partition_manager import PartitionManager
+from services.vector_index_manager import LEXICAL_CONFIG, MEMORY_LEVELS, VectorIndexManager
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +26,91 @@ class MemoryLevel:
     L2 = "L2"  # Mémoire de travail (jours/semaines) 
     L3 = "L3"  # Mémoire à long terme (mois/années)
 
+# Mots-clés augmentant l'importance d'une mémoire
+IMPORTANT_KEYWORDS = (
+    "important", "urgent", "critique", "essentiel", "priorité",
+    "décision", "objectif", "projet", "deadline", "problème"
+)
+
+# Règles de consolidation (une transaction courte par bloc de $1 lignes)
+CONSOLIDATION_STEPS = (
+    # L1 -> L2: mémoires importantes de plus de 1 jour
+    ("l1_to_l2", """
+    WITH batch AS (
+        SELECT id FROM memories
+        WHERE level = 'L1'
+          AND importance >= 0.7
+          AND created_at < NOW() - INTERVAL '1 day'
+          {scope}
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    ), moved AS (
+        UPDATE memories m
+        SET level = 'L2', updated_at = NOW(),
+            expires_at = NOW() + INTERVAL '30 days'
+        FROM batch
+        WHERE m.id = batch.id
+        RETURNING m.id
+    )
+    SELECT COUNT(*) FROM moved
+    """),
+    # L2 -> L3: mémoires très importantes de plus de 7 jours
+    ("l2_to_l3", """
+    WITH batch AS (
+        SELECT id FROM memories
+        WHERE level = 'L2'
+          AND importance >= 0.8
+          AND created_at < NOW() - INTERVAL '7 days'
+          {scope}
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    ), moved AS (
+        UPDATE memories m
+        SET level = 'L3', updated_at = NOW(),
+            expires_at = NOW() + INTERVAL '1 year'
+        FROM batch
+        WHERE m.id = batch.id
+        RETURNING m.id
+    )
+    SELECT COUNT(*) FROM moved
+    """),
+    # Suppression des mémoires expirées et des L1 de faible importance
+    ("deleted", """
+    WITH batch AS (
+        SELECT id FROM memories
+        WHERE (expires_at < NOW() OR (importance < 0.3 AND level = 'L1'))
+          {scope}
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    ), removed AS (
+        DELETE FROM memories m
+        USING batch
+        WHERE m.id = batch.id
+        RETURNING m.id
+    )
+    SELECT COUNT(*) FROM removed
+    """)
+)
+
+# Avec partitions, les L1/L2 expirées disparaissent avec leur partition mensuelle
+PARTITIONED_CONSOLIDATION_STEPS = CONSOLIDATION_STEPS[:2] + (
+    ("deleted", """
+    WITH batch AS (
+        SELECT id FROM memories
+        WHERE ((level = 'L3' AND expires_at < NOW()) OR (importance < 0.3 AND level = 'L1'))
+          {scope}
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    ), removed AS (
+        DELETE FROM memories m
+        USING batch
+        WHERE m.id = batch.id
+        RETURNING m.id
+    )
+    SELECT COUNT(*) FROM removed
+    """),
+)
+
 class MemoryService:
     """Service de gestion des mémoires avec hiérarchie L1/L2/L3"""
     
@@ -30,23 +118,42 @@ class MemoryService:
         self.settings = get_settings()
         self.external_services = external_services
         self.pool: Optional[asyncpg.Pool] = None
+        self.index_manager: Optional[VectorIndexManager] = None
+        self.partition_manager: Optional[PartitionManager] = None
+        self.partitioned = False
+        self._index_task: Optional[asyncio.Task] = None
+        self._iterative_scan_supported: Optional[bool] = None
         
     async def initialize(self):
         """Initialise la connexion à PostgreSQL"""
         try:
+            # Le type vector est enregistré sur chaque connexion du pool
             self.pool = await asyncpg.create_pool(
-                host=self.settings.postgres_host,
-                port=self.settings.postgres_port,
-                user=self.settings.postgres_user,
-                password=self.settings.postgres_password,
-                database=self.settings.postgres_db,
+                self.settings.database_url,
                 min_size=5,
-                max_size=20
+                max_size=self.settings.db_pool_size,
+                init=register_vector
             )
             
-            # Enregistrer le type vector pour pgvector
-            async with self.pool.acquire() as conn:
-                await register_vector(conn)
+            self.index_manager = VectorIndexManager(
+                self.pool,
+                m=self.settings.vector_index_m,
+                ef_construction=self.settings.vector_index_ef_construction
+            )
+            self.partition_manager = PartitionManager(
+                self.pool,
+                premake_months=self.settings.memory_partition_premake_months,
+                hnsw_m=self.settings.vector_index_m,
+                hnsw_ef_construction=self.settings.vector_index_ef_construction
+            )
+            
+            if self.settings.memory_partitioning_enabled:
+                await self._initialize_partitions()
+            
+            # Avec partitions, chaque feuille porte déjà son index HNSW
+            if self.settings.vector_index_auto_create and not self.partitioned:
+                # Construction en arrière-plan: ne bloque pas le démarrage
+                self._index_task = asyncio.create_task(self._ensure_vector_indexes())
                 
             logger.info("MemoryService initialisé avec succès")
             
@@ -54,8 +161,31 @@ class MemoryService:
             logger.error(f"Erreur lors de l'initialisation de MemoryService: {e}")
             raise
     
+    async def _initialize_partitions(self):
+        exists = await self.pool.fetchval("SELECT to_regclass('memories') IS NOT NULL")
+        if not exists:
+            await self.partition_manager.create_schema()
+        
+        self.partitioned = await self.partition_manager.is_partitioned()
+        if self.partitioned:
+            await self.partition_manager.ensure_future_partitions()
+        else:
+            logger.warning(
+                "Table memories non partitionnée: lancer PartitionManager.migrate_existing_table()"
+            )
+    
+    async def _ensure_vector_indexes(self):
+        try:
+            status = await self.index_manager.ensure_indexes()
+            status["content_tsv"] = await self.index_manager.ensure_lexical_index()
+            logger.info(f"Index vectoriels et plein texte: {status}")
+        except Exception as e:
+            logger.error(f"Erreur lors de la création des index vectoriels: {e}")
+    
     async def close(self):
         """Ferme les connexions"""
+        if self._index_task and not self._index_task.done():
+            self._index_task.cancel()
         if self.pool:
             await self.pool.close()
     
@@ -71,8 +201,8 @@ class MemoryService:
         """Crée une nouvelle mémoire avec embedding"""
         
         try:
-            # Générer l'embedding du contenu
-            embedding = await self.external_services.voyage_ai.get_embedding(content)
+            # Générer l'embedding du contenu (regroupé avec les appels concurrents)
+            embedding = await self.external_services.voyage.create_single_embedding(content)
             
             # Calculer l'importance automatiquement si non fournie
             if importance == 0.5:  # Valeur par défaut
@@ -95,7 +225,7 @@ class MemoryService:
                 result = await conn.fetchrow(
                     query,
                     memory_id, user_id, content, level, importance,
-                    embedding, metadata or {}, conversation_id, expires_at
+                    embedding, json.dumps(metadata or {}), conversation_id, expires_at
                 )
                 
                 logger.info(f"Mémoire {level} créée: {memory_id}")
@@ -114,72 +244,382 @@ class MemoryService:
             logger.error(f"Erreur lors de la création de mémoire: {e}")
             raise
     
+    async def create_memories_bulk(
+        self,
+        user_id: UUID,
+        items: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+        chunk_size: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Import massif de mémoires.
+        
+        Les éléments sont traités par blocs: embeddings par lots de la taille
+        acceptée par le fournisseur, importance calculée en bloc, puis écriture
+        par COPY dans une transaction par bloc. L'embedding du bloc suivant
+        est lancé pendant l'écriture du bloc courant.
+        
+        Produit un résultat par élément, dans l'ordre d'entrée:
+        {"index", "status": "created", "id", ...} ou {"index", "status": "error", "error"}.
+        """
+        chunk_size = chunk_size or self.settings.memory_bulk_chunk_size
+        pending: Optional[asyncio.Task] = None
+        
+        try:
+            async for chunk in self._iter_chunks(items, chunk_size):
+                prepared = asyncio.create_task(self._prepare_bulk_chunk(user_id, chunk))
+                
+                if pending is not None:
+                    for result in await self._write_bulk_chunk(await pending):
+                        yield result
+                pending = prepared
+                
+            if pending is not None:
+                for result in await self._write_bulk_chunk(await pending):
+                    yield result
+                pending = None
+        finally:
+            # Client déconnecté: ne pas laisser d'embedding orphelin
+            if pending is not None and not pending.done():
+                pending.cancel()
+    
+    @staticmethod
+    async def _iter_chunks(
+        items: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+        chunk_size: int
+    ) -> AsyncIterator[List[Tuple[int, Dict[str, Any]]]]:
+        """Découper une source (synchrone ou asynchrone) en blocs indexés"""
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        index = 0
+        
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                chunk.append((index, item))
+                index += 1
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        else:
+            for item in items:
+                chunk.append((index, item))
+                index += 1
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+                    
+        if chunk:
+            yield chunk
+    
+    async def _prepare_bulk_chunk(
+        self,
+        user_id: UUID,
+        chunk: List[Tuple[int, Dict[str, Any]]]
+    ) -> Tuple[List[Tuple], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Valider, encoder et préparer les enregistrements COPY d'un bloc"""
+        errors: List[Dict[str, Any]] = []
+        valid: List[Tuple[int, Dict[str, Any], Optional[float], Optional[UUID]]] = []
+        
+        # Tout est validé et converti avant l'embedding: une ligne invalide
+        # reste une erreur de ligne et n'interrompt pas le flux
+        for index, item in chunk:
+            content = item.get("content")
+            level = item.get("level") or MemoryLevel.L1
+            if item.get("error"):
+                errors.append({"index": index, "status": "error", "error": item["error"]})
+            elif not isinstance(content, str) or not content.strip():
+                errors.append({"index": index, "status": "error", "error": "Contenu vide"})
+            elif level not in MEMORY_LEVELS:
+                errors.append({"index": index, "status": "error", "error": f"Niveau invalide: {level}"})
+            else:
+                try:
+                    importance = None if item.get("importance") is None else float(item["importance"])
+                except (TypeError, ValueError):
+                    errors.append({"index": index, "status": "error", "error": f"Importance invalide: {item['importance']}"})
+                    continue
+                try:
+                    conversation_id = item.get("conversation_id")
+                    if conversation_id and not isinstance(conversation_id, UUID):
+                        conversation_id = UUID(str(conversation_id))
+                except ValueError:
+                    errors.append({"index": index, "status": "error", "error": f"conversation_id invalide: {conversation_id}"})
+                    continue
+                valid.append((index, item, importance, conversation_id or None))
+        
+        if not valid:
+            return [], [], errors
+        
+        contents = [item["content"] for _, item, _, _ in valid]
+        levels = [item.get("level") or MemoryLevel.L1 for _, item, _, _ in valid]
+        
+        try:
+            embeddings = await self.external_services.voyage.create_embeddings(contents)
+        except Exception as e:
+            logger.error(f"Erreur d'embedding pour un bloc de {len(valid)} mémoires: {e}")
+            errors.extend(
+                {"index": index, "status": "error", "error": f"Embedding: {e}"}
+                for index, _, _, _ in valid
+            )
+            return [], [], errors
+        
+        computed = self._calculate_importance_bulk(contents, levels)
+        expirations = {level: self._calculate_expiration(level) for level in set(levels)}
+        owner = user_id if isinstance(user_id, UUID) else UUID(str(user_id))
+        
+        records: List[Tuple] = []
+        results: List[Dict[str, Any]] = []
+        for (index, item, requested_importance, conversation_id), content, level, embedding, importance in zip(
+            valid, contents, levels, embeddings, computed
+        ):
+            if requested_importance is not None:
+                importance = requested_importance
+            memory_id = uuid4()
+            
+            records.append((
+                memory_id, owner, content, level, importance, embedding,
+                json.dumps(item.get("metadata") or {}),
+                conversation_id,
+                expirations[level]
+            ))
+            results.append({
+                "index": index,
+                "status": "created",
+                "id": str(memory_id),
+                "level": level,
+                "importance": importance,
+                "expires_at": expirations[level].isoformat()
+            })
+        
+        return records, results, errors
+    
+    async def _write_bulk_chunk(
+        self,
+        prepared: Tuple[List[Tuple], List[Dict[str, Any]], List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Écrire un bloc par COPY (une transaction par bloc)"""
+        records, results, errors = prepared
+        
+        if records:
+            try:
+                async with self.pool.acquire() as conn:
+                    async with conn.transaction():
+                        await conn.copy_records_to_table(
+                            "memories",
+                            records=records,
+                            columns=[
+                                "id", "user_id", "content", "level", "importance",
+                                "embedding", "metadata", "conversation_id", "expires_at"
+                            ]
+                        )
+                logger.info(f"{len(records)} mémoires importées")
+            except Exception as e:
+                logger.error(f"Erreur lors de l'import d'un bloc de {len(records)} mémoires: {e}")
+                results = [
+                    {"index": result["index"], "status": "error", "error": str(e)}
+                    for result in results
+                ]
+        
+        return sorted(results + errors, key=lambda result: result["index"])
+    
     async def search_memories(
         self,
         user_id: UUID,
         query: str,
         level: Optional[str] = None,
         limit: int = 10,
-        similarity_threshold: float = 0.7
+        similarity_threshold: float = 0.7,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """Recherche sémantique dans les mémoires"""
         
         try:
             # Générer l'embedding de la requête
-            query_embedding = await self.external_services.voyage_ai.get_embedding(query)
+            query_embedding = await self.external_services.voyage.create_single_embedding(
+                query, input_type="query"
+            )
             
-            async with self.pool.acquire() as conn:
-                # Construire la requête SQL avec filtres optionnels
-                where_conditions = ["user_id = $1", "expires_at > NOW()"]
-                params = [user_id]
-                param_count = 1
-                
-                if level:
-                    param_count += 1
-                    where_conditions.append(f"level = ${param_count}")
-                    params.append(level)
-                
-                # Ajouter le seuil de similarité
-                param_count += 1
-                where_conditions.append(f"1 - (embedding <=> ${param_count}) >= ${param_count + 1}")
-                params.extend([query_embedding, similarity_threshold])
-                
-                sql_query = f"""
-                SELECT 
-                    id, content, level, importance, created_at, updated_at,
-                    metadata, conversation_id,
-                    1 - (embedding <=> ${param_count}) as similarity
-                FROM memories 
-                WHERE {' AND '.join(where_conditions)}
-                ORDER BY similarity DESC, importance DESC, created_at DESC
-                LIMIT ${param_count + 2}
-                """
-                
-                params.append(limit)
-                
-                results = await conn.fetch(sql_query, *params)
-                
-                memories = []
-                for row in results:
-                    memories.append({
-                        "id": row["id"],
-                        "content": row["content"],
-                        "level": row["level"],
-                        "importance": row["importance"],
-                        "similarity": float(row["similarity"]),
-                        "created_at": row["created_at"],
-                        "updated_at": row["updated_at"],
-                        "metadata": row["metadata"],
-                        "conversation_id": row["conversation_id"]
-                    })
-                
-                logger.info(f"Trouvé {len(memories)} mémoires pour la requête: {query[:50]}...")
-                return memories
+            memories = await self.search_memories_by_embedding(
+                user_id,
+                query_embedding,
+                level=level,
+                limit=limit,
+                similarity_threshold=similarity_threshold,
+                ef_search=ef_search,
+                probes=probes
+            )
+            
+            logger.info(f"Trouvé {len(memories)} mémoires pour la requête: {query[:50]}...")
+            return memories
                 
         except Exception as e:
             logger.error(f"Erreur lors de la recherche de mémoires: {e}")
             raise
     
+    async def search_memories_by_embedding(
+        self,
+        user_id: UUID,
+        query_embedding: List[float],
+        level: Optional[str] = None,
+        limit: int = 10,
+        similarity_threshold: float = 0.7,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche ANN à partir d'un embedding déjà calculé.
+        
+        Chaque niveau est interrogé sous la forme `ORDER BY embedding <=> $q
+        LIMIT k`, seule forme servie par les index HNSW partiels; le seuil de
+        similarité est appliqué ensuite sur les candidats. `ef_search` et
+        `probes` règlent le compromis rappel/latence pour cette requête.
+        
+        Si la table est partitionnée, le niveau littéral élague les autres
+        niveaux au plan et `expires_at > NOW()` les mois expirés à l'exécution.
+        
+        Les index sont communs à tous les utilisateurs: sans parcours itératif
+        (pgvector >= 0.8), HNSW ne rendrait que `ef_search` candidats avant le
+        filtre `user_id`, et un utilisateur minoritaire aucun résultat. Le
+        parcours itératif continue jusqu'à `limit` lignes de l'utilisateur;
+        à défaut, la recherche repasse en scan exact par utilisateur.
+        """
+        
+        levels = [level] if level else list(MEMORY_LEVELS)
+        if any(item not in MEMORY_LEVELS for item in levels):
+            raise ValueError(f"Niveau de mémoire inconnu: {level}")
+        
+        # Sur-échantillonner pour compenser le filtrage par seuil et par utilisateur
+        candidate_limit = limit * max(1, self.settings.vector_search_overfetch)
+        # hnsw.ef_search est borné à 1000 par pgvector
+        ef_search = min(1000, max(ef_search or self.settings.vector_search_ef_search, candidate_limit))
+        probes = probes or self.settings.vector_search_probes
+        
+        # Niveau en littéral (liste blanche) pour que le planificateur
+        # associe chaque sous-requête à son index partiel
+        candidates = " UNION ALL ".join(
+            f"""(
+                SELECT id, content, level, importance, created_at, updated_at,
+                       metadata, conversation_id, embedding <=> $2 AS distance
+                FROM memories
+                WHERE user_id = $1 AND level = '{item}' AND expires_at > NOW()
+                ORDER BY embedding <=> $2
+                LIMIT $3
+            )"""
+            for item in levels
+        )
+        
+        sql_query = f"""
+        SELECT id, content, level, importance, created_at, updated_at,
+               metadata, conversation_id, 1 - distance AS similarity
+        FROM ({candidates}) candidates
+        WHERE distance <= $4
+        ORDER BY distance, importance DESC, created_at DESC
+        LIMIT $5
+        """
+        
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "SELECT set_config('hnsw.ef_search', $1, true), "
+                    "set_config('ivfflat.probes', $2, true)",
+                    str(ef_search), str(probes)
+                )
+                iterative_scan = await self._iterative_scan_mode(conn)
+                if iterative_scan:
+                    await conn.execute(
+                        "SELECT set_config('hnsw.iterative_scan', $1, true), "
+                        "set_config('hnsw.max_scan_tuples', $2, true)",
+                        iterative_scan, str(self.settings.vector_search_max_scan_tuples)
+                    )
+                else:
+                    # Scan exact: lignes de l'utilisateur via l'index user_id (bitmap), sans HNSW
+                    await conn.execute("SELECT set_config('enable_indexscan', 'off', true)")
+                
+                results = await conn.fetch(
+                    sql_query,
+                    user_id, query_embedding, candidate_limit,
+                    1 - similarity_threshold, limit
+                )
+        
+        return [
+            {
+                "id": row["id"],
+                "content": row["content"],
+                "level": row["level"],
+                "importance": row["importance"],
+                "similarity": float(row["similarity"]),
+                "created_at": row["created_at"],
+                "updated_at": row["updated_at"],
+                "metadata": row["metadata"],
+                "conversation_id": row["conversation_id"]
+            }
+            for row in results
+        ]
+    
+    async def _iterative_scan_mode(self, conn) -> Optional[str]:
+        """Mode de parcours itératif HNSW, None s'il est désactivé ou non supporté"""
+        mode = self.settings.vector_search_iterative_scan
+        if not mode or mode == "off":
+            return None
+        
+        if self._iterative_scan_supported is None:
+            version = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            numbers = tuple(int(part) for part in (version or "0").split(".")[:2] if part.isdigit())
+            self._iterative_scan_supported = numbers >= (0, 8)
+            if not self._iterative_scan_supported:
+                logger.warning(
+                    f"pgvector {version} sans parcours itératif: recherche vectorielle en scan exact"
+                )
+        
+        return mode if self._iterative_scan_supported else None
+    
+    async def search_memories_lexical(
+        self,
+        user_id: UUID,
+        query: str,
+        level: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche plein texte (tsvector/GIN).
+        
+        Complète la recherche vectorielle pour les termes exacts (identifiants,
+        noms, codes d'erreur) que les embeddings rapprochent mal.
+        `lexical_score` est le ts_rank_cd normalisé par la longueur.
+        """
+        
+        if level and level not in MEMORY_LEVELS:
+            raise ValueError(f"Niveau de mémoire inconnu: {level}")
+        
+        level_filter = f"AND level = '{level}'" if level else ""
+        sql_query = f"""
+        SELECT id, content, level, importance, created_at, updated_at,
+               metadata, conversation_id,
+               ts_rank_cd(content_tsv, query, 32) AS lexical_score
+        FROM memories, websearch_to_tsquery('{LEXICAL_CONFIG}', $2) query
+        WHERE user_id = $1 {level_filter}
+          AND content_tsv @@ query
+          AND expires_at > NOW()
+        ORDER BY lexical_score DESC, importance DESC
+        LIMIT $3
+        """
+        
+        async with self.pool.acquire() as conn:
+            results = await conn.fetch(sql_query, user_id, query, limit)
+        
+        return [
+            {
+                "id": row["id"],
+                "content": row["content"],
+                "level": row["level"],
+                "importance": row["importance"],
+                "lexical_score": float(row["lexical_score"]),
+                "created_at": row["created_at"],
+                "updated_at": row["updated_at"],
+                "metadata": row["metadata"],
+                "conversation_id": row["conversation_id"]
+            }
+            for row in results
+        ]
+    
     async def get_memory_by_id(self, user_id: UUID, memory_id: UUID) -> Optional[Dict[str, Any]]:
         """Récupère une mémoire par son ID"""
         
@@ -213,6 +653,173 @@ class MemoryService:
             logger.error(f"Erreur lors de la récupération de mémoire {memory_id}: {e}")
             raise
     
+    async def get_memories_changed_since(
+        self,
+        user_id: UUID,
+        since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Mémoires actives modifiées depuis `since` (toutes si None), dans
+        l'ordre des modifications. Sert la validation incrémentale.
+        """
+        
+        query = """
+        SELECT id, content, level, importance, created_at, updated_at,
+               metadata, conversation_id
+        FROM memories
+        WHERE user_id = $1
+          AND expires_at > NOW()
+          AND ($2::timestamptz IS NULL OR updated_at >= $2)
+        ORDER BY updated_at, id
+        """
+        
+        try:
+            async with self.pool.acquire() as conn:
+                results = await conn.fetch(query, user_id, since)
+            return [dict(row) for row in results]
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des mémoires modifiées: {e}")
+            raise
+    
+    async def iter_memories_for_analysis(
+        self,
+        user_id: Optional[UUID] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        include_embeddings: bool = True
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Mémoires actives par blocs, des plus récentes aux plus anciennes.
+        
+        Lecture par curseur côté serveur dans une transaction en lecture
+        seule: seul le bloc courant est chargé. La connexion reste prise
+        jusqu'à la fin (ou la fermeture) de l'itération.
+        """
+        chunk_size = chunk_size or self.settings.memory_analysis_chunk_size
+        columns = "id, content, level, importance, created_at, metadata, conversation_id"
+        if include_embeddings:
+            columns += ", embedding"
+        
+        query = f"""
+        SELECT {columns}
+        FROM memories
+        WHERE expires_at > NOW()
+          AND ($1::uuid IS NULL OR user_id = $1)
+          AND ($2::timestamptz IS NULL OR created_at >= $2)
+        ORDER BY created_at DESC, id
+        LIMIT $3
+        """
+        
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction(readonly=True):
+                    cursor = await conn.cursor(query, user_id, since, limit)
+                    while True:
+                        rows = await cursor.fetch(chunk_size)
+                        if not rows:
+                            break
+                        yield [dict(row) for row in rows]
+                        
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture des mémoires à analyser: {e}")
+            raise
+    
+    async def get_memory_neighbors(
+        self,
+        user_id: UUID,
+        memory_ids: List[UUID],
+        k: int = 5,
+        similarity_threshold: float = 0.8
+    ) -> List[Dict[str, Any]]:
+        """
+        Plus proches voisines (même niveau) d'un ensemble de mémoires, hors
+        de cet ensemble; chaque voisine n'apparaît qu'une fois, avec sa
+        meilleure similarité. Une requête LATERAL par lot, pas par mémoire.
+        """
+        
+        if not memory_ids:
+            return []
+        
+        query = """
+        WITH sources AS (
+            SELECT id, level, embedding
+            FROM memories
+            WHERE user_id = $1 AND id = ANY($2::uuid[]) AND embedding IS NOT NULL
+        )
+        SELECT DISTINCT ON (n.id)
+               n.id, n.content, n.level, n.importance, n.created_at, n.updated_at,
+               n.metadata, n.conversation_id, 1 - n.distance AS similarity
+        FROM sources s
+        CROSS JOIN LATERAL (
+            SELECT m.id, m.content, m.level, m.importance, m.created_at, m.updated_at,
+                   m.metadata, m.conversation_id, m.embedding <=> s.embedding AS distance
+            FROM memories m
+            WHERE m.user_id = $1
+              AND m.level = s.level
+              AND m.expires_at > NOW()
+              AND m.id <> ALL($2::uuid[])
+            ORDER BY m.embedding <=> s.embedding
+            LIMIT $3
+        ) n
+        WHERE n.distance <= $4
+        ORDER BY n.id, n.distance
+        """
+        
+        try:
+            async with self.pool.acquire() as conn:
+                results = await conn.fetch(
+                    query, user_id, list(memory_ids), k, 1 - similarity_threshold
+                )
+            return [{**dict(row), "similarity": float(row["similarity"])} for row in results]
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche des mémoires voisines: {e}")
+            raise
+    
+    async def get_validation_watermark(
+        self,
+        user_id: UUID,
+        scope: str = "knowledge_validation"
+    ) -> Optional[Dict[str, Any]]:
+        """Dernier passage de validation réussi (watermark et dernier passage complet)"""
+        
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT watermark, last_full_sweep
+                FROM validation_watermarks
+                WHERE user_id = $1 AND scope = $2
+                """,
+                user_id, scope
+            )
+        return dict(row) if row else None
+    
+    async def set_validation_watermark(
+        self,
+        user_id: UUID,
+        watermark: datetime,
+        full_sweep: bool = False,
+        scope: str = "knowledge_validation"
+    ):
+        """Avancer le watermark (jamais en arrière); un passage complet le note aussi"""
+        
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO validation_watermarks (user_id, scope, watermark, last_full_sweep)
+                VALUES ($1, $2, $3, CASE WHEN $4 THEN $3 END)
+                ON CONFLICT (user_id, scope) DO UPDATE SET
+                    watermark = GREATEST(validation_watermarks.watermark, EXCLUDED.watermark),
+                    last_full_sweep = COALESCE(EXCLUDED.last_full_sweep, validation_watermarks.last_full_sweep),
+                    updated_at = NOW()
+                """,
+                user_id, scope, watermark, full_sweep
+            )
+        
+        logger.info(f"Watermark de validation {scope} pour {user_id}: {watermark.isoformat()}")
+    
     async def update_memory_importance(
         self, 
         user_id: UUID, 
@@ -245,54 +852,80 @@ class MemoryService:
         """Consolide les mémoires L1 -> L2 -> L3 selon l'importance"""
         
         try:
-            stats = {"l1_to_l2": 0, "l2_to_l3": 0, "deleted": 0}
+            stats = await self._run_consolidation(
+                self.settings.consolidation_chunk_size, user_id=user_id
+            )
+            stats.pop("chunks")
             
-            async with self.pool.acquire() as conn:
-                # Consolider L1 -> L2 (mémoires importantes de plus de 1 jour)
-                l1_to_l2_query = """
-                UPDATE memories 
-                SET level = 'L2', updated_at = NOW(),
-                    expires_at = NOW() + INTERVAL '30 days'
-                WHERE user_id = $1 
-                  AND level = 'L1' 
-                  AND importance >= 0.7
-                  AND created_at < NOW() - INTERVAL '1 day'
-                """
-                
-                result = await conn.execute(l1_to_l2_query, user_id)
-                stats["l1_to_l2"] = int(result.split()[-1]) if result.split()[-1].isdigit() else 0
-                
-                # Consolider L2 -> L3 (mémoires très importantes de plus de 7 jours)
-                l2_to_l3_query = """
-                UPDATE memories 
-                SET level = 'L3', updated_at = NOW(),
-                    expires_at = NOW() + INTERVAL '1 year'
-                WHERE user_id = $1 
-                  AND level = 'L2' 
-                  AND importance >= 0.8
-                  AND created_at < NOW() - INTERVAL '7 days'
-                """
-                
-                result = await conn.execute(l2_to_l3_query, user_id)
-                stats["l2_to_l3"] = int(result.split()[-1]) if result.split()[-1].isdigit() else 0
-                
-                # Supprimer les mémoires expirées de faible importance
-                delete_query = """
-                DELETE FROM memories 
-                WHERE user_id = $1 
-                  AND (expires_at < NOW() OR (importance < 0.3 AND level = 'L1'))
-                """
-                
-                result = await conn.execute(delete_query, user_id)
-                stats["deleted"] = int(result.split()[-1]) if result.split()[-1].isdigit() else 0
-                
-                logger.info(f"Consolidation terminée pour {user_id}: {stats}")
-                return stats
+            logger.info(f"Consolidation terminée pour {user_id}: {stats}")
+            return stats
                 
         except Exception as e:
             logger.error(f"Erreur lors de la consolidation: {e}")
             raise
     
+    async def consolidate_all_memories(
+        self,
+        chunk_size: Optional[int] = None,
+        max_chunks: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Consolidation globale (tous les utilisateurs) pour le balayage nocturne.
+        
+        Chaque bloc verrouille au plus `chunk_size` lignes avec
+        FOR UPDATE SKIP LOCKED et s'exécute dans sa propre transaction courte:
+        plusieurs workers peuvent lancer la tâche en parallèle sans s'attendre.
+        """
+        
+        try:
+            stats = await self._run_consolidation(
+                chunk_size or self.settings.consolidation_chunk_size,
+                max_chunks=max_chunks
+            )
+            
+            # L1/L2 expirées: suppression par partition entière
+            if self.partitioned:
+                partitions = await self.partition_manager.maintain()
+                stats["partitions_created"] = len(partitions["created"])
+                stats["partitions_dropped"] = len(partitions["dropped"])
+            
+            logger.info(f"Consolidation globale terminée: {stats}")
+            return stats
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la consolidation globale: {e}")
+            raise
+    
+    async def _run_consolidation(
+        self,
+        chunk_size: int,
+        user_id: Optional[UUID] = None,
+        max_chunks: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Appliquer les règles de consolidation bloc par bloc"""
+        stats = {"l1_to_l2": 0, "l2_to_l3": 0, "deleted": 0, "chunks": 0}
+        
+        # Filtre utilisateur optionnel ($2)
+        scope = "AND user_id = $2" if user_id is not None else ""
+        params = [chunk_size] + ([user_id] if user_id is not None else [])
+        
+        steps = PARTITIONED_CONSOLIDATION_STEPS if self.partitioned else CONSOLIDATION_STEPS
+        for key, statement in steps:
+            sql_query = statement.format(scope=scope)
+            while max_chunks is None or stats["chunks"] < max_chunks:
+                async with self.pool.acquire() as conn:
+                    # Le nombre de lignes vient de RETURNING, pas du statut de commande
+                    count = await conn.fetchval(sql_query, *params)
+                    
+                stats[key] += count
+                stats["chunks"] += 1
+                
+                # Bloc incomplet: plus rien à traiter (ou lignes prises par un autre worker)
+                if count < chunk_size:
+                    break
+                    
+        return stats
+    
     async def get_memory_stats(self, user_id: UUID) -> Dict[str, Any]:
         """Récupère les statistiques des mémoires d'un utilisateur"""
         
@@ -355,6 +988,15 @@ class MemoryService:
     
     async def _calculate_importance(self, content: str, level: str) -> float:
         """Calcule l'importance automatiquement basée sur le contenu et le niveau"""
+        return self._score_importance(content, level)
+    
+    def _calculate_importance_bulk(self, contents: List[str], levels: List[str]) -> List[float]:
+        """Importance d'un bloc de mémoires (sans aller-retour par élément)"""
+        return [self._score_importance(content, level) for content, level in zip(contents, levels)]
+    
+    @staticmethod
+    def _score_importance(content: str, level: str) -> float:
+        """Score d'importance heuristique (niveau, longueur, mots-clés)"""
         
         # Facteurs d'importance de base selon le niveau
         base_importance = {
@@ -372,13 +1014,8 @@ class MemoryService:
             importance -= 0.1
         
         # Mots-clés importants
-        important_keywords = [
-            "important", "urgent", "critique", "essentiel", "priorité",
-            "décision", "objectif", "projet", "deadline", "problème"
-        ]
-        
         content_lower = content.lower()
-        keyword_count = sum(1 for keyword in important_keywords if keyword in content_lower)
+        keyword_count = sum(1 for keyword in IMPORTANT_KEYWORDS if keyword in content_lower)
         importance += keyword_count * 0.05
         
         # Limiter entre 0.1 et 1.0
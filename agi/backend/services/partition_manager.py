@@ -0,0 +1,454 @@
+"""
+Partitionnement de la table des mémoires par niveau puis par date d'expiration
+L1/L2: sous-partitions mensuelles sur expires_at, supprimées en bloc une fois expirées,
+plus une partition DEFAULT pour les dates hors des mois créés
+L3: partition unique (expiration à la ligne, volume faible)
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from services.vector_index_manager import LEXICAL_COLUMN_SQL
+
+logger = logging.getLogger(__name__)
+
+# Niveaux sous-partitionnés par mois d'expiration
+TIME_PARTITIONED_LEVELS = ("L1", "L2")
+
+# Colonnes copiées (la colonne générée content_tsv est recalculée)
+MEMORY_COLUMNS = (
+    "id, user_id, content, level, importance, embedding, metadata, "
+    "conversation_id, created_at, updated_at, expires_at"
+)
+
+# Colonnes qui référencent memories(id). Une table partitionnée ne peut pas
+# porter d'unicité sur id seul: ces clés étrangères sont remplacées par un
+# trigger de suppression et par un nettoyage avant chaque DROP de partition.
+MEMORY_REFERENCES = (
+    ("memory_relations", "source_memory_id"),
+    ("memory_relations", "target_memory_id"),
+    ("memory_concepts", "memory_id")
+)
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+@dataclass
+class MonthlyPartition:
+    """Sous-partition mensuelle d'un niveau"""
+    table: str
+    level: str
+    start: date
+
+    @property
+    def end(self) -> date:
+        return add_months(self.start, 1)
+
+    @property
+    def name(self) -> str:
+        return f"{self.table}_{self.level.lower()}_p{self.start:%Y%m}"
+
+
+class PartitionManager:
+    """
+    Maintient les partitions de `memories`.
+
+    Schéma: LIST(level) puis, pour L1/L2, RANGE(expires_at) mensuel. Une
+    partition dont la borne haute est dépassée ne contient que des mémoires
+    expirées: elle est détachée (CONCURRENTLY si possible) puis supprimée, ce
+    qui remplace le DELETE ligne à ligne et évite bloat et VACUUM. Chaque
+    partition feuille porte son propre index HNSW, créé à vide.
+
+    Une partition DEFAULT par niveau reçoit les dates d'expiration sans mois
+    créé (au-delà de `premake_months`): l'insertion n'échoue jamais. Ses
+    lignes sont déplacées dans le mois correspondant quand il est créé.
+
+    Le filtre `level = 'Lx'` élague les niveaux au plan, et
+    `expires_at > NOW()` élague les mois expirés à l'exécution.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        table: str = "memories",
+        premake_months: int = 3,
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 64,
+        detach_lock_timeout_ms: int = 5000
+    ):
+        self.pool = pool
+        self.table = table
+        self.premake_months = premake_months
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.detach_lock_timeout_ms = detach_lock_timeout_ms
+        self._name_pattern = re.compile(rf"^{re.escape(table)}_(l[12])_p(\d{{4}})(\d{{2}})$")
+
+    async def is_partitioned(self) -> bool:
+        """La table est-elle déjà partitionnée ?"""
+        async with self.pool.acquire() as conn:
+            kind = await conn.fetchval(
+                "SELECT relkind FROM pg_class WHERE relname = $1 AND relkind IN ('r', 'p')",
+                self.table
+            )
+        return kind == "p"
+
+    async def create_schema(self):
+        """Créer la table partitionnée (installation neuve)"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+                    user_id UUID NOT NULL,
+                    content TEXT NOT NULL,
+                    level TEXT NOT NULL CHECK (level IN ('L1', 'L2', 'L3')),
+                    importance FLOAT NOT NULL DEFAULT 0.5,
+                    embedding vector(1536),
+                    metadata JSONB DEFAULT '{{}}',
+                    conversation_id UUID,
+                    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+                    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                    {LEXICAL_COLUMN_SQL},
+                    PRIMARY KEY (id, level, expires_at)
+                ) PARTITION BY LIST (level)
+                """)
+
+                for level in TIME_PARTITIONED_LEVELS:
+                    await conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.table}_{level.lower()}
+                    PARTITION OF {self.table} FOR VALUES IN ('{level}')
+                    PARTITION BY RANGE (expires_at)
+                    """)
+                    await self._create_default_partition(conn, level)
+
+                await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table}_l3
+                PARTITION OF {self.table} FOR VALUES IN ('L3')
+                """)
+
+                # Index partitionnés: propagés automatiquement aux feuilles
+                await conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.table}_user_level_expires_idx "
+                    f"ON {self.table} (user_id, level, expires_at)"
+                )
+                await conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.table}_content_tsv_idx "
+                    f"ON {self.table} USING gin (content_tsv)"
+                )
+                await self._create_vector_index(conn, f"{self.table}_l3")
+                await self._create_reference_cleanup(conn)
+
+        logger.info(f"Table {self.table} partitionnée créée")
+
+    async def maintain(self, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+        """Créer les partitions à venir et supprimer celles qui ont expiré"""
+        created = await self.ensure_future_partitions(now)
+        dropped = await self.drop_expired_partitions(now)
+        return {"created": created, "dropped": dropped}
+
+    async def ensure_future_partitions(
+        self,
+        now: Optional[datetime] = None,
+        until: Optional[date] = None
+    ) -> List[str]:
+        """Créer les partitions du mois courant et des `premake_months` suivants (ou jusqu'à `until`)"""
+        today = (now or datetime.now(timezone.utc)).date()
+        months = self.premake_months
+        if until is not None:
+            months = max(months, (until.year - today.year) * 12 + until.month - today.month)
+
+        existing = {partition.name for partition in await self.list_partitions()}
+        created: List[str] = []
+
+        async with self.pool.acquire() as conn:
+            for level in TIME_PARTITIONED_LEVELS:
+                # Tables partitionnées avant l'ajout des partitions DEFAULT
+                if not await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", self._default_partition(level)):
+                    async with conn.transaction():
+                        await self._create_default_partition(conn, level)
+                    created.append(self._default_partition(level))
+
+                for offset in range(months + 1):
+                    partition = MonthlyPartition(
+                        self.table, level, add_months(month_start(today), offset)
+                    )
+                    if partition.name in existing:
+                        continue
+
+                    async with conn.transaction():
+                        await self._create_monthly_partition(conn, partition)
+                    created.append(partition.name)
+
+        if created:
+            logger.info(f"Partitions créées: {created}")
+        return created
+
+    async def _create_monthly_partition(self, conn, partition: MonthlyPartition):
+        """
+        Créer un mois; les lignes déjà reçues par la partition DEFAULT pour
+        ce mois y sont déplacées (sinon PostgreSQL refuse la création).
+        """
+        parent = f"{self.table}_{partition.level.lower()}"
+        default = self._default_partition(partition.level)
+        in_range = (
+            f"expires_at >= '{partition.start.isoformat()}' AND expires_at < '{partition.end.isoformat()}'"
+        )
+        create = f"""
+        CREATE TABLE IF NOT EXISTS {partition.name}
+        PARTITION OF {parent}
+        FOR VALUES FROM ('{partition.start.isoformat()}') TO ('{partition.end.isoformat()}')
+        """
+
+        if not await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})"):
+            await conn.execute(create)
+            # Index construit sur une table vide: instantané
+            await self._create_vector_index(conn, partition.name)
+            return
+
+        # Rare (premake_months trop court): DEFAULT détachée le temps du déplacement
+        await conn.execute(f"ALTER TABLE {parent} DETACH PARTITION {default}")
+        await conn.execute(create)
+        await self._create_vector_index(conn, partition.name)
+        await conn.execute(
+            f"INSERT INTO {partition.name} ({MEMORY_COLUMNS}) "
+            f"SELECT {MEMORY_COLUMNS} FROM {default} WHERE {in_range}"
+        )
+        await conn.execute(f"DELETE FROM {default} WHERE {in_range}")
+        await conn.execute(f"ALTER TABLE {parent} ATTACH PARTITION {default} DEFAULT")
+        logger.info(f"Lignes de {default} déplacées dans {partition.name}")
+
+    async def drop_expired_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Détacher puis supprimer les partitions entièrement expirées.
+
+        DETACH CONCURRENTLY est refusé quand le parent a une partition
+        DEFAULT: le détachement prend un verrou ACCESS EXCLUSIVE sur le parent
+        du niveau (opération de catalogue, brève). Pour ne pas bloquer les
+        requêtes derrière une transaction longue, l'attente du verrou est
+        bornée par `detach_lock_timeout_ms`; la partition est alors laissée
+        pour la prochaine maintenance.
+        """
+        today = (now or datetime.now(timezone.utc)).date()
+        dropped: List[str] = []
+
+        for partition in await self.list_partitions():
+            if partition.end > today:
+                continue
+
+            parent = f"{self.table}_{partition.level.lower()}"
+            async with self.pool.acquire() as conn:
+                try:
+                    async with conn.transaction():
+                        await conn.execute(f"SET LOCAL lock_timeout = {int(self.detach_lock_timeout_ms)}")
+                        await conn.execute(f"ALTER TABLE {parent} DETACH PARTITION {partition.name}")
+                except asyncpg.LockNotAvailableError:
+                    logger.warning(f"Verrou indisponible pour détacher {partition.name}, reporté")
+                    continue
+
+                # DROP ne déclenche pas le trigger de suppression: références nettoyées avant
+                await self._delete_references(conn, f"SELECT id FROM {partition.name}")
+                await conn.execute(f"DROP TABLE IF EXISTS {partition.name}")
+            dropped.append(partition.name)
+
+        # Lignes expirées des partitions DEFAULT: DELETE (volume faible, trigger actif)
+        async with self.pool.acquire() as conn:
+            for level in TIME_PARTITIONED_LEVELS:
+                default = self._default_partition(level)
+                if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", default):
+                    await conn.execute(f"DELETE FROM {default} WHERE expires_at <= NOW()")
+
+        if dropped:
+            logger.info(f"Partitions expirées supprimées: {dropped}")
+        return dropped
+
+    async def migrate_existing_table(self, batch_size: int = 10000) -> int:
+        """
+        Convertir une table `memories` non partitionnée.
+
+        L'ancienne table est renommée `<table>_unpartitioned` puis recopiée par
+        blocs (ordre des id); les mémoires déjà expirées ne sont pas reprises.
+
+        Les clés étrangères vers l'ancienne table (memory_relations,
+        memory_concepts) suivraient le renommage: elles sont supprimées et
+        remplacées par le trigger de suppression de la nouvelle table. Les
+        références aux mémoires non reprises sont supprimées après la copie.
+        """
+        legacy = f"{self.table}_unpartitioned"
+
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(f"ALTER TABLE {self.table} RENAME TO {legacy}")
+                # Libérer les noms d'index (clé primaire, GIN plein texte, HNSW...) pour
+                # la nouvelle table: sinon CREATE INDEX IF NOT EXISTS l'ignorerait
+                indexes = await conn.fetch(
+                    """
+                    SELECT c.relname AS name
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE i.indrelid = $1::regclass
+                    """,
+                    legacy
+                )
+                for index in indexes:
+                    name = index["name"]
+                    suffix = name[len(self.table) + 1:] if name.startswith(f"{self.table}_") else name
+                    await conn.execute(f'ALTER INDEX "{name}" RENAME TO "{legacy}_{suffix}"')
+                foreign_keys = await conn.fetch(
+                    """
+                    SELECT conrelid::regclass::text AS table_name, conname
+                    FROM pg_constraint
+                    WHERE confrelid = $1::regclass AND contype = 'f'
+                    """,
+                    legacy
+                )
+                for foreign_key in foreign_keys:
+                    await conn.execute(
+                        f'ALTER TABLE {foreign_key["table_name"]} DROP CONSTRAINT "{foreign_key["conname"]}"'
+                    )
+            latest = await conn.fetchval(f"SELECT MAX(expires_at) FROM {legacy} WHERE level <> 'L3'")
+
+        await self.create_schema()
+        await self.ensure_future_partitions(until=latest.date() if latest else None)
+
+        copied = 0
+        last_id = None
+        async with self.pool.acquire() as conn:
+            while True:
+                last_id = await conn.fetchval(
+                    f"""
+                    WITH batch AS (
+                        SELECT {MEMORY_COLUMNS} FROM {legacy}
+                        WHERE ($1::uuid IS NULL OR id > $1) AND expires_at > NOW()
+                        ORDER BY id
+                        LIMIT $2
+                    ), copied AS (
+                        INSERT INTO {self.table} ({MEMORY_COLUMNS})
+                        SELECT {MEMORY_COLUMNS} FROM batch
+                        RETURNING id
+                    )
+                    SELECT id FROM copied ORDER BY id DESC LIMIT 1
+                    """,
+                    last_id, batch_size
+                )
+                if last_id is None:
+                    break
+                copied += batch_size
+
+            await self._delete_references(
+                conn, f"SELECT id FROM {legacy} EXCEPT SELECT id FROM {self.table}"
+            )
+
+        logger.info(f"Migration vers {self.table} partitionnée: ~{copied} mémoires copiées depuis {legacy}")
+        return copied
+
+    async def list_partitions(self) -> List[MonthlyPartition]:
+        """Sous-partitions mensuelles existantes (nommées par ce gestionnaire)"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT child.relname AS name
+                FROM pg_inherits i
+                JOIN pg_class parent ON parent.oid = i.inhparent
+                JOIN pg_class child ON child.oid = i.inhrelid
+                WHERE parent.relname = ANY($1::text[])
+                """,
+                [f"{self.table}_{level.lower()}" for level in TIME_PARTITIONED_LEVELS]
+            )
+
+        partitions = []
+        for row in rows:
+            match = self._name_pattern.match(row["name"])
+            if match:
+                level, year, month = match.groups()
+                partitions.append(
+                    MonthlyPartition(self.table, level.upper(), date(int(year), int(month), 1))
+                )
+        return sorted(partitions, key=lambda partition: (partition.level, partition.start))
+
+    async def get_partition_stats(self) -> List[Dict[str, Any]]:
+        """Taille et nombre estimé de lignes par partition feuille"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT c.relname AS name, c.reltuples::bigint AS estimated_rows,
+                       pg_total_relation_size(c.oid) AS size_bytes
+                FROM pg_partition_tree($1::regclass) t
+                JOIN pg_class c ON c.oid = t.relid
+                WHERE t.isleaf
+                ORDER BY c.relname
+                """,
+                self.table
+            )
+        return [dict(row) for row in rows]
+
+    def _default_partition(self, level: str) -> str:
+        return f"{self.table}_{level.lower()}_default"
+
+    async def _create_default_partition(self, conn, level: str):
+        await conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {self._default_partition(level)}
+        PARTITION OF {self.table}_{level.lower()} DEFAULT
+        """)
+        await self._create_vector_index(conn, self._default_partition(level))
+
+    async def _existing_references(self, conn) -> List[Tuple[str, str]]:
+        tables = await conn.fetch(
+            "SELECT name FROM unnest($1::text[]) AS name WHERE to_regclass(name) IS NOT NULL",
+            sorted({table for table, _ in MEMORY_REFERENCES})
+        )
+        existing = {row["name"] for row in tables}
+        return [(table, column) for table, column in MEMORY_REFERENCES if table in existing]
+
+    async def _delete_references(self, conn, ids_query: str):
+        """Supprimer les lignes qui référencent les mémoires renvoyées par `ids_query`"""
+        for table, column in await self._existing_references(conn):
+            await conn.execute(f"DELETE FROM {table} WHERE {column} IN ({ids_query})")
+
+    async def _create_reference_cleanup(self, conn):
+        """Trigger remplaçant ON DELETE CASCADE des références à memories(id)"""
+        references = await self._existing_references(conn)
+        if not references:
+            return
+
+        deletes = "\n".join(
+            f"DELETE FROM {table} WHERE {column} = OLD.id;" for table, column in references
+        )
+        # Un changement de partition (niveau, mois) est un DELETE suivi d'un
+        # INSERT: la ligne existe encore en fin d'instruction, rien à supprimer
+        await conn.execute(f"""
+        CREATE OR REPLACE FUNCTION {self.table}_delete_references() RETURNS trigger AS $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM {self.table} WHERE id = OLD.id) THEN
+                {deletes}
+            END IF;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+        await conn.execute(f"DROP TRIGGER IF EXISTS {self.table}_delete_references ON {self.table}")
+        await conn.execute(f"""
+        CREATE TRIGGER {self.table}_delete_references
+        AFTER DELETE ON {self.table}
+        FOR EACH ROW EXECUTE FUNCTION {self.table}_delete_references()
+        """)
+
+    async def _create_vector_index(self, conn, table: str):
+        await conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_embedding_hnsw ON {table} "
+            f"USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {int(self.hnsw_m)}, ef_construction = {int(self.hnsw_ef_construction)})"
+        )
@@ -0,0 +1,219 @@
+"""
+Scanner de patterns en une seule passe
+Une alternance compilée unique (groupes nommés: patterns regex, nombres,
+mots) parcourt chaque texte une fois; les mots alimentent des compteurs de
+n-grammes glissants à clés tuple et les nombres sont comptés au passage.
+Les textes sont consommés un à un et les compteurs sont bornés: la mémoire
+ne dépend pas du nombre de textes. Les résultats de scans de blocs
+successifs se fusionnent (`ScanResult.merge`) comme un scan unique.
+"""
+
+import logging
+import re
+import sys
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+NUMBER_REGEX = r"\b\d+(?:\.\d+)?\b"
+WORD_REGEX = r"\w+"
+
+# Nombres et mots contenus dans un match de pattern regex
+_TOKEN_RE = re.compile(f"(?P<number>{NUMBER_REGEX})|(?P<word>{WORD_REGEX})")
+
+DEFAULT_MAX_COUNTER_ENTRIES = 500_000
+
+
+class BoundedCounter(Counter):
+    """
+    Counter élagué au-delà de `max_entries` clés: les clés les moins
+    fréquentes sont retirées jusqu'à revenir à la moitié de la capacité.
+    Les comptes restent exacts tant qu'aucun élagage n'a eu lieu.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_COUNTER_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self.pruned = 0
+
+    def __reduce__(self):
+        # Counter.__reduce__ passerait les comptes à __init__ (renvoi depuis un worker)
+        return self.__class__, (self.max_entries,), {"pruned": self.pruned}, None, iter(self.items())
+
+    def add(self, key):
+        self[key] = self.get(key, 0) + 1
+        self.bound()
+
+    def bound(self):
+        """Élaguer si la capacité est dépassée"""
+        if len(self) <= self.max_entries:
+            return
+
+        size = len(self)
+        target = self.max_entries // 2
+        floor = 0
+        kept = dict(self)
+        while len(kept) > target:
+            floor += 1
+            kept = {key: count for key, count in kept.items() if count > floor}
+        self.clear()
+        dict.update(self, kept)
+        self.pruned += size - len(kept)
+        logger.debug(f"Compteur élagué: {len(kept)} clés conservées (seuil {floor})")
+
+
+@dataclass
+class ScanResult:
+    """
+    Comptes agrégés d'un scan. `head` et `tail` gardent les premiers et
+    derniers jetons (taille du plus grand n-gramme - 1) pour compter les
+    n-grammes à la jonction de deux scans fusionnés.
+    """
+    documents: int = 0
+    tokens: int = 0
+    pattern_counts: Dict[str, int] = field(default_factory=dict)
+    pattern_examples: Dict[str, List[str]] = field(default_factory=dict)
+    ngrams: Dict[int, BoundedCounter] = field(default_factory=dict)
+    numbers: BoundedCounter = field(default_factory=BoundedCounter)
+    max_examples: int = 5
+    head: List[str] = field(default_factory=list)
+    tail: List[str] = field(default_factory=list)
+
+    @property
+    def exact(self) -> bool:
+        """Faux si un compteur a été élagué (comptes alors minorés)"""
+        return not self.numbers.pruned and not any(counter.pruned for counter in self.ngrams.values())
+
+    def most_common_ngrams(self, size: int, limit: int) -> List[Tuple[str, int]]:
+        return [(" ".join(ngram), count) for ngram, count in self.ngrams[size].most_common(limit)]
+
+    def merge(self, other: "ScanResult") -> "ScanResult":
+        """Ajouter (en place) le scan des textes qui suivent ceux de ce résultat"""
+        edge = max(self.ngrams, default=1) - 1
+        boundary = self.tail + other.head
+        split = len(self.tail)
+
+        for size, counter in self.ngrams.items():
+            counter.update(other.ngrams[size])
+            counter.pruned += other.ngrams[size].pruned
+            # N-grammes commençant avant la jonction et finissant après
+            for start in range(max(0, split - size + 1), min(split, len(boundary) - size + 1)):
+                key = tuple(boundary[start:start + size])
+                counter[key] = counter.get(key, 0) + 1
+
+        self.numbers.update(other.numbers)
+        self.numbers.pruned += other.numbers.pruned
+        for name, count in other.pattern_counts.items():
+            self.pattern_counts[name] = self.pattern_counts.get(name, 0) + count
+            examples = self.pattern_examples.setdefault(name, [])
+            examples.extend(other.pattern_examples.get(name, [])[:max(0, self.max_examples - len(examples))])
+
+        # Tête incomplète tant que le premier scan compte moins de `edge` jetons
+        self.head = (self.head + other.head)[:edge]
+        self.tail = (self.tail + other.tail)[len(self.tail) + len(other.tail) - edge:] if edge else []
+        self.documents += other.documents
+        self.tokens += other.tokens
+
+        for counter in list(self.ngrams.values()) + [self.numbers]:
+            counter.bound()
+        return self
+
+
+class PatternScanner:
+    """
+    Compile les patterns regex nommés en une alternance avec les nombres et
+    les mots. À une position donnée, le premier pattern qui correspond
+    l'emporte (dans l'ordre de `regex_patterns`, puis nombre, puis mot): les
+    matches ne se chevauchent pas. Les nombres et mots contenus dans un match
+    de pattern sont tout de même comptés.
+
+    Comme l'extraction historique sur le texte joint par des espaces, la
+    fenêtre des n-grammes n'est pas réinitialisée entre deux textes.
+    """
+
+    def __init__(
+        self,
+        regex_patterns: Dict[str, str],
+        ngram_sizes: Sequence[int] = (2, 3),
+        max_examples: int = 5,
+        max_counter_entries: int = DEFAULT_MAX_COUNTER_ENTRIES
+    ):
+        reserved = {"number", "word"} & set(regex_patterns)
+        if reserved:
+            raise ValueError(f"Noms de patterns réservés: {sorted(reserved)}")
+
+        alternatives = [f"(?P<{name}>{regex})" for name, regex in regex_patterns.items()]
+        alternatives += [f"(?P<number>{NUMBER_REGEX})", f"(?P<word>{WORD_REGEX})"]
+        self._regex = re.compile("|".join(alternatives))
+
+        self.pattern_names = list(regex_patterns)
+        self.ngram_sizes = tuple(sorted(ngram_sizes))
+        self.max_examples = max_examples
+        self.max_counter_entries = max_counter_entries
+
+    def scan(self, texts: Iterable[str]) -> ScanResult:
+        """Parcourir les textes (itérable consommé une seule fois)"""
+        result = ScanResult(
+            pattern_counts={name: 0 for name in self.pattern_names},
+            pattern_examples={name: [] for name in self.pattern_names},
+            ngrams={size: BoundedCounter(self.max_counter_entries) for size in self.ngram_sizes},
+            numbers=BoundedCounter(self.max_counter_entries),
+            max_examples=self.max_examples
+        )
+        counters = list(result.ngrams.values()) + [result.numbers]
+        # Derniers jetons du texte précédent: n-grammes à cheval entre deux textes
+        carry: List[str] = []
+        carry_size = max(self.ngram_sizes, default=1) - 1
+
+        for text in texts:
+            result.documents += 1
+            words, numbers = self._tokenize(text, result)
+
+            # Comptage par texte (zip et Counter.update en C) plutôt que jeton par jeton
+            # Une seule mise en minuscules par texte (\x00 n'est pas un caractère de mot)
+            lowered = "\x00".join(words).lower().split("\x00") if words else []
+            tokens = carry + list(map(sys.intern, lowered))
+            for size, counter in result.ngrams.items():
+                start = max(0, len(carry) - (size - 1))
+                counter.update(zip(*(tokens[start + offset:] for offset in range(size))))
+            result.numbers.update(map(float, numbers))
+            result.tokens += len(tokens) - len(carry)
+            if len(result.head) < carry_size:
+                result.head = tokens[:carry_size]
+            carry = tokens[len(tokens) - carry_size:] if carry_size else []
+
+            # Bornes vérifiées par texte: dépassement limité à la taille d'un texte
+            for counter in counters:
+                counter.bound()
+
+        result.tail = carry
+        return result
+
+    def _tokenize(self, text: str, result: ScanResult) -> Tuple[List[str], List[str]]:
+        """Mots et nombres du texte; les matches de patterns sont comptés au passage"""
+        words: List[str] = []
+        numbers: List[str] = []
+
+        for match in self._regex.finditer(text):
+            kind = match.lastgroup
+            value = match.group()
+            if kind == "word":
+                words.append(value)
+            elif kind == "number":
+                numbers.append(value)
+                # "3.14" correspond aux mots "3" et "14"
+                words.extend(value.split("."))
+            else:
+                result.pattern_counts[kind] += 1
+                if len(result.pattern_examples[kind]) < self.max_examples:
+                    result.pattern_examples[kind].append(value)
+                for token in _TOKEN_RE.finditer(value):
+                    if token.lastgroup == "number":
+                        numbers.append(token.group())
+                        words.extend(token.group().split("."))
+                    else:
+                        words.append(token.group())
+
+        return words, numbers
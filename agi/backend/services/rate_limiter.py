@@ -0,0 +1,409 @@
+"""
+Gouverneur de débit des fournisseurs externes (Anthropic, Voyage AI, Cohere).
+Seaux à jetons requêtes/min et tokens/min partagés entre workers via Redis,
+sémaphores de requêtes en vol et pause commune après un 429.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Codes HTTP pour lesquels une nouvelle tentative a un sens
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+# Réserve atomique dans les deux seaux (requêtes, tokens).
+# Retourne 0 si la réservation est acceptée, sinon l'attente en ms.
+_RESERVE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+
+local cooldown = tonumber(redis.call('GET', KEYS[3]) or '0')
+if cooldown > now then
+    return cooldown - now
+end
+
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local function refill(key, capacity)
+    local data = redis.call('HMGET', key, 'level', 'ts')
+    local level = tonumber(data[1])
+    local ts = tonumber(data[2])
+    if level == nil or ts == nil then
+        return capacity
+    end
+    return math.min(capacity, level + math.max(0, now - ts) * capacity / 60000)
+end
+
+local wait = 0
+local req_level = 0
+local tok_level = 0
+
+if rpm > 0 then
+    req_level = refill(KEYS[1], rpm)
+    if req_level < 1 then
+        wait = math.ceil((1 - req_level) * 60000 / rpm)
+    end
+end
+
+if tpm > 0 and cost > 0 then
+    tok_level = refill(KEYS[2], tpm)
+    if tok_level < cost then
+        wait = math.max(wait, math.ceil((cost - tok_level) * 60000 / tpm))
+    end
+end
+
+if wait > 0 then
+    return wait
+end
+
+if rpm > 0 then
+    redis.call('HSET', KEYS[1], 'level', tostring(req_level - 1), 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], 120000)
+end
+if tpm > 0 and cost > 0 then
+    redis.call('HSET', KEYS[2], 'level', tostring(tok_level - cost), 'ts', now)
+    redis.call('PEXPIRE', KEYS[2], 120000)
+end
+return 0
+"""
+
+# Prolonge la pause commune sans jamais la raccourcir
+_COOLDOWN_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local until_ms = now + tonumber(ARGV[1])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if until_ms > current then
+    redis.call('SET', KEYS[1], until_ms, 'PX', tonumber(ARGV[1]))
+end
+return until_ms
+"""
+
+
+@dataclass
+class ProviderLimits:
+    """Budget d'un fournisseur (0 = illimité)."""
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+    max_concurrency: int = 0
+
+
+@dataclass
+class ProviderLimiterStats:
+    """Compteurs d'un fournisseur."""
+    acquired: int = 0
+    throttled: int = 0
+    total_wait_seconds: float = 0.0
+    rate_limited_responses: int = 0
+    rejected_try_acquire: int = 0
+    redis_errors: int = 0
+
+
+class _LocalBucket:
+    """Seau à jetons en mémoire (repli sans Redis)."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.level = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> float:
+        elapsed = max(0.0, now - self.updated_at)
+        self.level = min(self.capacity, self.level + elapsed * self.capacity / 60.0)
+        self.updated_at = now
+        return self.level
+
+    def wait_for(self, cost: float) -> float:
+        if self.level >= cost:
+            return 0.0
+        return (cost - self.level) * 60.0 / self.capacity
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière du nombre de tokens (~4 caractères par token)."""
+    return max(1, len(text) // 4)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Extraire l'en-tête Retry-After d'une erreur HTTP (secondes ou date)."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Erreurs transitoires: transport, timeouts et codes 408/429/5xx."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+class wait_retry_after:
+    """
+    Stratégie d'attente tenacity qui respecte Retry-After.
+
+    Si le fournisseur indique un délai il est utilisé tel quel (borné par
+    `max_wait`), sinon on se rabat sur la stratégie `fallback`.
+    """
+
+    def __init__(self, fallback, max_wait: float = 60.0):
+        self.fallback = fallback
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state) -> float:
+        outcome = retry_state.outcome
+        if outcome is not None and outcome.failed:
+            delay = retry_after_seconds(outcome.exception())
+            if delay is not None:
+                return min(delay, self.max_wait)
+        return self.fallback(retry_state)
+
+
+class ProviderRateLimiter:
+    """
+    Limiteur de débit par fournisseur.
+
+    Chaque fournisseur dispose de deux seaux à jetons (requêtes/min et
+    tokens/min) stockés dans Redis et mis à jour par un script Lua, de sorte
+    que tous les workers API consomment le même budget. Sans Redis (ou en
+    cas d'erreur Redis), des seaux locaux prennent le relais. Le nombre de
+    requêtes en vol est borné par un sémaphore propre au processus.
+
+    Un 429 déclenche une pause commune (`penalize`) respectée par tous les
+    workers jusqu'à l'expiration du Retry-After.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, ProviderLimits],
+        redis_client=None,
+        key_prefix: str = "ratelimit:v1:",
+        max_wait_seconds: float = 60.0
+    ):
+        self.limits = limits
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.max_wait_seconds = max_wait_seconds
+        self.stats: Dict[str, ProviderLimiterStats] = {
+            provider: ProviderLimiterStats() for provider in limits
+        }
+
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {provider: 0 for provider in limits}
+        self._local_buckets: Dict[str, Dict[str, _LocalBucket]] = {}
+        self._local_cooldowns: Dict[str, float] = {}
+        self._reserve_script = None
+        self._cooldown_script = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "ProviderRateLimiter":
+        """Construire le limiteur à partir des paramètres applicatifs."""
+        limits = {
+            provider: ProviderLimits(
+                requests_per_minute=getattr(settings, f"{provider}_requests_per_minute"),
+                tokens_per_minute=getattr(settings, f"{provider}_tokens_per_minute"),
+                max_concurrency=getattr(settings, f"{provider}_max_concurrency")
+            )
+            for provider in ("anthropic", "voyage", "cohere")
+        }
+        # Budget logique: reranks facultatifs de la recherche (try_acquire)
+        limits["search_rerank"] = ProviderLimits(
+            requests_per_minute=settings.search_rerank_per_minute
+        )
+        return cls(limits, max_wait_seconds=settings.provider_max_retry_after)
+
+    def attach_redis(self, redis_client):
+        """Partager les budgets via Redis."""
+        self.redis = redis_client
+        self._reserve_script = None
+        self._cooldown_script = None
+
+    @asynccontextmanager
+    async def limit(self, provider: str, tokens: int = 0) -> AsyncIterator[None]:
+        """
+        Réserver un créneau pour un appel au fournisseur.
+
+        Attend une place dans le sémaphore puis le budget requêtes/tokens.
+        """
+        semaphore = self._get_semaphore(provider)
+        if semaphore is None:
+            await self.acquire(provider, tokens)
+            yield
+            return
+
+        async with semaphore:
+            self._in_flight[provider] = self._in_flight.get(provider, 0) + 1
+            try:
+                await self.acquire(provider, tokens)
+                yield
+            finally:
+                self._in_flight[provider] -= 1
+
+    async def acquire(self, provider: str, tokens: int = 0):
+        """Attendre que le budget du fournisseur permette un appel."""
+        stats = self._get_stats(provider)
+        waited = 0.0
+
+        while True:
+            wait = await self._reserve(provider, tokens)
+            if wait <= 0:
+                break
+            if waited == 0.0:
+                stats.throttled += 1
+            wait = min(wait, self.max_wait_seconds)
+            await asyncio.sleep(wait)
+            waited += wait
+
+        stats.acquired += 1
+        stats.total_wait_seconds += waited
+        if waited:
+            logger.debug("Appel fournisseur retardé", provider=provider, waited_s=round(waited, 3))
+
+    async def try_acquire(self, provider: str, tokens: int = 0) -> bool:
+        """Réserver sans attendre; False si le budget est épuisé."""
+        if await self._reserve(provider, tokens) > 0:
+            self._get_stats(provider).rejected_try_acquire += 1
+            return False
+        self._get_stats(provider).acquired += 1
+        return True
+
+    async def penalize(self, provider: str, retry_after: Optional[float] = None):
+        """Suspendre le fournisseur pour tous les workers après un 429."""
+        delay = retry_after if retry_after is not None else 1.0
+        delay = min(max(delay, 0.0), self.max_wait_seconds)
+        self._get_stats(provider).rate_limited_responses += 1
+
+        self._local_cooldowns[provider] = max(
+            self._local_cooldowns.get(provider, 0.0), time.monotonic() + delay
+        )
+
+        if self.redis is not None and delay > 0:
+            try:
+                if self._cooldown_script is None:
+                    self._cooldown_script = self.redis.register_script(_COOLDOWN_SCRIPT)
+                await self._cooldown_script(
+                    keys=[self._key(provider, "cooldown")], args=[int(delay * 1000)]
+                )
+            except Exception as e:
+                self._get_stats(provider).redis_errors += 1
+                logger.warning("Pause fournisseur non partagée", provider=provider, error=str(e))
+
+        logger.warning("Fournisseur limité (429)", provider=provider, retry_after_s=delay)
+
+    async def record_response_error(self, provider: str, error: BaseException):
+        """Réagir à une erreur HTTP: pause commune si 429/529."""
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code in (429, 529):
+            await self.penalize(provider, retry_after_seconds(error))
+
+    async def _reserve(self, provider: str, tokens: int) -> float:
+        """Tenter une réservation; retourne l'attente nécessaire en secondes."""
+        limits = self.limits.get(provider)
+        if limits is None:
+            return 0.0
+
+        # Une requête plus grosse que le budget/minute passerait jamais
+        cost = min(tokens, limits.tokens_per_minute) if limits.tokens_per_minute else 0
+
+        if self.redis is not None:
+            try:
+                if self._reserve_script is None:
+                    self._reserve_script = self.redis.register_script(_RESERVE_SCRIPT)
+                wait_ms = await self._reserve_script(
+                    keys=[
+                        self._key(provider, "requests"),
+                        self._key(provider, "tokens"),
+                        self._key(provider, "cooldown")
+                    ],
+                    args=[limits.requests_per_minute, limits.tokens_per_minute, cost]
+                )
+                return int(wait_ms) / 1000.0
+            except Exception as e:
+                self._get_stats(provider).redis_errors += 1
+                logger.warning("Limiteur Redis indisponible, repli local", provider=provider, error=str(e))
+
+        return self._reserve_local(provider, limits, cost)
+
+    def _reserve_local(self, provider: str, limits: ProviderLimits, cost: int) -> float:
+        now = time.monotonic()
+
+        cooldown = self._local_cooldowns.get(provider, 0.0)
+        if cooldown > now:
+            return cooldown - now
+
+        buckets = self._local_buckets.setdefault(provider, {})
+        wait = 0.0
+
+        requests = None
+        if limits.requests_per_minute:
+            requests = buckets.setdefault("requests", _LocalBucket(limits.requests_per_minute))
+            requests.refill(now)
+            wait = max(wait, requests.wait_for(1))
+
+        token_bucket = None
+        if limits.tokens_per_minute and cost:
+            token_bucket = buckets.setdefault("tokens", _LocalBucket(limits.tokens_per_minute))
+            token_bucket.refill(now)
+            wait = max(wait, token_bucket.wait_for(cost))
+
+        if wait > 0:
+            return wait
+
+        if requests is not None:
+            requests.level -= 1
+        if token_bucket is not None:
+            token_bucket.level -= cost
+        return 0.0
+
+    def _get_semaphore(self, provider: str) -> Optional[asyncio.Semaphore]:
+        limits = self.limits.get(provider)
+        if limits is None or limits.max_concurrency <= 0:
+            return None
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(limits.max_concurrency)
+            self._semaphores[provider] = semaphore
+        return semaphore
+
+    def _get_stats(self, provider: str) -> ProviderLimiterStats:
+        return self.stats.setdefault(provider, ProviderLimiterStats())
+
+    def _key(self, provider: str, kind: str) -> str:
+        return f"{self.key_prefix}{provider}:{kind}"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compteurs par fournisseur."""
+        return {
+            provider: {
+                **asdict(stats),
+                **asdict(self.limits.get(provider, ProviderLimits())),
+                "in_flight": self._in_flight.get(provider, 0),
+                "shared": self.redis is not None
+            }
+            for provider, stats in self.stats.items()
+        }
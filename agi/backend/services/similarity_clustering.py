@@ -0,0 +1,237 @@
+"""
+Regroupement de mémoires par similarité cosinus
+Les embeddings sont empilés dans une matrice float32 normalisée et les
+similarités calculées par blocs de produits matriciels (BLAS) au lieu
+d'appels cosine_similarity un à un.
+"""
+
+import logging
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CLUSTERING_MODES = ("greedy", "components", "agglomerative")
+
+# Taille maximale d'un bloc de similarités (lignes x colonnes): ~64 Mo en float32
+DEFAULT_MAX_BLOCK_ELEMENTS = 16_000_000
+
+
+def normalize_embeddings(embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+    """Matrice float32 (n, d) de vecteurs unitaires; un vecteur nul reste nul"""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2:
+        raise ValueError("Les embeddings doivent former une matrice (n, d)")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SimilarityClusterer:
+    """
+    Regroupe des vecteurs dont la similarité cosinus atteint `threshold`.
+
+    Modes:
+    - "greedy": chaque vecteur non affecté, dans l'ordre, devient le
+      représentant d'un groupe et absorbe tous les vecteurs non affectés
+      assez proches (comportement historique du ConsolidatorAgent).
+    - "components": composantes connexes du graphe des paires au-dessus
+      du seuil (liaison simple, insensible à l'ordre).
+    - "agglomerative": groupes gloutons puis fusions successives des
+      groupes dont les centroïdes restent au-dessus du seuil.
+
+    Les similarités sont calculées par blocs de lignes pour borner la
+    mémoire: la matrice n x n n'est jamais matérialisée.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        mode: str = "greedy",
+        max_block_elements: int = DEFAULT_MAX_BLOCK_ELEMENTS
+    ):
+        if mode not in CLUSTERING_MODES:
+            raise ValueError(f"Mode de regroupement inconnu: {mode}")
+        self.threshold = threshold
+        self.mode = mode
+        self.max_block_elements = max_block_elements
+
+    def cluster(self, embeddings: Sequence[Sequence[float]]) -> List[List[int]]:
+        """Indices des groupes, chacun trié, ordonnés par leur premier indice"""
+        if len(embeddings) == 0:
+            return []
+
+        matrix = normalize_embeddings(embeddings)
+        if self.mode == "greedy":
+            clusters = self._greedy(matrix)
+        elif self.mode == "components":
+            clusters = self._components(matrix)
+        else:
+            clusters = self._agglomerative(matrix)
+
+        logger.debug(f"{len(matrix)} vecteurs regroupés en {len(clusters)} groupes (mode {self.mode})")
+        return clusters
+
+    def cluster_items(
+        self,
+        items: List[Dict[str, Any]],
+        embeddings: Sequence[Sequence[float]],
+        text_key: str = "content"
+    ) -> List[Dict[str, Any]]:
+        """
+        Groupes sous forme de patterns: le premier élément du groupe en est
+        le représentant (`representative_content`, `embedding`).
+        """
+        return self.patterns_from_clusters(items, embeddings, self.cluster(embeddings), text_key)
+
+    @staticmethod
+    def patterns_from_clusters(
+        items: List[Dict[str, Any]],
+        embeddings: Sequence[Sequence[float]],
+        clusters: List[List[int]],
+        text_key: str = "content"
+    ) -> List[Dict[str, Any]]:
+        """Patterns de `cluster_items` à partir de groupes déjà calculés"""
+        patterns = []
+        for indices in clusters:
+            representative = indices[0]
+            patterns.append({
+                "representative_content": items[representative][text_key],
+                "memories": [items[index] for index in indices],
+                "embedding": embeddings[representative]
+            })
+        return patterns
+
+    def _row_blocks(self, rows: int, columns: int) -> Iterator[Tuple[int, int]]:
+        block_rows = max(1, self.max_block_elements // max(1, columns))
+        for start in range(0, rows, block_rows):
+            yield start, min(rows, start + block_rows)
+
+    def _greedy(self, matrix: np.ndarray) -> List[List[int]]:
+        count = len(matrix)
+        assigned = np.zeros(count, dtype=bool)
+        clusters = []
+
+        for start, end in self._row_blocks(count, count):
+            if assigned[start:end].all():
+                continue
+
+            # Voisins au-dessus du seuil pour chaque ligne du bloc; les lignes
+            # précédentes sont toutes affectées, seules les colonnes >= start comptent
+            similarities = matrix[start:end] @ matrix[start:].T
+            block_rows, block_columns = np.nonzero(similarities >= self.threshold)
+            block_columns += start
+            del similarities
+            bounds = np.searchsorted(block_rows, np.arange(end - start + 1))
+
+            for offset in range(end - start):
+                seed = start + offset
+                if assigned[seed]:
+                    continue
+
+                neighbors = block_columns[bounds[offset]:bounds[offset + 1]]
+                members = neighbors[~assigned[neighbors]]
+                assigned[members] = True
+                assigned[seed] = True
+                clusters.append([seed] + sorted(int(index) for index in members if index != seed))
+
+        return clusters
+
+    def _components(self, matrix: np.ndarray) -> List[List[int]]:
+        count = len(matrix)
+        sources = []
+        targets = []
+
+        for start, end in self._row_blocks(count, count):
+            # Triangle supérieur uniquement: chaque paire une seule fois
+            similarities = matrix[start:end] @ matrix[start:].T
+            rows, columns = np.nonzero(similarities >= self.threshold)
+            del similarities
+            keep = columns > rows
+            sources.append(rows[keep] + start)
+            targets.append(columns[keep] + start)
+
+        labels = connected_component_labels(
+            count,
+            np.concatenate(sources) if sources else np.empty(0, dtype=np.int64),
+            np.concatenate(targets) if targets else np.empty(0, dtype=np.int64)
+        )
+        return _groups_from_labels(labels)
+
+    def _agglomerative(self, matrix: np.ndarray) -> List[List[int]]:
+        clusters = self._greedy(matrix)
+
+        while len(clusters) > 1:
+            centroids = normalize_embeddings(
+                np.stack([matrix[indices].sum(axis=0) for indices in clusters])
+            )
+            best = self._best_partners(centroids)
+
+            # Fusionner les paires de plus proches voisins mutuels
+            merged = np.arange(len(clusters))
+            for index, (partner, similarity) in enumerate(best):
+                if partner > index and similarity >= self.threshold and best[partner][0] == index:
+                    merged[partner] = index
+            if (merged == np.arange(len(clusters))).all():
+                break
+
+            groups: Dict[int, List[int]] = {}
+            for index, target in enumerate(merged):
+                groups.setdefault(int(target), []).extend(clusters[index])
+            clusters = sorted((sorted(group) for group in groups.values()), key=lambda group: group[0])
+
+        return clusters
+
+    def _best_partners(self, centroids: np.ndarray) -> List[Tuple[int, float]]:
+        """Plus proche autre centroïde de chaque centroïde"""
+        count = len(centroids)
+        best: List[Tuple[int, float]] = []
+        for start, end in self._row_blocks(count, count):
+            similarities = centroids[start:end] @ centroids.T
+            similarities[np.arange(end - start), np.arange(start, end)] = -np.inf
+            partners = similarities.argmax(axis=1)
+            scores = similarities[np.arange(end - start), partners]
+            best.extend((int(partner), float(score)) for partner, score in zip(partners, scores))
+        return best
+
+
+def connected_component_labels(count: int, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Étiquette de composante (plus petit indice) de chaque sommet.
+
+    Propagation du minimum le long des arêtes avec saut de pointeurs,
+    entièrement vectorisée (minimum par sommet via tri + reduceat).
+    """
+    labels = np.arange(count)
+    if len(sources) == 0:
+        return labels
+
+    # Arêtes dans les deux sens, groupées par sommet d'arrivée une fois pour toutes
+    heads = np.concatenate([sources, targets])
+    tails = np.concatenate([targets, sources])
+    order = np.argsort(heads, kind="stable")
+    heads = heads[order]
+    tails = tails[order]
+    vertices, starts = np.unique(heads, return_index=True)
+
+    while True:
+        previous = labels
+        incoming = np.minimum.reduceat(labels[tails], starts)
+        labels = labels.copy()
+        labels[vertices] = np.minimum(labels[vertices], incoming)
+        # Saut de pointeurs jusqu'à stabilisation
+        while True:
+            jumped = labels[labels]
+            if (jumped == labels).all():
+                break
+            labels = jumped
+        if (labels == previous).all():
+            return labels
+
+
+def _groups_from_labels(labels: np.ndarray) -> List[List[int]]:
+    groups: Dict[int, List[int]] = {}
+    for index, label in enumerate(labels.tolist()):
+        groups.setdefault(label, []).append(index)
+    return sorted(groups.values(), key=lambda group: group[0])
@@ -0,0 +1,194 @@
+"""
+Gestion des index ANN pgvector de la table des mémoires
+Un index HNSW partiel par niveau (L1/L2/L3), construit sans bloquer les écritures
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+MEMORY_LEVELS = ("L1", "L2", "L3")
+
+# Configuration plein texte: 'simple' conserve les termes exacts (ids, codes d'erreur, noms)
+LEXICAL_CONFIG = "simple"
+LEXICAL_COLUMN_SQL = (
+    f"content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('{LEXICAL_CONFIG}', content)) STORED"
+)
+
+
+@dataclass
+class VectorIndexSpec:
+    """Définition d'un index HNSW partiel"""
+    name: str
+    level: Optional[str]
+    m: int = 16
+    ef_construction: int = 64
+    opclass: str = "vector_cosine_ops"
+
+    def create_sql(self, table: str, concurrently: bool = True) -> str:
+        predicate = f" WHERE level = '{self.level}'" if self.level else ""
+        return (
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {self.name} "
+            f"ON {table} USING hnsw (embedding {self.opclass}) "
+            f"WITH (m = {int(self.m)}, ef_construction = {int(self.ef_construction)})"
+            f"{predicate}"
+        )
+
+
+class VectorIndexManager:
+    """
+    Crée et maintient les index HNSW des mémoires.
+
+    Les index sont partiels par niveau: une recherche filtrée sur un niveau
+    parcourt un graphe plus petit, et le prédicat reste immuable (un
+    prédicat sur `expires_at > NOW()` n'est pas autorisé dans un index).
+    Les constructions CONCURRENTLY interrompues laissent un index invalide,
+    qui est supprimé puis reconstruit.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        table: str = "memories",
+        m: int = 16,
+        ef_construction: int = 64
+    ):
+        self.pool = pool
+        self.table = table
+        self.m = m
+        self.ef_construction = ef_construction
+
+    def index_name(self, level: str) -> str:
+        if level not in MEMORY_LEVELS:
+            raise ValueError(f"Niveau de mémoire inconnu: {level}")
+        return f"{self.table}_embedding_hnsw_{level.lower()}"
+
+    def index_specs(self) -> List[VectorIndexSpec]:
+        """Index attendus (un par niveau)"""
+        return [
+            VectorIndexSpec(
+                name=self.index_name(level),
+                level=level,
+                m=self.m,
+                ef_construction=self.ef_construction
+            )
+            for level in MEMORY_LEVELS
+        ]
+
+    async def ensure_indexes(self, concurrently: bool = True) -> Dict[str, str]:
+        """Créer les index manquants et reconstruire les index invalides"""
+        status: Dict[str, str] = {}
+        existing = {index["name"]: index for index in await self.list_indexes()}
+
+        # CREATE INDEX CONCURRENTLY ne peut pas s'exécuter dans une transaction
+        async with self.pool.acquire() as conn:
+            for spec in self.index_specs():
+                current = existing.get(spec.name)
+
+                if current is not None and current["valid"]:
+                    status[spec.name] = "exists"
+                    continue
+
+                if current is not None:
+                    logger.warning(f"Index {spec.name} invalide, reconstruction")
+                    await conn.execute(
+                        f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {spec.name}"
+                    )
+
+                logger.info(f"Construction de l'index {spec.name}")
+                await conn.execute(spec.create_sql(self.table, concurrently))
+                status[spec.name] = "created"
+
+        return status
+
+    async def add_lexical_column(self):
+        """
+        Migration explicite des bases créées avant la colonne content_tsv
+        (les nouvelles bases l'ont dans init.sql).
+
+        ADD COLUMN ... STORED réécrit toute la table sous verrou ACCESS
+        EXCLUSIVE: à lancer pendant une fenêtre de maintenance, jamais au démarrage.
+        """
+        async with self.pool.acquire() as conn:
+            if await self._has_lexical_column(conn):
+                return
+            logger.info(f"Ajout de la colonne content_tsv sur {self.table} (réécriture de la table)")
+            await conn.execute(f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS {LEXICAL_COLUMN_SQL}")
+
+    async def ensure_lexical_index(self, concurrently: bool = True) -> str:
+        """
+        Construire l'index GIN de content_tsv sans bloquer les écritures.
+
+        Appelé au démarrage: ne modifie jamais le schéma. Sans la colonne,
+        l'index est ignoré jusqu'à la migration (add_lexical_column).
+        """
+        async with self.pool.acquire() as conn:
+            if not await self._has_lexical_column(conn):
+                logger.warning(
+                    f"Colonne content_tsv absente de {self.table}: "
+                    "lancer VectorIndexManager.add_lexical_column()"
+                )
+                return "missing_column"
+
+            await conn.execute(
+                f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+                f"{self.table}_content_tsv_idx ON {self.table} USING gin (content_tsv)"
+            )
+
+        return "exists"
+
+    async def _has_lexical_column(self, conn) -> bool:
+        return await conn.fetchval(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = $1 AND column_name = 'content_tsv'
+            )
+            """,
+            self.table
+        )
+
+    async def list_indexes(self) -> List[Dict[str, Any]]:
+        """Index vectoriels de la table avec taille, validité et utilisation"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT
+                    c.relname AS name,
+                    am.amname AS method,
+                    i.indisvalid AS valid,
+                    pg_relation_size(c.oid) AS size_bytes,
+                    COALESCE(s.idx_scan, 0) AS scans,
+                    pg_get_indexdef(c.oid) AS definition
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_class t ON t.oid = i.indrelid
+                JOIN pg_am am ON am.oid = c.relam
+                LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = i.indexrelid
+                WHERE t.relname = $1 AND am.amname IN ('hnsw', 'ivfflat')
+                ORDER BY c.relname
+                """,
+                self.table
+            )
+
+        return [dict(row) for row in rows]
+
+    async def drop_index(self, name: str, concurrently: bool = True):
+        """Supprimer un index (par ex. l'ancien IVFFlat global)"""
+        if not name.isidentifier():
+            raise ValueError(f"Nom d'index invalide: {name}")
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {name}"
+            )
+        logger.info(f"Index {name} supprimé")
+
+    async def reindex(self, level: str):
+        """Reconstruire l'index d'un niveau sans bloquer les écritures"""
+        async with self.pool.acquire() as conn:
+            await conn.execute(f"REINDEX INDEX CONCURRENTLY {self.index_name(level)}")
+        logger.info(f"Index {self.index_name(level)} reconstruit")
@@ -31,6 +31,8 @@ CREATE TABLE IF NOT EXISTS memories (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     content TEXT NOT NULL,
+    -- Recherche plein texte ('simple': termes exacts); bases existantes: VectorIndexManager.add_lexical_column()
+    content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED,
     content_type VARCHAR(50) DEFAULT 'text', -- text, image, audio, etc.
     memory_level INTEGER NOT NULL CHECK (memory_level IN (1, 2, 3)), -- L1, L2, L3
     embedding vector(1536), -- Voyage AI embeddings (1536 dimensions)
@@ -48,6 +50,8 @@ CREATE INDEX IF NOT EXISTS memories_embedding_idx ON memories USING ivfflat (emb
 CREATE INDEX IF NOT EXISTS memories_user_level_idx ON memories(user_id, memory_level);
 CREATE INDEX IF NOT EXISTS memories_importance_idx ON memories(importance_score DESC);
 CREATE INDEX IF NOT EXISTS memories_created_idx ON memories(created_at DESC);
+CREATE INDEX IF NOT EXISTS memories_user_updated_idx ON memories(user_id, updated_at);
+CREATE INDEX IF NOT EXISTS memories_content_tsv_idx ON memories USING gin (content_tsv);
 
 -- Table des relations entre mémoires
 CREATE TABLE IF NOT EXISTS memory_relations (
@@ -141,6 +145,16 @@ CREATE TABLE IF NOT EXISTS analytics (
 CREATE INDEX IF NOT EXISTS analytics_user_metric_idx ON analytics(user_id, metric_name);
 CREATE INDEX IF NOT EXISTS analytics_timestamp_idx ON analytics(timestamp DESC);
 
+-- Watermarks de validation incrémentale (dernier passage réussi par utilisateur)
+CREATE TABLE IF NOT EXISTS validation_watermarks (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    scope VARCHAR(50) NOT NULL, -- knowledge_validation, ...
+    watermark TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_full_sweep TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, scope)
+);
+
 -- Fonctions utilitaires
 
 -- Fonction pour calculer la similarité cosinus
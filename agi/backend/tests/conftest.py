@@ -0,0 +1,9 @@
+"""
+Configuration commune des tests
+Modules importés comme par `uvicorn main:app`: le répertoire backend est la racine.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
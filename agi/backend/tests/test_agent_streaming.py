@@ -0,0 +1,117 @@
+"""
+Tests pour la diffusion des étapes d'un agent (astream_steps, SSE)
+"""
+
+import json
+from contextlib import aclosing
+
+import pytest
+
+from agents.base_agent import AgentConfig, BaseAgent
+
+
+class FakeCompiledGraph:
+    """Rejoue des mises à jour par nœud; `fail_after` lève après ce nœud"""
+
+    def __init__(self, updates, fail_after=None):
+        self.updates = updates
+        self.fail_after = fail_after
+        self.executed = []
+        self.closed = False
+
+    async def astream(self, state, stream_mode="updates"):
+        assert stream_mode == "updates"
+        try:
+            for node, node_state in self.updates:
+                self.executed.append(node)
+                yield {node: node_state}
+                if node == self.fail_after:
+                    raise RuntimeError(f"{node} a échoué")
+        finally:
+            self.closed = True
+
+
+class StreamingAgent(BaseAgent):
+    def __init__(self, graph):
+        super().__init__(AgentConfig(name="streaming_agent", description="test"), {})
+        self.fake_graph = graph
+
+    def _build_graph(self):
+        return self.fake_graph
+
+    async def process(self, state):
+        return await self.run(state)
+
+
+UPDATES = [
+    ("prepare", {"context": {"items": [1, 2, 3]}, "step_count": 1}),
+    ("analyze", {"context": {"items": [1, 2, 3], "score": 0.5}, "step_count": 2})
+]
+
+
+async def collect(agent, state):
+    return [event async for event in agent.astream_steps(state)]
+
+
+class TestAstreamSteps:
+    """Un événement par nœud, puis un événement final"""
+
+    @pytest.mark.asyncio
+    async def test_steps_then_completed_event(self):
+        agent = StreamingAgent(FakeCompiledGraph(UPDATES))
+
+        events = await collect(agent, agent.create_initial_state(context={"run_id": "r1"}))
+
+        assert [(event["event"], event.get("node")) for event in events] == [
+            ("step", "prepare"), ("step", "analyze"), ("completed", None)
+        ]
+        assert events[0]["counts"] == {"items": 3}
+        assert events[-1]["step_count"] == 2
+        assert events[-1]["result"] == {"items": [1, 2, 3], "score": 0.5}
+        assert events[-1]["error"] is None
+        assert all(event["agent"] == "streaming_agent" for event in events)
+
+    @pytest.mark.asyncio
+    async def test_graph_exception_yields_failed_event(self):
+        graph = FakeCompiledGraph(UPDATES, fail_after="prepare")
+        agent = StreamingAgent(graph)
+
+        events = await collect(agent, agent.create_initial_state())
+
+        assert [event["event"] for event in events] == ["step", "failed"]
+        assert events[-1]["error"] == "prepare a échoué"
+        assert events[-1]["result"] == {"items": [1, 2, 3]}
+        assert graph.executed == ["prepare"]
+
+    @pytest.mark.asyncio
+    async def test_closing_the_stream_stops_the_graph(self):
+        graph = FakeCompiledGraph(UPDATES)
+        agent = StreamingAgent(graph)
+
+        async with aclosing(agent.astream_steps(agent.create_initial_state())) as events:
+            async for _event in events:
+                break
+
+        assert graph.executed == ["prepare"]
+        assert graph.closed
+
+
+class TestSseFraming:
+    """Trame text/event-stream des événements diffusés par la route"""
+
+    @pytest.mark.asyncio
+    async def test_stream_steps_frames_each_event(self):
+        # consolidator_agent requiert une version de langgraph fournissant ToolExecutor
+        routes = pytest.importorskip("api.routes.agents", exc_type=ImportError)
+        agent = StreamingAgent(FakeCompiledGraph(UPDATES, fail_after="analyze"))
+
+        frames = [frame async for frame in routes._stream_steps(agent, agent.create_initial_state())]
+
+        assert len(frames) == 3
+        for frame, expected in zip(frames, ["step", "step", "failed"]):
+            event_line, data_line, *rest = frame.split("\n")
+            assert event_line == f"event: {expected}"
+            assert data_line.startswith("data: ")
+            assert rest == ["", ""]
+            assert json.loads(data_line[len("data: "):])["event"] == expected
+        assert json.loads(frames[-1].split("\n")[1][len("data: "):])["error"] == "analyze a échoué"
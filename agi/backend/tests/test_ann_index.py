@@ -0,0 +1,58 @@
+"""
+Tests pour l'index IVF de génération de candidats
+"""
+
+import numpy as np
+
+from services.ann_index import IVFIndex, similar_pairs
+
+
+def clustered_vectors(count, dimensions=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((count // 20, dimensions))
+    assignments = rng.integers(0, len(centers), size=count)
+    return (centers[assignments] + rng.standard_normal((count, dimensions)) * 0.1).astype(np.float32)
+
+
+class TestIVFIndex:
+    """Tests de rappel et de génération de paires"""
+
+    def test_neighbors_recall_against_exact_search(self):
+        """Les k voisins IVF retrouvent l'essentiel des voisins exacts"""
+        vectors = clustered_vectors(6000)
+        index = IVFIndex(n_probe=8).build(vectors)
+        assert not index.is_exact
+
+        neighbors = {}
+        for queries, found, _ in index.iter_neighbors(5):
+            for query, row in zip(queries.tolist(), found.tolist()):
+                neighbors[query] = set(row)
+        assert len(neighbors) == len(vectors)
+
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        sample = np.arange(0, len(vectors), 60)
+        similarities = normalized[sample] @ normalized.T
+        similarities[np.arange(len(sample)), sample] = -np.inf
+        exact = np.argsort(-similarities, axis=1)[:, :5]
+
+        recall = np.mean([
+            len(neighbors[query] & set(row)) / 5 for query, row in zip(sample.tolist(), exact.tolist())
+        ])
+        assert recall >= 0.9
+
+    def test_similar_pairs_are_unique_and_thresholded(self):
+        vectors = [[1.0, 0.0], [0.99, 0.1], [0.0, 1.0], [0.1, 0.99], [-1.0, 0.0]]
+
+        pairs = similar_pairs(vectors, threshold=0.9, k=2)
+
+        assert sorted((source, target) for source, target, _ in pairs) == [(0, 1), (2, 3)]
+        assert all(score >= 0.9 for _, _, score in pairs)
+
+    def test_search_returns_closest_first(self):
+        vectors = clustered_vectors(200)
+        index = IVFIndex().build(vectors)
+
+        found, scores = index.search(vectors[42], 3)
+
+        assert found[0] == 42
+        assert list(scores) == sorted(scores, reverse=True)
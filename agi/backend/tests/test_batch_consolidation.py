@@ -0,0 +1,121 @@
+"""
+Tests pour la consolidation concurrente des lots de mémoires
+"""
+
+import asyncio
+import json
+
+import pytest
+
+# consolidator_agent requiert une version de langgraph fournissant ToolExecutor
+workflow_module = pytest.importorskip(
+    "agents.workflows.memory_consolidation_workflow", exc_type=ImportError
+)
+
+from agents.base_agent import AgentConfig
+from services.checkpoint_store import CheckpointStore
+
+
+class RecordingStore(CheckpointStore):
+    """Enregistre le contexte effectivement écrit à chaque sauvegarde"""
+
+    def __init__(self, directory):
+        super().__init__(directory=directory)
+        self.written = []
+
+    def _write_file(self, run_id, payload, part=""):
+        self.written.append((part, payload))
+        super()._write_file(run_id, payload, part)
+
+
+class StubConsolidator:
+    """Les derniers lots finissent en premier; le lot `failing` échoue"""
+
+    def __init__(self, total_batches, failing):
+        self.total_batches = total_batches
+        self.failing = failing
+        self.active = 0
+        self.max_active = 0
+        self.finished = []
+
+    async def process(self, state):
+        batch_number = state["context"]["batch_number"]
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01 * (self.total_batches - batch_number + 1))
+            if batch_number == self.failing:
+                raise RuntimeError("LLM indisponible")
+            return {
+                **state,
+                "context": {
+                    **state["context"],
+                    "consolidated_memories": [
+                        {"source": memory["id"]} for memory in state["context"]["l2_memories"]
+                    ]
+                },
+                "error": None
+            }
+        finally:
+            self.active -= 1
+            self.finished.append(batch_number)
+
+
+def make_workflow(consolidator, services=None):
+    workflow = workflow_module.MemoryConsolidationWorkflow(
+        AgentConfig(name="memory_consolidation_workflow", description="test"), services or {}
+    )
+    workflow.consolidator_agent = consolidator
+    return workflow
+
+
+class TestBatchConsolidation:
+    """Fusion dans l'ordre des lots, erreurs confinées, concurrence bornée"""
+
+    @pytest.mark.asyncio
+    async def test_out_of_order_batches_merge_in_batch_order(self):
+        consolidator = StubConsolidator(total_batches=5, failing=3)
+        workflow = make_workflow(consolidator)
+        state = workflow.create_consolidation_state()
+        state["context"]["consolidation_config"].update(batch_size=2, max_concurrent_batches=2)
+        state["context"]["consolidation_candidates"] = [{"id": index} for index in range(10)]
+
+        state = await workflow._batch_consolidation(state)
+
+        assert state.get("error") is None
+        assert consolidator.finished != sorted(consolidator.finished)
+        assert consolidator.max_active == 2
+
+        context = state["context"]
+        assert [memory["source"] for memory in context["consolidated_memories"]] == [0, 1, 2, 3, 6, 7, 8, 9]
+        assert context["consolidation_errors"] == [{"batch": 3, "error": "LLM indisponible"}]
+        assert [timing["batch"] for timing in context["batch_timings"]] == [1, 2, 3, 4, 5]
+        assert [timing["status"] for timing in context["batch_timings"]] == [
+            "success", "success", "error", "success", "success"
+        ]
+        # Lot réessayé à la reprise: seuls les lots réussis sont marqués terminés
+        assert sorted(context["completed_batches"]) == ["1", "2", "4", "5"]
+
+        state = await workflow._generate_consolidation_report(state)
+
+        batch_metrics = state["context"]["consolidation_report"]["batch_metrics"]
+        assert batch_metrics["batches"] == 5
+        assert batch_metrics["max_concurrent_batches"] == 2
+        assert batch_metrics["batch_timings"] == context["batch_timings"]
+        assert state["context"]["consolidation_report"]["errors"]["consolidation_errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_checkpoints_do_not_rewrite_candidates(self, tmp_path):
+        store = RecordingStore(str(tmp_path))
+        workflow = make_workflow(StubConsolidator(total_batches=3, failing=None), {"checkpoint_store": store})
+        state = workflow.create_consolidation_state(run_id="run-1")
+        state["context"]["consolidation_config"].update(batch_size=2)
+        state["context"]["consolidation_candidates"] = [{"id": f"candidate-{index}"} for index in range(6)]
+
+        await workflow._batch_consolidation(state)
+
+        # Un checkpoint par lot, sans les lignes candidates
+        assert [part for part, _ in store.written] == ["", "", ""]
+        assert all("consolidation_candidates" not in json.loads(payload)["context"] for _, payload in store.written)
+        checkpoint = await store.load("run-1")
+        assert sorted(checkpoint["context"]["completed_batches"]) == ["1", "2", "3"]
@@ -0,0 +1,95 @@
+"""
+Tests pour le stockage des checkpoints de workflows (stand-in fichier)
+"""
+
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+import pytest
+
+from services.checkpoint_store import (
+    CHECKPOINT_COMPLETED,
+    CheckpointStore,
+    checkpoint_type
+)
+
+
+@checkpoint_type
+@dataclass
+class FakeMetrics:
+    contradictions_found: int = 0
+    valid_items: int = 0
+
+
+class TestCheckpointStore:
+    """Tests de sauvegarde, relecture et expiration"""
+
+    @pytest.mark.asyncio
+    async def test_context_round_trip(self, tmp_path):
+        """Dataclasses déclarées et dates sont reconstruites à la lecture"""
+        store = CheckpointStore(directory=str(tmp_path))
+        started = datetime(2026, 1, 2, 3, 4, 5)
+        state = {
+            "step_count": 3,
+            "context": {
+                "run_id": "run-1",
+                "started": started,
+                "validation_metrics": FakeMetrics(contradictions_found=2),
+                "completed_batches": {"1": {"consolidated": ["m1"]}}
+            }
+        }
+
+        await store.save("run-1", "memory_consolidation_agent", "batch_consolidation", state)
+        checkpoint = await store.load("run-1")
+
+        assert checkpoint["next_node"] == "batch_consolidation"
+        assert checkpoint["step_count"] == 3
+        assert checkpoint["context"]["started"] == started
+        assert checkpoint["context"]["validation_metrics"] == FakeMetrics(contradictions_found=2)
+        assert checkpoint["context"]["completed_batches"]["1"]["consolidated"] == ["m1"]
+
+    @pytest.mark.asyncio
+    async def test_last_save_wins_and_expires(self, tmp_path):
+        store = CheckpointStore(directory=str(tmp_path), ttl=3600)
+
+        await store.save("run-2", "agent", "a", {"context": {}})
+        await store.save("run-2", "agent", None, {"context": {}}, status=CHECKPOINT_COMPLETED)
+
+        assert (await store.load("run-2"))["status"] == CHECKPOINT_COMPLETED
+        assert list(tmp_path.iterdir()) == [tmp_path / "run-2.json"]
+
+        store.ttl = -1
+        assert await store.load("run-2") is None
+        assert await store.load("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_run_id_cannot_escape_directory(self, tmp_path):
+        store = CheckpointStore(directory=str(tmp_path / "checkpoints"))
+
+        await store.save("../outside", "agent", "a", {"context": {}})
+
+        assert [path.name for path in (tmp_path / "checkpoints").iterdir()] == ["outside.json"]
+
+    @pytest.mark.asyncio
+    async def test_detached_keys_are_written_once_and_merged(self, tmp_path):
+        """Sauvegarde intermédiaire: seul le contexte hors clés détachées est réécrit"""
+        store = CheckpointStore(directory=str(tmp_path))
+        rows = [{"id": index, "content": "x" * 100} for index in range(50)]
+        context = {"consolidation_candidates": rows, "completed_batches": {}}
+
+        await store.save("run-3", "agent", "b", {"context": context},
+                         detached_keys=("consolidation_candidates",))
+        context["completed_batches"]["1"] = {"consolidated": ["m1"]}
+        context["consolidation_candidates"] = []
+        await store.save("run-3", "agent", "b", {"context": context},
+                         detached_keys=("consolidation_candidates",), write_detached=False)
+
+        written = json.loads((tmp_path / "run-3.json").read_text())
+        assert "consolidation_candidates" not in written["context"]
+        checkpoint = await store.load("run-3")
+        assert checkpoint["context"]["consolidation_candidates"] == rows
+        assert checkpoint["context"]["completed_batches"] == {"1": {"consolidated": ["m1"]}}
+
+        await store.delete("run-3")
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,75 @@
+"""
+Tests pour le cache des completions LLM
+"""
+
+import pytest
+
+from services.completion_cache import CompletionCache, completion_cost
+
+MODEL = "claude-3-sonnet-20240229"
+
+
+def request(cache, content, temperature=0.1):
+    return cache.make_request(
+        MODEL, [{"role": "user", "content": content}],
+        system_prompt="Analyse les contradictions", max_tokens=1000, temperature=temperature
+    )
+
+
+class FakeEmbedder:
+    """Embeddings déterministes: les textes contenant 'chat' sont proches"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, text):
+        self.calls += 1
+        if "chat" in text:
+            return [1.0, 0.01 * len(text), 0.0]
+        return [0.0, 0.0, 1.0]
+
+
+class TestCompletionCache:
+    """Tests des niveaux exact et sémantique"""
+
+    @pytest.mark.asyncio
+    async def test_exact_hit_counts_savings_per_agent(self):
+        cache = CompletionCache()
+
+        first = request(cache, "A contredit-il B ?")
+        assert await cache.get(first, agent="validator_agent") is None
+        await cache.set(first, {"text": "non"}, input_tokens=1000, output_tokens=200, agent="validator_agent")
+
+        again = request(cache, "A contredit-il B ?")
+        assert await cache.get(again, agent="validator_agent") == {"text": "non"}
+
+        stats = cache.get_stats()["agents"]["validator_agent"]
+        assert stats["exact_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["saved_usd"] == pytest.approx(completion_cost(MODEL, 1000, 200))
+
+    @pytest.mark.asyncio
+    async def test_parameters_are_part_of_the_key(self):
+        cache = CompletionCache()
+        await cache.set(request(cache, "prompt"), {"text": "x"})
+
+        assert await cache.get(request(cache, "prompt", temperature=0.7)) is None
+
+    @pytest.mark.asyncio
+    async def test_semantic_tier_serves_near_duplicates(self):
+        embedder = FakeEmbedder()
+        cache = CompletionCache(semantic_threshold=0.95, embedder=embedder)
+
+        original = request(cache, "le chat dort")
+        await cache.get(original)
+        await cache.set(original, {"text": "ok"}, input_tokens=10, output_tokens=5)
+
+        assert embedder.calls == 1
+        assert await cache.get(request(cache, "le chat dort.")) == {"text": "ok"}
+        assert await cache.get(request(cache, "le chien court")) is None
+        assert await cache.get(request(cache, "le chat dort.", temperature=0.9)) is None
+
+        total = cache.get_stats()["total"]
+        assert total["semantic_hits"] == 1
+        assert total["misses"] == 3
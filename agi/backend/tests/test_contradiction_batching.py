@@ -0,0 +1,113 @@
+"""
+Tests pour l'analyse des contradictions par lots (réponse validée, repli par paire)
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+import structlog
+
+validator_agent = pytest.importorskip("agents.validator_agent", exc_type=ImportError)
+ValidatorAgent = validator_agent.ValidatorAgent
+
+
+def item(index, has_contradiction=False, **overrides):
+    return {
+        "index": index,
+        "has_contradiction": has_contradiction,
+        "type": "factual" if has_contradiction else "none",
+        "severity": "high" if has_contradiction else "low",
+        "explanation": f"paire {index}",
+        "confidence": 0.9,
+        **overrides
+    }
+
+
+def reply(*items):
+    return json.dumps({"results": list(items)})
+
+
+class ScriptedValidator(ValidatorAgent):
+    """Réponse de lot imposée; le repli par paire renvoie l'index de l'élément"""
+
+    def __init__(self, batch_reply, batch_size=5):
+        self.logger = structlog.get_logger(__name__)
+        self.contradiction_batch_size = batch_size
+        self.max_concurrent_contradiction_batches = 2
+        self.batch_reply = batch_reply
+        self.pair_calls = []
+
+    async def _invoke_llm(self, messages):
+        return SimpleNamespace(content=self.batch_reply)
+
+    async def _analyze_contradiction(self, new_content, existing_knowledge):
+        self.pair_calls.append(existing_knowledge["id"])
+        return {"fallback": existing_knowledge["id"]}
+
+
+class TestParseBatchAnalysis:
+    """Les éléments absents ou invalides restent à None"""
+
+    def test_valid_reply_is_indexed_by_pair(self):
+        analyses = ValidatorAgent._parse_batch_analysis(reply(item(1, True), item(0)), 2)
+
+        assert [analysis["has_contradiction"] for analysis in analyses] == [False, True]
+        assert analyses[1] == {
+            "has_contradiction": True,
+            "type": "factual",
+            "severity": "high",
+            "explanation": "paire 1",
+            "confidence": 0.9
+        }
+
+    def test_partial_reply_leaves_missing_pairs_unset(self):
+        analyses = ValidatorAgent._parse_batch_analysis(reply(item(0), item(2)), 3)
+
+        assert analyses[1] is None
+        assert analyses[0] is not None and analyses[2] is not None
+
+    def test_out_of_range_and_bool_indexes_are_rejected(self):
+        content = reply(item(3), item(-1), item(True), item(0, type="unknown"), item(1))
+
+        analyses = ValidatorAgent._parse_batch_analysis(content, 2)
+
+        assert analyses[0] is None
+        assert analyses[1]["explanation"] == "paire 1"
+
+    @pytest.mark.parametrize("content", [
+        "pas du json",
+        json.dumps({"results": {"index": 0}}),
+        json.dumps({"analyses": [item(0)]}),
+        json.dumps([item(0)]),
+        json.dumps({"results": ["texte", None]})
+    ])
+    def test_malformed_reply_parses_to_nothing(self, content):
+        assert ValidatorAgent._parse_batch_analysis(content, 2) == [None, None]
+
+
+class TestAnalyzeContradictionBatch:
+    """Repli par paire pour les éléments manquants, ordre des entrées conservé"""
+
+    def test_fallback_fills_missing_pairs_in_input_order(self):
+        batch = [{"id": index, "content": f"contenu {index}"} for index in range(4)]
+        validator = ScriptedValidator(reply(item(2, True), item(0)))
+
+        analyses = asyncio.run(
+            validator._analyze_contradiction_batch("nouveau", batch, asyncio.Semaphore(2))
+        )
+
+        assert sorted(validator.pair_calls) == [1, 3]
+        assert analyses[0]["explanation"] == "paire 0"
+        assert analyses[1] == {"fallback": 1}
+        assert analyses[2]["has_contradiction"] is True
+        assert analyses[3] == {"fallback": 3}
+
+    def test_malformed_reply_falls_back_for_every_pair(self):
+        knowledge = [{"id": index, "content": f"contenu {index}"} for index in range(5)]
+        validator = ScriptedValidator("réponse tronquée", batch_size=2)
+
+        analyses = asyncio.run(validator._analyze_contradictions("nouveau", knowledge))
+
+        assert analyses == [{"fallback": index} for index in range(5)]
@@ -0,0 +1,63 @@
+"""
+Tests pour le pré-filtre des contradictions avant le LLM
+"""
+
+from services.contradiction_prefilter import ContradictionPrefilter, extract_dates
+
+
+class TestContradictionPrefilter:
+    """Seuls les cas sans contradiction sont tranchés localement"""
+
+    def test_unrelated_and_concordant_pairs_are_resolved(self):
+        prefilter = ContradictionPrefilter()
+
+        unrelated = prefilter.classify("Le chat dort", "La bourse monte", 0.5)
+        agreed = prefilter.classify("Il ne pleut pas", "Il ne pleut jamais", 0.96)
+
+        assert (unrelated["resolved_by"], unrelated["has_contradiction"]) == ("embedding", False)
+        assert (agreed["resolved_by"], agreed["has_contradiction"]) == ("embedding", False)
+
+    def test_conflict_cues_never_conclude_locally(self):
+        """Négation, antonyme, valeurs ou dates différentes: verdict laissé au LLM"""
+        prefilter = ContradictionPrefilter()
+
+        assert prefilter.classify("Paris est la capitale", "Paris n'est pas la capitale", 0.93) is None
+        assert prefilter.classify("The door is open", "The door is closed", 0.97) is None
+        assert prefilter.classify("Le serveur a 16 Go de RAM", "Le serveur a 32 Go de RAM", 0.97) is None
+
+    def test_unrelated_statements_with_cues_are_not_contradictions(self):
+        """Faux positifs de l'ancienne cascade: sujets différents malgré les indices"""
+        prefilter = ContradictionPrefilter()
+
+        trips = prefilter.classify(
+            "Je suis allé à Paris en 2019 pour le travail",
+            "Je suis allé à Paris en 2022 avec ma famille",
+            0.86
+        )
+        servers = prefilter.classify("Mon portable a 16 Go de RAM", "Le serveur de test a 32 Go", 0.9)
+        drinks = prefilter.classify("I like tea", "I like coffee, not tea", 0.93)
+
+        assert (trips, servers, drinks) == (None, None, None)
+
+    def test_ambiguous_pairs_go_to_llm(self):
+        prefilter = ContradictionPrefilter()
+
+        assert prefilter.classify("Python est rapide", "Python est lent", 0.86) is None
+        assert prefilter.classify("A est vrai", "A est établi") is None
+
+    def test_dates_and_metrics(self):
+        prefilter = ContradictionPrefilter()
+
+        assert extract_dates("Sortie le 05/01/2023, annoncée en 2022") == {"2023-01-05", "2022"}
+
+        analyses, metrics = prefilter.classify_pairs("Version publiée le 2023-01-05", [
+            {"content": "Version publiée le 2024-02-01", "similarity": 0.97},
+            {"content": "Version publiée le 2023-01-05", "similarity": 0.99},
+            {"content": "Autre sujet", "similarity": 0.4},
+            {"content": "Version non publiée", "similarity": 0.88}
+        ])
+
+        assert [analysis is None for analysis in analyses] == [True, False, False, True]
+        assert not any(analysis["has_contradiction"] for analysis in analyses if analysis)
+        assert (metrics.pairs, metrics.embedding, metrics.llm) == (4, 2, 2)
+        assert (metrics.numeric, metrics.lexical) == (1, 1)
@@ -0,0 +1,68 @@
+"""
+Tests pour l'exécuteur CPU partagé (pool de processus et mémoire partagée)
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from services.cpu_executor import CPUExecutor
+from services.pattern_scanner import PatternScanner
+from services.similarity_clustering import SimilarityClusterer
+
+
+@pytest.fixture
+def executor():
+    executor = CPUExecutor(workers=2)
+    yield executor
+    executor.shutdown()
+
+
+class TestCPUExecutor:
+    """Tests d'exécution hors boucle et de statistiques"""
+
+    @pytest.mark.asyncio
+    async def test_shared_array_clustering_matches_in_process(self, executor):
+        rng = np.random.default_rng(3)
+        centers = rng.standard_normal((4, 16))
+        matrix = np.repeat(centers, 25, axis=0) + 0.05 * rng.standard_normal((100, 16))
+        clusterer = SimilarityClusterer(0.9, "components")
+
+        clusters = await executor.run_with_array(
+            clusterer.cluster, matrix.astype(np.float32), kind="similarity_clustering"
+        )
+
+        assert clusters == clusterer.cluster(matrix)
+        if os.path.isdir("/dev/shm"):
+            assert not [name for name in os.listdir("/dev/shm") if name.startswith("psm_")]
+
+    @pytest.mark.asyncio
+    async def test_scan_results_survive_the_process_boundary(self, executor):
+        scanner = PatternScanner({"email": r"\b\w+@\w+\.\w{2,}\b"})
+        texts = ["écrire à bob@example.com", "écrire à alice@example.com"]
+
+        remote = await executor.run(scanner.scan, texts, kind="pattern_scan")
+
+        assert remote.ngrams == scanner.scan(texts).ngrams
+        assert remote.ngrams[2].max_entries == scanner.max_counter_entries
+        assert remote.pattern_counts == {"email": 2}
+
+    @pytest.mark.asyncio
+    async def test_stats_and_failures(self, executor):
+        with pytest.raises(np.linalg.LinAlgError):
+            await executor.run_with_array(np.linalg.inv, np.zeros((2, 3)), kind="inverse")
+        assert await executor.run(sum, [1, 2, 3]) == 6
+
+        stats = executor.get_stats()
+        assert stats["mode"] == "process"
+        assert (stats["in_flight"], stats["queue_depth"]) == (0, 0)
+        assert stats["tasks"]["inverse"]["failed"] == 1
+        assert stats["tasks"]["task"]["completed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_thread_fallback(self):
+        executor = CPUExecutor(workers=0)
+
+        assert await executor.run_with_array(np.sum, np.ones((3, 3))) == 9.0
+        assert executor.get_stats()["mode"] == "thread"
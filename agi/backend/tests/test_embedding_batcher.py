@@ -0,0 +1,83 @@
+"""
+Tests pour le regroupement des requêtes d'embeddings
+"""
+
+import asyncio
+
+import pytest
+
+from services.embedding_batcher import EmbeddingBatcher
+
+
+class TestEmbeddingBatcher:
+    """Tests du micro-batching des embeddings"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_are_coalesced(self):
+        """Les demandes concurrentes partent en une seule requête"""
+        calls = []
+
+        async def embed_fn(texts, input_type):
+            calls.append((list(texts), input_type))
+            return [[float(len(text))] for text in texts]
+
+        batcher = EmbeddingBatcher(embed_fn, max_batch_size=16, flush_window_ms=20)
+        results = await asyncio.gather(*[batcher.embed("x" * i) for i in range(1, 6)])
+
+        assert results == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert len(calls) == 1
+        assert calls[0][1] == "document"
+
+        metrics = batcher.get_metrics()
+        assert metrics["requests"] == 5
+        assert metrics["batches"] == 1
+        assert metrics["avg_fill_ratio"] == pytest.approx(5 / 16)
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_triggers_flush(self):
+        """Un lot plein est envoyé sans attendre la fenêtre"""
+        sizes = []
+
+        async def embed_fn(texts, input_type):
+            sizes.append(len(texts))
+            return [[0.0] for _ in texts]
+
+        batcher = EmbeddingBatcher(embed_fn, max_batch_size=2, flush_window_ms=10_000)
+        await asyncio.wait_for(
+            asyncio.gather(*[batcher.embed(str(i)) for i in range(4)]),
+            timeout=1.0
+        )
+
+        assert sizes == [2, 2]
+
+    @pytest.mark.asyncio
+    async def test_input_types_are_batched_separately(self):
+        """Les requêtes et documents ne partagent pas un lot"""
+        calls = []
+
+        async def embed_fn(texts, input_type):
+            calls.append(input_type)
+            return [[0.0] for _ in texts]
+
+        batcher = EmbeddingBatcher(embed_fn, max_batch_size=8, flush_window_ms=5)
+        await asyncio.gather(
+            batcher.embed("a", "document"),
+            batcher.embed("b", "query")
+        )
+
+        assert sorted(calls) == ["document", "query"]
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_every_waiter(self):
+        """Une erreur fournisseur est remontée à chaque appelant"""
+
+        async def embed_fn(texts, input_type):
+            raise RuntimeError("provider down")
+
+        batcher = EmbeddingBatcher(embed_fn, max_batch_size=8, flush_window_ms=1)
+        results = await asyncio.gather(
+            batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert batcher.get_metrics()["failed_batches"] == 1
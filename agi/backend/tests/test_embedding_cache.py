@@ -0,0 +1,103 @@
+"""
+Tests pour le cache d'embeddings L1/L2
+"""
+
+import pytest
+
+from services.embedding_cache import EmbeddingCache, decode_vector, encode_vector
+from services.external_services import VoyageAIService
+
+
+class FakeRedis:
+    """Client Redis minimal en mémoire"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def setex(self, key, ttl, value):
+        self.ops.append((key, value))
+
+    async def execute(self):
+        for key, value in self.ops:
+            self.redis.store[key] = value
+
+
+class TestEmbeddingCache:
+    """Tests du cache d'embeddings"""
+
+    def test_vectors_round_trip_as_float32(self):
+        payload = encode_vector([0.5, -1.25, 2.0])
+        assert len(payload) == 12
+        assert decode_vector(payload) == [0.5, -1.25, 2.0]
+
+    def test_key_normalizes_whitespace_and_scopes_model(self):
+        cache = EmbeddingCache()
+        key = cache.make_key("voyage-large-2", "document", "hello   world ")
+        assert key == cache.make_key("voyage-large-2", "document", "hello world")
+        assert key != cache.make_key("voyage-large-2", "query", "hello world")
+        assert key != cache.make_key("other-model", "document", "hello world")
+
+    @pytest.mark.asyncio
+    async def test_l1_lru_eviction(self):
+        cache = EmbeddingCache(max_entries=2)
+        await cache.set_many({"a": [1.0], "b": [2.0]})
+        await cache.get("a")
+        await cache.set("c", [3.0])
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") == [1.0]
+        assert cache.get_stats()["l1_evictions"] == 1
+
+    @pytest.mark.asyncio
+    async def test_l2_hit_promotes_to_l1(self):
+        redis = FakeRedis()
+        await EmbeddingCache(redis_client=redis).set("k", [1.0, 2.0])
+
+        cache = EmbeddingCache(redis_client=redis)
+        assert await cache.get_many(["k", "missing"]) == [[1.0, 2.0], None]
+        assert await cache.get("k") == [1.0, 2.0]
+
+        stats = cache.get_stats()
+        assert stats["l2_hits"] == 1
+        assert stats["l1_hits"] == 1
+        assert stats["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_uncached_embedding_always_reaches_provider(self):
+        """Sonde de santé: jamais servie par le cache"""
+        requests = []
+
+        async def fake_request(texts, input_type="document"):
+            requests.append(list(texts))
+            return [[0.5] for _ in texts]
+
+        service = VoyageAIService()
+        service.batcher = None
+        service.cache = EmbeddingCache()
+        service._request_embeddings = fake_request
+
+        await service.create_single_embedding("test")
+        await service.create_single_embedding("test")
+        assert len(requests) == 1
+
+        await service.create_single_embedding("test", use_cache=False)
+        await service.create_single_embedding("test", use_cache=False)
+        assert len(requests) == 3
@@ -0,0 +1,137 @@
+"""
+Tests pour les écritures groupées (UNWIND) du GraphService
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from neo4j.exceptions import TransientError
+
+from services.graph_service import GraphService
+from services.graph_snapshot import GraphSnapshotStore
+
+
+class FakeResult:
+    def __init__(self, record):
+        self.record = record
+
+    async def single(self):
+        return self.record
+
+
+class FakeTransaction:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def run(self, query, rows, **parameters):
+        self.driver.batches.append((rows, parameters))
+        record = {"count": len(rows)}
+        if "AS edges" in query:
+            record["edges"] = [
+                [row["source_id"], row["target_id"], row["relationship_type"],
+                 row["properties"].get("strength"), f"rel-{row['source_id']}-{row['target_id']}"]
+                for row in rows
+            ]
+        return FakeResult(record)
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute_write(self, work, *args):
+        if self.driver.failures:
+            self.driver.failures -= 1
+            raise TransientError("deadlock")
+        return await work(FakeTransaction(self.driver), *args)
+
+
+class FakeDriver:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def session(self):
+        return FakeSession(self)
+
+
+def make_service(failures=0):
+    service = GraphService(external_services=None)
+    service.settings = SimpleNamespace(graph_write_batch_size=1000, graph_write_max_retries=3)
+    service.driver = FakeDriver(failures)
+    service.snapshots = None
+    return service
+
+
+class TestGraphBatchWrites:
+    """Tests de write_in_batches et des API groupées"""
+
+    @pytest.mark.asyncio
+    async def test_relationships_are_written_in_chunks(self):
+        """2500 relations: trois transactions, métadonnées sérialisées"""
+        service = make_service()
+        relationships = [
+            {
+                "source_id": f"a{index}",
+                "target_id": f"b{index}",
+                "relationship_type": "semantic",
+                "properties": {"strength": 0.8, "metadata": {"method": "ann"}}
+            }
+            for index in range(2500)
+        ]
+
+        created = await service.create_relationships(relationships)
+
+        assert created == 2500
+        assert [len(rows) for rows, _ in service.driver.batches] == [1000, 1000, 500]
+        properties = service.driver.batches[0][0][0]["properties"]
+        assert json.loads(properties["metadata"]) == {"method": "ann"}
+
+    @pytest.mark.asyncio
+    async def test_transient_error_replays_the_batch(self):
+        service = make_service(failures=1)
+
+        removed = await service.remove_relationships(["r1", "r2"])
+
+        assert removed == 2
+        assert len(service.driver.batches) == 1
+
+    @pytest.mark.asyncio
+    async def test_memory_node_is_merged_without_concepts(self):
+        """Sans concept, la requête s'exécute une fois pour créer le nœud mémoire"""
+        service = make_service()
+
+        linked = await service.link_memory_to_concepts("m1", "u1", [])
+
+        assert linked == 0
+        assert service.driver.batches == [([], {"memory_id": "m1", "user_id": "u1"})]
+
+    @pytest.mark.asyncio
+    async def test_created_edges_are_tracked_by_element_id(self):
+        """Les mises à jour et suppressions par elementId atteignent l'instantané"""
+        service = make_service()
+
+        async def load(user_id):
+            nodes = [{"id": concept_id, "name": concept_id, "type": "IDEA"} for concept_id in "abc"]
+            return nodes, []
+
+        service.snapshots = GraphSnapshotStore(load)
+        snapshot = await service.snapshots.get("u1")
+
+        await service.create_relationships([
+            {"source_id": "a", "target_id": "b", "relationship_type": "semantic", "properties": {"strength": 0.8}},
+            {"source_id": "b", "target_id": "c", "relationship_type": "semantic", "properties": {"strength": 0.9}}
+        ])
+        await service.update_relationships_properties([{"id": "rel-a-b", "properties": {"strength": 0.4}}])
+        await service.remove_relationships(["rel-b-c"])
+
+        neighbors = snapshot.neighbors("a", max_depth=2, min_strength=0.1)
+        assert [neighbor["concept"]["id"] for neighbor in neighbors] == ["b"]
+        assert neighbors[0]["path_strength"] == pytest.approx(0.4)
@@ -0,0 +1,92 @@
+"""
+Tests pour l'instantané CSR du graphe de concepts
+"""
+
+import pytest
+
+from services.graph_snapshot import GraphSnapshot, GraphSnapshotStore
+
+
+def concepts(*ids):
+    return [{"id": concept_id, "name": concept_id.upper(), "type": "IDEA", "importance": 0.5} for concept_id in ids]
+
+
+EDGES = [
+    {"id": "r1", "source_id": "a", "target_id": "b", "type": "USES", "strength": 0.9},
+    {"id": "r2", "source_id": "b", "target_id": "c", "type": "USES", "strength": 0.8},
+    {"id": "r3", "source_id": "a", "target_id": "c", "type": "CONTAINS", "strength": 0.5},
+    {"id": "r4", "source_id": "c", "target_id": "d", "type": "CONTAINS", "strength": 0.2}
+]
+
+
+class TestGraphSnapshot:
+    """Tests des parcours et des mises à jour incrémentales"""
+
+    def test_neighbors_use_best_path_strength(self):
+        """c est atteint via b (0.9 * 0.8) plutôt que directement (0.5); d est sous le seuil"""
+        snapshot = GraphSnapshot(concepts("a", "b", "c", "d"), EDGES)
+
+        neighbors = snapshot.neighbors("a", max_depth=2, min_strength=0.3)
+
+        assert [(n["concept"]["id"], n["distance"]) for n in neighbors] == [("b", 1), ("c", 2)]
+        assert neighbors[1]["path_strength"] == pytest.approx(0.72)
+
+    def test_best_path_and_k_hop(self):
+        snapshot = GraphSnapshot(concepts("a", "b", "c", "d"), EDGES)
+
+        path = snapshot.best_path("a", "d")
+
+        assert [node["id"] for node in path["nodes"]] == ["a", "b", "c", "d"]
+        assert [rel["type"] for rel in path["relationships"]] == ["USES", "USES", "CONTAINS"]
+        assert path["score"] == pytest.approx(0.9 * 0.8 * 0.2)
+        assert snapshot.k_hop("a", 1) == {"b": 1, "c": 1}
+
+    @pytest.mark.parametrize("compact_threshold", [1000, 1])
+    def test_incremental_writes_with_and_without_compaction(self, compact_threshold):
+        """Les écritures sont visibles avant comme après reconstruction du CSR"""
+        snapshot = GraphSnapshot(concepts("a", "b", "c", "d"), EDGES, compact_threshold=compact_threshold)
+
+        snapshot.upsert_concept({"id": "e", "name": "E", "type": "IDEA"})
+        snapshot.upsert_edge("d", "e", "USES", 0.9)
+        snapshot.remove_edge_by_id("r2")
+        snapshot.update_edge_by_id("r3", 0.95)
+
+        neighbors = {n["concept"]["id"]: n for n in snapshot.neighbors("a", max_depth=3, min_strength=0.1)}
+
+        assert neighbors["c"]["path_strength"] == pytest.approx(0.95)
+        assert neighbors["e"]["distance"] == 3
+        assert snapshot.best_path("b", "c")["nodes"][1]["id"] == "a"
+
+    def test_stats_report_age_and_footprint(self):
+        snapshot = GraphSnapshot(concepts("a", "b", "c", "d"), EDGES)
+
+        stats = snapshot.stats()
+
+        assert stats["nodes"] == 4
+        assert stats["edges"] == 4
+        assert stats["age_seconds"] >= 0
+        assert stats["memory_bytes"] > 0
+
+
+class TestGraphSnapshotStore:
+    """Tests du chargement par utilisateur"""
+
+    @pytest.mark.asyncio
+    async def test_loads_once_and_routes_writes(self):
+        loads = []
+
+        async def loader(user_id):
+            loads.append(user_id)
+            return concepts("a", "b"), []
+
+        store = GraphSnapshotStore(loader)
+        snapshot = await store.get("user-1")
+        store.record_edge("a", "b", "USES", 0.7)
+
+        assert await store.get("user-1") is snapshot
+        assert loads == ["user-1"]
+        assert snapshot.neighbors("a")[0]["concept"]["id"] == "b"
+
+        store.invalidate("user-1")
+        await store.get("user-1")
+        assert loads == ["user-1", "user-1"]
@@ -0,0 +1,93 @@
+"""
+Tests pour la recherche hybride (plein texte + vecteurs, fusion RRF)
+"""
+
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from services.embedding_service import EmbeddingService
+from services.rate_limiter import ProviderLimits, ProviderRateLimiter
+
+
+class FakeVoyage:
+    async def create_single_embedding(self, text, input_type="document"):
+        return [0.1, 0.2]
+
+
+class FakeMemoryService:
+    async def search_memories_by_embedding(self, user_id, query_embedding, limit, similarity_threshold):
+        return [
+            {"id": "a", "content": "alpha", "similarity": 0.91},
+            {"id": "b", "content": "beta", "similarity": 0.85}
+        ]
+
+    async def search_memories_lexical(self, user_id, query, limit):
+        return [
+            {"id": "c", "content": "ERR-4242", "lexical_score": 0.7},
+            {"id": "b", "content": "beta", "lexical_score": 0.4}
+        ]
+
+
+class FakeGraphService:
+    async def find_similar_concepts(self, user_id, query, limit):
+        return []
+
+
+class FakeCohere:
+    def __init__(self):
+        self.calls = 0
+
+    async def rerank_documents(self, query, documents, top_k, return_documents=True):
+        self.calls += 1
+        return [{"index": len(documents) - 1, "relevance_score": 0.99}]
+
+
+def make_service(rerank_per_minute=10):
+    cohere = FakeCohere()
+    external_services = SimpleNamespace(
+        voyage=FakeVoyage(),
+        cohere=cohere,
+        rate_limiter=ProviderRateLimiter({
+            "search_rerank": ProviderLimits(requests_per_minute=rerank_per_minute)
+        })
+    )
+    service = EmbeddingService(external_services, FakeMemoryService(), FakeGraphService())
+    return service, cohere
+
+
+class TestHybridSearch:
+    """Tests de semantic_search en mode hybride"""
+
+    @pytest.mark.asyncio
+    async def test_rrf_fuses_sources_with_per_source_scores(self):
+        """Un document présent dans les deux sources remonte en tête"""
+        service, cohere = make_service()
+
+        results = await service.semantic_search(uuid4(), "beta ERR-4242", mode="hybrid")
+
+        ids = [memory["id"] for memory in results["memories"]]
+        assert ids[0] == "b"
+        assert set(ids) == {"a", "b", "c"}
+
+        top = results["combined_results"][0]
+        assert top["scores"]["vector"] == 0.85
+        assert top["scores"]["lexical"] == 0.4
+        assert top["ranks"] == {"vector": 2, "lexical": 2}
+        assert top["scores"]["rrf"] == pytest.approx(2 / 62)
+        assert cohere.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_rerank_is_budget_gated(self):
+        """Le rerank n'est appelé que dans la limite du budget"""
+        service, cohere = make_service(rerank_per_minute=1)
+
+        first = await service.semantic_search(uuid4(), "beta", mode="hybrid", use_reranking=True)
+        second = await service.semantic_search(uuid4(), "beta", mode="hybrid", use_reranking=True)
+
+        assert first["reranked"] is True
+        assert first["combined_results"][0]["scores"]["rerank"] == 0.99
+        assert second["reranked"] is False
+        assert second["rerank_skipped"] == "budget"
+        assert cohere.calls == 1
@@ -0,0 +1,156 @@
+"""
+Tests pour la file de jobs asynchrones (mode local, sans Redis)
+"""
+
+import asyncio
+
+import pytest
+
+from services.job_queue import (
+    JOB_CANCELLED,
+    JOB_COMPLETED,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JobLimitExceeded,
+    JobManager
+)
+
+
+async def wait_for_status(manager, job_id, status, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        job = await manager.get(job_id)
+        if job.status == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id}: {job.status} != {status}")
+
+
+class TestJobManager:
+    """Tests de soumission, progression, annulation et quotas"""
+
+    @pytest.mark.asyncio
+    async def test_job_reports_progress_and_result(self):
+        manager = JobManager(workers=2)
+
+        async def handler(job, context):
+            await context.report(0.5, "moitié")
+            return {"echo": job.payload["value"]}
+
+        manager.register_handler("agent", handler)
+        manager.start()
+        try:
+            job = await manager.submit("agent", "consolidator", {"value": 42}, "u1")
+            done = await wait_for_status(manager, job.id, JOB_COMPLETED)
+        finally:
+            await manager.stop()
+
+        assert done.result == {"echo": 42}
+        assert done.progress == 1.0
+        assert done.message == "moitié"
+        assert [listed.id for listed in await manager.list_jobs("u1")] == [job.id]
+
+    @pytest.mark.asyncio
+    async def test_running_job_is_cancelled(self):
+        manager = JobManager(workers=1)
+        started = asyncio.Event()
+
+        async def handler(job, context):
+            started.set()
+            await asyncio.sleep(10)
+            return {}
+
+        manager.register_handler("workflow", handler)
+        manager.start()
+        try:
+            job = await manager.submit("workflow", "multi_agent", {}, "u1")
+            await asyncio.wait_for(started.wait(), 1.0)
+            await manager.cancel(job.id)
+            cancelled = await wait_for_status(manager, job.id, JOB_CANCELLED)
+        finally:
+            await manager.stop()
+
+        assert cancelled.cancel_requested is True
+        assert cancelled.finished_at is not None
+
+    @pytest.mark.asyncio
+    async def test_per_user_running_cap_and_timeout(self):
+        """Un seul job en cours pour u1 malgré deux workers; u2 n'est pas bloqué"""
+        manager = JobManager(workers=2, max_running_per_user=1, job_timeout=0.3)
+        release = asyncio.Event()
+
+        async def handler(job, context):
+            if job.payload.get("hang"):
+                await asyncio.sleep(10)
+            await release.wait()
+            return {}
+
+        manager.register_handler("agent", handler)
+        manager.start()
+        try:
+            first = await manager.submit("agent", "validator", {"hang": True}, "u1")
+            second = await manager.submit("agent", "validator", {}, "u1")
+            other = await manager.submit("agent", "validator", {}, "u2")
+
+            await wait_for_status(manager, first.id, JOB_RUNNING)
+            await wait_for_status(manager, other.id, JOB_RUNNING)
+            assert (await manager.get(second.id)).status != JOB_RUNNING
+
+            release.set()
+            timed_out = await wait_for_status(manager, first.id, JOB_FAILED)
+            await wait_for_status(manager, second.id, JOB_COMPLETED)
+        finally:
+            await manager.stop()
+
+        assert "Délai" in timed_out.error
+
+    @pytest.mark.asyncio
+    async def test_submission_limits(self):
+        manager = JobManager(max_queued_per_user=2)
+
+        async def handler(job, context):
+            return {}
+
+        manager.register_handler("agent", handler)
+
+        await manager.submit("agent", "connector", {}, "u1")
+        await manager.submit("agent", "connector", {}, "u1")
+
+        with pytest.raises(JobLimitExceeded):
+            await manager.submit("agent", "connector", {}, "u1")
+        with pytest.raises(ValueError):
+            await manager.submit("unknown", "connector", {}, "u2")
+
+    @pytest.mark.asyncio
+    async def test_stop_requeues_running_job_and_releases_slot(self):
+        manager = JobManager(workers=1, max_running_per_user=1)
+        started = asyncio.Event()
+        runs = []
+
+        async def handler(job, context):
+            runs.append(job.id)
+            if len(runs) == 1:
+                started.set()
+                await asyncio.sleep(10)
+            return {"run": len(runs)}
+
+        manager.register_handler("workflow", handler)
+        manager.start()
+        job = await manager.submit("workflow", "memory_consolidation", {}, "u1")
+        await asyncio.wait_for(started.wait(), 2.0)
+        await manager.stop()
+
+        interrupted = await manager.get(job.id)
+        assert interrupted.status == JOB_QUEUED
+        assert interrupted.finished_at is None
+        assert manager._user_slots["u1"] == set()
+
+        # Redémarrage: le job est repris sans nouvelle soumission
+        manager.start()
+        try:
+            done = await wait_for_status(manager, job.id, JOB_COMPLETED)
+        finally:
+            await manager.stop()
+
+        assert done.result == {"run": 2}
@@ -0,0 +1,123 @@
+"""
+Tests pour l'import massif de mémoires
+"""
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from services.memory_service import MemoryService
+
+
+class FakeConnection:
+    def __init__(self, copies, fail=False):
+        self.copies = copies
+        self.fail = fail
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def copy_records_to_table(self, table, records, columns):
+        if self.fail:
+            raise RuntimeError("copy failed")
+        self.copies.append((table, list(records), columns))
+
+
+class FakePool:
+    def __init__(self, fail=False):
+        self.copies = []
+        self.fail = fail
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self.copies, self.fail)
+
+
+class FakeVoyage:
+    def __init__(self):
+        self.calls = []
+
+    async def create_embeddings(self, texts, input_type="document"):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def make_service(pool):
+    voyage = FakeVoyage()
+    service = MemoryService(external_services=SimpleNamespace(voyage=voyage))
+    service.pool = pool
+    return service, voyage
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestCreateMemoriesBulk:
+    """Tests de create_memories_bulk"""
+
+    @pytest.mark.asyncio
+    async def test_chunks_are_embedded_and_copied(self):
+        """Un appel d'embedding et un COPY par bloc, résultats dans l'ordre"""
+        pool = FakePool()
+        service, voyage = make_service(pool)
+        items = [{"content": f"mémoire {i}", "level": "L2"} for i in range(5)]
+
+        results = await collect(service.create_memories_bulk(uuid4(), items, chunk_size=2))
+
+        assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+        assert all(result["status"] == "created" for result in results)
+        assert [len(call) for call in voyage.calls] == [2, 2, 1]
+        assert [len(copy[1]) for copy in pool.copies] == [2, 2, 1]
+        assert pool.copies[0][0] == "memories"
+
+    @pytest.mark.asyncio
+    async def test_invalid_items_are_reported_individually(self):
+        """Les éléments invalides n'empêchent pas l'import du bloc"""
+        pool = FakePool()
+        service, _ = make_service(pool)
+        items = [
+            {"content": "valide", "importance": 0.9},
+            {"content": "   "},
+            {"content": "niveau", "level": "L9"},
+            {"error": "Invalid line: bad json"}
+        ]
+
+        results = await collect(service.create_memories_bulk(uuid4(), items))
+
+        assert [result["status"] for result in results] == ["created", "error", "error", "error"]
+        assert results[0]["importance"] == 0.9
+        assert len(pool.copies[0][1]) == 1
+
+    @pytest.mark.asyncio
+    async def test_unconvertible_fields_are_rejected_before_embedding(self):
+        """conversation_id ou importance invalide: erreur de ligne, le flux continue"""
+        pool = FakePool()
+        service, voyage = make_service(pool)
+        conversation_id = uuid4()
+        items = [
+            {"content": "conversation", "conversation_id": str(conversation_id)},
+            {"content": "uuid invalide", "conversation_id": "not-a-uuid"},
+            {"content": "importance invalide", "importance": "haute"}
+        ]
+
+        results = await collect(service.create_memories_bulk(uuid4(), items))
+
+        assert [result["status"] for result in results] == ["created", "error", "error"]
+        assert "not-a-uuid" in results[1]["error"]
+        assert voyage.calls == [["conversation"]]
+        assert pool.copies[0][1][0][7] == conversation_id
+
+    @pytest.mark.asyncio
+    async def test_copy_failure_marks_chunk_as_failed(self):
+        """Un COPY en échec invalide tout son bloc (transaction annulée)"""
+        service, _ = make_service(FakePool(fail=True))
+
+        results = await collect(
+            service.create_memories_bulk(uuid4(), [{"content": "a"}, {"content": "b"}])
+        )
+
+        assert [result["status"] for result in results] == ["error", "error"]
@@ -0,0 +1,65 @@
+"""
+Tests pour la consolidation des mémoires par blocs
+"""
+
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+import pytest
+
+from services.memory_service import MemoryService
+
+
+class FakePool:
+    """Renvoie un nombre de lignes prédéfini par étape"""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.queries = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetchval(self, query, *params):
+        self.queries.append((query, params))
+        for key, remaining in self.counts.items():
+            if f"'{key}'" in query and remaining:
+                return remaining.pop(0)
+        return 0
+
+
+def make_service(counts):
+    service = MemoryService(external_services=None)
+    service.pool = FakePool(counts)
+    return service
+
+
+class TestConsolidation:
+    """Tests de consolidate_all_memories"""
+
+    @pytest.mark.asyncio
+    async def test_chunks_until_partial_batch(self):
+        """Chaque étape boucle jusqu'à un bloc incomplet et cumule les comptes"""
+        # Clés: niveau visé par le SELECT de chaque étape
+        service = make_service({"L1": [10, 10, 3], "L2": [4]})
+
+        stats = await service.consolidate_all_memories(chunk_size=10)
+
+        assert stats["l1_to_l2"] == 23
+        assert stats["l2_to_l3"] == 4
+        assert stats["chunks"] == 5
+        assert all("FOR UPDATE SKIP LOCKED" in query for query, _ in service.pool.queries)
+        assert all(params == (10,) for _, params in service.pool.queries)
+
+    @pytest.mark.asyncio
+    async def test_per_user_consolidation_is_scoped(self):
+        """La consolidation d'un utilisateur filtre sur user_id"""
+        service = make_service({})
+        user_id = uuid4()
+
+        stats = await service.consolidate_memories(user_id)
+
+        assert stats == {"l1_to_l2": 0, "l2_to_l3": 0, "deleted": 0}
+        assert all("user_id = $2" in query for query, _ in service.pool.queries)
+        assert all(params[1] == user_id for _, params in service.pool.queries)
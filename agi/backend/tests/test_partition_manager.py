@@ -0,0 +1,178 @@
+"""
+Tests pour le partitionnement des mémoires
+"""
+
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+
+import asyncpg
+import pytest
+
+from services.partition_manager import PartitionManager, add_months
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, query, *params):
+        statement = " ".join(query.split())
+        if any(statement.endswith(f"DETACH PARTITION {name}") for name in self.pool.locked):
+            raise asyncpg.LockNotAvailableError("canceling statement due to lock timeout")
+        self.pool.statements.append(statement)
+
+    async def fetch(self, query, *params):
+        if "unnest" in query:
+            return [{"name": name} for name in params[0] if name in self.pool.tables]
+        if "pg_constraint" in query:
+            return self.pool.foreign_keys
+        if "pg_index" in query:
+            return [{"name": name} for name in self.pool.indexes]
+        return [{"name": name} for name in self.pool.partitions]
+
+    async def fetchval(self, query, *params):
+        if "to_regclass" in query:
+            return True
+        if "SELECT EXISTS" in query:
+            return any(month in query for month in self.pool.pending_months)
+        return None
+
+
+class FakePool:
+    def __init__(self, partitions, tables=(), foreign_keys=(), pending_months=(), locked=(), indexes=()):
+        self.partitions = partitions
+        self.indexes = indexes
+        self.locked = locked
+        self.tables = set(tables)
+        self.foreign_keys = list(foreign_keys)
+        self.pending_months = pending_months
+        self.statements = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self)
+
+
+class TestPartitionManager:
+    """Tests de création et d'expiration des partitions mensuelles"""
+
+    def test_add_months_wraps_years(self):
+        assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+
+    @pytest.mark.asyncio
+    async def test_future_partitions_are_created_with_index(self):
+        """Les mois manquants sont créés pour L1 et L2, chacun avec son index HNSW"""
+        pool = FakePool(["memories_l1_p202610"])
+        manager = PartitionManager(pool, premake_months=1)
+
+        created = await manager.ensure_future_partitions(
+            now=datetime(2026, 10, 17, tzinfo=timezone.utc)
+        )
+
+        assert created == ["memories_l1_p202611", "memories_l2_p202610", "memories_l2_p202611"]
+        assert any(
+            "PARTITION OF memories_l2 FOR VALUES FROM ('2026-11-01') TO ('2026-12-01')" in statement
+            for statement in pool.statements
+        )
+        assert sum("USING hnsw" in statement for statement in pool.statements) == 3
+
+    @pytest.mark.asyncio
+    async def test_only_fully_expired_partitions_are_dropped(self):
+        """Seules les partitions dont la borne haute est passée sont détachées puis supprimées"""
+        pool = FakePool(["memories_l1_p202608", "memories_l1_p202609", "memories_l2_p202610", "memories_l3"])
+        manager = PartitionManager(pool)
+
+        dropped = await manager.drop_expired_partitions(
+            now=datetime(2026, 10, 1, tzinfo=timezone.utc)
+        )
+
+        assert dropped == ["memories_l1_p202608", "memories_l1_p202609"]
+        # Pas de CONCURRENTLY possible à côté d'une partition DEFAULT: attente du verrou bornée
+        assert pool.statements[:3] == [
+            "SET LOCAL lock_timeout = 5000",
+            "ALTER TABLE memories_l1 DETACH PARTITION memories_l1_p202608",
+            "DROP TABLE IF EXISTS memories_l1_p202608"
+        ]
+        assert "DELETE FROM memories_l2_default WHERE expires_at <= NOW()" in pool.statements
+
+    @pytest.mark.asyncio
+    async def test_locked_partition_is_left_for_next_maintenance(self):
+        pool = FakePool(["memories_l1_p202608", "memories_l1_p202609"], locked=["memories_l1_p202608"])
+        manager = PartitionManager(pool)
+
+        dropped = await manager.drop_expired_partitions(
+            now=datetime(2026, 10, 1, tzinfo=timezone.utc)
+        )
+
+        assert dropped == ["memories_l1_p202609"]
+        assert "DROP TABLE IF EXISTS memories_l1_p202608" not in pool.statements
+
+    @pytest.mark.asyncio
+    async def test_schema_has_default_partitions_and_reference_trigger(self):
+        """Une date hors des mois créés tombe dans DEFAULT; les références sont nettoyées par trigger"""
+        pool = FakePool([], tables=["memory_relations"])
+        manager = PartitionManager(pool)
+
+        await manager.create_schema()
+
+        assert "CREATE TABLE IF NOT EXISTS memories_l1_default PARTITION OF memories_l1 DEFAULT" in pool.statements
+        assert "CREATE TABLE IF NOT EXISTS memories_l2_default PARTITION OF memories_l2 DEFAULT" in pool.statements
+        trigger_function = next(s for s in pool.statements if "FUNCTION memories_delete_references" in s)
+        assert "DELETE FROM memory_relations WHERE source_memory_id = OLD.id;" in trigger_function
+        assert "DELETE FROM memory_relations WHERE target_memory_id = OLD.id;" in trigger_function
+        assert "memory_concepts" not in trigger_function
+
+    @pytest.mark.asyncio
+    async def test_new_month_takes_over_default_rows(self):
+        """Les lignes déjà en DEFAULT pour le mois sont déplacées à sa création"""
+        pool = FakePool(
+            ["memories_l1_p202610", "memories_l2_p202610"], pending_months=["'2026-11-01'"]
+        )
+        manager = PartitionManager(pool, premake_months=1)
+
+        await manager.ensure_future_partitions(now=datetime(2026, 10, 17, tzinfo=timezone.utc))
+
+        moves = [s for s in pool.statements if "memories_l1" in s and "hnsw" not in s]
+        assert moves[0] == "ALTER TABLE memories_l1 DETACH PARTITION memories_l1_default"
+        assert moves[1].startswith("CREATE TABLE IF NOT EXISTS memories_l1_p202611 PARTITION OF memories_l1")
+        assert moves[2].startswith("INSERT INTO memories_l1_p202611 (id, user_id")
+        assert moves[3].startswith("DELETE FROM memories_l1_default WHERE expires_at >= '2026-11-01'")
+        assert moves[4] == "ALTER TABLE memories_l1 ATTACH PARTITION memories_l1_default DEFAULT"
+
+    @pytest.mark.asyncio
+    async def test_migration_replaces_foreign_keys_to_legacy_table(self):
+        """Les clés étrangères vers l'ancienne table sont supprimées, les références orphelines aussi"""
+        pool = FakePool(
+            [],
+            tables=["memory_relations", "memory_concepts"],
+            foreign_keys=[
+                {"table_name": "memory_relations", "conname": "memory_relations_source_memory_id_fkey"},
+                {"table_name": "memory_concepts", "conname": "memory_concepts_memory_id_fkey"}
+            ],
+            indexes=["memories_pkey", "memories_content_tsv_idx", "idx_memories_user"]
+        )
+        manager = PartitionManager(pool)
+
+        await manager.migrate_existing_table()
+
+        assert (
+            'ALTER TABLE memory_relations DROP CONSTRAINT "memory_relations_source_memory_id_fkey"'
+            in pool.statements
+        )
+        assert 'ALTER TABLE memory_concepts DROP CONSTRAINT "memory_concepts_memory_id_fkey"' in pool.statements
+        assert any("CREATE TRIGGER memories_delete_references" in s for s in pool.statements)
+        # Noms d'index libérés: la nouvelle table crée bien son index GIN
+        assert 'ALTER INDEX "memories_pkey" RENAME TO "memories_unpartitioned_pkey"' in pool.statements
+        assert (
+            'ALTER INDEX "memories_content_tsv_idx" RENAME TO "memories_unpartitioned_content_tsv_idx"'
+            in pool.statements
+        )
+        assert 'ALTER INDEX "idx_memories_user" RENAME TO "memories_unpartitioned_idx_memories_user"' in pool.statements
+        assert pool.statements[-1] == (
+            "DELETE FROM memory_concepts WHERE memory_id IN "
+            "(SELECT id FROM memories_unpartitioned EXCEPT SELECT id FROM memories)"
+        )
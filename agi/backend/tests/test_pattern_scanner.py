@@ -0,0 +1,78 @@
+"""
+Tests pour le scanner de patterns en une seule passe
+"""
+
+import re
+from collections import Counter
+
+import pytest
+
+from services.pattern_scanner import BoundedCounter, PatternScanner
+
+REGEX_PATTERNS = {
+    "email": r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    "date": r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{4}[/-]\d{1,2}[/-]\d{1,2}\b',
+    "time": r'\b\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM|am|pm)?\b'
+}
+
+TEXTS = [
+    "Réunion le 12/05/2024 à 10:30 avec alice@example.com",
+    "Le taux est de 3.14 pour 100 requêtes",
+    "Réunion le 2024-05-13 à 10:30, puis 100 tests",
+    "Contact alice@example.com pour la réunion le 12/05/2024"
+]
+
+
+class TestPatternScanner:
+    """Tests de parité avec l'extraction en plusieurs passes"""
+
+    def test_single_pass_matches_separate_scans(self):
+        scan = PatternScanner(REGEX_PATTERNS).scan(iter(TEXTS))
+
+        words = re.findall(r'\b\w+\b', " ".join(TEXTS).lower())
+        bigrams = Counter(tuple(words[i:i + 2]) for i in range(len(words) - 1))
+        trigrams = Counter(tuple(words[i:i + 3]) for i in range(len(words) - 2))
+        numbers = Counter(
+            float(number) for text in TEXTS for number in re.findall(r'\b\d+(?:\.\d+)?\b', text)
+        )
+
+        assert scan.documents == 4
+        assert scan.ngrams[2] == bigrams
+        assert scan.ngrams[3] == trigrams
+        assert scan.numbers == numbers
+        for name, regex in REGEX_PATTERNS.items():
+            expected = [match for text in TEXTS for match in re.findall(regex, text)]
+            assert scan.pattern_counts[name] == len(expected)
+            assert scan.pattern_examples[name] == expected[:5]
+        assert scan.most_common_ngrams(2, 1) == [("réunion le", 3)]
+        assert scan.exact
+
+    def test_counters_stay_bounded(self):
+        counter = BoundedCounter(max_entries=10)
+        for key in range(100):
+            counter.add("fréquent")
+            counter.add(key)
+
+        assert len(counter) <= 10
+        assert counter["fréquent"] == 100
+        assert counter.pruned > 0
+
+    def test_reserved_names_are_rejected(self):
+        with pytest.raises(ValueError):
+            PatternScanner({"word": r"\w+"})
+
+    def test_chunk_scans_merge_like_a_single_scan(self):
+        """Les n-grammes à cheval sur deux blocs sont comptés à la fusion"""
+        scanner = PatternScanner(REGEX_PATTERNS)
+        texts = TEXTS + ["", "un", "deux trois"] + TEXTS
+
+        merged = scanner.scan(texts[:1])
+        for start, end in ((1, 5), (5, 6), (6, 7), (7, len(texts))):
+            merged.merge(scanner.scan(texts[start:end]))
+        single = scanner.scan(texts)
+
+        assert merged.ngrams == single.ngrams
+        assert merged.numbers == single.numbers
+        assert merged.pattern_counts == single.pattern_counts
+        assert merged.pattern_examples == single.pattern_examples
+        assert (merged.documents, merged.tokens) == (single.documents, single.tokens)
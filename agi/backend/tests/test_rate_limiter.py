@@ -0,0 +1,99 @@
+"""
+Tests pour le gouverneur de débit des fournisseurs
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from services.rate_limiter import (
+    ProviderLimits,
+    ProviderRateLimiter,
+    is_retryable_error,
+    retry_after_seconds,
+    wait_retry_after
+)
+
+
+def make_status_error(status_code: int, headers=None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.example.com")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+class TestProviderRateLimiter:
+    """Tests des seaux à jetons (repli local)"""
+
+    @pytest.mark.asyncio
+    async def test_requests_per_minute_budget(self):
+        """Le budget requêtes/min est consommé puis refusé"""
+        limiter = ProviderRateLimiter({"anthropic": ProviderLimits(requests_per_minute=2)})
+
+        assert await limiter.try_acquire("anthropic")
+        assert await limiter.try_acquire("anthropic")
+        assert not await limiter.try_acquire("anthropic")
+        assert limiter.get_stats()["anthropic"]["rejected_try_acquire"] == 1
+
+    @pytest.mark.asyncio
+    async def test_tokens_per_minute_budget(self):
+        """Le budget tokens/min limite indépendamment des requêtes"""
+        limiter = ProviderRateLimiter({
+            "voyage": ProviderLimits(requests_per_minute=100, tokens_per_minute=1000)
+        })
+
+        assert await limiter.try_acquire("voyage", tokens=800)
+        assert not await limiter.try_acquire("voyage", tokens=400)
+        assert await limiter.try_acquire("voyage", tokens=100)
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """Le sémaphore borne les appels en vol"""
+        limiter = ProviderRateLimiter({"cohere": ProviderLimits(max_concurrency=2)})
+        active = 0
+        peak = 0
+
+        async def call():
+            nonlocal active, peak
+            async with limiter.limit("cohere"):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*[call() for _ in range(6)])
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_penalize_pauses_provider(self):
+        """Un 429 suspend le fournisseur jusqu'au Retry-After"""
+        limiter = ProviderRateLimiter({"anthropic": ProviderLimits(requests_per_minute=100)})
+
+        await limiter.record_response_error(
+            "anthropic", make_status_error(429, {"retry-after": "30"})
+        )
+
+        assert not await limiter.try_acquire("anthropic")
+        assert limiter.get_stats()["anthropic"]["rate_limited_responses"] == 1
+
+
+class TestRetryPolicy:
+    """Tests de la politique de retry"""
+
+    def test_retry_after_header_is_honoured(self):
+        """Retry-After remplace le backoff exponentiel"""
+        error = make_status_error(429, {"retry-after": "2"})
+        state = SimpleNamespace(outcome=SimpleNamespace(failed=True, exception=lambda: error))
+
+        wait = wait_retry_after(lambda retry_state: 99.0, max_wait=60.0)
+
+        assert retry_after_seconds(error) == 2.0
+        assert wait(state) == 2.0
+
+    def test_only_transient_errors_are_retried(self):
+        """Les erreurs client (400, clé manquante) ne sont pas retentées"""
+        assert is_retryable_error(make_status_error(429))
+        assert is_retryable_error(make_status_error(503))
+        assert not is_retryable_error(make_status_error(400))
+        assert not is_retryable_error(ValueError("VOYAGE_API_KEY non configurée"))
@@ -0,0 +1,114 @@
+"""
+Tests pour la recherche en parallèle avec délai par branche
+"""
+
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from services.embedding_service import EmbeddingService
+
+
+class FakeVoyage:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def create_single_embedding(self, text, input_type="document"):
+        await asyncio.sleep(self.delay)
+        self.calls += 1
+        return [0.1, 0.2]
+
+
+class FakeMemoryService:
+    def __init__(self):
+        self.embeddings = []
+
+    async def search_memories_by_embedding(self, user_id, query_embedding, limit, similarity_threshold=0.7):
+        self.embeddings.append(query_embedding)
+        return [
+            {"id": "m1", "content": "alpha", "similarity": 0.9},
+            {"id": "m2", "content": "beta", "similarity": 0.8}
+        ]
+
+
+class FakeGraphService:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batch_calls = []
+
+    async def find_similar_concepts(self, user_id, query, limit):
+        await asyncio.sleep(self.delay)
+        return [{"id": "c0", "name": "source", "importance": 0.5}]
+
+    async def find_similar_concepts_batch(self, user_id, queries, limit):
+        self.batch_calls.append(("concepts", len(queries)))
+        return [[{"id": f"c{index + 1}"}] for index in range(len(queries))]
+
+    async def get_concepts_neighbors_batch(self, concept_ids, max_depth, min_strength, user_id):
+        self.batch_calls.append(("neighbors", len(concept_ids)))
+        return {
+            concept_id: [{"concept": {"id": "shared"}}, {"concept": {"id": f"n-{concept_id}"}}]
+            for concept_id in concept_ids
+        }
+
+
+def make_service(graph_delay=0.0, embedding_delay=0.0, postgres_timeout=1.0):
+    voyage = FakeVoyage(embedding_delay)
+    graph = FakeGraphService(graph_delay)
+    service = EmbeddingService(SimpleNamespace(voyage=voyage), FakeMemoryService(), graph)
+    service.settings = SimpleNamespace(
+        search_postgres_timeout=postgres_timeout,
+        search_graph_timeout=0.05,
+        search_candidate_multiplier=3,
+        search_rrf_k=60
+    )
+    return service, voyage, graph
+
+
+class TestSearchFanOut:
+    """Tests de semantic_search et find_related_content"""
+
+    @pytest.mark.asyncio
+    async def test_related_content_embeds_once_and_batches_graph(self):
+        """Un seul embedding, une requête groupée pour les concepts et une pour les voisins"""
+        service, voyage, graph = make_service()
+
+        related = await service.find_related_content(uuid4(), "alpha beta")
+
+        assert voyage.calls == 1
+        assert graph.batch_calls == [("concepts", 2), ("neighbors", 3)]
+        assert [neighbor["concept"]["id"] for neighbor in related["graph_neighbors"]] == [
+            "shared", "n-c0", "n-c1", "n-c2"
+        ]
+        assert related["partial"] is False
+
+    @pytest.mark.asyncio
+    async def test_slow_graph_branch_returns_partial_result(self):
+        """Une branche Neo4j hors délai n'empêche pas de renvoyer les mémoires"""
+        service, _, graph = make_service(graph_delay=0.5)
+
+        related = await service.find_related_content(uuid4(), "alpha beta")
+        results = await service.semantic_search(uuid4(), "alpha")
+
+        assert len(related["similar_memories"]) == 2
+        assert related["timed_out"] == ["concepts"]
+        assert graph.batch_calls == []
+        assert [memory["id"] for memory in results["memories"]] == ["m1", "m2"]
+        assert results["concepts"] == []
+        assert results["timed_out"] == ["concept"]
+        assert results["partial"] is True
+
+    @pytest.mark.asyncio
+    async def test_query_embedding_is_outside_postgres_timeout(self):
+        """Un embedding lent ne consomme pas le délai de la branche vectorielle"""
+        service, voyage, _ = make_service(embedding_delay=0.1, postgres_timeout=0.05)
+
+        results = await service.semantic_search(uuid4(), "alpha")
+
+        assert voyage.calls == 1
+        assert service.memory_service.embeddings == [[0.1, 0.2]]
+        assert [memory["id"] for memory in results["memories"]] == ["m1", "m2"]
+        assert results["timed_out"] == []
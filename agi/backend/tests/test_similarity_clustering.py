@@ -0,0 +1,74 @@
+"""
+Tests pour le regroupement vectorisé par similarité
+"""
+
+import numpy as np
+import pytest
+
+from services.similarity_clustering import SimilarityClusterer
+
+
+def angle_vectors(degrees):
+    """Vecteurs unitaires du plan, un par angle"""
+    radians = np.radians(degrees)
+    return np.stack([np.cos(radians), np.sin(radians)], axis=1).tolist()
+
+
+class TestSimilarityClusterer:
+    """Tests des modes de regroupement"""
+
+    def test_greedy_matches_pairwise_loop_across_blocks(self):
+        """Le mode glouton reproduit la boucle d'origine, quel que soit le découpage en blocs"""
+        rng = np.random.default_rng(7)
+        embeddings = rng.standard_normal((60, 8)).tolist()
+        normalized = np.asarray(embeddings) / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+        expected = []
+        used = set()
+        for i in range(len(embeddings)):
+            if i in used:
+                continue
+            cluster = [i]
+            used.add(i)
+            for j in range(len(embeddings)):
+                if j not in used and normalized[i] @ normalized[j] >= 0.5:
+                    cluster.append(j)
+                    used.add(j)
+            expected.append(cluster)
+
+        for max_block_elements in (7, 100, 10_000):
+            clusterer = SimilarityClusterer(0.5, max_block_elements=max_block_elements)
+            assert clusterer.cluster(embeddings) == expected
+
+    def test_components_follow_chains(self):
+        """Liaison simple: 0°-20°-40° forment un groupe même si 0° et 40° sont éloignés"""
+        embeddings = angle_vectors([0, 20, 40, 120])
+        threshold = float(np.cos(np.radians(25)))
+
+        assert SimilarityClusterer(threshold, "greedy").cluster(embeddings) == [[0, 1], [2], [3]]
+        assert SimilarityClusterer(threshold, "components", max_block_elements=4).cluster(embeddings) == [
+            [0, 1, 2], [3]
+        ]
+
+    def test_agglomerative_merges_close_centroids(self):
+        """Deux groupes gloutons aux centroïdes proches sont fusionnés"""
+        embeddings = angle_vectors([0, 18, 27, 90])
+        threshold = float(np.cos(np.radians(20)))
+
+        clusters = SimilarityClusterer(threshold, "agglomerative").cluster(embeddings)
+
+        assert clusters == [[0, 1, 2], [3]]
+
+    def test_cluster_items_returns_pattern_dicts(self):
+        memories = [{"content": "a"}, {"content": "b"}, {"content": "c"}]
+        embeddings = angle_vectors([0, 5, 90])
+
+        patterns = SimilarityClusterer(0.9).cluster_items(memories, embeddings)
+
+        assert [pattern["representative_content"] for pattern in patterns] == ["a", "c"]
+        assert patterns[0]["memories"] == memories[:2]
+        assert patterns[0]["embedding"] == embeddings[0]
+
+    def test_unknown_mode_is_rejected(self):
+        with pytest.raises(ValueError):
+            SimilarityClusterer(0.8, "kmeans")
@@ -0,0 +1,177 @@
+"""
+Tests de la fenêtre de validation incrémentale et de l'avancée du watermark
+"""
+
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+# Le paquet workflows importe consolidator_agent (ToolExecutor de langgraph)
+validation = pytest.importorskip("agents.workflows.knowledge_validation_workflow", exc_type=ImportError)
+
+from agents.base_agent import AgentConfig
+
+USER_ID = str(uuid4())
+
+
+class FakeMemoryService:
+    """Watermark en mémoire; lecture des mémoires modifiées éventuellement en échec"""
+
+    def __init__(self, watermark=None, memories=None, fail_reads=False):
+        self.watermark = watermark
+        self.memories = memories or []
+        self.fail_reads = fail_reads
+        self.saved_watermarks = []
+
+    async def get_validation_watermark(self, user_id):
+        return self.watermark
+
+    async def set_validation_watermark(self, user_id, watermark, full_sweep=False):
+        self.saved_watermarks.append((watermark, full_sweep))
+
+    async def get_memories_changed_since(self, user_id, since):
+        if self.fail_reads:
+            raise ConnectionError("base indisponible")
+        return self.memories
+
+    async def get_memory_neighbors(self, user_id, memory_ids, k, similarity_threshold):
+        return []
+
+
+class FakeValidatorAgent:
+    """Valide chaque lot, sauf ceux listés en échec"""
+
+    def __init__(self, failing_batches=()):
+        self.failing_batches = set(failing_batches)
+
+    async def process(self, state):
+        context = state["context"]
+        if context["batch_number"] in self.failing_batches:
+            return {**state, "error": "Claude indisponible"}
+        results = [{"memory_id": memory["id"], "is_valid": True} for memory in context["memories_to_validate"]]
+        return {**state, "context": {**context, "validation_results": results}, "error": None}
+
+
+def make_workflow(memory_service, validator=None):
+    workflow = validation.KnowledgeValidationWorkflow(
+        AgentConfig(name="knowledge_validation_agent", description="Validation"),
+        {"memory_service": memory_service}
+    )
+    if validator is not None:
+        workflow.validator_agent = validator
+    return workflow
+
+
+async def run_memory_validation(workflow, batch_size=2, **scope_options):
+    scope = validation.ValidationScope(user_id=USER_ID, **scope_options)
+    state = workflow.create_validation_state(scope)
+    state["context"]["validation_config"]["batch_size"] = batch_size
+    state["context"]["validation_window"] = await workflow._plan_validation_window(scope)
+    state = await workflow._validate_memory_consistency(state)
+    # Le rapport est le seul nœud qui avance le watermark
+    return await workflow._generate_validation_report(state)
+
+
+class TestValidationWindow:
+    """Choix entre passage complet et passage incrémental"""
+
+    @pytest.mark.asyncio
+    async def test_full_sweep_reasons(self):
+        now = datetime.now(timezone.utc)
+        recent = {"watermark": now - timedelta(hours=1), "last_full_sweep": now - timedelta(days=1)}
+        stale = {"watermark": now - timedelta(hours=1), "last_full_sweep": now - timedelta(days=8)}
+
+        cases = [
+            (validation.ValidationScope(), None, "no user scope"),
+            (validation.ValidationScope(user_id=USER_ID, full_sweep=True), recent, "full sweep requested"),
+            (validation.ValidationScope(user_id=USER_ID, incremental=False), recent, "full sweep requested"),
+            (validation.ValidationScope(user_id=USER_ID), None, "first validation"),
+            (validation.ValidationScope(user_id=USER_ID), stale, "periodic full sweep")
+        ]
+        for scope, watermark, reason in cases:
+            window = await make_workflow(FakeMemoryService(watermark))._plan_validation_window(scope)
+            assert (window["mode"], window["since"], window["reason"]) == ("full", None, reason)
+
+    @pytest.mark.asyncio
+    async def test_incremental_since_watermark(self):
+        now = datetime.now(timezone.utc)
+        watermark = {"watermark": now - timedelta(hours=1), "last_full_sweep": now - timedelta(days=1)}
+
+        window = await make_workflow(FakeMemoryService(watermark))._plan_validation_window(
+            validation.ValidationScope(user_id=USER_ID)
+        )
+
+        assert window["mode"] == "incremental"
+        assert window["since"] == watermark["watermark"]
+        assert window["started_at"] >= now
+
+
+class TestWatermarkAdvance:
+    """Le watermark n'avance qu'après un run sans erreur ni lot en échec"""
+
+    @pytest.mark.asyncio
+    async def test_clean_run_advances_watermark(self):
+        memories = [{"id": str(uuid4()), "content": f"m{i}"} for i in range(3)]
+        memory_service = FakeMemoryService(memories=memories)
+
+        state = await run_memory_validation(make_workflow(memory_service, FakeValidatorAgent()))
+
+        assert state.get("error") is None
+        assert state["context"]["memory_validation_results"]["total_validated"] == 3
+        assert len(memory_service.saved_watermarks) == 1
+        watermark, full_sweep = memory_service.saved_watermarks[0]
+        assert watermark == state["context"]["validation_window"]["started_at"]
+        assert full_sweep is True
+
+    @pytest.mark.asyncio
+    async def test_failed_read_fails_run_without_advancing(self):
+        memory_service = FakeMemoryService(fail_reads=True)
+
+        state = await run_memory_validation(make_workflow(memory_service, FakeValidatorAgent()))
+
+        assert "base indisponible" in state["error"]
+        assert memory_service.saved_watermarks == []
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_keeps_watermark(self):
+        memories = [{"id": str(uuid4()), "content": f"m{i}"} for i in range(4)]
+        memory_service = FakeMemoryService(memories=memories)
+
+        state = await run_memory_validation(
+            make_workflow(memory_service, FakeValidatorAgent(failing_batches={2}))
+        )
+
+        results = state["context"]["memory_validation_results"]
+        assert results["total_validated"] == 2
+        assert [failed["batch"] for failed in results["failed_batches"]] == [2]
+        assert memory_service.saved_watermarks == []
+
+    @pytest.mark.asyncio
+    async def test_state_error_keeps_watermark(self):
+        memory_service = FakeMemoryService()
+        workflow = make_workflow(memory_service)
+        state = workflow.create_validation_state(validation.ValidationScope(user_id=USER_ID))
+        state["context"]["validation_window"] = {"mode": "full", "since": None, "started_at": datetime.now(timezone.utc)}
+        state["error"] = "Connection integrity validation failed"
+
+        await workflow._advance_validation_watermark(state)
+
+        assert memory_service.saved_watermarks == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("scope_options", [
+        {"validate_memories": False},
+        {"validate_connections": False}
+    ])
+    async def test_partial_scope_keeps_watermark(self, scope_options):
+        """Une portée partielle ne vaut ni passage incrémental ni passage complet"""
+        memories = [{"id": str(uuid4()), "content": "m"}]
+        memory_service = FakeMemoryService(memories=memories)
+
+        state = await run_memory_validation(
+            make_workflow(memory_service, FakeValidatorAgent()), **scope_options
+        )
+
+        assert state.get("error") is None
+        assert memory_service.saved_watermarks == []
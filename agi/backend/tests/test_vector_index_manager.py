@@ -0,0 +1,81 @@
+"""
+Tests pour la gestion des index vectoriels
+"""
+
+from contextlib import asynccontextmanager
+
+import pytest
+
+from services.vector_index_manager import VectorIndexManager
+
+
+class FakeConnection:
+    def __init__(self, has_column):
+        self.has_column = has_column
+        self.executed = []
+
+    async def fetchval(self, query, *args):
+        return self.has_column
+
+    async def execute(self, query):
+        self.executed.append(query)
+
+
+class FakePool:
+    def __init__(self, has_column):
+        self.conn = FakeConnection(has_column)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+class TestVectorIndexManager:
+    """Tests des définitions d'index HNSW"""
+
+    def test_one_partial_index_per_level(self):
+        """Un index HNSW partiel est prévu pour chaque niveau"""
+        manager = VectorIndexManager(pool=None, m=24, ef_construction=100)
+        specs = manager.index_specs()
+
+        assert [spec.level for spec in specs] == ["L1", "L2", "L3"]
+
+        sql = specs[0].create_sql("memories")
+        assert sql.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS memories_embedding_hnsw_l1")
+        assert "USING hnsw (embedding vector_cosine_ops)" in sql
+        assert "WITH (m = 24, ef_construction = 100)" in sql
+        assert sql.endswith("WHERE level = 'L1'")
+
+    def test_unknown_level_is_rejected(self):
+        """Les noms d'index ne sont construits que pour les niveaux connus"""
+        manager = VectorIndexManager(pool=None)
+
+        with pytest.raises(ValueError):
+            manager.index_name("L1'; DROP TABLE memories; --")
+
+
+class TestLexicalIndex:
+    """Le démarrage construit l'index plein texte sans jamais modifier le schéma"""
+
+    @pytest.mark.asyncio
+    async def test_startup_only_builds_the_index_concurrently(self):
+        pool = FakePool(has_column=True)
+
+        status = await VectorIndexManager(pool).ensure_lexical_index()
+
+        assert status == "exists"
+        assert pool.conn.executed == [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS memories_content_tsv_idx "
+            "ON memories USING gin (content_tsv)"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_missing_column_is_left_to_the_migration(self):
+        pool = FakePool(has_column=False)
+        manager = VectorIndexManager(pool)
+
+        assert await manager.ensure_lexical_index() == "missing_column"
+        assert pool.conn.executed == []
+
+        await manager.add_lexical_column()
+        assert pool.conn.executed[0].startswith("ALTER TABLE memories ADD COLUMN IF NOT EXISTS content_tsv")
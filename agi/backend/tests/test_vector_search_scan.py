@@ -0,0 +1,74 @@
+"""
+Tests du mode de parcours de la recherche vectorielle (itératif ou exact)
+"""
+
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+import pytest
+
+from services.memory_service import MemoryService
+
+
+class FakeConnection:
+    """Enregistre les réglages de session et renvoie la version de pgvector"""
+
+    def __init__(self, pgvector_version):
+        self.pgvector_version = pgvector_version
+        self.executed = []
+        self.version_queries = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetchval(self, query, *params):
+        self.version_queries += 1
+        return self.pgvector_version
+
+    async def execute(self, query, *params):
+        self.executed.append((query, params))
+
+    async def fetch(self, query, *params):
+        return []
+
+    def settings_sql(self):
+        return " ".join(query for query, _ in self.executed)
+
+
+def make_service(pgvector_version, iterative_scan="relaxed_order"):
+    service = MemoryService(external_services=None)
+    service.settings = service.settings.model_copy(update={"vector_search_iterative_scan": iterative_scan})
+    service.pool = FakeConnection(pgvector_version)
+    return service
+
+
+class TestVectorSearchScan:
+    """Utilisateur minoritaire: jamais de HNSW sans parcours itératif"""
+
+    @pytest.mark.asyncio
+    async def test_iterative_scan_when_supported(self):
+        service = make_service("0.8.0")
+
+        await service.search_memories_by_embedding(uuid4(), [0.1, 0.2])
+        await service.search_memories_by_embedding(uuid4(), [0.1, 0.2])
+
+        sql = service.pool.settings_sql()
+        assert "hnsw.iterative_scan" in sql and "hnsw.max_scan_tuples" in sql
+        assert "enable_indexscan" not in sql
+        assert ("relaxed_order", "20000") in [params for _, params in service.pool.executed]
+        # Version lue une seule fois
+        assert service.pool.version_queries == 1
+
+    @pytest.mark.asyncio
+    async def test_exact_scan_without_iterative_support(self):
+        for service in (make_service("0.7.4"), make_service("0.8.1", iterative_scan="off")):
+            await service.search_memories_by_embedding(uuid4(), [0.1, 0.2], level="L2")
+
+            sql = service.pool.settings_sql()
+            assert "hnsw.iterative_scan" not in sql
+            assert "set_config('enable_indexscan', 'off', true)" in sql
@@ -0,0 +1,178 @@
+"""
+Tests d'exécution des workflows en jobs d'arrière-plan
+"""
+
+import asyncio
+
+import pytest
+
+# consolidator_agent requiert une version de langgraph fournissant ToolExecutor
+routes = pytest.importorskip("api.routes.agents", exc_type=ImportError)
+
+from services.checkpoint_store import CHECKPOINT_COMPLETED, CheckpointStore
+from services.job_queue import JOB_COMPLETED, JOB_FAILED, JobManager
+
+
+class FakeMemoryService:
+    """Aucune mémoire L2 à consolider; `fail` simule une base indisponible"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def get_l2_memories_before_date(self, threshold_date):
+        self.calls.append("get_l2_memories_before_date")
+        return []
+
+    async def get_all_l2_memories(self):
+        self.calls.append("get_all_l2_memories")
+        if self.fail:
+            raise ConnectionError("base indisponible")
+        return []
+
+
+async def wait_for_final(manager, job_id, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        job = await manager.get(job_id)
+        if job.is_final:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} non terminé")
+
+
+class TestWorkflowJobs:
+    """Jobs de workflow construits comme en streaming puis exécutés"""
+
+    @pytest.mark.asyncio
+    async def test_consolidation_job_runs_to_completion(self):
+        memory_service = FakeMemoryService()
+        manager = JobManager(workers=1)
+        routes.register_job_handlers(manager, {"memory_service": memory_service})
+        manager.start()
+        try:
+            request = routes.WorkflowRequest(
+                workflow_type="memory_consolidation",
+                parameters={"force_consolidation": True}
+            )
+            job = await manager.submit("workflow", request.workflow_type, request.model_dump(), "u1")
+            done = await wait_for_final(manager, job.id)
+        finally:
+            await manager.stop()
+
+        assert done.status == JOB_COMPLETED
+        assert done.result["status"] == "completed", done.result["error"]
+        assert done.result["agents_used"] == ["consolidator", "validator", "connector"]
+        assert done.result["result"]["consolidation_report"]["consolidation_metrics"]["total_candidates"] == 0
+        assert memory_service.calls == ["get_all_l2_memories"]
+
+    @pytest.mark.asyncio
+    async def test_failed_workflow_run_fails_the_job(self):
+        manager = JobManager(workers=1)
+        routes.register_job_handlers(manager, {"memory_service": FakeMemoryService(fail=True)})
+        manager.start()
+        try:
+            request = routes.WorkflowRequest(
+                workflow_type="memory_consolidation",
+                parameters={"force_consolidation": True}
+            )
+            job = await manager.submit("workflow", request.workflow_type, request.model_dump(), "u1")
+            done = await wait_for_final(manager, job.id)
+        finally:
+            await manager.stop()
+
+        assert done.status == JOB_FAILED
+        assert "base indisponible" in done.error
+        assert done.result is None
+
+    @pytest.mark.asyncio
+    async def test_workflow_job_carries_run_id_into_checkpoints(self, tmp_path):
+        checkpoint_store = CheckpointStore(directory=str(tmp_path))
+        manager = JobManager(workers=1)
+        routes.register_job_handlers(
+            manager, {"memory_service": FakeMemoryService(), "checkpoint_store": checkpoint_store}
+        )
+        manager.start()
+        try:
+            submitted = await routes.execute_workflow(
+                routes.WorkflowRequest(workflow_type="memory_consolidation", parameters={}),
+                None,
+                manager
+            )
+            done = await wait_for_final(manager, submitted.job_id)
+        finally:
+            await manager.stop()
+
+        # run_id généré à la soumission, conservé dans le payload du job
+        assert submitted.run_id
+        assert routes._job_status(done).run_id == submitted.run_id
+        assert done.result["run_id"] == submitted.run_id
+        checkpoint = await checkpoint_store.load(submitted.run_id)
+        assert checkpoint["status"] == CHECKPOINT_COMPLETED
+        assert checkpoint["owner"] == "anonymous"
+
+    @pytest.mark.asyncio
+    async def test_run_id_of_another_user_is_not_resumed(self, tmp_path):
+        checkpoint_store = CheckpointStore(directory=str(tmp_path))
+        manager = JobManager(workers=1)
+        routes.register_job_handlers(
+            manager, {"memory_service": FakeMemoryService(), "checkpoint_store": checkpoint_store}
+        )
+        manager.start()
+        try:
+            request = routes.WorkflowRequest(
+                workflow_type="memory_consolidation", parameters={}, run_id="run-u1"
+            )
+            owned = await routes.execute_workflow(request, "u1", manager)
+            assert (await wait_for_final(manager, owned.job_id)).status == JOB_COMPLETED
+
+            # Même run_id soumis par un autre utilisateur: pas de reprise, contexte non exposé
+            foreign = await routes.execute_workflow(request.model_copy(), "u2", manager)
+            done = await wait_for_final(manager, foreign.job_id)
+        finally:
+            await manager.stop()
+
+        assert done.status == JOB_FAILED
+        assert "another user" in done.error
+        assert (await checkpoint_store.load("run-u1"))["owner"] == "u1"
+
+    @pytest.mark.asyncio
+    async def test_job_and_stream_share_workflow_construction(self):
+        request = routes.WorkflowRequest(
+            workflow_type="knowledge_validation",
+            parameters={"user_id": "u1", "full_sweep": True, "unknown": 1}
+        )
+        workflow, state = routes._prepare_workflow(request, {}, "u1")
+
+        assert workflow.name == "knowledge_validation_agent"
+        assert state["context"]["validation_scope"].full_sweep is True
+        assert state["context"]["run_id"]
+        assert state["context"]["run_owner"] == "u1"
+
+    @pytest.mark.asyncio
+    async def test_unknown_workflow_fails_without_raising(self):
+        response = await routes.run_workflow(
+            routes.WorkflowRequest.model_construct(workflow_type="unknown", parameters={}, config=None, run_id=None),
+            {}
+        )
+        assert response.status == "failed"
+        assert "not supported" in response.error
+
+
+class TestLifespan:
+    """Handlers enregistrés au démarrage de l'application (uvicorn main:app)"""
+
+    @pytest.mark.asyncio
+    async def test_lifespan_registers_job_handlers(self, monkeypatch):
+        main = pytest.importorskip("main", exc_type=ImportError)
+        monkeypatch.setattr(main.settings, "redis_url", "redis://127.0.0.1:1/0")
+        monkeypatch.setattr(main.settings, "cpu_executor_workers", 0)
+
+        async def aclose():
+            pass
+
+        monkeypatch.setattr(main.external_services, "aclose", aclose)
+
+        async with main.lifespan(main.app):
+            assert main.app.state.job_manager.has_handler("workflow")
+            assert main.app.state.job_manager.has_handler("agent")